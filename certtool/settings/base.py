@@ -276,3 +276,66 @@ DONT_RAISE_WARNINGS_IN_DEV = str_to_bool(
         "false",
     )
 )
+
+# Pre-generated RSA key pool drawn from by PrivateKey.new. A size of 0 turns the pool off.
+KEY_POOL_SIZE = int(env.get_env("KEY_POOL_SIZE", "0"))
+KEY_POOL_WORKERS = int(env.get_env("KEY_POOL_WORKERS", "2"))
+KEY_POOL_MP_CONTEXT = env.get_env("KEY_POOL_MP_CONTEXT", None)
+
+# Process pool that CPU heavy crypto (key generation, CSR signing, key encryption) is offloaded to.
+# A worker count of 0 keeps that work on the request thread.
+CRYPTO_EXECUTOR_WORKERS = int(env.get_env("CRYPTO_EXECUTOR_WORKERS", "0"))
+CRYPTO_EXECUTOR_BATCH_SIZE = int(env.get_env("CRYPTO_EXECUTOR_BATCH_SIZE", "8"))
+
+# Parsed certificates kept in the process wide LRU cache, see certtool_api.core.certificate_cache.
+# A size of 0 turns the cache off.
+CERTIFICATE_CACHE_SIZE = int(env.get_env("CERTIFICATE_CACHE_SIZE", "1024"))
+
+# How certificates and CSRs are stored: pem, der or der_compressed. Rows written in any of them are read
+# back whatever this is set to, so switch it once every instance runs a release that reads the der
+# columns, then convert older rows with ./manage.py convert_certificate_storage
+CERTIFICATE_STORAGE = env.get_env("CERTIFICATE_STORAGE", "pem")
+
+# HTTP connections each boto3 client keeps open, per thread. See certtool_api.aws.clients
+AWS_MAX_POOL_CONNECTIONS = int(env.get_env("AWS_MAX_POOL_CONNECTIONS", "10"))
+
+# Client side rate limits, retries and circuit breakers on every AWS call, see certtool_api.aws.throttling.CallPolicy.
+# AWS_QUOTA_SHARE is the fraction of the account's documented quotas this deployment may use. With
+# AWS_SHARED_BUDGET_DIR set (a tmpfs such as /dev/shm/certtool) every process on a host draws from one budget,
+# otherwise each has its own and the share should be divided by the number of uWSGI workers.
+AWS_CALL_POLICY = str_to_bool(env.get_env("AWS_CALL_POLICY", "true"))
+AWS_QUOTA_SHARE = float(env.get_env("AWS_QUOTA_SHARE", "1"))
+AWS_SHARED_BUDGET_DIR = env.get_env("AWS_SHARED_BUDGET_DIR", None)
+AWS_MAX_ATTEMPTS = int(env.get_env("AWS_MAX_ATTEMPTS", "5"))
+AWS_CIRCUIT_FAILURES = int(env.get_env("AWS_CIRCUIT_FAILURES", "10"))
+AWS_CIRCUIT_RESET_SECONDS = float(env.get_env("AWS_CIRCUIT_RESET_SECONDS", "30"))
+
+# KMS envelope encryption of stored private keys, see certtool_api.services.KMSService
+KMS_KEY_ID = env.get_env("KMS_KEY_ID", "alias/certtool-private-keys")
+KMS_ENVELOPE_ENCRYPTION = str_to_bool(env.get_env("KMS_ENVELOPE_ENCRYPTION", "false"))
+KMS_DATA_KEY_MAX_AGE_SECONDS = float(env.get_env("KMS_DATA_KEY_MAX_AGE_SECONDS", "300"))
+KMS_DATA_KEY_MAX_USES = int(env.get_env("KMS_DATA_KEY_MAX_USES", "1000"))
+KMS_DATA_KEY_MAX_BYTES = int(
+    env.get_env("KMS_DATA_KEY_MAX_BYTES", str(64 * 1024 * 1024))
+)
+# concurrency and client side request rate (per second, per process) of KMSService's batch calls
+KMS_BATCH_WORKERS = int(env.get_env("KMS_BATCH_WORKERS", "8"))
+KMS_BATCH_RATE_LIMIT = float(env.get_env("KMS_BATCH_RATE_LIMIT", "100"))
+
+# The private CA certificates are signed by, directly or through ACM
+PRIVATE_CA_ARN = env.get_env("PRIVATE_CA_ARN", None)
+
+# Renewal of expiring certificates, see ./manage.py renew_certificates. Certificates are renewed
+# RENEWAL_WINDOW_DAYS before they expire, in batches of RENEWAL_BUCKET_SECONDS of expiries, RENEWAL_WORKERS at
+# a time and at most RENEWAL_RATE_LIMIT per second from each CA (0 for no limit)
+RENEWAL_WINDOW_DAYS = float(env.get_env("RENEWAL_WINDOW_DAYS", "30"))
+RENEWAL_WORKERS = int(env.get_env("RENEWAL_WORKERS", "4"))
+RENEWAL_RATE_LIMIT = float(env.get_env("RENEWAL_RATE_LIMIT", "5"))
+RENEWAL_BUCKET_SECONDS = float(env.get_env("RENEWAL_BUCKET_SECONDS", "3600"))
+RENEWAL_INTERVAL_SECONDS = float(env.get_env("RENEWAL_INTERVAL_SECONDS", "300"))
+
+# Micro-benchmarks, see the benchmark management command
+BENCHMARK_HISTORY = env.get_env(
+    "BENCHMARK_HISTORY", os.path.join(BASE_DIR, "benchmarks/history.json")
+)
+BENCHMARK_THRESHOLD = float(env.get_env("BENCHMARK_THRESHOLD", "0.25"))
@@ -13,6 +13,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from certtool_api.views.export import export_certificates
 from certtool_api.views.status import status_check
 from django.contrib import admin
 from django.urls import path
@@ -21,4 +22,5 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     # Do not remove this status check. This is used in health checks.
     path("status/", status_check, name="status"),
+    path("certificates/export/", export_certificates, name="certificate_export"),
 ]
@@ -1,6 +1,75 @@
+import os
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CertToolApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "certtool_api"
+
+    def ready(self) -> None:
+        from certtool_api.aws import clients
+
+        clients.max_pool_connections = getattr(
+            settings, "AWS_MAX_POOL_CONNECTIONS", clients.max_pool_connections
+        )
+        if getattr(settings, "AWS_CALL_POLICY", False):
+            from certtool_api.aws.throttling import DEFAULT_QUOTAS, CallPolicy
+
+            # the quotas are per account and region, AWS_QUOTA_SHARE is the part of them this deployment uses
+            clients.policy = CallPolicy(
+                quotas={
+                    key: quota * settings.AWS_QUOTA_SHARE
+                    for key, quota in DEFAULT_QUOTAS.items()
+                },
+                max_attempts=settings.AWS_MAX_ATTEMPTS,
+                failure_threshold=settings.AWS_CIRCUIT_FAILURES,
+                reset_timeout=settings.AWS_CIRCUIT_RESET_SECONDS,
+                shared_dir=settings.AWS_SHARED_BUDGET_DIR,
+            )
+            if settings.AWS_SHARED_BUDGET_DIR:
+                os.makedirs(settings.AWS_SHARED_BUDGET_DIR, exist_ok=True)
+        try:
+            from uwsgidecorators import postfork
+        except ImportError:
+            # not running under uWSGI, os.register_at_fork already covers plain forks
+            pass
+        else:
+            postfork(clients.reset)
+        from certtool_api.core.certificate_cache import (
+            DEFAULT_CACHE_SIZE,
+            CertificateCache,
+            install_certificate_cache,
+        )
+
+        cache_size: int = getattr(
+            settings, "CERTIFICATE_CACHE_SIZE", DEFAULT_CACHE_SIZE
+        )
+        install_certificate_cache(
+            CertificateCache(size=cache_size) if cache_size else None
+        )
+        # uWSGI runs with lazy-apps, so this happens once per worker after the fork
+        if getattr(settings, "KEY_POOL_SIZE", 0):
+            from certtool_api.core.key_pool import KeyPool, install_key_pool
+
+            install_key_pool(
+                KeyPool(
+                    size=settings.KEY_POOL_SIZE,
+                    workers=settings.KEY_POOL_WORKERS,
+                    mp_context=settings.KEY_POOL_MP_CONTEXT,
+                ).start()
+            )
+        if getattr(settings, "CRYPTO_EXECUTOR_WORKERS", 0):
+            from certtool_api.core.crypto_executor import (
+                CryptoExecutor,
+                install_crypto_executor,
+            )
+
+            install_crypto_executor(
+                CryptoExecutor(
+                    workers=settings.CRYPTO_EXECUTOR_WORKERS,
+                    batch_size=settings.CRYPTO_EXECUTOR_BATCH_SIZE,
+                    mp_context=settings.KEY_POOL_MP_CONTEXT,
+                ).start()
+            )
@@ -0,0 +1,6 @@
+from .clients import ClientRegistry, clients
+
+__all__ = [
+    "ClientRegistry",
+    "clients",
+]
@@ -0,0 +1,141 @@
+# This module keeps boto3 clients around between calls so endpoint/credential resolution and TLS connections are paid once per thread rather than once per call.
+
+import os
+import threading
+from typing import Any
+
+import boto3
+from attrs import define, field
+from botocore.config import Config
+
+from .throttling import CallPolicy
+
+DEFAULT_MAX_POOL_CONNECTIONS: int = 10
+# botocore's retries are left to the CallPolicy when there is one
+SINGLE_ATTEMPT: Config = Config(retries={"mode": "standard", "total_max_attempts": 1})
+
+# (service_name, profile_name, region_name, endpoint_url)
+ClientKey = tuple[str, str | None, str | None, str | None]
+
+
+@define
+class ClientRegistry:
+    """
+    This class hands out boto3 clients keyed by (service, profile, region, endpoint_url).
+
+    boto3 sessions are not thread safe, so every thread gets its own session per profile and its own clients.
+    Each client holds a urllib3 pool of up to max_pool_connections connections that is reused across calls.
+    Connections must never be shared between processes, so the registry drops everything it holds after a
+    fork (see :meth:`reset`).
+
+    :param max_pool_connections: The size of each client's HTTP connection pool
+    :param config: Extra botocore config merged into every client's config
+    :param policy: The rate limits, retries and circuit breakers every client's calls go through, botocore's
+        default retries if None. Only clients created after it is set use it.
+
+    :Example:
+
+    >>> from certtool_api.aws import clients
+    >>> kms = clients.client("kms", region_name="us-east-1")
+    >>> kms is clients.client("kms", region_name="us-east-1")
+    True
+    """
+
+    max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS
+    config: Config | None = None
+    policy: CallPolicy | None = None
+    _local: threading.local = field(init=False, factory=threading.local)
+    _generation: int = field(init=False, default=0)
+    _pid: int = field(init=False, factory=os.getpid)
+    _lock: threading.Lock = field(init=False, factory=threading.Lock)
+
+    def client(
+        self,
+        service_name: str,
+        profile_name: str | None = None,
+        region_name: str | None = None,
+        endpoint_url: str | None = None,
+    ) -> Any:
+        """
+        Return this thread's client for the given service, creating it on first use
+
+        :param service_name: The boto3 service name, e.g. "kms" or "acm-pca"
+        :param profile_name: The name of the AWS profile to use
+        :param region_name: The region to use, the profile/environment default if None
+        :param endpoint_url: An endpoint to use in place of the AWS one
+
+        :return: The boto3 client
+        """
+        clients: dict[ClientKey, Any] = self._thread_clients()
+        key: ClientKey = (service_name, profile_name, region_name, endpoint_url)
+        client: Any = clients.get(key)
+        if client is None:
+            client = self._create_client(*key)
+            if self.policy:
+                self.policy.attach(client)
+            clients[key] = client
+        return client
+
+    def reset(self) -> None:
+        """
+        Forget every client in every thread. Called in the child after a fork so a uWSGI worker never reuses
+        a connection opened by the master. The clients are dropped rather than closed, closing them would
+        close sockets the parent process may still be using.
+        """
+        with self._lock:
+            self._generation += 1
+            self._pid = os.getpid()
+        self._local = threading.local()
+
+    def close(self) -> None:
+        """
+        Close the calling thread's clients and their connections
+        """
+        clients: dict[ClientKey, Any] = self._thread_clients()
+        for client in clients.values():
+            client.close()
+        clients.clear()
+
+    def _client_config(self) -> Config:
+        config: Config = Config(max_pool_connections=self.max_pool_connections)
+        if self.config:
+            config = config.merge(self.config)
+        if self.policy:
+            config = config.merge(SINGLE_ATTEMPT)
+        return config
+
+    def _create_client(
+        self,
+        service_name: str,
+        profile_name: str | None,
+        region_name: str | None,
+        endpoint_url: str | None,
+    ) -> Any:
+        sessions: dict[str | None, boto3.session.Session] = self._local.sessions
+        session: boto3.session.Session | None = sessions.get(profile_name)
+        if session is None:
+            session = boto3.session.Session(profile_name=profile_name)
+            sessions[profile_name] = session
+        return session.client(
+            service_name,
+            region_name=region_name,
+            endpoint_url=endpoint_url,
+            config=self._client_config(),
+        )
+
+    # return this thread's clients, starting again if we've forked or been reset since the thread last looked
+    def _thread_clients(self) -> dict[ClientKey, Any]:
+        if self._pid != os.getpid():
+            self.reset()
+        local: threading.local = self._local
+        if getattr(local, "generation", None) != self._generation:
+            local.generation = self._generation
+            local.clients = {}
+            local.sessions = {}
+        return local.clients
+
+
+# the registry shared by everything in the process
+clients: ClientRegistry = ClientRegistry()
+
+os.register_at_fork(after_in_child=clients.reset)
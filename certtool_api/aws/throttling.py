@@ -0,0 +1,425 @@
+# This module holds the client side rate limiting used to keep certtool under its AWS request quotas.
+
+import fcntl
+import os
+import random
+import struct
+import time
+from threading import Lock
+from typing import Any
+
+from attrs import define, field
+from certtool_api.core import CertToolError
+
+# requests per second allowed per account and region, by "service:Operation" or "service" for every operation
+# of a service that shares one quota. See the Service Quotas console for the values of an account.
+DEFAULT_QUOTAS: dict[str, float] = {
+    "acm-pca:IssueCertificate": 25,
+    "acm-pca:GetCertificate": 75,
+    "acm-pca:GetCertificateAuthorityCertificate": 10,
+    "acm:RequestCertificate": 5,
+    "acm:DescribeCertificate": 10,
+    "acm:ExportCertificate": 5,
+    "acm:GetCertificate": 10,
+    # Encrypt, Decrypt and GenerateDataKey share the symmetric cryptographic operations quota
+    "kms": 5500,
+}
+DEFAULT_MAX_ATTEMPTS: int = 5
+DEFAULT_BASE_DELAY: float = 0.1
+DEFAULT_MAX_DELAY: float = 20.0
+DEFAULT_FAILURE_THRESHOLD: int = 10
+DEFAULT_RESET_TIMEOUT: float = 30.0
+# the lowest fraction of its quota a throttled API is slowed to, and the fraction each success wins back
+MIN_RATE_FRACTION: float = 0.1
+RECOVERY_FRACTION: float = 0.05
+
+# the error codes AWS answers with when a request is over a rate quota
+THROTTLING_ERROR_CODES: frozenset[str] = frozenset(
+    {
+        "Throttling",
+        "ThrottlingException",
+        "ThrottledException",
+        "RequestThrottledException",
+        "TooManyRequestsException",
+        "RequestLimitExceeded",
+        "LimitExceededException",
+        "SlowDown",
+    }
+)
+
+# (tokens, monotonic time they were counted at), the state a SharedTokenBucket keeps in its file
+_SHARED_STATE: struct.Struct = struct.Struct("dd")
+
+
+@define
+class TokenBucket:
+    """
+    This class is a thread safe token bucket. Tokens refill continuously at rate per second up to burst,
+    and each call takes one.
+
+    :param rate: The number of tokens added per second
+    :param burst: The most tokens the bucket holds, rate (and at least one) if None
+
+    :Example:
+
+    >>> from certtool_api.aws.throttling import TokenBucket
+    >>> bucket = TokenBucket(rate=50)
+    >>> bucket.acquire()  # blocks until a token is free
+    """
+
+    rate: float
+    burst: float | None = None
+    _tokens: float = field(init=False, default=0.0)
+    _updated_at: float = field(init=False, default=0.0)
+    _lock: Lock = field(init=False, factory=Lock)
+
+    def __attrs_post_init__(self) -> None:
+        if self.rate <= 0:
+            raise ThrottlingError("A token bucket needs a positive rate.")
+        if self.burst is None:
+            # a bucket that held less than one token could never hand one out
+            self.burst = max(self.rate, 1.0)
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Take tokens if they are available
+
+        :param tokens: The number of tokens to take
+
+        :return: 0 if the tokens were taken, otherwise the number of seconds until they will be available
+        """
+        with self._lock:
+            now: float = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1, timeout: float | None = None) -> None:
+        """
+        Take tokens, sleeping until they are available
+
+        :param tokens: The number of tokens to take
+        :param timeout: The most seconds to wait, forever if None
+
+        :raises ThrottlingError: if the tokens don't become available within timeout
+        """
+        _acquire(self, tokens, timeout)
+
+
+@define
+class SharedTokenBucket:
+    """
+    This class is a token bucket whose state is kept in a file, so every process that opens the same path
+    draws from one budget. Put the file on a tmpfs such as /dev/shm and it is a shared memory segment, which
+    is how uWSGI workers on a host share an account's quota. Takes are serialized with flock, so they are
+    safe across both threads and processes.
+
+    :param path: The file the bucket's state is kept in, created if it doesn't exist
+    :param rate: The number of tokens added per second. Each process uses its own, keep them the same.
+    :param burst: The most tokens the bucket holds, rate (and at least one) if None
+
+    :Example:
+
+    >>> from certtool_api.aws.throttling import SharedTokenBucket
+    >>> bucket = SharedTokenBucket(path="/dev/shm/certtool-acm-pca-IssueCertificate", rate=25)
+    >>> bucket.acquire()  # blocks until a token is free in any process
+    """
+
+    path: str
+    rate: float
+    burst: float | None = None
+    _fd: int | None = field(init=False, default=None)
+    _pid: int = field(init=False, default=0)
+    _lock: Lock = field(init=False, factory=Lock)
+
+    def __attrs_post_init__(self) -> None:
+        if self.rate <= 0:
+            raise ThrottlingError("A token bucket needs a positive rate.")
+        if self.burst is None:
+            self.burst = max(self.rate, 1.0)
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Take tokens if they are available
+
+        :param tokens: The number of tokens to take
+
+        :return: 0 if the tokens were taken, otherwise the number of seconds until they will be available
+        """
+        # flock is per open file, so the threads of a process take turns on its one descriptor
+        with self._lock:
+            fd: int = self._file()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                # CLOCK_MONOTONIC is the same for every process on the host
+                now: float = time.monotonic()
+                state: bytes = os.pread(fd, _SHARED_STATE.size, 0)
+                available: float = self.burst
+                if len(state) == _SHARED_STATE.size:
+                    stored, updated_at = _SHARED_STATE.unpack(state)
+                    available = min(
+                        self.burst, stored + max(0.0, now - updated_at) * self.rate
+                    )
+                wait: float = 0.0
+                if available >= tokens:
+                    available -= tokens
+                else:
+                    wait = (tokens - available) / self.rate
+                os.pwrite(fd, _SHARED_STATE.pack(available, now), 0)
+                return wait
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def acquire(self, tokens: float = 1, timeout: float | None = None) -> None:
+        """
+        Take tokens, sleeping until they are available
+
+        :param tokens: The number of tokens to take
+        :param timeout: The most seconds to wait, forever if None
+
+        :raises ThrottlingError: if the tokens don't become available within timeout
+        """
+        _acquire(self, tokens, timeout)
+
+    # method returning this process's descriptor for path, a forked child opens its own so its locks are its own
+    def _file(self) -> int:
+        if self._fd is None or self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+        return self._fd
+
+
+# function to take tokens from bucket, sleeping until they are available
+def _acquire(
+    bucket: TokenBucket | SharedTokenBucket, tokens: float, timeout: float | None
+) -> None:
+    if tokens > bucket.burst:
+        raise ThrottlingError(
+            f"Can't take {tokens} tokens from a burst of {bucket.burst}."
+        )
+    deadline: float | None = None if timeout is None else time.monotonic() + timeout
+    while wait := bucket.try_acquire(tokens):
+        if deadline is not None and time.monotonic() + wait > deadline:
+            raise ThrottlingError("Timed out waiting for the rate limit.")
+        time.sleep(wait)
+
+
+@define
+class CircuitBreaker:
+    """
+    This class stops calls to a service that keeps failing. After failure_threshold failures in a row it
+    opens and refuses calls for reset_timeout seconds, then lets a single trial call through: the breaker
+    closes again if it succeeds and stays open for another reset_timeout if it doesn't.
+
+    :param failure_threshold: The number of failures in a row that opens the breaker
+    :param reset_timeout: The number of seconds the breaker stays open before a trial call
+    """
+
+    failure_threshold: int = DEFAULT_FAILURE_THRESHOLD
+    reset_timeout: float = DEFAULT_RESET_TIMEOUT
+    _failures: int = field(init=False, default=0)
+    _opened_at: float | None = field(init=False, default=None)
+    _trial: bool = field(init=False, default=False)
+    _lock: Lock = field(init=False, factory=Lock)
+
+    @property
+    def open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """
+        :return: Whether a call may be made now
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+
+@define
+class _Limit:
+    """
+    A rate limit on one quota and the quota it is adapted within
+    """
+
+    bucket: TokenBucket | SharedTokenBucket
+    quota: float
+
+
+@define
+class CallPolicy:
+    """
+    This class is the rate limiting, retrying and circuit breaking every AWS call certtool makes goes
+    through, shared by every client in the process. :meth:`attach` hooks it into a boto3 client, see
+    ClientRegistry.policy, and takes over from botocore's own retries.
+
+    - Before each attempt the call takes a token from the bucket of its quota, the most specific of
+      "service:Operation" or "service" in quotas, so a burst of calls queues client side instead of
+      tripping ThrottlingExceptions. With shared_dir set the buckets are :class:`SharedTokenBucket` files
+      there, one budget for every process on the host.
+    - A throttled attempt halves the rate its bucket refills at, down to MIN_RATE_FRACTION of the quota,
+      and each successful one wins back RECOVERY_FRACTION of it, so the process settles under whatever
+      rate AWS is actually allowing.
+    - Throttled, 5xx and connection failures are retried up to max_attempts times after a delay drawn
+      uniformly from 0 to base_delay doubled per attempt (capped at max_delay), so callers that failed
+      together don't retry together.
+    - Each service has a :class:`CircuitBreaker`. While it is open calls fail at once with
+      CircuitOpenError rather than adding to an outage.
+
+    :param quotas: The requests per second allowed by "service:Operation" or "service", unlimited if absent
+    :param max_attempts: The most attempts made of a call
+    :param base_delay: The longest delay before the first retry, in seconds
+    :param max_delay: The longest delay before any retry, in seconds
+    :param failure_threshold: The failed attempts in a row that open a service's circuit breaker
+    :param reset_timeout: The seconds a circuit breaker stays open
+    :param shared_dir: A directory, ideally on a tmpfs, to keep buckets shared between processes in
+
+    :Example:
+
+    >>> from certtool_api.aws import clients
+    >>> from certtool_api.aws.throttling import DEFAULT_QUOTAS, CallPolicy
+    >>> clients.policy = CallPolicy(quotas=DEFAULT_QUOTAS, shared_dir="/dev/shm/certtool")
+    """
+
+    quotas: dict[str, float] = field(factory=lambda: dict(DEFAULT_QUOTAS))
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    base_delay: float = DEFAULT_BASE_DELAY
+    max_delay: float = DEFAULT_MAX_DELAY
+    failure_threshold: int = DEFAULT_FAILURE_THRESHOLD
+    reset_timeout: float = DEFAULT_RESET_TIMEOUT
+    shared_dir: str | None = None
+    _limits: dict[str, _Limit] = field(init=False, factory=dict)
+    _breakers: dict[str, CircuitBreaker] = field(init=False, factory=dict)
+    _rng: random.Random = field(init=False, factory=random.Random)
+    _lock: Lock = field(init=False, factory=Lock)
+
+    def attach(self, client: Any) -> None:
+        """
+        Route client's calls through the policy. Its config should allow botocore a single attempt, see
+        ClientRegistry._client_config, or botocore retries alongside it.
+
+        :param client: A boto3 client
+        """
+        service: str = client.meta.service_model.service_id.hyphenize()
+        # first, so buckets are taken before any other hook answers the request
+        client.meta.events.register_first(f"before-send.{service}", self._before_send)
+        client.meta.events.register_first(f"needs-retry.{service}", self._needs_retry)
+
+    def breaker(self, service: str) -> CircuitBreaker:
+        """
+        :param service: The service name, e.g. "acm-pca"
+
+        :return: The circuit breaker of service
+        """
+        with self._lock:
+            breaker: CircuitBreaker | None = self._breakers.get(service)
+            if breaker is None:
+                breaker = self._breakers[service] = CircuitBreaker(
+                    failure_threshold=self.failure_threshold,
+                    reset_timeout=self.reset_timeout,
+                )
+            return breaker
+
+    # hook run before each attempt of a call is sent
+    def _before_send(self, event_name: str, **_) -> None:
+        _, service, operation = event_name.split(".", 2)
+        if not self.breaker(service).allow():
+            raise CircuitOpenError(f"{service} is failing, not calling {operation}.")
+        limit: _Limit | None = self._limit(service, operation)
+        if limit:
+            limit.bucket.acquire()
+
+    # hook run after each attempt of a call, returning the seconds to wait before retrying or None to stop
+    def _needs_retry(
+        self,
+        operation: Any,
+        attempts: int,
+        response: tuple[Any, dict] | None = None,
+        caught_exception: Exception | None = None,
+        **_,
+    ) -> float | None:
+        if isinstance(caught_exception, CircuitOpenError):
+            # refused before it was sent, so it says nothing of the service and isn't worth retrying
+            return None
+        service: str = operation.service_model.service_id.hyphenize()
+        status: int = response[0].status_code if response else 0
+        code: str | None = (
+            response[1].get("Error", {}).get("Code") if response else None
+        )
+        throttled: bool = code in THROTTLING_ERROR_CODES
+        limit: _Limit | None = self._limit(service, operation.name)
+        if not (throttled or caught_exception is not None or status >= 500):
+            # anything else, errors included, means the service is up and answering
+            self.breaker(service).record_success()
+            if limit:
+                self._adapt(limit, limit.bucket.rate + limit.quota * RECOVERY_FRACTION)
+            return None
+        self.breaker(service).record_failure()
+        if throttled and limit:
+            self._adapt(limit, limit.bucket.rate / 2)
+        if attempts >= self.max_attempts:
+            return None
+        with self._lock:
+            return self._rng.uniform(
+                0, min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            )
+
+    # method returning the limit on the quota of service's operation, made the first time it is asked for
+    def _limit(self, service: str, operation: str) -> _Limit | None:
+        key: str | None = next(
+            (key for key in (f"{service}:{operation}", service) if key in self.quotas),
+            None,
+        )
+        if key is None:
+            return None
+        with self._lock:
+            limit: _Limit | None = self._limits.get(key)
+            if limit is None:
+                quota: float = self.quotas[key]
+                bucket: TokenBucket | SharedTokenBucket = (
+                    SharedTokenBucket(
+                        path=os.path.join(self.shared_dir, key.replace(":", "-")),
+                        rate=quota,
+                    )
+                    if self.shared_dir
+                    else TokenBucket(rate=quota)
+                )
+                limit = self._limits[key] = _Limit(bucket=bucket, quota=quota)
+            return limit
+
+    # method to set the rate limit refills at, within MIN_RATE_FRACTION of its quota and the quota itself
+    def _adapt(self, limit: _Limit, rate: float) -> None:
+        limit.bucket.rate = min(limit.quota, max(limit.quota * MIN_RATE_FRACTION, rate))
+
+
+class ThrottlingError(CertToolError):
+    """Throttling error"""
+
+
+class CircuitOpenError(ThrottlingError):
+    """
+    This class is used to represent a call refused because its service's circuit breaker is open
+    """
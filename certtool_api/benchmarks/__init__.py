@@ -0,0 +1,19 @@
+from .runner import (
+    Benchmark,
+    BenchmarkHistory,
+    BenchmarkResult,
+    Comparison,
+    register,
+    registry,
+    run_benchmark,
+)
+
+__all__ = [
+    "Benchmark",
+    "BenchmarkHistory",
+    "BenchmarkResult",
+    "Comparison",
+    "register",
+    "registry",
+    "run_benchmark",
+]
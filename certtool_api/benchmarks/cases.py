@@ -0,0 +1,272 @@
+# The benchmarked code paths. Each setup function builds its fixtures and returns the callable to time.
+# The CertificateModel paths write to the database, run them inside a transaction that is rolled back.
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator
+
+from certtool_api.core import Certificate, PrivateKey, Status, Subject, Tags
+from certtool_api.core.crypto_executor import (
+    get_crypto_executor,
+    install_crypto_executor,
+)
+from certtool_api.core.key_pool import get_key_pool, install_key_pool
+from certtool_api.core.private_key import KeyTypes
+from certtool_api.models import CertificateModel
+from certtool_api.repositories import (
+    CertificateRepository,
+    DjangoRepository,
+    RepoFactory,
+)
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.x509 import (
+    BasicConstraints,
+)
+from cryptography.x509 import Certificate as X509Certificate
+from cryptography.x509 import (
+    CertificateBuilder,
+    DNSName,
+    SubjectAlternativeName,
+    random_serial_number,
+)
+
+from .runner import register
+
+SUBJECT: Subject = Subject(
+    common_name="service.example.com",
+    country="US",
+    state="New York",
+    locality="New York",
+    organization="Example, Inc.",
+    organizational_unit="Platform",
+    email="platform@example.com",
+)
+ALTERNATE_NAMES: list[str] = [f"host{index}.example.com" for index in range(10)]
+
+
+@contextmanager
+def inline_crypto() -> Iterator[None]:
+    """
+    Uninstall the KeyPool and CryptoExecutor while benchmarking, so keys, CSRs and PEMs are timed on the
+    calling thread rather than as a handoff to worker processes
+    """
+    pool, executor = get_key_pool(), get_crypto_executor()
+    install_key_pool(None)
+    install_crypto_executor(None)
+    try:
+        yield
+    finally:
+        install_key_pool(pool)
+        install_crypto_executor(executor)
+
+
+# function to sign a certificate for key with issuer_key, self signed when issuer is None
+def _sign(
+    key: PrivateKey,
+    subject: Subject,
+    issuer_key: PrivateKey,
+    issuer: X509Certificate | None = None,
+    ca: bool = False,
+) -> X509Certificate:
+    now: datetime = datetime.now(timezone.utc)
+    builder: CertificateBuilder = (
+        CertificateBuilder()
+        .subject_name(subject.to_x509_name())
+        .issuer_name(issuer.subject if issuer else subject.to_x509_name())
+        .public_key(key.key.public_key())
+        .serial_number(random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + timedelta(days=30))
+        .add_extension(BasicConstraints(ca=ca, path_length=None), critical=True)
+    )
+    if not ca:
+        builder = builder.add_extension(
+            SubjectAlternativeName([DNSName(name) for name in ALTERNATE_NAMES]),
+            critical=False,
+        )
+    return builder.sign(issuer_key.key, SHA256())
+
+
+# function returning a leaf certificate, with its key, signed by an intermediate and its root
+def _issued() -> Certificate:
+    root_key: PrivateKey = PrivateKey.new(key_size=256, key_type=KeyTypes.EC)
+    root: X509Certificate = _sign(
+        root_key, Subject(common_name="Benchmark Root CA"), root_key, ca=True
+    )
+    intermediate_key: PrivateKey = PrivateKey.new(key_size=256, key_type=KeyTypes.EC)
+    intermediate: X509Certificate = _sign(
+        intermediate_key,
+        Subject(common_name="Benchmark Issuing CA"),
+        root_key,
+        root,
+        ca=True,
+    )
+    key: PrivateKey = PrivateKey.new(key_size=2048)
+    certificate: Certificate = Certificate(
+        key=key,
+        certificate=_sign(key, SUBJECT, intermediate_key, intermediate),
+        chain=[intermediate, root],
+        subject=SUBJECT,
+        alternate_names=ALTERNATE_NAMES,
+        tags=Tags(team="platform", environment="production", service="benchmark"),
+        status=Status.ACTIVE,
+    )
+    certificate.attrs_from_x509_certificate()
+    certificate.not_before = certificate.not_before.replace(tzinfo=timezone.utc)
+    certificate.not_after = certificate.not_after.replace(tzinfo=timezone.utc)
+    return certificate
+
+
+@register("Certificate.from_pem", number=20)
+def certificate_from_pem() -> Callable[[], object]:
+    pem: bytes = _issued().certificate_pem
+    return lambda: Certificate.from_pem(pem)
+
+
+@register("Certificate.chain_pem.get", number=50)
+def chain_pem_get() -> Callable[[], object]:
+    certificate: Certificate = _issued()
+    return lambda: certificate.chain_pem
+
+
+@register("Certificate.chain_pem.set", number=20)
+def chain_pem_set() -> Callable[[], object]:
+    chain_pem: bytes = _issued().chain_pem
+    certificate: Certificate = Certificate()
+
+    def _set() -> None:
+        certificate.chain_pem = chain_pem
+
+    return _set
+
+
+@register("Certificate.chain.parse", number=20)
+def chain_parse() -> Callable[[], object]:
+    chain_pem: bytes = _issued().chain_pem
+
+    # a fresh entity each call, so only the certificate cache can save the parse
+    def _parse() -> list[X509Certificate]:
+        certificate: Certificate = Certificate()
+        certificate.chain_pem = chain_pem
+        return certificate.chain
+
+    return _parse
+
+
+@register("Certificate.generate_csr", number=5)
+def generate_csr() -> Callable[[], object]:
+    certificate: Certificate = Certificate(
+        key=PrivateKey.new(key_size=2048),
+        subject=SUBJECT,
+        alternate_names=ALTERNATE_NAMES,
+    )
+    return certificate.generate_csr
+
+
+@register("Certificate.attrs_from_x509_certificate", number=50)
+def attrs_from_x509_certificate() -> Callable[[], object]:
+    certificate: Certificate = _issued()
+    return certificate.attrs_from_x509_certificate
+
+
+# RSA key generation searches for random primes, so its timings spread widely from one run to the next
+@register("PrivateKey.new[2048]", rounds=10, threshold=1.0)
+def private_key_new_2048() -> Callable[[], object]:
+    return lambda: PrivateKey.new(key_size=2048)
+
+
+@register("PrivateKey.new[4096]", rounds=5, threshold=1.0)
+def private_key_new_4096() -> Callable[[], object]:
+    return lambda: PrivateKey.new(key_size=4096)
+
+
+@register("PrivateKey.from_pem", number=5)
+def private_key_from_pem() -> Callable[[], object]:
+    pem: bytes = PrivateKey.new(key_size=2048).pem
+    return lambda: PrivateKey.from_pem(pem)
+
+
+@register("Subject.to_x509_name", number=500)
+def subject_to_x509_name() -> Callable[[], object]:
+    return SUBJECT.to_x509_name
+
+
+@register("CertificateModel.to_entity", number=10)
+def certificate_model_to_entity() -> Callable[[], object]:
+    model: CertificateModel = CertificateModel.objects.get(
+        certificate_id=CertificateModel.save_from_entity(_issued()).certificate_id
+    )
+    # the tags, alternate names and chain links are read through the model's relations, so each call queries them
+    return model.to_entity
+
+
+@register("CertificateModel.save_from_entity[create]", number=10)
+def certificate_model_save_create() -> Callable[[], object]:
+    certificate: Certificate = _issued()
+    return lambda: CertificateModel.save_from_entity(certificate)
+
+
+@register("CertificateModel.save_from_entity[update]", number=10)
+def certificate_model_save_update() -> Callable[[], object]:
+    certificate: Certificate = _issued()
+    certificate.certificate_id = CertificateModel.save_from_entity(
+        certificate
+    ).certificate_id
+    return lambda: CertificateModel.save_from_entity(certificate)
+
+
+@register("CertificateModel.save_many[100]", rounds=10)
+def certificate_model_save_many() -> Callable[[], object]:
+    certificate: Certificate = _issued()
+    certificates: list[Certificate] = [
+        Certificate(
+            certificate=certificate.certificate,
+            chain=certificate.chain,
+            subject=certificate.subject,
+            alternate_names=certificate.alternate_names,
+            tags=certificate.tags,
+            status=certificate.status,
+        )
+        for _ in range(100)
+    ]
+    return lambda: CertificateModel.save_many(certificates)
+
+
+@register("DjangoRepository.all[100]", rounds=10)
+def certificate_repository_all() -> Callable[[], object]:
+    certificate: Certificate = _issued()
+    CertificateModel.save_many(
+        [
+            Certificate(
+                certificate=certificate.certificate,
+                subject=certificate.subject,
+                alternate_names=certificate.alternate_names,
+                tags=certificate.tags,
+            )
+            for _ in range(100)
+        ]
+    )
+    repository: DjangoRepository = RepoFactory.certificate()
+    return repository.all
+
+
+@register("CertificateRepository.covering[10000 SANs]", number=10)
+def certificate_repository_covering() -> Callable[[], object]:
+    not_after: datetime = datetime.now(timezone.utc) + timedelta(days=30)
+    CertificateModel.save_many(
+        [
+            Certificate(
+                subject=Subject(common_name=f"service{index}.example.com"),
+                alternate_names=[
+                    f"{name}.service{index}.example.com"
+                    for name in ("api", "www", "admin", "*")
+                ]
+                + [f"service{index}.example.com"],
+                not_after=not_after,
+                status=Status.ACTIVE,
+            )
+            for index in range(2000)
+        ]
+    )
+    repository: CertificateRepository = RepoFactory.certificate()
+    return lambda: repository.covering("web.service1000.example.com")
@@ -0,0 +1,266 @@
+import gc
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable
+
+from attrs import asdict, define, field
+
+DEFAULT_ROUNDS: int = 20
+DEFAULT_THRESHOLD: float = 0.25
+# runs kept in the history file, oldest dropped first
+MAX_RUNS: int = 200
+
+
+@define
+class Benchmark:
+    """
+    A single benchmarked code path
+
+    :param name: The name results are recorded under, e.g. "Certificate.from_pem"
+    :param setup: Builds the fixtures and returns the callable to time
+    :param rounds: The number of timed rounds
+    :param number: The number of calls in each round, raise it for paths too quick to time one call of
+    :param threshold: The regression threshold of this path, the runner's threshold if None. Paths with a
+        lot of natural variance, like RSA key generation, need a looser one
+    """
+
+    name: str
+    setup: Callable[[], Callable[[], object]]
+    rounds: int = DEFAULT_ROUNDS
+    number: int = 1
+    threshold: float | None = None
+
+
+@define
+class BenchmarkResult:
+    """
+    The timings of a benchmark, in seconds per call
+
+    :param name: The benchmark's name
+    :param rounds: The number of timed rounds
+    :param number: The number of calls in each round
+    :param min: The fastest round, the figure regressions are judged on. Noise from the rest of the machine
+        only ever slows a round down, so the fastest is the steadiest estimate of the code's own cost
+    :param median: The median round
+    :param mean: The mean round
+    :param stdev: The standard deviation of the rounds
+    """
+
+    name: str
+    rounds: int
+    number: int
+    min: float
+    median: float
+    mean: float
+    stdev: float
+
+    @classmethod
+    def from_timings(
+        cls, name: str, number: int, timings: list[float]
+    ) -> "BenchmarkResult":
+        return cls(
+            name=name,
+            rounds=len(timings),
+            number=number,
+            min=min(timings),
+            median=statistics.median(timings),
+            mean=statistics.fmean(timings),
+            stdev=statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BenchmarkResult":
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@define
+class Comparison:
+    """
+    A result compared with its baseline
+
+    :param name: The benchmark's name
+    :param baseline: The baseline's fastest round
+    :param current: The current fastest round
+    :param threshold: The allowed slowdown, as a fraction of the baseline
+    """
+
+    name: str
+    baseline: float
+    current: float
+    threshold: float
+
+    # property returning how many times slower the current run is than the baseline
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline if self.baseline else 1.0
+
+    @property
+    def regressed(self) -> bool:
+        return self.ratio > 1 + self.threshold
+
+
+# function to time a benchmark the way timeit does, with the garbage collector off
+def run_benchmark(benchmark: Benchmark, rounds: int | None = None) -> BenchmarkResult:
+    """
+    Run one benchmark
+
+    :param benchmark: The benchmark to run
+    :param rounds: The number of timed rounds, benchmark.rounds if None
+
+    :return: The benchmark's timings
+    """
+    call: Callable[[], object] = benchmark.setup()
+    # one untimed call so lazily built state doesn't land in the first round
+    call()
+    timings: list[float] = []
+    gc_was_enabled: bool = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds or benchmark.rounds):
+            started: float = time.perf_counter()
+            for _ in range(benchmark.number):
+                call()
+            timings.append((time.perf_counter() - started) / benchmark.number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return BenchmarkResult.from_timings(benchmark.name, benchmark.number, timings)
+
+
+@define
+class BenchmarkHistory:
+    """
+    This class keeps benchmark results in a JSON file: a baseline to compare against and the runs recorded
+    so far, newest last.
+
+    :param path: The JSON file, created on the first save
+    :param max_runs: The number of runs to keep
+
+    :Example:
+
+    >>> history = BenchmarkHistory.load(Path("benchmarks/history.json"))
+    >>> regressions = [c for c in history.compare(results) if c.regressed]
+    >>> history.record(results)
+    >>> history.save()
+    """
+
+    path: Path
+    max_runs: int = MAX_RUNS
+    baseline: dict[str, BenchmarkResult] = field(factory=dict)
+    runs: list[dict] = field(factory=list)
+
+    @classmethod
+    def load(cls, path: Path, max_runs: int = MAX_RUNS) -> "BenchmarkHistory":
+        history: BenchmarkHistory = cls(path=path, max_runs=max_runs)
+        if path.exists():
+            data: dict = json.loads(path.read_text())
+            history.baseline = {
+                name: BenchmarkResult.from_dict(result)
+                for name, result in data.get("baseline", {}).items()
+            }
+            history.runs = data.get("runs", [])
+        return history
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(
+            json.dumps(
+                {
+                    "baseline": {
+                        name: result.to_dict() for name, result in self.baseline.items()
+                    },
+                    "runs": self.runs,
+                },
+                indent=2,
+                sort_keys=True,
+            )
+            + "\n"
+        )
+
+    def record(self, results: Iterable[BenchmarkResult]) -> dict:
+        """
+        Add a run to the history, dropping the oldest past max_runs
+
+        :param results: The run's results
+
+        :return: The recorded run
+        """
+        run: dict = {
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": {result.name: result.to_dict() for result in results},
+        }
+        self.runs = [*self.runs, run][-self.max_runs :]
+        return run
+
+    def set_baseline(self, results: Iterable[BenchmarkResult]) -> None:
+        """
+        Make results the baseline, keeping the baseline of any benchmark that wasn't run
+        """
+        self.baseline.update({result.name: result for result in results})
+
+    def compare(
+        self,
+        results: Iterable[BenchmarkResult],
+        threshold: float = DEFAULT_THRESHOLD,
+        thresholds: dict[str, float] | None = None,
+    ) -> list[Comparison]:
+        """
+        Compare results with the baseline, on their fastest rounds
+
+        :param results: The results to compare
+        :param threshold: The allowed slowdown, 0.25 allows a path to get 25% slower
+        :param thresholds: Thresholds of particular benchmarks, by name
+
+        :return: A comparison for each result that has a baseline
+        """
+        thresholds = thresholds or {}
+        return [
+            Comparison(
+                name=result.name,
+                baseline=self.baseline[result.name].min,
+                current=result.min,
+                threshold=thresholds.get(result.name, threshold),
+            )
+            for result in results
+            if result.name in self.baseline
+        ]
+
+
+# every benchmark registered with @register, in the order they were registered
+registry: list[Benchmark] = []
+
+
+def register(
+    name: str,
+    rounds: int = DEFAULT_ROUNDS,
+    number: int = 1,
+    threshold: float | None = None,
+) -> Callable[[Callable[[], Callable[[], object]]], Callable[[], Callable[[], object]]]:
+    """
+    Decorator registering a setup function as a benchmark, see :class:`Benchmark`
+    """
+
+    def _register(
+        setup: Callable[[], Callable[[], object]]
+    ) -> Callable[[], Callable[[], object]]:
+        registry.append(
+            Benchmark(
+                name=name,
+                setup=setup,
+                rounds=rounds,
+                number=number,
+                threshold=threshold,
+            )
+        )
+        return setup
+
+    return _register
@@ -1,33 +1,46 @@
+import hashlib
 from datetime import datetime
 from enum import Enum
 
 from attrs import define, field
 from cryptography.hazmat.primitives.hashes import SHA256, HashAlgorithm
-from cryptography.hazmat.primitives.serialization import Encoding
 from cryptography.x509 import Certificate as X509Certificate
 from cryptography.x509 import (
     CertificateSigningRequest,
-    CertificateSigningRequestBuilder,
     DNSName,
     ExtensionNotFound,
     ExtensionOID,
-    Name,
-    NameAttribute,
-    NameOID,
-    ObjectIdentifier,
-    SubjectAlternativeName,
-    load_pem_x509_certificate,
-    load_pem_x509_csr,
 )
 
 from .base import CertToolError
+from .crypto_executor import CryptoExecutor, get_crypto_executor, sign_csr
 from .private_key import PrivateKey
 from .subject import Subject
 from .tags import Tags
+from .x509_encoding import CERTIFICATE_LABEL, LazyX509, split_pem
 
 END_CERTIFICATE = b"-----END CERTIFICATE-----\n"
 
 
+# converters letting the X.509 fields be given parsed or already wrapped
+def _lazy_certificate(
+    certificate: X509Certificate | LazyX509 | None,
+) -> LazyX509 | None:
+    if certificate is None or isinstance(certificate, LazyX509):
+        return certificate
+    return LazyX509.certificate(parsed=certificate)
+
+
+def _lazy_csr(csr: CertificateSigningRequest | LazyX509 | None) -> LazyX509 | None:
+    if csr is None or isinstance(csr, LazyX509):
+        return csr
+    return LazyX509.csr(parsed=csr)
+
+
+def _lazy_chain(chain: list[X509Certificate | LazyX509] | None) -> list[LazyX509]:
+    return [_lazy_certificate(certificate) for certificate in chain or []]
+
+
 class Status(Enum):
     """
     Status enum class.
@@ -87,9 +100,10 @@ class Certificate:
     acm_arn: str | None = None
     private_ca_arn: str | None = None
     issuer_ca_arn: str | None = None
-    certificate: X509Certificate | None = None
-    chain: list[X509Certificate] = field(factory=list)
-    csr: CertificateSigningRequest | None = None
+    # held lazily, see the certificate, chain and csr properties
+    _certificate: LazyX509 | None = field(default=None, converter=_lazy_certificate)
+    _chain: list[LazyX509] = field(factory=list, converter=_lazy_chain)
+    _csr: LazyX509 | None = field(default=None, converter=_lazy_csr)
     key: PrivateKey | None = None
     alternate_names: list[str] = field(factory=list)
     not_before: datetime | None = None
@@ -129,58 +143,103 @@ class Certificate:
         self.key = PrivateKey.new()
         return self
 
+    # the parsed certificate, parsed on first access when it was set as PEM or DER
+    @property
+    def certificate(self) -> X509Certificate | None:
+        return self._certificate.parsed if self._certificate else None
+
+    @certificate.setter
+    def certificate(self, certificate: X509Certificate | None) -> None:
+        self._certificate = _lazy_certificate(certificate)
+
+    # the parsed chain, parsed on first access when it was set as PEM. A new list each time, assign to change it
+    @property
+    def chain(self) -> list[X509Certificate]:
+        return [certificate.parsed for certificate in self._chain]
+
+    @chain.setter
+    def chain(self, chain: list[X509Certificate] | None) -> None:
+        self._chain = _lazy_chain(chain)
+
+    # the parsed CSR, parsed on first access when it was set as PEM
+    @property
+    def csr(self) -> CertificateSigningRequest | None:
+        return self._csr.parsed if self._csr else None
+
+    @csr.setter
+    def csr(self, csr: CertificateSigningRequest | None) -> None:
+        self._csr = _lazy_csr(csr)
+
     # function to generate a pem bytes string from self.csr that raises CsrNotSetError if self.csr is None
     @property
     def csr_pem(self) -> bytes:
-        if not self.csr:
+        if not self._csr:
             raise CertificateError("CSR not set.")
-        return self.csr.public_bytes(Encoding.PEM)
+        return self._csr.pem
 
-    # function to set self.csr from a pem bytes string
+    # function to set self.csr from a pem bytes string, it is parsed when self.csr is first read
     @csr_pem.setter
     def csr_pem(self, csr_pem: bytes) -> None:
-        self.csr = load_pem_x509_csr(csr_pem)
+        self._csr = LazyX509.csr(pem=csr_pem)
+
+    # function to generate a der bytes string from self.csr that raises CertificateError if it is not set
+    @property
+    def csr_der(self) -> bytes:
+        if not self._csr:
+            raise CertificateError("CSR not set.")
+        return self._csr.der
+
+    # function to set self.csr from a der bytes string, it is parsed when self.csr is first read
+    @csr_der.setter
+    def csr_der(self, csr_der: bytes) -> None:
+        self._csr = LazyX509.csr(der=csr_der)
 
     # function to generate a pem bytes string from self.certificate that raises CertNotSetError if self.cert is None
     @property
     def certificate_pem(self) -> bytes:
-        if not self.certificate:
+        if not self._certificate:
             raise CertificateError("Certificate not set.")
-        return self.certificate.public_bytes(Encoding.PEM)
+        return self._certificate.pem
 
-    # function to set self.certificate from a pem bytes string
+    # function to set self.certificate from a pem bytes string, it is parsed when self.certificate is first read
     @certificate_pem.setter
     def certificate_pem(self, certificate_pem: bytes) -> None:
-        self.certificate = load_pem_x509_certificate(certificate_pem)
+        self._certificate = LazyX509.certificate(pem=certificate_pem)
+
+    # function to generate a der bytes string from self.certificate that raises CertificateError if it is not set
+    @property
+    def certificate_der(self) -> bytes:
+        if not self._certificate:
+            raise CertificateError("Certificate not set.")
+        return self._certificate.der
+
+    # function to set self.certificate from a der bytes string, it is parsed when self.certificate is first read
+    @certificate_der.setter
+    def certificate_der(self, certificate_der: bytes) -> None:
+        self._certificate = LazyX509.certificate(der=certificate_der)
 
     # function to pem bytes string from self.chain that raises CertificateError if self.chain is None
     @property
     def chain_pem(self) -> bytes:
-        if not self.chain:
+        if not self._chain:
             raise CertificateError("Chain not set.")
-        return b"".join(
-            [
-                cert.public_bytes(Encoding.PEM)
-                for cert in self.chain
-                if isinstance(cert, X509Certificate)
-            ]
-        )
-
-    # function to set self.chain from a list of certificates encoded in a single pem bytes string
+        return b"".join(certificate.pem for certificate in self._chain)
+
+    # function to set self.chain from a list of certificates encoded in a single pem bytes string, each is parsed through the certificate cache when self.chain is first read. Raises X509EncodingError for anything else in it.
     @chain_pem.setter
     def chain_pem(self, chain_pem: bytes) -> None:
-        self.chain = [
-            load_pem_x509_certificate(cert + END_CERTIFICATE)
-            for cert in chain_pem.split(END_CERTIFICATE)
-            if cert
+        self._chain = [
+            LazyX509.certificate(pem=pem)
+            for pem in split_pem(chain_pem, CERTIFICATE_LABEL)
         ]
 
     # function to generate a bytes string fingerprint from self.certificate using a default of sha256 that raises CertNotSetError if self.certificate is None
     @property
     def fingerprint(self, hash: HashAlgorithm = SHA256) -> bytes:
-        if not self.certificate:
+        if not self._certificate:
             raise CertificateError("Certificate not set.")
-        return self.certificate.fingerprint(hash())
+        # the fingerprint is a digest of the DER, which doesn't need the certificate parsed
+        return hashlib.new(hash.name, self._certificate.der).digest()
 
     # function to read self.certificate and use its data to populate self.common_name, self.alternate_names, self.not_before, self.not_after and self.subject assuming self.alternate_names may not be found
     def attrs_from_x509_certificate(self) -> None:
@@ -193,7 +252,7 @@ class Certificate:
         """
         if not self.certificate:
             raise CertificateError("Certificate not set.")
-        self.subject = self._get_subject_details(self.certificate.subject)
+        self.subject = Subject.from_x509_name(self.certificate.subject)
         self.not_before = self.certificate.not_valid_before
         self.not_after = self.certificate.not_valid_after
         try:
@@ -203,20 +262,6 @@ class Certificate:
         except ExtensionNotFound:
             pass
 
-    # private function to take a X509Certificate.subject and return a SubjectDetails object checking for missing attributes
-    def _get_subject_details(self, subject: Name) -> Subject:
-        def _getter(oid: ObjectIdentifier) -> str | None:
-            attributes: list[NameAttribute] = subject.get_attributes_for_oid(oid)
-            return attributes[0].value if attributes else None
-
-        return Subject(
-            country=_getter(NameOID.COUNTRY_NAME),
-            state=_getter(NameOID.STATE_OR_PROVINCE_NAME),
-            locality=_getter(NameOID.LOCALITY_NAME),
-            organization=_getter(NameOID.ORGANIZATION_NAME),
-            organizational_unit=_getter(NameOID.ORGANIZATIONAL_UNIT_NAME),
-        )
-
     # method to generate a Certificate. It should take a pem bytes string, parse it, add it to a Certificate and read its attributes into the Certificate. Returns that Certificate.
     @classmethod
     def from_pem(cls, pem: bytes) -> "Certificate":
@@ -225,12 +270,13 @@ class Certificate:
         certificate.attrs_from_x509_certificate()
         return certificate
 
-    # method with type annotations on all internal variables to generate a new CSR and assign it to self.csr. It can optionally take a list of alternate_names, a RSAPrivateKey, a SubjectDetails object or uses the defaults from the class. The SubjectDetails should be checked for values and only included in the name if not None. Returns self.
+    # method with type annotations on all internal variables to generate a new CSR and assign it to self.csr. It can optionally take a list of alternate_names, a RSAPrivateKey, a SubjectDetails object or uses the defaults from the class. The SubjectDetails should be checked for values and only included in the name if not None. Signs in the CryptoExecutor when one is passed or installed. Returns self.
     def generate_csr(
         self,
         alternate_names: list[str] | None = None,
         key: PrivateKey | None = None,
         subject: Subject | None = None,
+        executor: CryptoExecutor | None = None,
     ) -> "Certificate":
         if not key:
             key = self.key
@@ -238,43 +284,45 @@ class Certificate:
             subject = self.subject
         if not alternate_names:
             alternate_names = self.alternate_names
-        csr_builder: CertificateSigningRequestBuilder = (
-            CertificateSigningRequestBuilder()
-        )
-        csr_builder = csr_builder.subject_name(subject.to_x509_name())
-        if alternate_names:
-            csr_builder = csr_builder.add_extension(
-                SubjectAlternativeName([DNSName(name) for name in alternate_names]),
-                critical=False,
-            )
-        self.csr = csr_builder.sign(key.key, SHA256())
+        executor = executor or get_crypto_executor()
+        if executor:
+            self.csr = executor.sign_csr(key.key, subject, alternate_names)
+        else:
+            self.csr = sign_csr(key.key, subject, alternate_names)
         return self
 
     # method to return self.certificate as a der encoded bytes string
     def get_certificate_der(self) -> bytes:
-        return self.certificate.public_bytes(Encoding.DER)
+        return self._certificate.der
 
     # method to return self.certificate as a pem encoded bytes string
     def get_certificate_pem(self) -> bytes:
-        return self.certificate.public_bytes(Encoding.PEM)
+        return self._certificate.pem
 
     # method to return self.csr as a der encoded bytes string
     def get_csr_der(self) -> bytes:
-        return self.csr.public_bytes(Encoding.DER)
+        return self._csr.der
 
     # method to return self.csr as a pem encoded bytes string
     def get_csr_pem(self) -> bytes:
-        return self.csr.public_bytes(Encoding.PEM)
+        return self._csr.pem
 
     # method to return self.key as a der encoded bytes string
     def get_key_der(self) -> bytes:
         return self.key.get_key_der()
 
     def get_pem_safe(self, pem: str) -> str:
-        if getattr(self, pem):
+        # checks the lazy field, so nothing is parsed just to be encoded again
+        if getattr(self, f"_{pem}"):
             return getattr(self, f"{pem}_pem").decode()
         return ""
 
+    # method returning the DER of the certificate or csr, or None when it isn't set
+    def get_der_safe(self, der: str) -> bytes | None:
+        if getattr(self, f"_{der}"):
+            return getattr(self, f"{der}_der")
+        return None
+
 
 class CertificateError(CertToolError):
     """Base exception class for all Certificate exceptions."""
@@ -0,0 +1,106 @@
+# Filename: certificate_bundle.py
+
+import mmap
+import os
+from collections.abc import Iterable, Iterator
+
+from attrs import define
+
+from .x509_encoding import CERTIFICATE_LABEL, NON_WHITESPACE, PEM_BLOCK
+
+PEM_BEGIN: bytes = b"-----BEGIN "
+# DER certificates are an ASN.1 SEQUENCE
+DER_SEQUENCE_TAG: int = 0x30
+
+
+@define
+class BundleItem:
+    """
+    One item read out of a bundle, left encoded so it can be parsed elsewhere
+
+    :param source: The path of the file it was read from
+    :param index: Its position in the file, from 0
+    :param label: The PEM label, CERTIFICATE_LABEL for DER, or None for bytes that are neither
+    :param data: The PEM block or DER, empty when label is None
+    """
+
+    source: str
+    index: int
+    label: bytes | None
+    data: bytes
+
+    def __str__(self) -> str:
+        return f"{self.source}#{self.index}"
+
+
+# function to yield the items of the PEM or DER bundle at path, from a memory map so a file of any size is
+# read a page at a time and never held whole
+def read_bundle(path: str) -> Iterator[BundleItem]:
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data.find(PEM_BEGIN) >= 0:
+                yield from _read_pem(path, data)
+            else:
+                yield from _read_der(path, data)
+
+
+# function to yield the items of every bundle in paths, in order, and of every file under the directories among them
+def read_bundles(paths: Iterable[str]) -> Iterator[BundleItem]:
+    for path in paths:
+        if not os.path.isdir(path):
+            yield from read_bundle(path)
+            continue
+        for directory, directories, files in os.walk(path):
+            # walked in name order, so an import reads the same files in the same order every time
+            directories.sort()
+            for name in sorted(files):
+                yield from read_bundle(os.path.join(directory, name))
+
+
+# anything but whitespace before, between or after the PEM blocks, like text or a block whose base64 is malformed,
+# is a bad item, so it is counted rather than passed over
+def _read_pem(path: str, data: mmap.mmap) -> Iterator[BundleItem]:
+    index: int = 0
+    start: int = 0
+    for match in PEM_BLOCK.finditer(data):
+        if NON_WHITESPACE.search(data, start, match.start()):
+            yield BundleItem(path, index, None, b"")
+            index += 1
+        yield BundleItem(path, index, match.group(1), match.group(0))
+        index += 1
+        start = match.end()
+    if NON_WHITESPACE.search(data, start):
+        yield BundleItem(path, index, None, b"")
+
+
+# DER has no delimiters, so concatenated certificates are split on the length each SEQUENCE header gives
+def _read_der(path: str, data: mmap.mmap) -> Iterator[BundleItem]:
+    offset: int = 0
+    index: int = 0
+    while offset < len(data):
+        end: int | None = _der_end(data, offset)
+        if end is None:
+            # nothing after bytes that aren't DER can be found, so the rest is one bad item
+            yield BundleItem(path, index, None, b"")
+            return
+        yield BundleItem(path, index, CERTIFICATE_LABEL, data[offset:end])
+        offset = end
+        index += 1
+
+
+# function returning where the DER SEQUENCE at offset ends, None if there isn't one
+def _der_end(data: mmap.mmap, offset: int) -> int | None:
+    if data[offset] != DER_SEQUENCE_TAG or offset + 2 > len(data):
+        return None
+    length: int = data[offset + 1]
+    header: int = 2
+    if length & 0x80:
+        size: int = length & 0x7F
+        if not 0 < size <= 4:
+            return None
+        header += size
+        length = int.from_bytes(data[offset + 2 : offset + header], "big")
+    end: int = offset + header + length
+    return end if end <= len(data) else None
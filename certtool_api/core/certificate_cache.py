@@ -0,0 +1,126 @@
+# Filename: certificate_cache.py
+
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+
+from attrs import define, field
+from cryptography.x509 import Certificate as X509Certificate
+from cryptography.x509 import load_der_x509_certificate
+
+DEFAULT_CACHE_SIZE: int = 1024
+
+
+@define
+class CertificateCacheStats:
+    """
+    Counters for a :class:`CertificateCache`
+
+    :param hits: The number of loads served from the cache
+    :param misses: The number of loads that had to parse
+    :param evictions: The number of certificates dropped to stay within the size
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    # property returning the fraction of loads served from the cache
+    @property
+    def hit_rate(self) -> float:
+        loads: int = self.hits + self.misses
+        return self.hits / loads if loads else 0.0
+
+
+@define
+class CertificateCache:
+    """
+    This class is a bounded LRU cache of parsed certificates keyed by the SHA-256 digest of their DER.
+
+    Most leaf certificates share the same few intermediates and roots, so with the cache installed each
+    of those is parsed once and the one immutable X509Certificate is shared by every Certificate entity
+    whose chain includes it.
+
+    :param size: The number of parsed certificates to keep
+
+    :Example:
+
+    >>> from certtool_api.core.certificate_cache import CertificateCache, install_certificate_cache
+    >>> install_certificate_cache(CertificateCache(size=4096))
+    """
+
+    size: int = DEFAULT_CACHE_SIZE
+    _entries: OrderedDict[bytes, X509Certificate] = field(
+        init=False, factory=OrderedDict
+    )
+    _stats: CertificateCacheStats = field(init=False, factory=CertificateCacheStats)
+    _lock: Lock = field(init=False, factory=Lock)
+
+    def load(self, der: bytes) -> X509Certificate:
+        """
+        Return the parsed certificate for der, parsing and caching it if it isn't cached
+
+        :param der: The DER encoded certificate
+
+        :return: The parsed certificate, shared with every other load of the same DER
+        """
+        digest: bytes = sha256(der).digest()
+        with self._lock:
+            certificate: X509Certificate | None = self._entries.get(digest)
+            if certificate is not None:
+                self._entries.move_to_end(digest)
+                self._stats.hits += 1
+                return certificate
+            self._stats.misses += 1
+        # parse outside the lock, two threads missing on the same DER at once just both parse it
+        certificate = load_der_x509_certificate(der)
+        with self._lock:
+            certificate = self._entries.setdefault(digest, certificate)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+        return certificate
+
+    def stats(self) -> CertificateCacheStats:
+        """
+        Return a copy of the cache's counters
+
+        :return: A :class:`CertificateCacheStats`
+        """
+        with self._lock:
+            return CertificateCacheStats(
+                self._stats.hits, self._stats.misses, self._stats.evictions
+            )
+
+    def clear(self) -> None:
+        """
+        Drop every cached certificate and reset the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self._stats = CertificateCacheStats()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_installed_cache: CertificateCache | None = CertificateCache()
+
+
+# function to make cache the one certificates are parsed through. Passing None turns caching off.
+def install_certificate_cache(cache: CertificateCache | None) -> None:
+    global _installed_cache
+    _installed_cache = cache
+
+
+# function to return the installed certificate cache, if any
+def get_certificate_cache() -> CertificateCache | None:
+    return _installed_cache
+
+
+# function to parse a DER certificate through the installed cache, or directly when there isn't one
+def load_certificate_der(der: bytes) -> X509Certificate:
+    cache: CertificateCache | None = _installed_cache
+    return cache.load(der) if cache is not None else load_der_x509_certificate(der)
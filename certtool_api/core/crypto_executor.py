@@ -0,0 +1,345 @@
+# Filename: crypto_executor.py
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from hashlib import sha256
+from multiprocessing import get_context
+
+from attrs import define, field
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.serialization import (
+    BestAvailableEncryption,
+    Encoding,
+    NoEncryption,
+    PrivateFormat,
+    load_der_private_key,
+)
+from cryptography.x509 import (
+    BasicConstraints,
+)
+from cryptography.x509 import Certificate as X509Certificate
+from cryptography.x509 import (
+    CertificateSigningRequest,
+    CertificateSigningRequestBuilder,
+    DNSName,
+    ExtensionNotFound,
+    ExtensionOID,
+    SubjectAlternativeName,
+    load_der_x509_certificate,
+    load_der_x509_csr,
+    load_pem_x509_certificate,
+)
+
+from .base import CertToolError
+from .key_pool import generate_key_der
+from .subject import Subject
+
+PEM_HEADER = b"-----BEGIN"
+
+
+@define
+class CsrRequest:
+    """
+    The inputs needed to sign a CSR in a worker process
+
+    :param key: The private key to sign with
+    :param subject: The subject of the CSR
+    :param alternate_names: The DNS names to add as subject alternative names
+    """
+
+    key: RSAPrivateKey
+    subject: Subject
+    alternate_names: list[str] = field(factory=list)
+
+
+@define
+class ParsedCertificate:
+    """
+    The parts of a certificate a worker process can hand back. cryptography's X509Certificate can't be
+    pickled, so the DER travels back alongside the attributes read from it.
+
+    :param der: The DER encoding of the certificate
+    :param fingerprint: The hex sha256 fingerprint of the DER
+    :param subject: The subject of the certificate
+    :param issuer: The issuer of the certificate
+    :param alternate_names: The DNS subject alternative names
+    :param not_before: The not before date
+    :param not_after: The not after date
+    :param ca: Whether the certificate is a CA, able to issue others
+    :param subject_id: The hex sha256 of the DER of the subject name, to match issuers by
+    :param issuer_id: The hex sha256 of the DER of the issuer name, the subject_id of the issuer
+    """
+
+    der: bytes
+    fingerprint: str
+    subject: Subject
+    issuer: Subject
+    alternate_names: list[str]
+    not_before: datetime
+    not_after: datetime
+    ca: bool = False
+    subject_id: str = ""
+    issuer_id: str = ""
+
+
+# function to build and sign a CSR, shared by Certificate.generate_csr and the worker processes
+def sign_csr(
+    key: RSAPrivateKey, subject: Subject, alternate_names: list[str] | None = None
+) -> CertificateSigningRequest:
+    csr_builder: CertificateSigningRequestBuilder = CertificateSigningRequestBuilder()
+    csr_builder = csr_builder.subject_name(subject.to_x509_name())
+    if alternate_names:
+        csr_builder = csr_builder.add_extension(
+            SubjectAlternativeName([DNSName(name) for name in alternate_names]),
+            critical=False,
+        )
+    return csr_builder.sign(key, SHA256())
+
+
+# function to parse a single PEM or DER certificate into a ParsedCertificate
+def parse_certificate(data: bytes) -> ParsedCertificate:
+    certificate: X509Certificate
+    if data.lstrip().startswith(PEM_HEADER):
+        certificate = load_pem_x509_certificate(data)
+    else:
+        certificate = load_der_x509_certificate(data)
+    der: bytes = certificate.public_bytes(Encoding.DER)
+    try:
+        alternate_names: list[str] = certificate.extensions.get_extension_for_oid(
+            ExtensionOID.SUBJECT_ALTERNATIVE_NAME
+        ).value.get_values_for_type(DNSName)
+    except ExtensionNotFound:
+        alternate_names = []
+    try:
+        ca: bool = certificate.extensions.get_extension_for_class(
+            BasicConstraints
+        ).value.ca
+    except ExtensionNotFound:
+        ca = False
+    return ParsedCertificate(
+        der=der,
+        fingerprint=sha256(der).hexdigest(),
+        subject=Subject.from_x509_name(certificate.subject),
+        issuer=Subject.from_x509_name(certificate.issuer),
+        alternate_names=alternate_names,
+        not_before=certificate.not_valid_before,
+        not_after=certificate.not_valid_after,
+        ca=ca,
+        subject_id=sha256(certificate.subject.public_bytes()).hexdigest(),
+        issuer_id=sha256(certificate.issuer.public_bytes()).hexdigest(),
+    )
+
+
+# function to parse data in a worker, None for anything that isn't a certificate so one bad item doesn't fail its batch
+def try_parse_certificate(data: bytes) -> ParsedCertificate | None:
+    try:
+        return parse_certificate(data)
+    except ValueError:
+        return None
+
+
+# the functions below run inside the worker processes. Keys cross the pipe as unencrypted PKCS8 DER and are never written anywhere.
+def _key_der(key: RSAPrivateKey) -> bytes:
+    return key.private_bytes(Encoding.DER, PrivateFormat.PKCS8, NoEncryption())
+
+
+def _sign_csr_der(
+    key_der: bytes, subject: Subject, alternate_names: list[str]
+) -> bytes:
+    key = load_der_private_key(key_der, password=None)
+    return sign_csr(key, subject, alternate_names).public_bytes(Encoding.DER)
+
+
+def _encrypt_key_pem(key_der: bytes, passphrase: bytes) -> bytes:
+    key = load_der_private_key(key_der, password=None)
+    return key.private_bytes(
+        encoding=Encoding.PEM,
+        format=PrivateFormat.PKCS8,
+        encryption_algorithm=BestAvailableEncryption(passphrase),
+    )
+
+
+@define
+class CryptoExecutor:
+    """
+    This class runs the CPU heavy crypto operations in a pool of worker processes so they don't hold the
+    request thread.
+
+    The single item methods are a synchronous facade that block until the worker is done, the batch
+    methods send work to the workers in chunks of batch_size to amortise the IPC cost.
+
+    :param workers: The number of worker processes, the number of CPUs if None
+    :param batch_size: The number of items sent to a worker at a time by the batch methods
+    :param mp_context: The multiprocessing start method for the workers, the platform default if None
+
+    :Example:
+
+    >>> from certtool_api.core.crypto_executor import CryptoExecutor
+    >>> with CryptoExecutor(workers=4) as executor:
+    ...     keys = executor.generate_keys(count=10, key_size=2048)
+    """
+
+    workers: int | None = None
+    batch_size: int = 8
+    mp_context: str | None = None
+    _executor: ProcessPoolExecutor | None = field(init=False, default=None)
+
+    def __enter__(self) -> "CryptoExecutor":
+        return self.start()
+
+    def __exit__(self, *_) -> None:
+        self.shutdown()
+
+    @property
+    def _pool(self) -> ProcessPoolExecutor:
+        if not self._executor:
+            raise CryptoExecutorError("Crypto executor not started.")
+        return self._executor
+
+    def start(self) -> "CryptoExecutor":
+        if self._executor:
+            raise CryptoExecutorError("Crypto executor already started.")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context(self.mp_context) if self.mp_context else None,
+        )
+        return self
+
+    def shutdown(self, wait: bool = True) -> None:
+        executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def generate_key(self, key_size: int, public_exponent: int) -> RSAPrivateKey:
+        """
+        Generate a single RSA key in a worker process
+
+        :param key_size: The key size in bits
+        :param public_exponent: The public exponent
+
+        :return: The new key
+        """
+        return load_der_private_key(
+            self._pool.submit(generate_key_der, key_size, public_exponent).result(),
+            password=None,
+        )
+
+    def generate_keys(
+        self, count: int, key_size: int = 4096, public_exponent: int = 65537
+    ) -> list[RSAPrivateKey]:
+        """
+        Generate count RSA keys across the worker processes
+
+        :param count: The number of keys to generate
+        :param key_size: The key size in bits
+        :param public_exponent: The public exponent
+
+        :return: The new keys
+        """
+        return [
+            load_der_private_key(der, password=None)
+            for der in self._pool.map(
+                generate_key_der,
+                [key_size] * count,
+                [public_exponent] * count,
+                chunksize=self.batch_size,
+            )
+        ]
+
+    def sign_csr(
+        self,
+        key: RSAPrivateKey,
+        subject: Subject,
+        alternate_names: list[str] | None = None,
+    ) -> CertificateSigningRequest:
+        """
+        Build and sign a single CSR in a worker process
+
+        :param key: The private key to sign with
+        :param subject: The subject of the CSR
+        :param alternate_names: The DNS names to add as subject alternative names
+
+        :return: The signed CSR
+        """
+        return self.sign_csrs([CsrRequest(key, subject, alternate_names or [])])[0]
+
+    def sign_csrs(self, requests: list[CsrRequest]) -> list[CertificateSigningRequest]:
+        """
+        Build and sign a batch of CSRs across the worker processes
+
+        :param requests: The CSRs to sign
+
+        :return: The signed CSRs, in the same order as requests
+        """
+        return [
+            load_der_x509_csr(der)
+            for der in self._pool.map(
+                _sign_csr_der,
+                [_key_der(request.key) for request in requests],
+                [request.subject for request in requests],
+                [request.alternate_names for request in requests],
+                chunksize=self.batch_size,
+            )
+        ]
+
+    def encrypt_key(self, key: RSAPrivateKey, passphrase: bytes) -> bytes:
+        """
+        Serialise a key as a passphrase encrypted PKCS8 PEM in a worker process
+
+        :param key: The key to serialise
+        :param passphrase: The passphrase to encrypt with
+
+        :return: The encrypted PEM
+        """
+        return self.encrypt_keys([key], passphrase)[0]
+
+    def encrypt_keys(self, keys: list[RSAPrivateKey], passphrase: bytes) -> list[bytes]:
+        """
+        Serialise a batch of keys as passphrase encrypted PKCS8 PEMs across the worker processes
+
+        :param keys: The keys to serialise
+        :param passphrase: The passphrase to encrypt with
+
+        :return: The encrypted PEMs, in the same order as keys
+        """
+        return list(
+            self._pool.map(
+                _encrypt_key_pem,
+                [_key_der(key) for key in keys],
+                [passphrase] * len(keys),
+                chunksize=self.batch_size,
+            )
+        )
+
+    def parse_certificates(
+        self, blobs: list[bytes], skip_invalid: bool = False
+    ) -> list[ParsedCertificate | None]:
+        """
+        Parse a batch of PEM or DER certificates across the worker processes
+
+        :param blobs: The encoded certificates, one certificate per item
+        :param skip_invalid: Return None for the items that aren't a certificate rather than raising
+
+        :return: The parsed certificates, in the same order as blobs
+        """
+        parse = try_parse_certificate if skip_invalid else parse_certificate
+        return list(self._pool.map(parse, blobs, chunksize=self.batch_size))
+
+
+_installed_executor: CryptoExecutor | None = None
+
+
+# function to make executor the default for Certificate and PrivateKey. Passing None keeps the work on the calling thread.
+def install_crypto_executor(executor: CryptoExecutor | None) -> None:
+    global _installed_executor
+    _installed_executor = executor
+
+
+# function to return the installed crypto executor, if any
+def get_crypto_executor() -> CryptoExecutor | None:
+    return _installed_executor
+
+
+class CryptoExecutorError(CertToolError):
+    """CryptoExecutor error"""
@@ -0,0 +1,28 @@
+# Filename: hostname.py
+
+WILDCARD_LABEL: str = "*"
+
+
+# function to normalize a DNS name to lowercase IDNA (punycode), names that aren't valid IDNA are just lowercased
+def normalize_hostname(name: str) -> str:
+    name = name.strip().rstrip(".").lower()
+    try:
+        return name.encode("idna").decode("ascii")
+    except UnicodeError:
+        return name
+
+
+# function to return the key a name is indexed under, its normalized labels in reverse, so
+# "api.payments.internal" is "internal.payments.api" and every name under a domain shares a prefix
+def reversed_name(name: str) -> str:
+    return ".".join(reversed(normalize_hostname(name).split(".")))
+
+
+# function to return the reversed names of the SANs that cover hostname, itself and the wildcard one label up
+def covering_names(hostname: str) -> list[str]:
+    labels: list[str] = normalize_hostname(hostname).split(".")
+    names: list[str] = [".".join(reversed(labels))]
+    # a wildcard only ever stands for the single leftmost label
+    if len(labels) > 1 and labels[0] != WILDCARD_LABEL:
+        names.append(".".join([*reversed(labels[1:]), WILDCARD_LABEL]))
+    return names
@@ -0,0 +1,39 @@
+# Filename: issuance.py
+
+import json
+from hashlib import sha256
+
+from attrs import asdict
+
+from .base import CertToolError
+from .certificate import Certificate
+from .hostname import normalize_hostname
+
+# the longest IdempotencyToken ACM takes, ACM-PCA takes 36
+IDEMPOTENCY_TOKEN_LENGTH: int = 32
+
+
+# function returning the canonical hash of a request to issue certificate with template, the hex SHA-256 of its
+# subject, its alternate names in any order or case and the template, which names the issuer and how it issues.
+# A request signing a CSR of ours also includes the CSR, so only requests for the same key are the same request.
+def issuance_key(certificate: Certificate, template: str | None = None) -> str:
+    request: dict = {
+        "subject": asdict(certificate.subject),
+        "alternate_names": sorted(
+            {normalize_hostname(name) for name in certificate.alternate_names}
+        ),
+        "template": template,
+        "csr": sha256(certificate.get_csr_der()).hexdigest()
+        if certificate.csr
+        else None,
+    }
+    return sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+# function returning an IdempotencyToken for the request with key, so every retry of it sends the same one
+def idempotency_token(key: str, length: int = IDEMPOTENCY_TOKEN_LENGTH) -> str:
+    return key[:length]
+
+
+class IssuanceInProgressError(CertToolError):
+    """Raised for a request another caller holds the issuance lease on"""
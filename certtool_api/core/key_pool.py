@@ -0,0 +1,249 @@
+# Filename: key_pool.py
+
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from logging import getLogger
+from multiprocessing import get_context
+from threading import Condition
+
+from attrs import define, field
+from cryptography.hazmat.primitives.asymmetric.rsa import (
+    RSAPrivateKey,
+    generate_private_key,
+)
+from cryptography.hazmat.primitives.serialization import (
+    Encoding,
+    NoEncryption,
+    PrivateFormat,
+    load_der_private_key,
+)
+
+from .base import CertToolError
+
+DEFAULT_KEY_SPEC: tuple[int, int] = (4096, 65537)
+
+log = getLogger(__name__)
+
+# (key_size, public_exponent)
+KeySpec = tuple[int, int]
+
+
+# function run inside the worker processes. The key only ever crosses the process boundary as DER over the executor pipe, it is never written anywhere.
+def generate_key_der(key_size: int, public_exponent: int) -> bytes:
+    key: RSAPrivateKey = generate_private_key(
+        public_exponent=public_exponent, key_size=key_size
+    )
+    return key.private_bytes(Encoding.DER, PrivateFormat.PKCS8, NoEncryption())
+
+
+@define
+class KeyPoolStats:
+    """
+    Counters for a single key spec in a :class:`KeyPool`
+
+    :param hits: The number of keys served from the buffer
+    :param misses: The number of requests that found the buffer empty
+    :param generated: The number of keys the workers have added to the buffer
+    :param failed: The number of key generations that raised in a worker
+    :param started_at: The monotonic time the counters started
+    """
+
+    hits: int = 0
+    misses: int = 0
+    generated: int = 0
+    failed: int = 0
+    started_at: float = field(factory=time.monotonic)
+
+    # property returning the fraction of requests served from the buffer
+    @property
+    def hit_rate(self) -> float:
+        requests: int = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    # property returning the number of keys per second the workers have been producing
+    @property
+    def refill_rate(self) -> float:
+        elapsed: float = time.monotonic() - self.started_at
+        return self.generated / elapsed if elapsed > 0 else 0.0
+
+
+@define
+class KeyPool:
+    """
+    This class keeps a bounded buffer of freshly generated RSA keys per (key_size, public_exponent)
+    that background worker processes top up as keys are taken.
+
+    Keys are handed out at most once and only ever held in memory. A key that is taken is removed from
+    the buffer before it is returned, so two callers can never receive the same key.
+
+    :param size: The number of keys to keep buffered per key spec
+    :param workers: The number of worker processes generating keys
+    :param specs: The key specs to start filling as soon as the pool starts. Other specs are filled
+        the first time they are asked for.
+    :param mp_context: The multiprocessing start method for the workers, the platform default if None
+
+    :Example:
+
+    >>> from certtool_api.core.key_pool import KeyPool
+    >>> pool = KeyPool(size=8, workers=2).start()
+    >>> pool.take(4096, 65537)  # None until the workers have produced a key
+    """
+
+    size: int = 4
+    workers: int = 2
+    specs: list[KeySpec] = field(factory=lambda: [DEFAULT_KEY_SPEC])
+    mp_context: str | None = None
+    _buffers: dict[KeySpec, deque[RSAPrivateKey]] = field(init=False, factory=dict)
+    _pending: dict[KeySpec, int] = field(init=False, factory=dict)
+    _stats: dict[KeySpec, KeyPoolStats] = field(init=False, factory=dict)
+    _condition: Condition = field(init=False, factory=Condition)
+    _executor: ProcessPoolExecutor | None = field(init=False, default=None)
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> "KeyPool":
+        """
+        Start the worker processes and begin filling the buffers for self.specs
+
+        :return: self
+        """
+        if self.size < 1 or self.workers < 1:
+            raise KeyPoolError("A key pool needs a size and at least one worker.")
+        with self._condition:
+            if self._executor:
+                raise KeyPoolError("Key pool already started.")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context(self.mp_context) if self.mp_context else None,
+            )
+        for spec in self.specs:
+            self._refill(spec)
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop the worker processes and drop every buffered key. Keys still being generated are discarded.
+        """
+        with self._condition:
+            executor, self._executor = self._executor, None
+            self._buffers.clear()
+            self._pending.clear()
+            self._condition.notify_all()
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def take(self, key_size: int, public_exponent: int) -> RSAPrivateKey | None:
+        """
+        Remove a key from the buffer for the given spec and schedule its replacement
+
+        :param key_size: The key size in bits
+        :param public_exponent: The public exponent
+
+        :return: The key, or None if the buffer is empty and the caller should generate one itself
+        """
+        spec: KeySpec = (key_size, public_exponent)
+        with self._condition:
+            buffer: deque[RSAPrivateKey] = self._buffers.setdefault(spec, deque())
+            stats: KeyPoolStats = self._stats.setdefault(spec, KeyPoolStats())
+            key: RSAPrivateKey | None = buffer.popleft() if buffer else None
+            if key:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+        self._refill(spec)
+        return key
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Block until every known buffer is full. Useful to warm the pool before taking traffic.
+
+        :param timeout: The number of seconds to wait, forever if None
+
+        :return: True if the buffers filled before the timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self.running
+                or all(
+                    len(self._buffers.get(spec, ())) >= self.size for spec in self.specs
+                ),
+                timeout=timeout,
+            )
+
+    def stats(self) -> dict[KeySpec, KeyPoolStats]:
+        """
+        Return the counters for every key spec the pool has seen
+
+        :return: A dict of key spec to :class:`KeyPoolStats`
+        """
+        with self._condition:
+            return dict(self._stats)
+
+    def buffered(self, key_size: int, public_exponent: int) -> int:
+        with self._condition:
+            return len(self._buffers.get((key_size, public_exponent), ()))
+
+    # submit enough generation jobs to bring the buffer for spec back up to self.size
+    def _refill(self, spec: KeySpec) -> None:
+        with self._condition:
+            if not self._executor:
+                return
+            buffer: deque[RSAPrivateKey] = self._buffers.setdefault(spec, deque())
+            self._stats.setdefault(spec, KeyPoolStats())
+            pending: int = self._pending.get(spec, 0)
+            deficit: int = self.size - len(buffer) - pending
+            if deficit <= 0:
+                return
+            self._pending[spec] = pending + deficit
+            executor: ProcessPoolExecutor = self._executor
+        for _ in range(deficit):
+            try:
+                future: Future = executor.submit(generate_key_der, *spec)
+            except RuntimeError:
+                # the pool was stopped while we were submitting
+                return
+            future.add_done_callback(partial(self._on_generated, spec))
+
+    # callback run by the executor as each key arrives from a worker
+    def _on_generated(self, spec: KeySpec, future: Future) -> None:
+        if future.cancelled():
+            return
+        exc: BaseException | None = future.exception()
+        key: RSAPrivateKey | None = (
+            None if exc else load_der_private_key(future.result(), password=None)
+        )
+        with self._condition:
+            if not self._executor:
+                return
+            self._pending[spec] = max(self._pending.get(spec, 0) - 1, 0)
+            stats: KeyPoolStats = self._stats.setdefault(spec, KeyPoolStats())
+            if key is None:
+                stats.failed += 1
+            else:
+                self._buffers.setdefault(spec, deque()).append(key)
+                stats.generated += 1
+            self._condition.notify_all()
+        if exc:
+            log.error("Key pool failed to generate a %s bit key: %s", spec[0], exc)
+
+
+_installed_pool: KeyPool | None = None
+
+
+# function to make pool the key pool PrivateKey.new draws from. Passing None turns pooling off.
+def install_key_pool(pool: KeyPool | None) -> None:
+    global _installed_pool
+    _installed_pool = pool
+
+
+# function to return the installed key pool, if any
+def get_key_pool() -> KeyPool | None:
+    return _installed_pool
+
+
+class KeyPoolError(CertToolError):
+    """KeyPool error"""
@@ -5,16 +5,30 @@ from hashlib import sha256
 
 from attrs import define
 from cryptography.hazmat.backends.openssl.rsa import RSAPrivateKey
+from cryptography.hazmat.primitives.asymmetric.ec import (
+    SECP256R1,
+    SECP384R1,
+    SECP521R1,
+    EllipticCurve,
+    EllipticCurvePrivateKey,
+)
+from cryptography.hazmat.primitives.asymmetric.ec import (
+    generate_private_key as generate_ec_private_key,
+)
 from cryptography.hazmat.primitives.asymmetric.rsa import generate_private_key
 from cryptography.hazmat.primitives.serialization import (
     BestAvailableEncryption,
     Encoding,
     NoEncryption,
     PrivateFormat,
+    PublicFormat,
+    load_der_private_key,
     load_pem_private_key,
 )
 
 from .base import CertToolError
+from .crypto_executor import CryptoExecutor, get_crypto_executor
+from .key_pool import KeyPool, get_key_pool
 
 
 class KeyTypes(Enum):
@@ -26,6 +40,15 @@ class KeyTypes(Enum):
     """
 
     RSA = "RSA"
+    EC = "EC"
+
+
+# the curve used for an EC key of each key_size
+EC_CURVES: dict[int, type[EllipticCurve]] = {
+    256: SECP256R1,
+    384: SECP384R1,
+    521: SECP521R1,
+}
 
 
 @define
@@ -35,20 +58,54 @@ class PrivateKey:
 
     :param key: The private key
     :param algorithm: The algorithm used to generate the key
+
+    EC keys are only generated inline and their key_size picks the curve, see EC_CURVES.
     """
 
-    key: RSAPrivateKey | None = None
+    key: RSAPrivateKey | EllipticCurvePrivateKey | None = None
     public_exponent: int = 65537
     key_size: int = 4096
     key_type: KeyTypes = KeyTypes.RSA
     _kms_encrypted_key: bytes | None = None
     _kms_encryption_context: dict[str, str] | None = None
+    _kms_wrapped_data_key: bytes | None = None
+    private_key_id: int | None = None
+
+    @property
+    def kms_encrypted_key(self) -> bytes | None:
+        return self._kms_encrypted_key
+
+    @property
+    def kms_encryption_context(self) -> dict[str, str] | None:
+        return self._kms_encryption_context
+
+    # the KMS encrypted data key when kms_encrypted_key was encrypted locally in envelope mode, None when KMS encrypted it directly
+    @property
+    def kms_wrapped_data_key(self) -> bytes | None:
+        return self._kms_wrapped_data_key
+
+    def set_kms_encrypted_key(
+        self,
+        kms_encrypted_key: bytes,
+        kms_encryption_context: dict[str, str] | None = None,
+        kms_wrapped_data_key: bytes | None = None,
+    ) -> None:
+        """Use this function to record how the key is stored, see KMSService.encrypt_private_key."""
+        self._kms_encrypted_key = kms_encrypted_key
+        self._kms_encryption_context = kms_encryption_context
+        self._kms_wrapped_data_key = kms_wrapped_data_key
 
     # property returning the fingerprint of the public key portion of self.key
     @property
     def fingerprint(self) -> str:
         if not self.key:
             raise PrivateKeyError("Key not set.")
+        if isinstance(self.key, EllipticCurvePrivateKey):
+            return sha256(
+                self.key.public_key().public_bytes(
+                    Encoding.X962, PublicFormat.UncompressedPoint
+                )
+            ).hexdigest()
         return sha256(
             self.key.public_key().public_numbers().n.to_bytes(512, "big")
         ).hexdigest()
@@ -74,11 +131,20 @@ class PrivateKey:
     def set_pem(self, key_pem: bytes, passphrase: bytes | None = None) -> None:
         """Use this function when your key_pem is encrypted with a passphrase."""
         self.key = load_pem_private_key(data=key_pem, password=passphrase)
+        self._read_key_type()
 
-    def get_pem(self, passphrase: bytes | None = None) -> bytes:
-        """Use this function when your key_pem is encrypted with a passphrase."""
+    def get_pem(
+        self, passphrase: bytes | None = None, executor: CryptoExecutor | None = None
+    ) -> bytes:
+        """Use this function when your key_pem is encrypted with a passphrase.
+
+        Encrypting with a passphrase is slow, pass a CryptoExecutor (or install one) to do it in a worker process.
+        """
         if passphrase:
-            encryption_algorithm = BestAvailableEncryption(passphrase.encode())
+            executor = executor or get_crypto_executor()
+            if executor:
+                return executor.encrypt_key(self.key, passphrase)
+            encryption_algorithm = BestAvailableEncryption(passphrase)
         else:
             encryption_algorithm = NoEncryption()
         return self.key.private_bytes(
@@ -87,25 +153,52 @@ class PrivateKey:
             encryption_algorithm=encryption_algorithm,
         )
 
-    # class method to create a new PrivateKey instance and generate a new key for it returning the PrivateKey instance
+    # class method to create a new PrivateKey instance and generate a new key for it returning the PrivateKey instance. Draws from the installed KeyPool when there is one and falls back to generating inline when its buffer is empty.
     @classmethod
     def new(
-        cls, key_size: int | None = None, public_exponent: int | None = None
+        cls,
+        key_size: int | None = None,
+        public_exponent: int | None = None,
+        key_type: KeyTypes = KeyTypes.RSA,
     ) -> "PrivateKey":
-        key: PrivateKey = cls()
+        key: PrivateKey = cls(key_type=key_type)
+        pool: KeyPool | None = get_key_pool()
+        if pool and key_type == KeyTypes.RSA:
+            pooled: RSAPrivateKey | None = pool.take(
+                key_size=key_size or key.key_size,
+                public_exponent=public_exponent or key.public_exponent,
+            )
+            if pooled:
+                key.key = pooled
+                return key
         key.generate_key(key_size=key_size, public_exponent=public_exponent)
         return key
 
-    # method to generate a new RSAPrivateKey and assign it to self.key. It can optionally take key_size and public_exponent arguments or use the defaults from the class. Returns self.
+    # method to generate a new key of self.key_type and assign it to self.key. It can optionally take key_size and public_exponent arguments or use the defaults from the class. RSA keys run in the CryptoExecutor when one is passed or installed. Returns self.
     def generate_key(
-        self, key_size: int | None = None, public_exponent: int | None = None
+        self,
+        key_size: int | None = None,
+        public_exponent: int | None = None,
+        executor: CryptoExecutor | None = None,
     ) -> "PrivateKey":
         if self.key:
             raise PrivateKeyError("Key already set.")
         if not key_size:
             key_size = self.key_size
+        if self.key_type == KeyTypes.EC:
+            if key_size not in EC_CURVES:
+                raise PrivateKeyError(f"No EC curve for key size {key_size}.")
+            self.key = generate_ec_private_key(EC_CURVES[key_size]())
+            self.key_size = key_size
+            return self
         if not public_exponent:
             public_exponent = self.public_exponent
+        executor = executor or get_crypto_executor()
+        if executor:
+            self.key = executor.generate_key(
+                key_size=key_size, public_exponent=public_exponent
+            )
+            return self
         self.key = generate_private_key(
             public_exponent=public_exponent, key_size=key_size
         )
@@ -118,6 +211,19 @@ class PrivateKey:
         key.set_pem(key_pem=key_pem, passphrase=passphrase)
         return key
 
+    # method to set self.key from an unencrypted PKCS8 der bytes string
+    def set_der(self, key_der: bytes) -> None:
+        self.key = load_der_private_key(data=key_der, password=None)
+        self._read_key_type()
+
+    # method to set key_type and key_size from a loaded self.key
+    def _read_key_type(self) -> None:
+        if isinstance(self.key, EllipticCurvePrivateKey):
+            self.key_type = KeyTypes.EC
+        else:
+            self.key_type = KeyTypes.RSA
+        self.key_size = self.key.key_size
+
     # method to return self.key as a der encoded bytes string
     def get_key_der(self) -> bytes:
         return self.key.private_bytes(Encoding.DER, PrivateFormat.PKCS8, NoEncryption())
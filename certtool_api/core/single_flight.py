@@ -0,0 +1,57 @@
+# Filename: single_flight.py
+
+from concurrent.futures import Future
+from threading import Lock
+from typing import Callable, Generic, TypeVar
+
+from attrs import define, field
+
+ResultType = TypeVar("ResultType")
+
+
+@define
+class SingleFlight(Generic[ResultType]):
+    """
+    This class collapses concurrent calls for the same key into one. The first caller for a key runs the
+    function, every caller that arrives while it is running waits for it and gets its result, or its
+    exception, rather than running the function again. Results aren't kept once the call is done.
+
+    :Example:
+
+    >>> from certtool_api.core.single_flight import SingleFlight
+    >>> flights = SingleFlight()
+    >>> flights.do(request_key, lambda: issue(certificate))  # one issue() however many threads ask at once
+    """
+
+    _calls: dict[str, Future] = field(init=False, factory=dict)
+    _lock: Lock = field(init=False, factory=Lock)
+
+    def do(self, key: str, function: Callable[[], ResultType]) -> ResultType:
+        """
+        Return function's result, running it unless a call for key is already running
+
+        :param key: The key calls are collapsed on
+        :param function: The call to make
+
+        :return: The result of the one call made for key
+        """
+        with self._lock:
+            call: Future | None = self._calls.get(key)
+            leader: bool = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+        try:
+            call.set_result(function())
+        except BaseException as e:
+            call.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return call.result()
+
+    # method returning whether a call for key is running
+    def running(self, key: str) -> bool:
+        with self._lock:
+            return key in self._calls
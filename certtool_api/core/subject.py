@@ -1,5 +1,5 @@
 from attrs import define
-from cryptography.x509 import Name, NameAttribute, NameOID
+from cryptography.x509 import Name, NameAttribute, NameOID, ObjectIdentifier
 
 
 @define
@@ -12,6 +12,23 @@ class Subject:
     organizational_unit: str | None = None
     email: str | None = None
 
+    # method to read a Subject out of an x509 Name, like a certificate's subject or issuer, checking for missing attributes
+    @classmethod
+    def from_x509_name(cls, name: Name) -> "Subject":
+        def _getter(oid: ObjectIdentifier) -> str | None:
+            attributes: list[NameAttribute] = name.get_attributes_for_oid(oid)
+            return attributes[0].value if attributes else None
+
+        return cls(
+            common_name=_getter(NameOID.COMMON_NAME),
+            country=_getter(NameOID.COUNTRY_NAME),
+            state=_getter(NameOID.STATE_OR_PROVINCE_NAME),
+            locality=_getter(NameOID.LOCALITY_NAME),
+            organization=_getter(NameOID.ORGANIZATION_NAME),
+            organizational_unit=_getter(NameOID.ORGANIZATIONAL_UNIT_NAME),
+            email=_getter(NameOID.EMAIL_ADDRESS),
+        )
+
     def to_x509_name(self) -> Name:
         name_list: list[NameAttribute] = []
         if self.common_name:
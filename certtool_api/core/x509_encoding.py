@@ -0,0 +1,151 @@
+# Filename: x509_encoding.py
+
+import re
+from base64 import b64encode
+from binascii import a2b_base64
+from typing import Callable, Generic, TypeVar
+
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509 import Certificate as X509Certificate
+from cryptography.x509 import CertificateSigningRequest, load_der_x509_csr
+
+from .certificate_cache import load_certificate_der
+
+CERTIFICATE_LABEL: bytes = b"CERTIFICATE"
+CSR_LABEL: bytes = b"CERTIFICATE REQUEST"
+
+# the body is matched as base64 rather than lazily up to the footer, which is several times faster
+PEM_BLOCK = re.compile(
+    rb"-----BEGIN ([A-Z0-9 ]+)-----\r?\n([A-Za-z0-9+/=\r\n]*)-----END \1-----\r?\n?"
+)
+
+NON_WHITESPACE: re.Pattern = re.compile(rb"\S")
+
+X509Type = TypeVar("X509Type", X509Certificate, CertificateSigningRequest)
+
+
+class X509EncodingError(ValueError):
+    """
+    Raised for bytes that aren't the PEM they are meant to be
+    """
+
+
+# function to split a PEM bundle, like a chain, into its blocks without parsing any of them. With label set,
+# anything but whitespace and blocks of that label raises X509EncodingError rather than being skipped.
+def split_pem(pem: bytes, label: bytes | None = None) -> list[bytes]:
+    if label is None:
+        return [match.group(0) for match in PEM_BLOCK.finditer(pem)]
+    blocks: list[bytes] = []
+    start: int = 0
+    for match in PEM_BLOCK.finditer(pem):
+        if match.group(1) != label or NON_WHITESPACE.search(pem, start, match.start()):
+            break
+        blocks.append(match.group(0))
+        start = match.end()
+    else:
+        if not NON_WHITESPACE.search(pem, start):
+            return blocks
+    raise X509EncodingError(f"Not a bundle of PEM encoded {label.decode()}s.")
+
+
+# PEM is base64 DER between a header and footer, so the two convert into each other without a parse
+def pem_to_der(pem: bytes, label: bytes) -> bytes:
+    match = PEM_BLOCK.search(pem)
+    if not match or match.group(1) != label:
+        raise X509EncodingError(f"Not a PEM encoded {label.decode()}.")
+    # a2b_base64 skips the line breaks itself
+    return a2b_base64(match.group(2))
+
+
+def der_to_pem(der: bytes, label: bytes) -> bytes:
+    body: bytes = b64encode(der)
+    lines: list[bytes] = [body[start : start + 64] for start in range(0, len(body), 64)]
+    return (
+        b"-----BEGIN "
+        + label
+        + b"-----\n"
+        + b"\n".join(lines)
+        + b"\n-----END "
+        + label
+        + b"-----\n"
+    )
+
+
+class LazyX509(Generic[X509Type]):
+    """
+    An X.509 certificate or CSR held as whichever of its parsed object, PEM and DER it was given. The other
+    forms are worked out on first use and kept, and only reading parsed ever parses, so an entity that is
+    just stored, listed or passed along never pays for it.
+
+    Malformed PEM or DER is only noticed when it is first parsed.
+
+    :param label: The PEM label, CERTIFICATE_LABEL or CSR_LABEL
+    :param load_der: Parses the DER into the cryptography object
+    """
+
+    __slots__ = ("_label", "_load_der", "_parsed", "_pem", "_der")
+
+    def __init__(
+        self,
+        label: bytes,
+        load_der: Callable[[bytes], X509Type],
+        parsed: X509Type | None = None,
+        pem: bytes | None = None,
+        der: bytes | None = None,
+    ) -> None:
+        self._label: bytes = label
+        self._load_der: Callable[[bytes], X509Type] = load_der
+        self._parsed: X509Type | None = parsed
+        self._pem: bytes | None = pem
+        self._der: bytes | None = der
+
+    # certificates are parsed through the installed CertificateCache, so a chain cert shared by many
+    # entities is only parsed once
+    @classmethod
+    def certificate(cls, **kwargs) -> "LazyX509[X509Certificate]":
+        return cls(CERTIFICATE_LABEL, load_certificate_der, **kwargs)
+
+    @classmethod
+    def csr(cls, **kwargs) -> "LazyX509[CertificateSigningRequest]":
+        return cls(CSR_LABEL, load_der_x509_csr, **kwargs)
+
+    @property
+    def parsed(self) -> X509Type:
+        if self._parsed is None:
+            self._parsed = self._load_der(self.der)
+        return self._parsed
+
+    @property
+    def is_parsed(self) -> bool:
+        return self._parsed is not None
+
+    @property
+    def pem(self) -> bytes:
+        if self._pem is None:
+            self._pem = (
+                der_to_pem(self._der, self._label)
+                if self._der is not None
+                else self._parsed.public_bytes(Encoding.PEM)
+            )
+        return self._pem
+
+    @property
+    def der(self) -> bytes:
+        if self._der is None:
+            self._der = (
+                pem_to_der(self._pem, self._label)
+                if self._pem is not None
+                else self._parsed.public_bytes(Encoding.DER)
+            )
+        return self._der
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, LazyX509):
+            return NotImplemented
+        return self._label == other._label and self.der == other.der
+
+    def __hash__(self) -> int:
+        return hash(self.der)
+
+    def __repr__(self) -> str:
+        return f"LazyX509({self._label.decode()}, parsed={self.is_parsed})"
@@ -0,0 +1,117 @@
+from pathlib import Path
+
+from certtool_api.benchmarks import (
+    BenchmarkHistory,
+    BenchmarkResult,
+    Comparison,
+    registry,
+    run_benchmark,
+)
+from certtool_api.benchmarks.cases import inline_crypto
+from certtool_api.benchmarks.runner import DEFAULT_THRESHOLD
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the core entity and crypto hot paths, record the results to a JSON history file and fail "
+        "when a path is slower than its baseline by more than the threshold."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "names",
+            nargs="*",
+            help="Only run benchmarks whose name contains one of these",
+        )
+        parser.add_argument(
+            "--history",
+            type=Path,
+            default=Path(
+                getattr(settings, "BENCHMARK_HISTORY", "benchmarks/history.json")
+            ),
+            help="The JSON history file, settings.BENCHMARK_HISTORY by default",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=getattr(settings, "BENCHMARK_THRESHOLD", DEFAULT_THRESHOLD),
+            help="The slowdown allowed against the baseline, 0.25 allows 25%%. Benchmarks with their "
+            "own threshold keep it",
+        )
+        parser.add_argument(
+            "--rounds", type=int, help="Override the number of timed rounds"
+        )
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Make this run the baseline instead of comparing against it",
+        )
+        parser.add_argument(
+            "--no-record",
+            action="store_true",
+            help="Don't add this run to the history",
+        )
+
+    def handle(self, *args, **options) -> None:
+        benchmarks = [
+            benchmark
+            for benchmark in registry
+            if not options["names"]
+            or any(name in benchmark.name for name in options["names"])
+        ]
+        if not benchmarks:
+            raise CommandError("No benchmarks match.")
+        results: list[BenchmarkResult] = []
+        # the model benchmarks write rows, none of which should outlive the run
+        with inline_crypto(), transaction.atomic():
+            for benchmark in benchmarks:
+                result: BenchmarkResult = run_benchmark(benchmark, options["rounds"])
+                self.stdout.write(
+                    f"{result.name:<45} median {_format(result.median):>10}  "
+                    f"min {_format(result.min):>10}  stdev {_format(result.stdev):>10}"
+                )
+                results.append(result)
+            transaction.set_rollback(True)
+
+        history: BenchmarkHistory = BenchmarkHistory.load(options["history"])
+        comparisons: list[Comparison] = history.compare(
+            results,
+            threshold=options["threshold"],
+            thresholds={
+                benchmark.name: benchmark.threshold
+                for benchmark in benchmarks
+                if benchmark.threshold is not None
+            },
+        )
+        if options["update_baseline"]:
+            history.set_baseline(results)
+        if not options["no_record"]:
+            history.record(results)
+        if options["update_baseline"] or not options["no_record"]:
+            history.save()
+        if options["update_baseline"]:
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {history.path}"))
+            return
+
+        for comparison in comparisons:
+            line: str = (
+                f"{comparison.name:<45} {comparison.ratio:>6.2f}x baseline "
+                f"(allowed {1 + comparison.threshold:.2f}x)"
+            )
+            self.stdout.write(self.style.ERROR(line) if comparison.regressed else line)
+        regressed: list[str] = [
+            comparison.name for comparison in comparisons if comparison.regressed
+        ]
+        if regressed:
+            raise CommandError(f"Regressed: {', '.join(regressed)}")
+
+
+# function to format a duration in seconds with a readable unit
+def _format(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
@@ -0,0 +1,41 @@
+from certtool_api.models import (
+    SAVE_MANY_CHUNK_SIZE,
+    CertificateModel,
+    CertificateStorage,
+)
+from django.core.management.base import BaseCommand, CommandParser
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrite every stored certificate and CSR as PEM text, DER or compressed DER, a batch of rows per "
+        "transaction. Run it after every instance reads the storage being converted to."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--storage",
+            choices=[storage.value for storage in CertificateStorage],
+            help="The storage to convert to, settings.CERTIFICATE_STORAGE by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SAVE_MANY_CHUNK_SIZE,
+            help="The number of rows rewritten in each transaction",
+        )
+
+    def handle(self, *args, **options) -> None:
+        storage: CertificateStorage = (
+            CertificateStorage(options["storage"])
+            if options["storage"]
+            else CertificateStorage.configured()
+        )
+        converted: int = CertificateModel.convert_storage(
+            storage, batch_size=options["batch_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Converted {converted} certificates to {storage.value}."
+            )
+        )
@@ -0,0 +1,104 @@
+import sys
+from typing import BinaryIO
+
+from certtool_api.core import Status
+from certtool_api.repositories import InvalidQueryError
+from certtool_api.services.certificate_exporter import (
+    DEFAULT_EXPORT_CHUNK_SIZE,
+    ExportFormat,
+    export_filters,
+)
+from certtool_api.services.service_factory import CertificateExporterFactory
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the certificate inventory, or the certificates matching the filters, as a PEM bundle, JSON lines "
+        "of metadata or a tar of a PEM file per certificate. The export is streamed, so it runs in constant "
+        "memory however many certificates there are."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--format",
+            choices=[export_format.value for export_format in ExportFormat],
+            default=ExportFormat.PEM.value,
+            help="The format to export in",
+        )
+        parser.add_argument(
+            "--output",
+            help="The file to write the export to, stdout by default",
+        )
+        parser.add_argument(
+            "--status",
+            choices=[status.value for status in Status],
+            help="Only export certificates with this status",
+        )
+        parser.add_argument(
+            "--common-name",
+            help="Only export certificates with this subject common name",
+        )
+        parser.add_argument(
+            "--expires-before",
+            help="Only export certificates expiring before this ISO 8601 time, UTC if it has no offset",
+        )
+        parser.add_argument(
+            "--expires-after",
+            help="Only export certificates expiring at or after this ISO 8601 time, UTC if it has no offset",
+        )
+        parser.add_argument(
+            "--tag",
+            action="append",
+            default=[],
+            metavar="KEY=VALUE",
+            help="Only export certificates with this tag, may be given more than once",
+        )
+        parser.add_argument(
+            "--no-chain",
+            action="store_true",
+            help="Leave the chains out of the PEM and tar formats",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_EXPORT_CHUNK_SIZE,
+            help="The number of certificates read per query",
+        )
+
+    def handle(self, *args, **options) -> None:
+        try:
+            filters, tags = export_filters(
+                status=options["status"],
+                common_name=options["common_name"],
+                expires_before=options["expires_before"],
+                expires_after=options["expires_after"],
+                tags=options["tag"],
+            )
+            export = CertificateExporterFactory.certificate_exporter(
+                chunk_size=options["chunk_size"]
+            ).export(
+                ExportFormat(options["format"]),
+                tags=tags,
+                chain=not options["no_chain"],
+                **filters,
+            )
+        except (ValueError, InvalidQueryError) as e:
+            raise CommandError(str(e))
+        if not options["output"]:
+            self._write(sys.stdout.buffer, export)
+            return
+        with open(options["output"], "wb") as output:
+            written: int = self._write(output, export)
+        self.stdout.write(
+            self.style.SUCCESS(f"Exported {written} bytes to {options['output']}.")
+        )
+
+    # method writing export to output, returning the number of bytes written
+    def _write(self, output: BinaryIO, export) -> int:
+        written: int = 0
+        for piece in export:
+            output.write(piece)
+            written += len(piece)
+        output.flush()
+        return written
@@ -0,0 +1,91 @@
+from contextlib import nullcontext
+
+from certtool_api.core import Status, Tags
+from certtool_api.core.crypto_executor import CryptoExecutor
+from certtool_api.services.certificate_importer import (
+    DEFAULT_IMPORT_CHUNK_SIZE,
+    CertificateImporter,
+    ImportStats,
+)
+from certtool_api.services.service_factory import CertificateImporterFactory
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+# the certificates each worker process is sent at a time
+PARSE_BATCH_SIZE: int = 64
+
+
+class Command(BaseCommand):
+    help = (
+        "Import existing certificates from PEM or DER bundles and directories of them. Certificates are "
+        "deduplicated by fingerprint, so an import can be run again, and CA certificates in the bundles are "
+        "stored as the chains of the certificates they issued."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            help="The bundles and directories to import, in order, issuers first if they are apart",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="The number of processes certificates are parsed in, 0 to parse in this one, the number of CPUs by default",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_IMPORT_CHUNK_SIZE,
+            help="The number of certificates parsed and saved at a time",
+        )
+        parser.add_argument(
+            "--tag",
+            action="append",
+            default=[],
+            metavar="KEY=VALUE",
+            help="A tag to save every certificate with, may be given more than once",
+        )
+        parser.add_argument(
+            "--status",
+            choices=[status.value for status in Status],
+            default=Status.ACTIVE.value,
+            help="The status to save every certificate with",
+        )
+
+    def handle(self, *args, **options) -> None:
+        tags: Tags = Tags()
+        for tag in options["tag"]:
+            key, separator, value = tag.partition("=")
+            if not separator:
+                raise CommandError(f"--tag {tag} isn't KEY=VALUE.")
+            tags.add_tag(key, value)
+        executor: CryptoExecutor | None = (
+            None
+            if options["workers"] == 0
+            else CryptoExecutor(workers=options["workers"], batch_size=PARSE_BATCH_SIZE)
+        )
+        with executor or nullcontext():
+            importer: CertificateImporter = (
+                CertificateImporterFactory.certificate_importer(
+                    executor=executor,
+                    chunk_size=options["chunk_size"],
+                    tags=tags or None,
+                    status=Status(options["status"]),
+                )
+            )
+            stats: ImportStats = importer.import_paths(
+                options["paths"], progress=self._progress
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {stats.imported} certificates from {stats.read} items in {stats.seconds:.1f}s "
+                f"({stats.rate:.0f} items/s), {stats.duplicates} duplicates, {stats.invalid} invalid, "
+                f"{stats.skipped} skipped, {stats.issuers} issuers, {stats.unlinked} without a full chain."
+            )
+        )
+
+    def _progress(self, stats: ImportStats) -> None:
+        self.stdout.write(
+            f"{stats.read} read, {stats.imported} imported, {stats.duplicates} duplicates, "
+            f"{stats.invalid} invalid, {stats.rate:.0f} items/s"
+        )
@@ -0,0 +1,79 @@
+import signal
+from datetime import timedelta
+
+from certtool_api.services.renewal_scheduler import (
+    DEFAULT_SCHEDULER_NAME,
+    RenewalScheduler,
+    RenewalStats,
+)
+from certtool_api.services.service_factory import RenewalSchedulerFactory
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+
+class Command(BaseCommand):
+    help = (
+        "Renew active certificates as they come within the renewal window of expiring, a pass every interval "
+        "until stopped with SIGINT or SIGTERM. Progress is checkpointed, so a restart carries on where an "
+        "interrupted pass left off."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Make a single pass and exit",
+        )
+        parser.add_argument(
+            "--name",
+            default=DEFAULT_SCHEDULER_NAME,
+            help="The name the checkpoint is kept under",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.RENEWAL_INTERVAL_SECONDS,
+            help="The number of seconds between passes",
+        )
+        parser.add_argument(
+            "--window-days",
+            type=float,
+            help="How many days before they expire certificates are renewed, settings.RENEWAL_WINDOW_DAYS by default",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="The number of renewals made at once, settings.RENEWAL_WORKERS by default",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            help="The most renewals per second from each CA, 0 for no limit, settings.RENEWAL_RATE_LIMIT by default",
+        )
+
+    def handle(self, *args, **options) -> None:
+        overrides: dict = {}
+        if options["window_days"] is not None:
+            overrides["window"] = timedelta(days=options["window_days"])
+        if options["workers"] is not None:
+            overrides["workers"] = options["workers"]
+        if options["rate"] is not None:
+            overrides["rate"] = options["rate"] or None
+        scheduler: RenewalScheduler = RenewalSchedulerFactory.renewal_scheduler(
+            name=options["name"], **overrides
+        )
+        if options["once"]:
+            self._report(scheduler.run_once())
+            return
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: scheduler.stop())
+        scheduler.run(interval=options["interval"])
+        self._report(scheduler.stats())
+
+    def _report(self, stats: RenewalStats) -> None:
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Renewed {stats.renewed} certificates, {stats.failed} failed, {stats.queued} queued, "
+                f"longest renewal lag {stats.max_lag:.0f}s."
+            )
+        )
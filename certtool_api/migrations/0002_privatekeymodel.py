@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("certtool_api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PrivateKeyModel",
+            fields=[
+                (
+                    "private_key_id",
+                    models.BigAutoField(primary_key=True, serialize=False),
+                ),
+                ("kms_encrypted_key", models.BinaryField()),
+                ("kms_encryption_context", models.JSONField()),
+                ("kms_wrapped_data_key", models.BinaryField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name="certificatemodel",
+            name="tags",
+        ),
+        migrations.AlterField(
+            model_name="subjectalternatenamemodel",
+            name="certificate_id",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="_alternate_names",
+                to="certtool_api.certificatemodel",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="tagsmodel",
+            name="certificate_id",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="_tags",
+                to="certtool_api.certificatemodel",
+            ),
+        ),
+        migrations.AddField(
+            model_name="certificatemodel",
+            name="private_key_id",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="certificates",
+                to="certtool_api.privatekeymodel",
+            ),
+        ),
+    ]
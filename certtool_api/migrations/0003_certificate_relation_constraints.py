@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:57
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+# the constraints need any duplicate rows gone first, the newest of each is kept
+def delete_duplicates(apps, schema_editor):
+    for model_name, pk, fields in (
+        (
+            "SubjectAlternateNameModel",
+            "alternate_name_id",
+            ("certificate_id", "alternate_name"),
+        ),
+        ("TagsModel", "tag_id", ("certificate_id", "tag_key")),
+    ):
+        model = apps.get_model("certtool_api", model_name)
+        keep = (
+            model.objects.values(*fields)
+            .annotate(keep=Max(pk))
+            .values_list("keep", flat=True)
+        )
+        model.objects.exclude(**{f"{pk}__in": list(keep)}).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("certtool_api", "0002_privatekeymodel"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="subjectalternatenamemodel",
+            constraint=models.UniqueConstraint(
+                fields=("certificate_id", "alternate_name"),
+                name="unique_certificate_alternate_name",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="tagsmodel",
+            constraint=models.UniqueConstraint(
+                fields=("certificate_id", "tag_key"), name="unique_certificate_tag_key"
+            ),
+        ),
+    ]
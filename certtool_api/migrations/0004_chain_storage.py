@@ -0,0 +1,134 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:08
+
+from hashlib import sha256
+
+import django.db.models.deletion
+from certtool_api.core.x509_encoding import CERTIFICATE_LABEL, pem_to_der, split_pem
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 500
+
+
+# copy each stored chain into the issuer and link tables, a batch of certificates per transaction so no lock is
+# held on the whole table. An issuer shared by many chains is stored once, and certificates that already have
+# links are skipped, so it can run again for the chains written by the code before while this rolls out
+def copy_chains(apps, schema_editor):
+    certificate_model = apps.get_model("certtool_api", "CertificateModel")
+    issuer_model = apps.get_model("certtool_api", "IssuerCertificateModel")
+    link_model = apps.get_model("certtool_api", "CertificateChainModel")
+    after = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                certificate_model.objects.filter(certificate_id__gt=after)
+                .order_by("certificate_id")
+                .values_list("certificate_id", "chain_pem")[:BATCH_SIZE]
+            )
+            if not batch:
+                return
+            linked = set(
+                link_model.objects.filter(
+                    certificate_id__in=[certificate_id for certificate_id, _ in batch]
+                ).values_list("certificate_id", flat=True)
+            )
+            issuers: dict = {}
+            links: list = []
+            for certificate_id, chain_pem in batch:
+                if not chain_pem or certificate_id in linked:
+                    continue
+                for position, pem in enumerate(split_pem(chain_pem.encode())):
+                    fingerprint = sha256(pem_to_der(pem, CERTIFICATE_LABEL)).hexdigest()
+                    issuers.setdefault(
+                        fingerprint,
+                        issuer_model(
+                            fingerprint=fingerprint, certificate_pem=pem.decode()
+                        ),
+                    )
+                    links.append(
+                        link_model(
+                            certificate_id_id=certificate_id,
+                            issuer_certificate_id_id=fingerprint,
+                            position=position,
+                        )
+                    )
+            issuer_model.objects.bulk_create(issuers.values(), ignore_conflicts=True)
+            link_model.objects.bulk_create(links)
+        after = batch[-1][0]
+
+
+# not atomic, so copy_chains commits a batch at a time. chain_pem is kept, as legacy_chain_pem, for the code
+# before this to keep using while it rolls out, so the chains are still there to go back to
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("certtool_api", "0003_certificate_relation_constraints"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IssuerCertificateModel",
+            fields=[
+                (
+                    "fingerprint",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("certificate_pem", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="CertificateChainModel",
+            fields=[
+                (
+                    "chain_link_id",
+                    models.BigAutoField(primary_key=True, serialize=False),
+                ),
+                ("position", models.PositiveSmallIntegerField()),
+                (
+                    "certificate_id",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="_chain_links",
+                        to="certtool_api.certificatemodel",
+                    ),
+                ),
+                (
+                    "issuer_certificate_id",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="chain_links",
+                        to="certtool_api.issuercertificatemodel",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["position"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="certificatechainmodel",
+            constraint=models.UniqueConstraint(
+                fields=("certificate_id", "position"),
+                name="unique_certificate_chain_position",
+            ),
+        ),
+        migrations.RunPython(copy_chains, migrations.RunPython.noop),
+        # only the model changes, the column keeps its name
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name="certificatemodel",
+                    old_name="chain_pem",
+                    new_name="legacy_chain_pem",
+                ),
+                migrations.AlterField(
+                    model_name="certificatemodel",
+                    name="legacy_chain_pem",
+                    field=models.TextField(
+                        blank=True, db_column="chain_pem", null=True
+                    ),
+                ),
+            ],
+        ),
+    ]
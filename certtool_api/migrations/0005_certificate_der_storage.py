@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:11
+
+from django.db import migrations, models
+
+# Only adds nullable columns, which doesn't rewrite or lock the table. Existing rows keep their PEM and are
+# converted afterwards, in batches, by ./manage.py convert_certificate_storage
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("certtool_api", "0004_chain_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="certificatemodel",
+            name="certificate_der",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="certificatemodel",
+            name="csr_der",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="certificatemodel",
+            name="certificate_pem",
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:13
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# CONCURRENTLY builds the indexes without blocking writes to the certificate table, and can't run in a transaction
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("certtool_api", "0005_certificate_der_storage"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="certificatemodel",
+            index=django.contrib.postgres.indexes.HashIndex(
+                fields=["acm_arn"], name="certificate_acm_arn_hash"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="certificatemodel",
+            index=django.contrib.postgres.indexes.HashIndex(
+                fields=["private_ca_arn"], name="certificate_pca_arn_hash"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="certificatemodel",
+            index=models.Index(
+                fields=["subject_common_name"], name="certificate_common_name"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="certificatemodel",
+            index=models.Index(fields=["not_after"], name="certificate_not_after"),
+        ),
+        AddIndexConcurrently(
+            model_name="certificatemodel",
+            index=models.Index(
+                fields=["status", "not_after"], name="certificate_status"
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:15
+
+from certtool_api.core.hostname import reversed_name
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 1000
+
+
+# fill in reversed_name a batch per transaction, so no lock is held on the whole table
+def fill_reversed_names(apps, schema_editor):
+    model = apps.get_model("certtool_api", "SubjectAlternateNameModel")
+    after = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                model.objects.filter(alternate_name_id__gt=after)
+                .order_by("alternate_name_id")
+                .only("alternate_name_id", "alternate_name")[:BATCH_SIZE]
+            )
+            if not batch:
+                return
+            for row in batch:
+                row.reversed_name = reversed_name(row.alternate_name)
+            model.objects.bulk_update(batch, fields=["reversed_name"])
+        after = batch[-1].alternate_name_id
+
+
+# not atomic, so the backfill commits batch by batch and the index is built CONCURRENTLY while names are still written
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("certtool_api", "0006_certificate_find_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subjectalternatenamemodel",
+            name="reversed_name",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.RunPython(fill_reversed_names, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="subjectalternatenamemodel",
+            index=models.Index(
+                fields=["reversed_name"],
+                name="alternate_name_reversed",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:16
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# built CONCURRENTLY so tags can still be written meanwhile, which needs a migration outside a transaction
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("certtool_api", "0007_alternate_name_reversed"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="tagsmodel",
+            index=models.Index(
+                fields=["tag_key", "tag_value", "certificate_id"], name="tag_key_value"
+            ),
+        ),
+    ]
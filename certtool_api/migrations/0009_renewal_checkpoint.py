@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("certtool_api", "0008_tag_key_value_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RenewalCheckpointModel",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("not_after", models.DateTimeField()),
+                ("certificate_id", models.BigIntegerField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("certtool_api", "0009_renewal_checkpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IssuanceModel",
+            fields=[
+                (
+                    "request_key",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("issued_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "certificate_id",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="certtool_api.certificatemodel",
+                    ),
+                ),
+            ],
+        ),
+    ]
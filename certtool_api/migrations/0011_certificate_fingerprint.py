@@ -0,0 +1,69 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:31
+
+import zlib
+from hashlib import sha256
+
+import django.contrib.postgres.indexes
+from certtool_api.core.x509_encoding import CERTIFICATE_LABEL, pem_to_der
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 1000
+# DER certificates are an ASN.1 SEQUENCE, anything else in certificate_der was compressed
+DER_SEQUENCE = b"\x30"
+
+
+def _der(row):
+    if row.certificate_der:
+        stored = bytes(row.certificate_der)
+        return stored if stored[:1] == DER_SEQUENCE else zlib.decompress(stored)
+    if row.certificate_pem:
+        return pem_to_der(row.certificate_pem.encode(), CERTIFICATE_LABEL)
+    return None
+
+
+# fill in fingerprint a batch per transaction, so no lock is held on the whole table
+def fill_fingerprints(apps, schema_editor):
+    model = apps.get_model("certtool_api", "CertificateModel")
+    after = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                model.objects.filter(certificate_id__gt=after)
+                .order_by("certificate_id")
+                .only("certificate_id", "certificate_pem", "certificate_der")[
+                    :BATCH_SIZE
+                ]
+            )
+            if not batch:
+                return
+            for row in batch:
+                der = _der(row)
+                row.fingerprint = sha256(der).hexdigest() if der else None
+            model.objects.bulk_update(batch, fields=["fingerprint"])
+        after = batch[-1].certificate_id
+
+
+# not atomic, so fill_fingerprints commits a batch at a time and the hash index is built CONCURRENTLY without
+# blocking certificate writes
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("certtool_api", "0010_issuance"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="certificatemodel",
+            name="fingerprint",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="certificatemodel",
+            index=django.contrib.postgres.indexes.HashIndex(
+                fields=["fingerprint"], name="certificate_fingerprint_hash"
+            ),
+        ),
+    ]
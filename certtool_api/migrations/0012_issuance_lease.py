@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("certtool_api", "0011_certificate_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="issuancemodel",
+            name="certificate_arn",
+            field=models.CharField(blank=True, max_length=2048, null=True),
+        ),
+        migrations.AddField(
+            model_name="issuancemodel",
+            name="claimed_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:09
+
+from django.db import migrations, models
+
+TABLE = "certtool_api_certificatemodel"
+
+
+# the unique indexes can't be built over arns that are already stored twice, so say which up front
+def check_duplicates(apps, schema_editor):
+    model = apps.get_model("certtool_api", "CertificateModel")
+    for field in ("acm_arn", "private_ca_arn"):
+        duplicated = list(
+            model.objects.filter(**{f"{field}__isnull": False})
+            .values_list(field, flat=True)
+            .annotate(count=models.Count("certificate_id"))
+            .filter(count__gt=1)[:10]
+        )
+        if duplicated:
+            raise RuntimeError(
+                f"Certificates share a {field}, merge them before migrating: {duplicated}"
+            )
+
+
+# the index is built CONCURRENTLY without blocking writes to the certificate table, then made the constraint,
+# which only takes a lock for as long as it takes to attach it
+def _unique_operations(field, name):
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[
+            migrations.RunSQL(
+                f"CREATE UNIQUE INDEX CONCURRENTLY {name} ON {TABLE} ({field})",
+                f"DROP INDEX CONCURRENTLY IF EXISTS {name}",
+            ),
+            migrations.RunSQL(
+                f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}",
+                f"ALTER TABLE {TABLE} DROP CONSTRAINT {name}",
+            ),
+        ],
+        state_operations=[
+            migrations.AddConstraint(
+                model_name="certificatemodel",
+                constraint=models.UniqueConstraint(fields=(field,), name=name),
+            ),
+        ],
+    )
+
+
+# not atomic, CREATE INDEX CONCURRENTLY can't run in a transaction
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("certtool_api", "0012_issuance_lease"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        _unique_operations("acm_arn", "certificate_acm_arn_uniq"),
+        _unique_operations("private_ca_arn", "certificate_pca_arn_uniq"),
+    ]
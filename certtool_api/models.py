@@ -1,6 +1,63 @@
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from enum import Enum
+from hashlib import sha256
+from threading import Lock
+
 from certtool_api.core import Certificate, PrivateKey, Status, Subject, Tags
+from certtool_api.core.hostname import reversed_name
+from certtool_api.core.x509_encoding import CERTIFICATE_LABEL, pem_to_der, split_pem
+from django.conf import settings
+from django.contrib.postgres.indexes import HashIndex
 from django.db import models  # noqa: F401
+from django.db import transaction
 from django.forms.models import model_to_dict
+from django.utils import timezone
+
+# certificates saved per transaction by CertificateModel.save_many
+SAVE_MANY_CHUNK_SIZE: int = 500
+# the most queries CertificateModel.save_from_entity makes, see its docstring
+SAVE_QUERY_BUDGET: int = 11
+# issuer certificates whose PEM IssuerCertificateModel.pems keeps in memory
+ISSUER_CACHE_SIZE: int = 256
+# DER certificates and CSRs are an ASN.1 SEQUENCE, so this is the first byte of any that aren't compressed
+DER_SEQUENCE: bytes = b"\x30"
+
+
+# how CertificateModel stores certificates and CSRs, see settings.CERTIFICATE_STORAGE
+class CertificateStorage(Enum):
+    PEM = "pem"
+    DER = "der"
+    DER_COMPRESSED = "der_compressed"
+
+    # method returning the storage the settings ask for
+    @classmethod
+    def configured(cls) -> "CertificateStorage":
+        return cls(getattr(settings, "CERTIFICATE_STORAGE", cls.PEM.value))
+
+    # method to encode DER for a binary column, compressing it when this storage asks for it
+    def encode_der(self, der: bytes | None) -> bytes | None:
+        if der is None or self is CertificateStorage.PEM:
+            return None
+        return (
+            zlib.compress(der, 9) if self is CertificateStorage.DER_COMPRESSED else der
+        )
+
+    # method to decode a binary column, whichever storage wrote it
+    @staticmethod
+    def decode_der(stored: bytes | memoryview) -> bytes:
+        stored = bytes(stored)
+        return stored if stored[:1] == DER_SEQUENCE else zlib.decompress(stored)
+
+
+# function returning the value of CertificateModel.fingerprint for certificate, None when it has no certificate yet
+def certificate_fingerprint(certificate: Certificate) -> str | None:
+    return (
+        certificate.fingerprint.hex()
+        if certificate.get_der_safe("certificate")
+        else None
+    )
 
 
 # model for the PrivateKey object
@@ -12,6 +69,8 @@ class PrivateKeyModel(models.Model):
     private_key_id = models.BigAutoField(primary_key=True)
     kms_encrypted_key = models.BinaryField()
     kms_encryption_context = models.JSONField()
+    # set when kms_encrypted_key was encrypted locally under a KMS data key (envelope mode)
+    kms_wrapped_data_key = models.BinaryField(blank=True, null=True)
 
     def to_entity(self) -> PrivateKey:
         """
@@ -21,8 +80,11 @@ class PrivateKeyModel(models.Model):
         """
         return PrivateKey(
             private_key_id=self.private_key_id,
-            kms_encrypted_key=self.kms_encrypted_key,
+            kms_encrypted_key=bytes(self.kms_encrypted_key),
             kms_encryption_context=self.kms_encryption_context,
+            kms_wrapped_data_key=(
+                bytes(self.kms_wrapped_data_key) if self.kms_wrapped_data_key else None
+            ),
         )
 
     @classmethod
@@ -38,6 +100,7 @@ class PrivateKeyModel(models.Model):
             private_key_id=entity.private_key_id,
             kms_encrypted_key=entity.kms_encrypted_key,
             kms_encryption_context=entity.kms_encryption_context,
+            kms_wrapped_data_key=entity.kms_wrapped_data_key,
         )
 
 
@@ -56,75 +119,127 @@ class CertificateModel(models.Model):
         max_length=255, blank=True, null=True
     )
     subject_email = models.CharField(max_length=255, blank=True, null=True)
-    certificate_pem = models.TextField()
-    chain_pem = models.TextField(blank=True, null=True)
+    # left empty when CERTIFICATE_STORAGE keeps the certificate and CSR in the der columns instead
+    certificate_pem = models.TextField(blank=True)
     csr_pem = models.TextField(blank=True, null=True)
+    certificate_der = models.BinaryField(blank=True, null=True)
+    csr_der = models.BinaryField(blank=True, null=True)
     not_before = models.DateTimeField(blank=True, null=True)
     not_after = models.DateTimeField(blank=True, null=True)
+    # the hex SHA-256 of the certificate's DER, see Certificate.fingerprint, null until it is issued
+    fingerprint = models.CharField(max_length=64, blank=True, null=True)
+    # null for certificates issued from a CSR whose key we never held
     private_key_id = models.ForeignKey(
-        PrivateKeyModel, on_delete=models.CASCADE, related_name="certificates"
+        PrivateKeyModel,
+        on_delete=models.CASCADE,
+        related_name="certificates",
+        blank=True,
+        null=True,
     )
+    key_reference = models.CharField(max_length=2048, blank=True, null=True)
     status = models.CharField(
         max_length=255, choices=Status.choices(), blank=True, null=True
     )
+    # the chain as PEM text, where it was stored before CertificateChainModel. It is still written alongside the
+    # links for a release, so instances running the code before can read and write chains while it rolls out,
+    # and chain_pem falls back to it for the chains only they wrote. A later migration copies those to the links
+    # and drops it
+    legacy_chain_pem = models.TextField(db_column="chain_pem", blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    # method to get the tags for a certificate
+    # the relations to_entity reads, pass them to prefetch_related when reading many certificates
+    ENTITY_RELATIONS: tuple[str, ...] = ("_tags", "_alternate_names", "_chain_links")
+    # the fields DjangoRepository.find filters on and the lookups on each that the indexes in Meta serve
+    FIND_FIELDS: dict[str, tuple[str, ...]] = {
+        "acm_arn": ("exact", "in"),
+        "private_ca_arn": ("exact", "in"),
+        "fingerprint": ("exact", "in"),
+        "subject_common_name": ("exact", "in"),
+        "status": ("exact", "in"),
+        "not_after": ("exact", "in", "gt", "gte", "lt", "lte"),
+    }
+    # the fields DjangoRepository.find orders by
+    FIND_ORDERING: tuple[str, ...] = (
+        "certificate_id",
+        "subject_common_name",
+        "not_after",
+    )
+
+    class Meta:
+        indexes = [
+            # ARNs are only ever matched whole, and a hash index stays small however long they are
+            HashIndex(fields=["acm_arn"], name="certificate_acm_arn_hash"),
+            HashIndex(fields=["private_ca_arn"], name="certificate_pca_arn_hash"),
+            HashIndex(fields=["fingerprint"], name="certificate_fingerprint_hash"),
+            models.Index(
+                fields=["subject_common_name"], name="certificate_common_name"
+            ),
+            models.Index(fields=["not_after"], name="certificate_not_after"),
+            # serves status alone as well as status with a not_after range
+            models.Index(fields=["status", "not_after"], name="certificate_status"),
+        ]
+        constraints = [
+            # the conflict targets of save_many's upserts. Rows without an arn are null there, and nulls are
+            # distinct, so only stored arns are unique
+            models.UniqueConstraint(
+                fields=["acm_arn"], name="certificate_acm_arn_uniq"
+            ),
+            models.UniqueConstraint(
+                fields=["private_ca_arn"], name="certificate_pca_arn_uniq"
+            ),
+        ]
+
+    # tags, alternate names and chain assigned since the last save, which save() writes
+    _unsaved_tags: Tags | None = None
+    _unsaved_alternate_names: list[str] | None = None
+    _unsaved_chain: list[str] | None = None
+
+    # method to get the tags for a certificate, from the prefetch_related cache when there is one
     @property
     def tags(self) -> Tags:
-        return Tags(
-            **{
-                record.tag_key: record.tag_value
-                for record in self._tags.all().iterator()
-            }
-        )
+        if self._unsaved_tags is not None:
+            return self._unsaved_tags
+        return Tags(**{record.tag_key: record.tag_value for record in self._tags.all()})
 
-    # method to set the tags for a certificate
+    # method to set the tags for a certificate, they are written on save, None meaning none
     @tags.setter
-    def tags(self, tags: Tags) -> None:
-        tag_models: list[TagsModel] = []
-        for tag in tags.list():
-            tagmod: TagsModel
-            tagmod, _ = TagsModel.objects.update_or_create(
-                certificate_id=self,
-                tag_key=tag["Key"],
-                tag_value=tag["Value"],
-                defaults={
-                    "tag_key": tag["Key"],
-                    "tag_value": tag["Value"],
-                    "certificate_id": self,
-                },
-            )
-            tag_models.append(tagmod)
-        for tag in set(self._tags.all()) - set(tag_models):
-            tag.delete()
-        self._tags.set(tag_models)
+    def tags(self, tags: Tags | None) -> None:
+        self._unsaved_tags = tags or Tags()
 
-    # method to set the alternate names for a certificate
+    # method to get the alternate names for a certificate, from the prefetch_related cache when there is one
     @property
     def alternate_names(self) -> list[str]:
-        return [
-            record.alternate_name for record in self._alternate_names.all().iterator()
-        ]
+        if self._unsaved_alternate_names is not None:
+            return self._unsaved_alternate_names
+        return [record.alternate_name for record in self._alternate_names.all()]
 
-    # method to set the alternate names for a certificate
+    # method to set the alternate names for a certificate, they are written on save
     @alternate_names.setter
-    def alternate_names(self, alternate_names: list[str]) -> None:
-        alternate_name_mods: list[SubjectAlternateNameModel] = []
-        for alternate_name in alternate_names:
-            alternate_name_mod: SubjectAlternateNameModel
-            alternate_name_mod, _ = SubjectAlternateNameModel.objects.update_or_create(
-                certificate_id=self,
-                alternate_name=alternate_name,
-                defaults={"alternate_name": alternate_name, "certificate_id": self},
-            )
-            alternate_name_mods.append(alternate_name_mod)
-        for alternate_name in set(self._alternate_names.all()) - set(
-            alternate_name_mods
-        ):
-            alternate_name.delete()
-        self._alternate_names.set(alternate_name_mods)
+    def alternate_names(self, alternate_names: list[str] | None) -> None:
+        self._unsaved_alternate_names = list(alternate_names or [])
+
+    # method to get the chain for a certificate, its links from the prefetch_related cache when there is one and
+    # the issuer certificates from the IssuerCertificateModel cache
+    @property
+    def chain_pem(self) -> str:
+        if self._unsaved_chain is not None:
+            return "".join(self._unsaved_chain)
+        fingerprints: list[str] = [
+            link.issuer_certificate_id_id for link in self._chain_links.all()
+        ]
+        if not fingerprints:
+            return self.legacy_chain_pem or ""
+        pems: dict[str, str] = IssuerCertificateModel.pems(fingerprints)
+        return "".join(pems[fingerprint] for fingerprint in fingerprints)
+
+    # method to set the chain for a certificate from PEM text, it is written on save
+    @chain_pem.setter
+    def chain_pem(self, chain_pem: str | None) -> None:
+        self._unsaved_chain = [
+            pem.decode() for pem in split_pem((chain_pem or "").encode())
+        ]
+        self.legacy_chain_pem = chain_pem or None
 
     # method to convert a Certificate entity to a CertificateModel
     @classmethod
@@ -141,16 +256,16 @@ class CertificateModel(models.Model):
             subject_ogranization=certificate.subject.organization,
             subject_organizational_unit=certificate.subject.organizational_unit,
             subject_email=certificate.subject.email,
-            certificate_pem=certificate.get_pem_safe("certificate"),
-            chain_pem=certificate.get_pem_safe("chain"),
-            csr_pem=certificate.get_pem_safe("csr"),
+            **cls.x509_to_dict(certificate),
+            fingerprint=certificate_fingerprint(certificate),
             not_before=certificate.not_before,
             not_after=certificate.not_after,
             key_reference=certificate.key_reference,
-            status=certificate.status,
+            status=certificate.status.value if certificate.status else None,
         )
         cert_model.tags = certificate.tags
         cert_model.alternate_names = certificate.alternate_names
+        cert_model.chain_pem = certificate.get_pem_safe("chain")
         return cert_model
 
     # method to convert a CertificateModel to a Certificate entity
@@ -174,14 +289,13 @@ class CertificateModel(models.Model):
             key_reference=self.key_reference,
             tags=self.tags,
             alternate_names=self.alternate_names,
-            status=self.status,
+            status=Status(self.status) if self.status else None,
         )
-        if self.certificate_pem:
-            cert.certificate_pem = self.certificate_pem.encode()
-        if self.csr_pem:
-            cert.csr_pem = self.csr_pem.encode()
-        if self.chain_pem:
-            cert.chain_pem = self.chain_pem.encode()
+        self._load_x509(cert)
+        # read once, each read puts the chain together again
+        chain_pem: str = self.chain_pem
+        if chain_pem:
+            cert.chain_pem = chain_pem.encode()
         return cert
 
     # method to convert a Certificate to dict compatible with CertificateModel.objects.update_or_create defaults
@@ -198,15 +312,98 @@ class CertificateModel(models.Model):
             "subject_ogranization": certificate.subject.organization,
             "subject_organizational_unit": certificate.subject.organizational_unit,
             "subject_email": certificate.subject.email,
-            "certificate_pem": certificate.get_pem_safe("certificate"),
-            "chain_pem": certificate.get_pem_safe("chain"),
-            "csr_pem": certificate.get_pem_safe("csr"),
+            **CertificateModel.x509_to_dict(certificate),
+            "fingerprint": certificate_fingerprint(certificate),
+            "legacy_chain_pem": certificate.get_pem_safe("chain") or None,
             "not_before": certificate.not_before,
             "not_after": certificate.not_after,
             "key_reference": certificate.key_reference,
-            "status": certificate.status,
+            "status": certificate.status.value if certificate.status else None,
         }
 
+    # method to convert the certificate and CSR of a Certificate to the columns storage keeps them in
+    @staticmethod
+    def x509_to_dict(
+        certificate: Certificate, storage: CertificateStorage | None = None
+    ) -> dict:
+        storage = storage or CertificateStorage.configured()
+        if storage is CertificateStorage.PEM:
+            return {
+                "certificate_pem": certificate.get_pem_safe("certificate"),
+                "csr_pem": certificate.get_pem_safe("csr"),
+                "certificate_der": None,
+                "csr_der": None,
+            }
+        return {
+            "certificate_pem": "",
+            "csr_pem": "",
+            "certificate_der": storage.encode_der(
+                certificate.get_der_safe("certificate")
+            ),
+            "csr_der": storage.encode_der(certificate.get_der_safe("csr")),
+        }
+
+    # method to set the certificate and CSR of an entity from whichever columns they are stored in, without parsing
+    def _load_x509(self, cert: Certificate) -> None:
+        if self.certificate_der:
+            cert.certificate_der = CertificateStorage.decode_der(self.certificate_der)
+        elif self.certificate_pem:
+            cert.certificate_pem = self.certificate_pem.encode()
+        if self.csr_der:
+            cert.csr_der = CertificateStorage.decode_der(self.csr_der)
+        elif self.csr_pem:
+            cert.csr_pem = self.csr_pem.encode()
+
+    # method to rewrite every stored certificate and CSR in storage, a batch per transaction
+    @classmethod
+    def convert_storage(
+        cls, storage: CertificateStorage, batch_size: int = SAVE_MANY_CHUNK_SIZE
+    ) -> int:
+        """
+        Rewrite the certificate and CSR columns of every row in the given storage
+
+        Rows are locked a batch at a time, so saves carry on while it runs. Run it once every instance reads
+        the storage being converted to, see settings.CERTIFICATE_STORAGE.
+
+        :param storage: The storage to convert to
+        :param batch_size: The number of rows rewritten in each transaction
+
+        :return: The number of rows rewritten
+        """
+        columns: list[str] = [
+            "certificate_pem",
+            "csr_pem",
+            "certificate_der",
+            "csr_der",
+        ]
+        converted: int = 0
+        after: int = 0
+        while True:
+            with transaction.atomic():
+                batch: list[CertificateModel] = list(
+                    cls.objects.select_for_update()
+                    .filter(certificate_id__gt=after)
+                    .order_by("certificate_id")
+                    .only("certificate_id", *columns)[:batch_size]
+                )
+                if not batch:
+                    return converted
+                changed: list[CertificateModel] = []
+                for model in batch:
+                    certificate: Certificate = Certificate()
+                    model._load_x509(certificate)
+                    fields: dict = cls.x509_to_dict(certificate, storage)
+                    if any(
+                        getattr(model, column) != value
+                        for column, value in fields.items()
+                    ):
+                        for column, value in fields.items():
+                            setattr(model, column, value)
+                        changed.append(model)
+                cls.objects.bulk_update(changed, fields=columns)
+                converted += len(changed)
+                after = batch[-1].certificate_id
+
     # method to convert a CertificateModel to dict compatible with CertificateModel.objects.update_or_create defaults
     def to_dict(self) -> dict:
         return model_to_dict(self)
@@ -220,55 +417,310 @@ class CertificateModel(models.Model):
     def to_entities(self) -> list[Certificate]:
         return [certificate.to_entity() for certificate in self]
 
-    # method to write TagsModel objects to the database
-    def _write_tags(self) -> None:
-        if self.tags:
-            for tag in self.tags.list():
-                TagsModel.objects.update_or_create(
-                    certificate_id=self,
-                    tag_key=tag["Key"],
-                    defaults={
-                        "tag_key": tag["Key"],
-                        "tag_value": tag["Value"],
-                        "certificate_id": self,
-                    },
-                )
+    # method to bring the stored tags in line with the assigned ones, created skips reading the stored ones
+    def _write_tags(self, created: bool = False) -> None:
+        if self._unsaved_tags is None:
+            return
+        TagsModel.sync_many(
+            {
+                self.certificate_id: {
+                    tag["Key"]: tag["Value"] for tag in self._unsaved_tags.list()
+                }
+            },
+            [] if created else [self.certificate_id],
+        )
+        self._unsaved_tags = None
 
-    # method to write SubjectAlternateNameModel objects to the database
-    def _write_alternate_names(self) -> None:
-        if self.alternate_names:
-            for alternate_name in self.alternate_names:
-                SubjectAlternateNameModel.objects.update_or_create(
-                    certificate_id=self,
-                    alternate_name=alternate_name,
-                    defaults={
-                        "alternate_name": alternate_name,
-                        "certificate_id": self,
-                    },
-                )
+    # method to bring the stored alternate names in line with the assigned ones, created skips reading the stored ones
+    def _write_alternate_names(self, created: bool = False) -> None:
+        if self._unsaved_alternate_names is None:
+            return
+        SubjectAlternateNameModel.sync_many(
+            {self.certificate_id: self._unsaved_alternate_names},
+            [] if created else [self.certificate_id],
+        )
+        self._unsaved_alternate_names = None
+
+    # method to bring the stored chain links in line with the assigned chain, created skips reading the stored ones
+    def _write_chain(self, created: bool = False) -> None:
+        if self._unsaved_chain is None:
+            return
+        CertificateChainModel.sync_many(
+            {self.certificate_id: self._unsaved_chain},
+            [] if created else [self.certificate_id],
+        )
+        self._unsaved_chain = None
 
-    # override save method to save the tags and alternate names to the database
+    # override save method to save the tags, alternate names and chain to the database
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self._write_tags()
-        self._write_alternate_names()
+        # a row that is being inserted has nothing stored to diff against
+        created: bool = self._state.adding and (
+            self.certificate_id is None or kwargs.get("force_insert", False)
+        )
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._write_tags(created)
+            self._write_alternate_names(created)
+            self._write_chain(created)
 
     # method to save a CertificateModel from a Certificate entity
     @classmethod
     def save_from_entity(cls, certificate: Certificate) -> "CertificateModel":
+        """
+        Save a certificate, its tags, alternate names and chain
+
+        Tags, alternate names and chain links are diffed against what is stored, so unchanged ones aren't
+        written. A save stays within SAVE_QUERY_BUDGET queries, however many of them there are:
+
+        - 1 UPDATE of the certificate, or 1 INSERT when it is new or its certificate_id isn't stored
+        - per relation, 1 SELECT of the stored rows (skipped for new certificates), at most 1 DELETE of the
+          removed ones and at most 1 INSERT, an upsert for tags and chain links, of the added and changed ones
+        - at most 1 INSERT of the issuer certificates the changed chain links point to
+
+        :param certificate: The certificate to save, its certificate_id is set when it is created
+
+        :return: The CertificateModel
+        """
+        fields: dict = cls.certificate_to_dict(certificate)
         cert: CertificateModel
-        cert, _ = cls.objects.update_or_create(
-            certificate_id=certificate.certificate_id,
-            defaults=cls.certificate_to_dict(certificate),
-        )
-        if cert.tags != certificate.tags:
-            cert.tags = certificate.tags
-            cert._write_tags()
-        if cert.alternate_names != certificate.alternate_names:
-            cert.alternate_names = certificate.alternate_names
-            cert._write_alternate_names()
+        with transaction.atomic():
+            created: bool = True
+            if certificate.certificate_id is not None:
+                # bulk updates skip auto_now
+                fields["updated_at"] = timezone.now()
+                created = not cls.objects.filter(
+                    certificate_id=certificate.certificate_id
+                ).update(**fields)
+            if created:
+                cert = cls(certificate_id=certificate.certificate_id, **fields)
+                cert.tags = certificate.tags
+                cert.alternate_names = certificate.alternate_names
+                cert.chain_pem = certificate.get_pem_safe("chain")
+                cert.save(force_insert=True)
+            else:
+                # created_at wasn't read, it is left deferred and loads if it is used
+                cert = cls.from_db(
+                    cls.objects.db,
+                    ["certificate_id", *fields],
+                    [certificate.certificate_id, *fields.values()],
+                )
+                cert.tags = certificate.tags
+                cert.alternate_names = certificate.alternate_names
+                cert.chain_pem = certificate.get_pem_safe("chain")
+                cert._write_tags()
+                cert._write_alternate_names()
+                cert._write_chain()
+        certificate.certificate_id = cert.certificate_id
         return cert
 
+    # method to save many Certificate entities with bulk statements rather than a round of queries per certificate
+    @classmethod
+    def save_many(
+        cls, certificates: list[Certificate], chunk_size: int = SAVE_MANY_CHUNK_SIZE
+    ) -> list[int]:
+        """
+        Save certificates, their tags, alternate names and chains with bulk statements, one transaction per chunk
+
+        A certificate without a certificate_id is matched to a stored one by its private_ca_arn, then its
+        acm_arn, and updated in place when one is found, otherwise it is created. The arns are unique, and
+        certificates are inserted with an upsert on them, so one a concurrent save stores first is updated
+        rather than duplicated. Of certificates in the list with the same certificate_id or arn, the last is
+        saved and the others are given its certificate_id. A certificate whose certificate_id isn't stored is
+        created with it, as save_from_entity does. Tags and alternate names
+        and chains are made to match the entity, None meaning none. A chunk costs a fixed handful of queries however
+        many certificates are in it.
+
+        :param certificates: The certificates to save, their certificate_id is set as they are saved
+        :param chunk_size: The number of certificates saved in each transaction
+
+        :return: The certificate_id of each certificate, in order
+        """
+        for start in range(0, len(certificates), chunk_size):
+            with transaction.atomic():
+                cls._save_chunk(certificates[start : start + chunk_size])
+        return [certificate.certificate_id for certificate in certificates]
+
+    @classmethod
+    def _save_chunk(cls, certificates: list[Certificate]) -> None:
+        certificates, duplicates = cls._dedupe(certificates)
+        cls._match_natural_keys(certificates)
+        now: datetime = timezone.now()
+        fields: list[str] = [*cls.certificate_to_dict(certificates[0]), "updated_at"]
+        created: list[tuple[Certificate, CertificateModel]] = []
+        updated: list[CertificateModel] = []
+        for certificate in certificates:
+            model: CertificateModel = cls(
+                certificate_id=certificate.certificate_id,
+                **cls.certificate_to_dict(certificate),
+            )
+            # bulk_update and the update of an upsert skip auto_now
+            model.updated_at = now
+            if certificate.certificate_id is None:
+                created.append((certificate, model))
+            else:
+                updated.append(model)
+        if updated:
+            # as in save_from_entity, a certificate_id that isn't stored is inserted rather than updated
+            stored: set[int] = set(
+                cls.objects.filter(
+                    certificate_id__in=[model.certificate_id for model in updated]
+                ).values_list("certificate_id", flat=True)
+            )
+            missing: list[CertificateModel] = [
+                model for model in updated if model.certificate_id not in stored
+            ]
+            updated = [model for model in updated if model.certificate_id in stored]
+            if missing:
+                cls.objects.bulk_create(missing)
+        if updated:
+            cls.objects.bulk_update(updated, fields=fields)
+        # rows of new certificates can't need deleting, so only the updated and upserted ones are read back
+        updated_ids: list[int] = [model.certificate_id for model in updated]
+        updated_ids += cls._create(created, fields)
+        TagsModel.sync_many(
+            {
+                certificate.certificate_id: dict(
+                    (tag["Key"], tag["Value"])
+                    for tag in (certificate.tags or Tags()).list()
+                )
+                for certificate in certificates
+            },
+            updated_ids,
+        )
+        SubjectAlternateNameModel.sync_many(
+            {
+                certificate.certificate_id: list(certificate.alternate_names or [])
+                for certificate in certificates
+            },
+            updated_ids,
+        )
+        CertificateChainModel.sync_many(
+            {
+                certificate.certificate_id: [
+                    pem.decode()
+                    for pem in split_pem(certificate.get_pem_safe("chain").encode())
+                ]
+                for certificate in certificates
+            },
+            updated_ids,
+        )
+        for duplicate, replacement in duplicates:
+            duplicate.certificate_id = replacement.certificate_id
+
+    # method to insert the certificates in created, returning the ids of those upserted on an arn, which a
+    # concurrent save may have stored first
+    @classmethod
+    def _create(
+        cls, created: list[tuple[Certificate, "CertificateModel"]], fields: list[str]
+    ) -> list[int]:
+        by_private_ca_arn: list[tuple[Certificate, CertificateModel]] = []
+        by_acm_arn: list[tuple[Certificate, CertificateModel]] = []
+        plain: list[tuple[Certificate, CertificateModel]] = []
+        for certificate, model in created:
+            if certificate.private_ca_arn:
+                by_private_ca_arn.append((certificate, model))
+            elif certificate.acm_arn:
+                by_acm_arn.append((certificate, model))
+            else:
+                plain.append((certificate, model))
+        if plain:
+            cls.objects.bulk_create([model for _, model in plain])
+            for certificate, model in plain:
+                certificate.certificate_id = model.certificate_id
+        upserted: list[int] = []
+        for arn_field, group in (
+            ("private_ca_arn", by_private_ca_arn),
+            ("acm_arn", by_acm_arn),
+        ):
+            if not group:
+                continue
+            # a certificate stored since _match_natural_keys looked is updated rather than duplicated
+            cls.objects.bulk_create(
+                [model for _, model in group],
+                update_conflicts=True,
+                unique_fields=[arn_field],
+                update_fields=[field for field in fields if field != arn_field],
+            )
+            # the ids of upserted rows aren't returned, so they are read back by arn
+            ids: dict[str, int] = dict(
+                cls.objects.filter(
+                    **{f"{arn_field}__in": [getattr(c, arn_field) for c, _ in group]}
+                ).values_list(arn_field, "certificate_id")
+            )
+            for certificate, _ in group:
+                certificate.certificate_id = ids[getattr(certificate, arn_field)]
+                upserted.append(certificate.certificate_id)
+        return upserted
+
+    # method returning certificates without those a later one has the same certificate_id, private_ca_arn or
+    # acm_arn as, which the later one replaces, and each of those paired with the certificate that replaces it
+    @staticmethod
+    def _dedupe(
+        certificates: list[Certificate],
+    ) -> tuple[list[Certificate], list[tuple[Certificate, Certificate]]]:
+        kept: list[Certificate] = []
+        duplicates: list[tuple[Certificate, Certificate]] = []
+        by_key: dict[tuple[str, int | str], Certificate] = {}
+        for certificate in reversed(certificates):
+            keys: list[tuple[str, int | str]] = [
+                (name, value)
+                for name, value in (
+                    ("certificate_id", certificate.certificate_id),
+                    ("private_ca_arn", certificate.private_ca_arn),
+                    ("acm_arn", certificate.acm_arn),
+                )
+                if value
+            ]
+            replacement: Certificate | None = next(
+                (by_key[key] for key in keys if key in by_key), None
+            )
+            if replacement is None:
+                kept.append(certificate)
+            else:
+                duplicates.append((certificate, replacement))
+            for key in keys:
+                by_key.setdefault(key, replacement or certificate)
+        kept.reverse()
+        return kept, duplicates
+
+    # method to set the certificate_id of certificates that are already stored under their private_ca_arn or acm_arn
+    @classmethod
+    def _match_natural_keys(cls, certificates: list[Certificate]) -> None:
+        unmatched: list[Certificate] = [
+            certificate
+            for certificate in certificates
+            if certificate.certificate_id is None
+            and (certificate.private_ca_arn or certificate.acm_arn)
+        ]
+        if not unmatched:
+            return
+        private_ca_arns: set[str] = {
+            c.private_ca_arn for c in unmatched if c.private_ca_arn
+        }
+        acm_arns: set[str] = {c.acm_arn for c in unmatched if c.acm_arn}
+        by_private_ca_arn: dict[str, int] = {}
+        by_acm_arn: dict[str, int] = {}
+        for certificate_id, private_ca_arn, acm_arn in (
+            cls.objects.filter(
+                models.Q(private_ca_arn__in=private_ca_arns)
+                | models.Q(acm_arn__in=acm_arns)
+            )
+            .order_by("certificate_id")
+            .values_list("certificate_id", "private_ca_arn", "acm_arn")
+        ):
+            # rows without one of the arns share None, which mustn't match certificates without it
+            if private_ca_arn:
+                by_private_ca_arn.setdefault(private_ca_arn, certificate_id)
+            if acm_arn:
+                by_acm_arn.setdefault(acm_arn, certificate_id)
+        for certificate in unmatched:
+            if certificate.private_ca_arn in by_private_ca_arn:
+                certificate.certificate_id = by_private_ca_arn[
+                    certificate.private_ca_arn
+                ]
+            elif certificate.acm_arn in by_acm_arn:
+                certificate.certificate_id = by_acm_arn[certificate.acm_arn]
+
 
 # class for the Certificates subject alternate names that will be referenced by the CertificateModel
 class SubjectAlternateNameModel(models.Model):
@@ -277,6 +729,59 @@ class SubjectAlternateNameModel(models.Model):
         CertificateModel, on_delete=models.CASCADE, related_name="_alternate_names"
     )
     alternate_name = models.CharField(max_length=255)
+    # the lowercase IDNA labels of alternate_name in reverse, see core.hostname.reversed_name. Exact and
+    # wildcard matches are equality lookups on it and names under a domain are a prefix range
+    reversed_name = models.CharField(max_length=255, blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["certificate_id", "alternate_name"],
+                name="unique_certificate_alternate_name",
+            )
+        ]
+        indexes = [
+            # pattern ops so postgres serves the LIKE 'prefix%' of a domain search from it as well as equality
+            models.Index(
+                fields=["reversed_name"],
+                name="alternate_name_reversed",
+                opclasses=["varchar_pattern_ops"],
+            )
+        ]
+
+    # method to make the alternate names of many certificates match names, with one delete and one insert of the missing ones
+    @classmethod
+    def sync_many(
+        cls, names: dict[int, list[str]], stored_certificate_ids: list[int]
+    ) -> None:
+        """
+        :param names: The alternate names each certificate should have, by certificate_id
+        :param stored_certificate_ids: The certificates that may already have alternate names stored
+        """
+        stale: list[int] = []
+        stored: set[tuple[int, str]] = set()
+        for alternate_name_id, certificate_id, alternate_name in cls.objects.filter(
+            certificate_id__in=stored_certificate_ids
+        ).values_list("alternate_name_id", "certificate_id", "alternate_name"):
+            if alternate_name in names.get(certificate_id, []):
+                stored.add((certificate_id, alternate_name))
+            else:
+                stale.append(alternate_name_id)
+        if stale:
+            cls.objects.filter(alternate_name_id__in=stale).delete()
+        cls.objects.bulk_create(
+            [
+                cls(
+                    certificate_id_id=certificate_id,
+                    alternate_name=alternate_name,
+                    reversed_name=reversed_name(alternate_name),
+                )
+                for certificate_id, alternate_names in names.items()
+                for alternate_name in dict.fromkeys(alternate_names)
+                if (certificate_id, alternate_name) not in stored
+            ],
+            ignore_conflicts=True,
+        )
 
 
 class TagsModel(models.Model):
@@ -286,3 +791,243 @@ class TagsModel(models.Model):
     )
     tag_key = models.CharField(max_length=255)
     tag_value = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["certificate_id", "tag_key"], name="unique_certificate_tag_key"
+            )
+        ]
+        indexes = [
+            # finds the certificates with a tag, with certificate_id included so that is an index only scan
+            models.Index(
+                fields=["tag_key", "tag_value", "certificate_id"],
+                name="tag_key_value",
+            )
+        ]
+
+    # method to make the tags of many certificates match tags, with one delete and one upsert
+    @classmethod
+    def sync_many(
+        cls, tags: dict[int, dict[str, str]], stored_certificate_ids: list[int]
+    ) -> None:
+        """
+        :param tags: The tags each certificate should have, by certificate_id
+        :param stored_certificate_ids: The certificates that may already have tags stored
+        """
+        stale: list[int] = []
+        unchanged: set[tuple[int, str]] = set()
+        for tag_id, certificate_id, tag_key, tag_value in cls.objects.filter(
+            certificate_id__in=stored_certificate_ids
+        ).values_list("tag_id", "certificate_id", "tag_key", "tag_value"):
+            wanted: str | None = tags.get(certificate_id, {}).get(tag_key)
+            if wanted is None:
+                stale.append(tag_id)
+            elif wanted == tag_value:
+                unchanged.add((certificate_id, tag_key))
+        if stale:
+            cls.objects.filter(tag_id__in=stale).delete()
+        cls.objects.bulk_create(
+            [
+                cls(certificate_id_id=certificate_id, tag_key=key, tag_value=value)
+                for certificate_id, certificate_tags in tags.items()
+                for key, value in certificate_tags.items()
+                if (certificate_id, key) not in unchanged
+            ],
+            update_conflicts=True,
+            unique_fields=["certificate_id", "tag_key"],
+            update_fields=["tag_value"],
+        )
+
+
+# the content address of an issuer certificate, the hex SHA-256 of its DER
+def issuer_fingerprint(pem: str) -> str:
+    return sha256(pem_to_der(pem.encode(), CERTIFICATE_LABEL)).hexdigest()
+
+
+# class for the intermediate and root certificates that certificate chains are made of, each stored once
+class IssuerCertificateModel(models.Model):
+    """
+    An issuer certificate, stored once however many chains it is in and keyed by its fingerprint, see
+    issuer_fingerprint. Rows are never changed, so their PEM is safe to cache for the life of the process.
+    """
+
+    fingerprint = models.CharField(max_length=64, primary_key=True)
+    certificate_pem = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    _pem_cache: OrderedDict[str, str] = OrderedDict()
+    _pem_cache_lock: Lock = Lock()
+
+    # method to return the PEM of each fingerprint, reading only the ones that aren't cached in one query
+    @classmethod
+    def pems(cls, fingerprints: list[str]) -> dict[str, str]:
+        """
+        :param fingerprints: The fingerprints of stored issuer certificates
+
+        :return: The PEM of each, by fingerprint
+        """
+        found: dict[str, str] = {}
+        with cls._pem_cache_lock:
+            for fingerprint in fingerprints:
+                pem: str | None = cls._pem_cache.get(fingerprint)
+                if pem is not None:
+                    cls._pem_cache.move_to_end(fingerprint)
+                    found[fingerprint] = pem
+        missing: set[str] = set(fingerprints) - found.keys()
+        if not missing:
+            return found
+        read: dict[str, str] = dict(
+            cls.objects.filter(fingerprint__in=missing).values_list(
+                "fingerprint", "certificate_pem"
+            )
+        )
+        with cls._pem_cache_lock:
+            cls._pem_cache.update(read)
+            while len(cls._pem_cache) > ISSUER_CACHE_SIZE:
+                cls._pem_cache.popitem(last=False)
+        return found | read
+
+    # method to empty the PEM cache, for tests
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._pem_cache_lock:
+            cls._pem_cache.clear()
+
+
+# class for the ordered links from a certificate to the issuer certificates of its chain
+class CertificateChainModel(models.Model):
+    chain_link_id = models.BigAutoField(primary_key=True)
+    certificate_id = models.ForeignKey(
+        CertificateModel, on_delete=models.CASCADE, related_name="_chain_links"
+    )
+    issuer_certificate_id = models.ForeignKey(
+        IssuerCertificateModel, on_delete=models.PROTECT, related_name="chain_links"
+    )
+    # the index of the issuer in the chain, from the certificate's own issuer up
+    position = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ["position"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["certificate_id", "position"],
+                name="unique_certificate_chain_position",
+            )
+        ]
+
+    # method to make the chains of many certificates match chains, storing any issuer certificates that are new
+    @classmethod
+    def sync_many(
+        cls, chains: dict[int, list[str]], stored_certificate_ids: list[int]
+    ) -> None:
+        """
+        :param chains: The PEM of each issuer in the chain each certificate should have, by certificate_id
+        :param stored_certificate_ids: The certificates that may already have a chain stored
+        """
+        issuers: dict[str, str] = {}
+        wanted: dict[tuple[int, int], str] = {}
+        for certificate_id, pems in chains.items():
+            for position, pem in enumerate(pems):
+                fingerprint: str = issuer_fingerprint(pem)
+                issuers[fingerprint] = pem
+                wanted[(certificate_id, position)] = fingerprint
+        stale: list[int] = []
+        for chain_link_id, certificate_id, position, fingerprint in cls.objects.filter(
+            certificate_id__in=stored_certificate_ids
+        ).values_list(
+            "chain_link_id", "certificate_id", "position", "issuer_certificate_id"
+        ):
+            wanted_fingerprint: str | None = wanted.get((certificate_id, position))
+            if wanted_fingerprint is None:
+                stale.append(chain_link_id)
+            elif wanted_fingerprint == fingerprint:
+                del wanted[(certificate_id, position)]
+        if stale:
+            cls.objects.filter(chain_link_id__in=stale).delete()
+        if not wanted:
+            return
+        IssuerCertificateModel.objects.bulk_create(
+            [
+                IssuerCertificateModel(
+                    fingerprint=fingerprint, certificate_pem=issuers[fingerprint]
+                )
+                for fingerprint in set(wanted.values())
+            ],
+            ignore_conflicts=True,
+        )
+        cls.objects.bulk_create(
+            [
+                cls(
+                    certificate_id_id=certificate_id,
+                    issuer_certificate_id_id=fingerprint,
+                    position=position,
+                )
+                for (certificate_id, position), fingerprint in wanted.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["certificate_id", "position"],
+            update_fields=["issuer_certificate_id"],
+        )
+
+
+# (not_after, certificate_id), a position in the not_after order certificates are renewed in
+RenewalPosition = tuple[datetime, int]
+
+
+# class for how far through the certificates a renewal scheduler has got, so a restart carries on from there
+class RenewalCheckpointModel(models.Model):
+    """
+    The position of a renewal scheduler, every certificate before which has been renewed. There is a row per
+    scheduler name, so schedulers renewing different certificates don't move each other's checkpoint.
+    """
+
+    name = models.CharField(max_length=64, primary_key=True)
+    not_after = models.DateTimeField()
+    certificate_id = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # method to return the position stored for name, None if the scheduler hasn't renewed anything yet
+    @classmethod
+    def load(cls, name: str) -> RenewalPosition | None:
+        row: tuple[datetime, int] | None = (
+            cls.objects.filter(name=name)
+            .values_list("not_after", "certificate_id")
+            .first()
+        )
+        return tuple(row) if row else None
+
+    # method to store position as name's checkpoint
+    @classmethod
+    def store(cls, name: str, position: RenewalPosition) -> None:
+        cls.objects.update_or_create(
+            name=name,
+            defaults={"not_after": position[0], "certificate_id": position[1]},
+        )
+
+    # method to remove name's checkpoint, so its next pass starts from the beginning
+    @classmethod
+    def clear(cls, name: str) -> None:
+        cls.objects.filter(name=name).delete()
+
+
+# class recording the certificate issued for each distinct issuance request, see core.issuance.issuance_key
+class IssuanceModel(models.Model):
+    """
+    The ARN of the certificate last issued for a request. A process issuing it holds a lease on the row until
+    claimed_until, so processes making the same request wait for it and find the certificate it issued. The
+    ARN is recorded as soon as AWS has issued it, whether or not the caller has stored the certificate yet.
+    """
+
+    request_key = models.CharField(max_length=64, primary_key=True)
+    # no longer written, the ARN is recorded instead. Kept for a release so older processes still run
+    certificate_id = models.ForeignKey(
+        CertificateModel,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name="+",
+    )
+    certificate_arn = models.CharField(max_length=2048, blank=True, null=True)
+    issued_at = models.DateTimeField(blank=True, null=True)
+    claimed_until = models.DateTimeField(blank=True, null=True)
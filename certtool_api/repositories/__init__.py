@@ -1,7 +1,18 @@
-from .django_repository import DjangoRepository
+from .certificate_repository import CertificateRepository
+from .django_repository import DjangoRepository, EntityIterator, InvalidCursorError
+from .issuance_repository import IssuanceRepository
+from .query import FindQuery, InvalidQueryError
+from .renewal_checkpoint_repository import RenewalCheckpointRepository
 from .repo_factory import RepoFactory
 
 __all__ = [
+    "CertificateRepository",
     "DjangoRepository",
+    "EntityIterator",
+    "FindQuery",
+    "InvalidCursorError",
+    "InvalidQueryError",
+    "IssuanceRepository",
+    "RenewalCheckpointRepository",
     "RepoFactory",
 ]
@@ -1,13 +1,57 @@
+import random
+import time
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from hashlib import sha256
 from typing import TYPE_CHECKING
 
 from attrs import define
+from certtool_api.aws import clients
 from certtool_api.core import Certificate, CertToolError
+from certtool_api.core.issuance import idempotency_token
 
 if TYPE_CHECKING:
     from mypy_boto3_acm_pca import ACMPCAClient
     from mypy_boto3_acm_pca.waiter import CertificateIssuedWaiter
 
-import boto3
+
+DEFAULT_ISSUE_WORKERS: int = 16
+DEFAULT_POLL_DELAY: float = 1.0
+DEFAULT_MAX_POLL_DELAY: float = 15.0
+DEFAULT_ISSUE_TIMEOUT: float = 600.0  # 10 minutes
+# the longest IdempotencyToken ACM-PCA takes
+PCA_IDEMPOTENCY_TOKEN_LENGTH: int = 36
+
+
+@define
+class IssuanceResult:
+    """
+    The outcome of issuing one certificate in a batch
+
+    :param certificate: The certificate that was submitted, signed in place when issuance succeeded
+    :param latency: The number of seconds from submitting the CSR to the certificate being ready or failing
+    :param polls: The number of GetCertificate calls made for the certificate
+    :param error: The exception that stopped the certificate being issued, None on success
+    """
+
+    certificate: Certificate
+    latency: float
+    polls: int = 0
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# a certificate that has been submitted and is waiting to be fetched. submitted_at is stamped when the IssueCertificate call is sent.
+@define
+class _PendingIssue:
+    certificate: Certificate
+    next_poll_at: float
+    delay: float
+    submitted_at: float = 0.0
+    polls: int = 0
 
 
 # class to interact with the ACM Private CA
@@ -19,7 +63,10 @@ class AWSCertificateAuthority:
     :param arn: The arn of the certificate authority
     :param valid_days: The number of days certificates signed by this authority should be valid for
     :param signing_algorithm: The signing algorithm to use
+    :param template_arn: The ACM-PCA certificate template to issue with, the end entity template if None
     :param profile_name: The name of the AWS profile to use
+    :param region_name: The region of the certificate authority, the profile default if None
+    :param endpoint_url: An endpoint to use in place of the AWS one
 
     :Example:
 
@@ -31,11 +78,19 @@ class AWSCertificateAuthority:
     arn: str
     valid_days: int = 365 * 5  # 5 years
     signing_algorithm: str = "SHA512WITHRSA"
+    template_arn: str | None = None
     _profile_name: str | None = None
+    _region_name: str | None = None
+    _endpoint_url: str | None = None
 
     @property
     def _client(self) -> "ACMPCAClient":
-        return boto3.session.Session(profile_name=self._profile_name).client("acm-pca")
+        return clients.client(
+            "acm-pca",
+            profile_name=self._profile_name,
+            region_name=self._region_name,
+            endpoint_url=self._endpoint_url,
+        )
 
     def get_certificate(self, certificate_arn: str) -> Certificate:
         resp: dict = self._client.get_certificate(
@@ -43,28 +98,17 @@ class AWSCertificateAuthority:
         )
         cert: Certificate = Certificate(
             private_ca_arn=certificate_arn,
+            issuer_ca_arn=self.arn,
         )
         cert.certificate_pem = resp["Certificate"].encode()
         cert.chain_pem = resp["CertificateChain"].encode()
         return cert
 
     def issue_certificate(
-        self, certificate: Certificate, valid_days: int | None
+        self, certificate: Certificate, valid_days: int | None = None
     ) -> Certificate:
-        if not valid_days:
-            valid_days = self.valid_days
         client: "ACMPCAClient" = self._client
-        resp: dict = client.issue_certificate(
-            CertificateAuthorityArn=self.arn,
-            Csr=certificate.csr_pem.decode(),
-            SigningAlgorithm=self.signing_algorithm,
-            Validity={
-                "Value": valid_days,
-                "Type": "DAYS",
-            },
-        )
-        certificate.issuer_ca_arn = self.arn
-        certificate.private_ca_arn = resp["CertificateArn"]
+        self._submit(certificate, valid_days)
         waiter: CertificateIssuedWaiter = client.get_waiter("certificate_issued")
         waiter.wait(
             CertificateAuthorityArn=certificate.issuer_ca_arn,
@@ -77,6 +121,144 @@ class AWSCertificateAuthority:
         certificate.chain = signed_cert.chain
         return certificate
 
+    def issue_certificates(
+        self,
+        certificates: list[Certificate],
+        valid_days: int | None = None,
+        max_workers: int = DEFAULT_ISSUE_WORKERS,
+        poll_delay: float = DEFAULT_POLL_DELAY,
+        max_poll_delay: float = DEFAULT_MAX_POLL_DELAY,
+        timeout: float = DEFAULT_ISSUE_TIMEOUT,
+    ) -> Iterator[IssuanceResult]:
+        """
+        Issue a batch of certificates, yielding each one as soon as it is ready.
+
+        Every IssueCertificate call is submitted up front across max_workers threads. Each outstanding ARN is
+        then polled with GetCertificate, backing off from poll_delay up to max_poll_delay (with jitter, so a
+        large batch doesn't poll in lockstep) while ACM-PCA reports the request is still in progress.
+
+        :param certificates: The certificates to issue, each with a CSR set
+        :param valid_days: The number of days the certificates should be valid for
+        :param max_workers: The number of concurrent ACM-PCA calls
+        :param poll_delay: The number of seconds to wait before the first poll of a certificate
+        :param max_poll_delay: The longest to wait between polls of a certificate
+        :param timeout: The number of seconds after submission a certificate is given up on
+
+        :return: An iterator of :class:`IssuanceResult`, in completion order, one per certificate
+        """
+        pending: dict[Future, _PendingIssue] = {}
+        waiting: list[_PendingIssue] = []
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="acm-pca-issue"
+        ) as executor:
+            for certificate in certificates:
+                issue: _PendingIssue = _PendingIssue(
+                    certificate=certificate,
+                    next_poll_at=0.0,
+                    delay=poll_delay,
+                )
+                pending[
+                    executor.submit(self._submit_pending, issue, valid_days)
+                ] = issue
+            while pending or waiting:
+                now: float = time.monotonic()
+                for issue in [issue for issue in waiting if issue.next_poll_at <= now]:
+                    waiting.remove(issue)
+                    issue.polls += 1
+                    pending[executor.submit(self._fetch, issue.certificate)] = issue
+                next_poll_at: float | None = min(
+                    (issue.next_poll_at for issue in waiting), default=None
+                )
+                if not pending:
+                    # only polls are due, and wait() returns at once on no futures
+                    time.sleep(max(next_poll_at - now, 0))
+                    continue
+                done, _ = wait(
+                    pending,
+                    timeout=None
+                    if next_poll_at is None
+                    else max(next_poll_at - now, 0),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    issue = pending.pop(future)
+                    now = time.monotonic()
+                    latency: float = now - issue.submitted_at
+                    error: BaseException | None = future.exception()
+                    if error is None and future.result():
+                        yield IssuanceResult(
+                            certificate=issue.certificate,
+                            latency=latency,
+                            polls=issue.polls,
+                        )
+                        continue
+                    if error is None and latency >= timeout:
+                        error = AWSCertificateAuthorityError(
+                            f"Timed out waiting for {issue.certificate.private_ca_arn}"
+                        )
+                    if error:
+                        yield IssuanceResult(
+                            certificate=issue.certificate,
+                            latency=latency,
+                            polls=issue.polls,
+                            error=error,
+                        )
+                        continue
+                    # submitted, or still being issued: poll again after a jittered delay
+                    issue.next_poll_at = now + random.uniform(
+                        issue.delay / 2, issue.delay
+                    )
+                    if issue.polls:
+                        issue.delay = min(issue.delay * 2, max_poll_delay)
+                    waiting.append(issue)
+
+    # method to submit a queued batch issue once a worker picks it up, so its latency and timeout start there
+    def _submit_pending(self, issue: _PendingIssue, valid_days: int | None) -> bool:
+        issue.submitted_at = time.monotonic()
+        return self._submit(issue.certificate, valid_days)
+
+    # method to send certificate's CSR to IssueCertificate, recording the new ARN on it. Returns False so the batch knows to poll.
+    def _submit(self, certificate: Certificate, valid_days: int | None) -> bool:
+        if not valid_days:
+            valid_days = self.valid_days
+        template: dict = {"TemplateArn": self.template_arn} if self.template_arn else {}
+        # derived from the CSR, so a retried submission is one certificate and a new CSR never gets an old one
+        token: str = idempotency_token(
+            sha256(
+                f"{self.arn}:{self.template_arn}:{self.signing_algorithm}:{valid_days}:".encode()
+                + certificate.csr_pem
+            ).hexdigest(),
+            length=PCA_IDEMPOTENCY_TOKEN_LENGTH,
+        )
+        resp: dict = self._client.issue_certificate(
+            CertificateAuthorityArn=self.arn,
+            Csr=certificate.csr_pem.decode(),
+            SigningAlgorithm=self.signing_algorithm,
+            Validity={
+                "Value": valid_days,
+                "Type": "DAYS",
+            },
+            IdempotencyToken=token,
+            **template,
+        )
+        certificate.issuer_ca_arn = self.arn
+        certificate.private_ca_arn = resp["CertificateArn"]
+        return False
+
+    # method to fetch an issued certificate into certificate. Returns False while ACM-PCA is still issuing it.
+    def _fetch(self, certificate: Certificate) -> bool:
+        client: "ACMPCAClient" = self._client
+        try:
+            resp: dict = client.get_certificate(
+                CertificateAuthorityArn=self.arn,
+                CertificateArn=certificate.private_ca_arn,
+            )
+        except client.exceptions.RequestInProgressException:
+            return False
+        certificate.certificate_pem = resp["Certificate"].encode()
+        certificate.chain_pem = resp["CertificateChain"].encode()
+        return True
+
 
 # error class for the ACM Private CA
 class AWSCertificateAuthorityError(CertToolError):
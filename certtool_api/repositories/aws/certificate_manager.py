@@ -4,15 +4,16 @@ import secrets
 from typing import TYPE_CHECKING
 
 from attrs import define
-from certtool_api.core import Certificate, CertToolError
-from certtool_api.core.aws.certificate_authority import AWSCertificateAuthority
+from certtool_api.aws import clients
+from certtool_api.core import Certificate, CertToolError, PrivateKey
+from certtool_api.core.issuance import idempotency_token, issuance_key
+
+from .certificate_authority import AWSCertificateAuthority
 
 if TYPE_CHECKING:
     from mypy_boto3_acm import ACMClient
     from mypy_boto3_acm.waiter import CertificateValidatedWaiter
 
-import boto3
-
 
 @define
 class AWSCertificateManager:
@@ -24,15 +25,22 @@ class AWSCertificateManager:
     key_algo: str = "RSA_2048"
     _profile_name: str | None = None
     _private_ca: AWSCertificateAuthority | None = None
+    _region_name: str | None = None
+    _endpoint_url: str | None = None
 
     @property
     def _client(self) -> "ACMClient":
         """
-        This method is used to get an ACM client
+        This method is used to get an ACM client. Clients come from the shared registry, so this is cheap to call.
 
         :return: The ACM client
         """
-        return boto3.session.Session(profile_name=self._profile_name).client("acm")
+        return clients.client(
+            "acm",
+            profile_name=self._profile_name,
+            region_name=self._region_name,
+            endpoint_url=self._endpoint_url,
+        )
 
     def export_certificate(self, certificate_arn: str) -> Certificate:
         """
@@ -44,10 +52,10 @@ class AWSCertificateManager:
         )
         cert: Certificate = Certificate(
             acm_arn=certificate_arn,
-            cert_pem=resp["Certificate"].encode(),
-            chain_pem=resp["CertificateChain"].encode(),
+            key=PrivateKey.from_pem(resp["PrivateKey"].encode(), passphrase=passphrase),
         )
-        cert.set_key_pem(key_pem=resp["PrivateKey"].encode(), passphrase=passphrase),
+        cert.certificate_pem = resp["Certificate"].encode()
+        cert.chain_pem = resp["CertificateChain"].encode()
         return cert
 
     def request_certificate(self, certificate: Certificate) -> Certificate:
@@ -70,24 +78,30 @@ class AWSCertificateManager:
         """
         if not self._private_ca:
             raise AWSCertificateManagerError("No private CA configured")
-        idemp_token: str = secrets.token_hex()[0:32]
+        # the same for every retry of the same request, so ACM issues one certificate for them within an hour
+        idemp_token: str = idempotency_token(
+            issuance_key(certificate, f"acm:{self._private_ca.arn}:{self.key_algo}")
+        )
         client: ACMClient = self._client
+        optional: dict = {}
+        if certificate.alternate_names:
+            optional["SubjectAlternativeNames"] = certificate.alternate_names
+        if certificate.tags:
+            optional["Tags"] = certificate.tags.list()
         try:
             response = client.request_certificate(
                 DomainName=certificate.subject.common_name,
                 CertificateAuthorityArn=self._private_ca.arn,
-                SubjectAlternativeNames=certificate.alternative_names,
                 KeyAlgorithm=self.key_algo,
-                SigningAlgorithm=self.signing_algorithm,
                 IdempotencyToken=idemp_token,
-                Tags=certificate.tags,
+                **optional,
             )
         except Exception as e:
             raise AWSCertificateManagerError("Error requesting certificate") from e
         cert_arn: str = response["CertificateArn"]
         waiter: CertificateValidatedWaiter = client.get_waiter("certificate_validated")
         waiter.wait(CertificateArn=cert_arn)
-        signed_cert: Certificate = self.export_certificate(cert_arn=cert_arn)
+        signed_cert: Certificate = self.export_certificate(certificate_arn=cert_arn)
         certificate.acm_arn = signed_cert.acm_arn
         certificate.certificate = signed_cert.certificate
         certificate.chain = signed_cert.chain
@@ -0,0 +1,233 @@
+from collections.abc import Iterable
+from datetime import datetime
+
+from certtool_api.core import Certificate, Status, Tags
+from certtool_api.core.hostname import covering_names, reversed_name
+from certtool_api.models import (
+    SAVE_MANY_CHUNK_SIZE,
+    CertificateModel,
+    PrivateKeyModel,
+    RenewalPosition,
+    SubjectAlternateNameModel,
+    TagsModel,
+)
+from django.db import models  # noqa: F401
+from django.db import transaction
+from django.utils import timezone
+
+from .django_repository import (
+    DEFAULT_CHUNK_SIZE,
+    DjangoRepository,
+    EntityIterator,
+    decode_cursor,
+)
+from .query import InvalidQueryError
+
+
+class CertificateRepository(DjangoRepository[Certificate, CertificateModel]):
+    """
+    The DjangoRepository for certificates, with lookups by the hostnames they are for and by their tags.
+
+    Hostnames are matched on SubjectAlternateNameModel.reversed_name, so each lookup is an index scan of the
+    alternate names followed by the (status, not_after) index of the certificates, however many there are.
+    Tags are matched on the (tag_key, tag_value, certificate_id) index of TagsModel, and certificates on the
+    hash index of their fingerprint.
+    """
+
+    def save_many(
+        self, certificates: list[Certificate], chunk_size: int = SAVE_MANY_CHUNK_SIZE
+    ) -> list[int]:
+        """
+        Save certificates with bulk statements, a transaction per chunk_size of them, see CertificateModel.save_many
+
+        :param certificates: The certificates to save, their certificate_id is set as they are saved
+        :param chunk_size: The number of certificates saved in each transaction
+
+        :return: The certificate_id of each certificate, in order
+        """
+        return self._data_model.save_many(certificates, chunk_size=chunk_size)
+
+    def stored_fingerprints(self, fingerprints: Iterable[str]) -> set[str]:
+        """
+        Return which of fingerprints a stored certificate has, from the fingerprint index
+
+        :param fingerprints: Hex SHA-256 fingerprints, see Certificate.fingerprint
+
+        :return: The fingerprints that are stored
+        """
+        return set(
+            self._data_model.objects.filter(fingerprint__in=set(fingerprints))
+            .values_list("fingerprint", flat=True)
+            .distinct()
+        )
+
+    def tagged(
+        self,
+        tags: Tags,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        cursor: str | None = None,
+        **filters,
+    ) -> EntityIterator[Certificate]:
+        """
+        Stream the certificates that have every one of tags, and match filters, in certificate_id order and a
+        page of chunk_size at a time, see DjangoRepository.iter
+
+        Each tag is an index only scan of the certificate_ids with it, and the certificates are the
+        intersection of those.
+
+        :param tags: The tags, all of which a certificate must have with the same value
+        :param chunk_size: The number of certificates read per query
+        :param cursor: A token from EntityIterator.cursor, to carry on after the certificate it was taken at
+        :param filters: Filters on the find_fields, as for iter()
+
+        :return: An iterator of the certificates, whose cursor can be handed back for the next page
+
+        :raises InvalidQueryError: if tags is empty, or for a filter iter() doesn't allow
+        :raises InvalidCursorError: if cursor isn't a token iter() or tagged() made
+
+        :Example:
+
+        >>> page = repo.tagged(Tags(team="payments", env="prod"), chunk_size=50, cursor=request_cursor)
+        >>> certificates, next_cursor = list(itertools.islice(page, 50)), page.cursor
+        """
+        if not tags:
+            raise InvalidQueryError("Can't find certificates by no tags.")
+        queryset: models.QuerySet = self._filtered(self._queryset(), filters)
+        for tag in tags.list():
+            queryset = queryset.filter(
+                certificate_id__in=TagsModel.objects.filter(
+                    tag_key=tag["Key"], tag_value=tag["Value"]
+                ).values("certificate_id")
+            )
+        return EntityIterator(
+            queryset=queryset,
+            chunk_size=chunk_size,
+            after=decode_cursor(cursor) if cursor else None,
+        )
+
+    def covering(
+        self, hostname: str, at: datetime | None = None, limit: int | None = None
+    ) -> list[Certificate]:
+        """
+        Return the active certificates with an alternate name that covers hostname, itself or the wildcard
+        for its parent domain, soonest expiring first
+
+        :param hostname: The hostname, in any case and as unicode or IDNA
+        :param at: The time the certificates must be valid after, now if None
+        :param limit: The most certificates to return, all of them if None
+
+        :return: The certificates
+
+        :Example:
+
+        >>> repo.covering("api.payments.internal")  # *.payments.internal and api.payments.internal
+        """
+        return self._active(
+            SubjectAlternateNameModel.objects.filter(
+                reversed_name__in=covering_names(hostname)
+            ),
+            at,
+            limit,
+        )
+
+    def under(
+        self, domain: str, at: datetime | None = None, limit: int | None = None
+    ) -> list[Certificate]:
+        """
+        Return the active certificates with an alternate name of domain or any name under it, wildcards
+        included, soonest expiring first
+
+        :param domain: The domain, in any case and as unicode or IDNA
+        :param at: The time the certificates must be valid after, now if None
+        :param limit: The most certificates to return, all of them if None
+
+        :return: The certificates
+        """
+        key: str = reversed_name(domain)
+        return self._active(
+            SubjectAlternateNameModel.objects.filter(
+                models.Q(reversed_name=key)
+                | models.Q(reversed_name__startswith=f"{key}.")
+            ),
+            at,
+            limit,
+        )
+
+    def expiring(
+        self,
+        before: datetime,
+        after: RenewalPosition | None = None,
+        limit: int = DEFAULT_CHUNK_SIZE,
+    ) -> list[Certificate]:
+        """
+        Return the next limit active certificates that expire before before, in (not_after, certificate_id)
+        order from the (status, not_after) index
+
+        Only certificates we issued are returned, those ACM or one of our CAs issued. Certificates imported
+        from elsewhere have neither an acm_arn nor an issuer_ca_arn, and are renewed by whoever issued them.
+
+        :param before: The time the certificates must expire before
+        :param after: The (not_after, certificate_id) of the last certificate already read, from the start if None
+        :param limit: The most certificates to return
+
+        :return: The certificates
+
+        :Example:
+
+        >>> page = repo.expiring(now + timedelta(days=30))
+        >>> page = repo.expiring(now + timedelta(days=30), after=(page[-1].not_after, page[-1].certificate_id))
+        """
+        queryset: models.QuerySet = self._queryset().filter(
+            models.Q(acm_arn__isnull=False) | models.Q(issuer_ca_arn__isnull=False),
+            status=Status.ACTIVE.value,
+            not_after__lt=before,
+        )
+        if after is not None:
+            # a range on not_after the index can seek to, less the ties already read
+            queryset = queryset.filter(not_after__gte=after[0]).exclude(
+                not_after=after[0], pk__lte=after[1]
+            )
+        return [
+            model.to_entity() for model in queryset.order_by("not_after", "pk")[:limit]
+        ]
+
+    def supersede(self, certificate: Certificate, renewal: Certificate) -> None:
+        """
+        Save renewal, with its KMS encrypted key when it has one, and make certificate INACTIVE, in one
+        transaction so a certificate is never left active alongside the renewal that replaces it
+
+        :param certificate: The stored certificate that was renewed
+        :param renewal: The certificate replacing it, its key encrypted with KMSService.encrypt_private_key
+            unless ACM holds it. Its certificate_id and key's private_key_id are set when it is saved
+        """
+        with transaction.atomic():
+            self.save(renewal)
+            if renewal.key is not None and renewal.key.kms_encrypted_key:
+                key_model: PrivateKeyModel = PrivateKeyModel.from_entity(renewal.key)
+                key_model.save()
+                renewal.key.private_key_id = key_model.private_key_id
+                self._data_model.objects.filter(pk=renewal.certificate_id).update(
+                    private_key_id=key_model
+                )
+            # bulk updates skip auto_now
+            self._data_model.objects.filter(pk=certificate.certificate_id).update(
+                status=Status.INACTIVE.value, updated_at=timezone.now()
+            )
+        certificate.status = Status.INACTIVE
+
+    # method returning the active certificates of alternate_names in not_after order
+    def _active(
+        self,
+        alternate_names: models.QuerySet,
+        at: datetime | None,
+        limit: int | None,
+    ) -> list[Certificate]:
+        queryset: models.QuerySet = self._queryset().filter(
+            certificate_id__in=alternate_names.values("certificate_id"),
+            status=Status.ACTIVE.value,
+            not_after__gt=at or timezone.now(),
+        )
+        queryset = queryset.order_by("not_after", "pk")
+        if limit is not None:
+            queryset = queryset[:limit]
+        return [model.to_entity() for model in queryset]
@@ -1,9 +1,18 @@
-from typing import Generic, Protocol, TypeVar
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from typing import Generic, Iterator, Protocol, TypeVar
 
+from certtool_api.core import CertToolError
 from django.db import models  # noqa: F401
 
+from .query import OPTIONS, FindFields, FindQuery, InvalidQueryError
+
 EntityType = TypeVar("EntityType")
 
+DEFAULT_CHUNK_SIZE: int = 500
+CURSOR_VERSION: int = 1
+
 
 class DomainModeler(Protocol):
     def to_entity(self) -> EntityType:
@@ -19,16 +28,163 @@ ModelType = TypeVar("ModelType", bound=DomainModeler)
 class DjangoRepository(Generic[EntityType, ModelType]):
     """
     A DjangoRepository that uses a Django Model to store and retrieve an Entity.
+
+    :param data_model: The Django Model
+    :param prefetch: The relations to_entity reads, fetched up front with prefetch_related so reading N
+        entities costs one query per relation rather than one per entity
+    :param find_fields: The fields find() can filter on and the lookups allowed on each
+    :param find_ordering: The fields find() can order by
     """
 
-    def __init__(self, data_model: ModelType):
+    def __init__(
+        self,
+        data_model: ModelType,
+        prefetch: tuple[str, ...] = (),
+        find_fields: FindFields | None = None,
+        find_ordering: tuple[str, ...] = (),
+    ):
         self._data_model: ModelType = data_model
+        self._prefetch: tuple[str, ...] = prefetch
+        self._find_fields: FindFields = find_fields or {}
+        self._find_ordering: tuple[str, ...] = find_ordering
 
     def save(self, entity: EntityType):
         self._data_model.save_from_entity(entity)
 
     def get(self, id: int) -> EntityType:
-        return self._data_model.objects.get(id=id).to_entity()  # type: ignore
+        return self._queryset().get(pk=id).to_entity()
 
     def all(self) -> list[EntityType]:
-        return [e.to_entity() for e in self._data_model.objects.all()]  # type: ignore
+        return [e.to_entity() for e in self._queryset()]
+
+    def find(self, **kwargs) -> list[EntityType]:
+        """
+        Return the entities matching filters on the find_fields, see :class:`FindQuery` for the arguments
+
+        Only fields and lookups the model has an index for are allowed, so a find never scans the table.
+
+        :raises InvalidQueryError: for a filter, ordering or limit that isn't allowed
+
+        :Example:
+
+        >>> repo.find(status=Status.ACTIVE, not_after__lt=cutoff, order_by="not_after", limit=100)
+        """
+        query: FindQuery = FindQuery.parse(
+            kwargs, self._find_fields, self._find_ordering
+        )
+        return [e.to_entity() for e in query.apply(self._queryset())]
+
+    def iter(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        cursor: str | None = None,
+        **filters,
+    ) -> "EntityIterator[EntityType]":
+        """
+        Stream every entity, or every one matching filters, in primary key order, chunk_size rows at a time
+
+        Each chunk is its own keyset query, WHERE pk > the last one read ORDER BY pk LIMIT chunk_size, with
+        the prefetch relations fetched for just that chunk. Memory stays at one chunk however big the table
+        is, and as no cursor or transaction is held open between chunks, a long running job doesn't pin a
+        connection and sees rows added behind it.
+
+        :param chunk_size: The number of rows read per query
+        :param cursor: A token from EntityIterator.cursor, to carry on after the entity it was taken at
+        :param filters: Filters on the find_fields, as for find(), without order_by or limit
+
+        :return: An iterator of the entities, whose cursor can be saved to resume from later
+
+        :raises InvalidCursorError: if cursor isn't a token iter() made
+        :raises InvalidQueryError: for a filter find() doesn't allow, or an order_by or limit
+
+        :Example:
+
+        >>> entities = repo.iter(cursor=job.saved_cursor)
+        >>> for entity in entities:
+        ...     process(entity)
+        ...     job.saved_cursor = entities.cursor
+        """
+        return EntityIterator(
+            queryset=self._filtered(self._queryset(), filters),
+            chunk_size=chunk_size,
+            after=decode_cursor(cursor) if cursor else None,
+        )
+
+    # method returning the queryset entities are read from
+    def _queryset(self) -> models.QuerySet:
+        return self._data_model.objects.prefetch_related(*self._prefetch)  # type: ignore
+
+    # method narrowing queryset to filters, for the streams, which are always in primary key order and whole
+    def _filtered(self, queryset: models.QuerySet, filters: dict) -> models.QuerySet:
+        if not filters:
+            return queryset
+        if any(option in filters for option in OPTIONS):
+            raise InvalidQueryError("Streams are in primary key order and whole.")
+        return FindQuery.parse(filters, self._find_fields, self._find_ordering).apply(
+            queryset
+        )
+
+
+class EntityIterator(Generic[EntityType]):
+    """
+    The iterator DjangoRepository.iter() returns, see there
+    """
+
+    def __init__(
+        self, queryset: models.QuerySet, chunk_size: int, after: int | None = None
+    ):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self._queryset: models.QuerySet = queryset.order_by("pk")
+        self._chunk_size: int = chunk_size
+        self._after: int | None = after
+        self._entities: Iterator[EntityType] = self._read()
+
+    # property returning a token to resume after the last entity returned
+    @property
+    def cursor(self) -> str | None:
+        return encode_cursor(self._after) if self._after is not None else None
+
+    def __iter__(self) -> "EntityIterator[EntityType]":
+        return self
+
+    def __next__(self) -> EntityType:
+        return next(self._entities)
+
+    def _read(self) -> Iterator[EntityType]:
+        while True:
+            queryset: models.QuerySet = self._queryset
+            if self._after is not None:
+                queryset = queryset.filter(pk__gt=self._after)
+            chunk: list = list(queryset[: self._chunk_size])
+            for model in chunk:
+                entity: EntityType = model.to_entity()
+                self._after = model.pk
+                yield entity
+            if len(chunk) < self._chunk_size:
+                return
+
+
+# functions to turn the primary key iteration stopped at into an opaque token and back
+def encode_cursor(after: int) -> str:
+    return (
+        urlsafe_b64encode(json.dumps({"v": CURSOR_VERSION, "after": after}).encode())
+        .rstrip(b"=")
+        .decode()
+    )
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        data: dict = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if data["v"] != CURSOR_VERSION or not isinstance(data["after"], int):
+            raise ValueError(cursor)
+    except (Base64Error, ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}") from exc
+    return data["after"]
+
+
+class InvalidCursorError(CertToolError):
+    """
+    This class is used to represent a cursor token that DjangoRepository.iter() can't resume from
+    """
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from certtool_api.core.issuance import IssuanceInProgressError
+from certtool_api.models import IssuanceModel
+from django.db import transaction
+from django.utils import timezone
+
+
+class IssuanceRepository:
+    """
+    The certificates issued for each issuance request, leased per request so identical requests made at the
+    same time by different processes make one issuance, see IssuanceModel
+    """
+
+    def claim(
+        self, request_key: str, window: timedelta, lease: timedelta
+    ) -> str | None:
+        """
+        Find the certificate already issued for the request, or take the lease to issue it. The row is locked
+        for a short transaction, never for the issuance, which the caller makes afterwards and then either
+        calls record() or release().
+
+        :param request_key: The request's issuance_key
+        :param window: How recently the certificate must have been issued to be reused
+        :param lease: How long the caller has to issue the certificate before another may try
+
+        :return: The ARN of the certificate issued for the request within window, None if the caller should issue it
+
+        :raises IssuanceInProgressError: if another caller holds an unexpired lease on the request
+
+        :Example:
+
+        >>> certificate_arn = issuances.claim(key, timedelta(hours=1), timedelta(minutes=45))
+        >>> if certificate_arn is None:
+        ...     issuances.record(key, issue(certificate).acm_arn)
+        """
+        with transaction.atomic():
+            # a concurrent insert of the same key waits for this transaction and then does nothing
+            IssuanceModel.objects.bulk_create(
+                [IssuanceModel(request_key=request_key)], ignore_conflicts=True
+            )
+            issuance: IssuanceModel = IssuanceModel.objects.select_for_update().get(
+                request_key=request_key
+            )
+            now = timezone.now()
+            if (
+                issuance.certificate_arn
+                and issuance.issued_at
+                and issuance.issued_at > now - window
+            ):
+                return issuance.certificate_arn
+            if issuance.claimed_until and issuance.claimed_until > now:
+                raise IssuanceInProgressError(
+                    f"Request {request_key} is being issued until {issuance.claimed_until}."
+                )
+            issuance.claimed_until = now + lease
+            issuance.save(update_fields=["claimed_until"])
+            return None
+
+    def record(self, request_key: str, certificate_arn: str) -> None:
+        IssuanceModel.objects.filter(request_key=request_key).update(
+            certificate_arn=certificate_arn,
+            issued_at=timezone.now(),
+            claimed_until=None,
+        )
+
+    # gives up a lease taken by claim() when the issuance failed, so the next identical request issues at once
+    def release(self, request_key: str) -> None:
+        IssuanceModel.objects.filter(request_key=request_key).update(claimed_until=None)
@@ -0,0 +1,11 @@
+from .certificate_authority import (
+    LocalCertificateAuthority,
+    LocalCertificateAuthorityError,
+)
+from .subordinate_store import DjangoSubordinateStore
+
+__all__ = [
+    "DjangoSubordinateStore",
+    "LocalCertificateAuthority",
+    "LocalCertificateAuthorityError",
+]
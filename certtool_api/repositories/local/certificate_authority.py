@@ -0,0 +1,305 @@
+from datetime import datetime, timedelta, timezone
+from logging import Logger, getLogger
+from threading import Lock, Thread
+
+from attrs import define, field
+from certtool_api.core import (
+    Certificate,
+    CertificateError,
+    PrivateKey,
+    Status,
+    Subject,
+    Tags,
+)
+from certtool_api.core.certificate_types import CertificateType
+from certtool_api.core.private_key import KeyTypes
+from certtool_api.repositories.aws.certificate_authority import (
+    AWSCertificateAuthority,
+)
+from certtool_api.services.kms_service import KMSService
+from certtool_api.services.protocols import SubordinateStore
+from cryptography.hazmat.primitives.asymmetric.ec import EllipticCurvePrivateKey
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+from cryptography.hazmat.primitives.asymmetric.types import CertificatePublicKeyTypes
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.x509 import (
+    AuthorityKeyIdentifier,
+    BasicConstraints,
+)
+from cryptography.x509 import Certificate as X509Certificate
+from cryptography.x509 import (
+    CertificateBuilder,
+    CertificateSigningRequest,
+    ExtendedKeyUsage,
+    ExtendedKeyUsageOID,
+    ExtensionNotFound,
+    KeyUsage,
+    Name,
+    ObjectIdentifier,
+    SubjectAlternativeName,
+    SubjectKeyIdentifier,
+    random_serial_number,
+)
+
+# tag marking a stored certificate as one of our subordinate CAs
+ROLE_TAG = "certtool:role"
+SUBORDINATE_ROLE = "subordinate-ca"
+
+DEFAULT_LEAF_VALID_DAYS: int = 7
+# rotate once the subordinate can no longer cover a full leaf lifetime, plus a day of slack
+DEFAULT_ROTATE_BEFORE: timedelta = timedelta(days=DEFAULT_LEAF_VALID_DAYS + 1)
+ROTATION_RETRY_INTERVAL: timedelta = timedelta(minutes=5)
+# leaves are backdated a little so hosts with a slow clock accept them straight away
+CLOCK_SKEW: timedelta = timedelta(minutes=5)
+
+# the extended key usages of each CertificateType template
+TEMPLATE_USAGES: dict[str, list[ObjectIdentifier]] = {
+    "server": [ExtendedKeyUsageOID.SERVER_AUTH],
+    "client": [ExtendedKeyUsageOID.CLIENT_AUTH],
+}
+
+LEAF_KEY_USAGE: KeyUsage = KeyUsage(
+    digital_signature=True,
+    content_commitment=False,
+    key_encipherment=True,
+    data_encipherment=False,
+    key_agreement=False,
+    key_cert_sign=False,
+    crl_sign=False,
+    encipher_only=False,
+    decipher_only=False,
+)
+
+
+# everything about the current subordinate that signing needs, worked out once when it is loaded
+@define
+class _SigningState:
+    certificate: Certificate
+    key: RSAPrivateKey | EllipticCurvePrivateKey
+    issuer_name: Name
+    authority_key_identifier: AuthorityKeyIdentifier
+    chain: list[X509Certificate]
+    not_after: datetime
+    rotate_at: datetime
+
+
+# class to sign certificates locally with a subordinate CA issued by the ACM Private CA
+@define
+class LocalCertificateAuthority:
+    """
+    This class signs CSRs in process with a subordinate CA that the ACM Private CA issued, so a leaf
+    certificate costs a signature rather than a PCA round trip.
+
+    The subordinate's key is KMS encrypted in the store and only decrypted into memory. Once the subordinate
+    is within rotate_before of expiring, a replacement is requested from issuer in the background while the
+    current one keeps signing, and leaves are never valid past the subordinate that signed them.
+
+    :param issuer: The ACM Private CA that issues the subordinate, set up with a subordinate CA template_arn
+    :param store: Where the subordinate and its encrypted key are kept
+    :param kms: The KMS service used to encrypt and decrypt the subordinate's key
+    :param subject: The subject of the subordinate CA
+    :param allowed_types: The certificate templates this authority may sign
+    :param valid_days: The number of days leaf certificates are valid for
+    :param rotate_before: How long before the subordinate expires to replace it
+    :param key_type: The type of the subordinate's key. EC keys sign many times faster than RSA ones
+    :param key_size: The size of the subordinate's key, the curve size for EC keys
+
+    :Example:
+
+    >>> from certtool_api.repositories.local import LocalCertificateAuthority
+    >>> ca = LocalCertificateAuthority(issuer=pca, store=store, kms=kms, subject=Subject(common_name="certtool issuing CA"))
+    >>> ca.issue_certificate(certificate=cert)
+    """
+
+    issuer: AWSCertificateAuthority
+    store: SubordinateStore
+    kms: KMSService
+    subject: Subject
+    allowed_types: frozenset[CertificateType] = frozenset({CertificateType.Server})
+    valid_days: int = DEFAULT_LEAF_VALID_DAYS
+    rotate_before: timedelta = DEFAULT_ROTATE_BEFORE
+    key_type: KeyTypes = KeyTypes.EC
+    key_size: int = 256
+    _log: Logger = field(factory=lambda: getLogger(__name__))
+    _state: _SigningState | None = field(init=False, default=None)
+    _rotating: bool = field(init=False, default=False)
+    _lock: Lock = field(init=False, factory=Lock)
+
+    def issue_certificate(
+        self,
+        certificate: Certificate,
+        certificate_type: CertificateType = CertificateType.Server,
+        valid_days: int | None = None,
+    ) -> Certificate:
+        """
+        Sign certificate's CSR with the subordinate CA
+
+        :param certificate: The certificate to sign, with a CSR set
+        :param certificate_type: The template to sign with
+        :param valid_days: The number of days the certificate should be valid for, self.valid_days if None
+
+        :return: The certificate, with its certificate and chain set
+
+        :raises LocalCertificateAuthorityError: if the template isn't allowed or the CSR isn't validly signed
+        """
+        if certificate_type not in self.allowed_types:
+            raise LocalCertificateAuthorityError(
+                f"Not allowed to sign {certificate_type.value['template']} certificates."
+            )
+        csr: CertificateSigningRequest | None = certificate.csr
+        if not csr:
+            raise LocalCertificateAuthorityError("CSR not set.")
+        if not csr.is_signature_valid:
+            raise LocalCertificateAuthorityError("CSR signature is invalid.")
+        # loading the public key is a good part of the cost of a signature, so only do it once
+        public_key: CertificatePublicKeyTypes = csr.public_key()
+        state: _SigningState = self._signing_state()
+        now: datetime = datetime.now(timezone.utc)
+        builder: CertificateBuilder = (
+            CertificateBuilder()
+            .subject_name(csr.subject)
+            .issuer_name(state.issuer_name)
+            .public_key(public_key)
+            .serial_number(random_serial_number())
+            .not_valid_before(now - CLOCK_SKEW)
+            .not_valid_after(
+                min(
+                    now + timedelta(days=valid_days or self.valid_days),
+                    state.not_after,
+                )
+            )
+            .add_extension(BasicConstraints(ca=False, path_length=None), critical=True)
+            .add_extension(LEAF_KEY_USAGE, critical=True)
+            .add_extension(
+                ExtendedKeyUsage(TEMPLATE_USAGES[certificate_type.value["template"]]),
+                critical=False,
+            )
+            .add_extension(
+                SubjectKeyIdentifier.from_public_key(public_key), critical=False
+            )
+            .add_extension(state.authority_key_identifier, critical=False)
+        )
+        try:
+            builder = builder.add_extension(
+                csr.extensions.get_extension_for_class(SubjectAlternativeName).value,
+                critical=False,
+            )
+        except ExtensionNotFound:
+            pass
+        signed: X509Certificate = builder.sign(state.key, SHA256())
+        certificate.certificate = signed
+        certificate.chain = state.chain
+        certificate.issuer_ca_arn = state.certificate.private_ca_arn
+        certificate.not_before = signed.not_valid_before.replace(tzinfo=timezone.utc)
+        certificate.not_after = signed.not_valid_after.replace(tzinfo=timezone.utc)
+        return certificate
+
+    def rotate(self) -> Certificate:
+        """
+        Issue a new subordinate CA from self.issuer and save it, KMS encrypted, to the store. The next
+        signature uses it.
+
+        :return: The new subordinate
+        """
+        self._log.info("Issuing subordinate CA")
+        key: PrivateKey = PrivateKey.new(key_size=self.key_size, key_type=self.key_type)
+        subordinate: Certificate = Certificate(
+            key=key,
+            subject=self.subject,
+            tags=Tags(**{ROLE_TAG: SUBORDINATE_ROLE}),
+            status=Status.ACTIVE,
+        )
+        subordinate.generate_csr()
+        self.issuer.issue_certificate(subordinate)
+        subordinate.not_before = subordinate.certificate.not_valid_before.replace(
+            tzinfo=timezone.utc
+        )
+        subordinate.not_after = subordinate.certificate.not_valid_after.replace(
+            tzinfo=timezone.utc
+        )
+        self.kms.encrypt_private_key(key, {ROLE_TAG: SUBORDINATE_ROLE})
+        subordinate = self.store.save(subordinate)
+        self._state = self._prepare(subordinate)
+        self._log.info("Subordinate CA issued: %s", subordinate.private_ca_arn)
+        return subordinate
+
+    # method to return the signing state, loading or replacing the subordinate when it is missing or due
+    def _signing_state(self) -> _SigningState:
+        state: _SigningState | None = self._state
+        now: datetime = datetime.now(timezone.utc)
+        if state and now < state.rotate_at:
+            return state
+        with self._lock:
+            state = self._state
+            if state is None or now >= state.not_after:
+                # nothing we can sign with, so callers wait for one
+                current: Certificate | None = self.store.current(self.issuer.arn)
+                if current:
+                    self._state = self._prepare(current)
+                if self._state is None or now >= self._state.rotate_at:
+                    self.rotate()
+                return self._state
+            if now >= state.rotate_at and not self._rotating:
+                # the current subordinate is still good, replace it without holding anyone up
+                self._rotating = True
+                Thread(
+                    target=self._rotate_in_background,
+                    name="subordinate-ca-rotation",
+                    daemon=True,
+                ).start()
+            return state
+
+    def _rotate_in_background(self) -> None:
+        try:
+            current: Certificate | None = self.store.current(self.issuer.arn)
+            if current and current.not_after > self._state.certificate.not_after:
+                # another process has already rotated
+                self._state = self._prepare(current)
+            else:
+                self.rotate()
+        except Exception:
+            self._log.exception("Error rotating subordinate CA")
+            with self._lock:
+                self._state.rotate_at = (
+                    datetime.now(timezone.utc) + ROTATION_RETRY_INTERVAL
+                )
+        finally:
+            with self._lock:
+                self._rotating = False
+
+    # method to decrypt a stored subordinate's key and work out what signing needs from it
+    def _prepare(self, subordinate: Certificate) -> _SigningState:
+        if not subordinate.key.key:
+            self.kms.decrypt_private_key(subordinate.key)
+        ca_certificate: X509Certificate = subordinate.certificate
+        try:
+            authority_key_identifier: AuthorityKeyIdentifier = (
+                AuthorityKeyIdentifier.from_issuer_subject_key_identifier(
+                    ca_certificate.extensions.get_extension_for_class(
+                        SubjectKeyIdentifier
+                    ).value
+                )
+            )
+        except ExtensionNotFound:
+            authority_key_identifier = AuthorityKeyIdentifier.from_issuer_public_key(
+                subordinate.key.key.public_key()
+            )
+        not_after: datetime = ca_certificate.not_valid_after.replace(
+            tzinfo=timezone.utc
+        )
+        return _SigningState(
+            certificate=subordinate,
+            key=subordinate.key.key,
+            issuer_name=ca_certificate.subject,
+            authority_key_identifier=authority_key_identifier,
+            chain=[ca_certificate, *subordinate.chain],
+            not_after=not_after,
+            rotate_at=not_after - self.rotate_before,
+        )
+
+
+# error class for the local certificate authority
+class LocalCertificateAuthorityError(CertificateError):
+    """
+    This class is used to represent errors signing with the local certificate authority
+    """
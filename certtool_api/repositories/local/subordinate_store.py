@@ -0,0 +1,58 @@
+from certtool_api.core import Certificate, Status
+from certtool_api.models import CertificateModel, PrivateKeyModel
+from django.db import transaction
+
+from .certificate_authority import ROLE_TAG, SUBORDINATE_ROLE
+
+
+# class to keep LocalCertificateAuthority's subordinates in the certificate tables
+class DjangoSubordinateStore:
+    """
+    This class stores subordinate CAs as tagged CertificateModels, with their KMS encrypted key in a
+    PrivateKeyModel. Superseded subordinates are left active, they still verify the leaves they signed.
+    """
+
+    def current(self, issuer_ca_arn: str) -> Certificate | None:
+        """
+        Return the newest active subordinate issued by issuer_ca_arn, with its key still encrypted
+
+        :param issuer_ca_arn: The ARN of the ACM Private CA that issued the subordinate
+
+        :return: The subordinate, None if there isn't one
+        """
+        model: CertificateModel | None = (
+            CertificateModel.objects.filter(
+                issuer_ca_arn=issuer_ca_arn,
+                status=Status.ACTIVE.value,
+                private_key_id__isnull=False,
+                _tags__tag_key=ROLE_TAG,
+                _tags__tag_value=SUBORDINATE_ROLE,
+            )
+            .select_related("private_key_id")
+            .order_by("-not_after")
+            .first()
+        )
+        if not model:
+            return None
+        certificate: Certificate = model.to_entity()
+        certificate.key = model.private_key_id.to_entity()
+        return certificate
+
+    @transaction.atomic
+    def save(self, certificate: Certificate) -> Certificate:
+        """
+        Save a subordinate and its KMS encrypted key
+
+        :param certificate: The subordinate, its key encrypted with KMSService.encrypt_private_key
+
+        :return: The subordinate, with its certificate_id and key's private_key_id set
+        """
+        key_model: PrivateKeyModel = PrivateKeyModel.from_entity(certificate.key)
+        key_model.save()
+        certificate.key.private_key_id = key_model.private_key_id
+        model: CertificateModel = CertificateModel.save_from_entity(certificate)
+        CertificateModel.objects.filter(certificate_id=model.certificate_id).update(
+            private_key_id=key_model
+        )
+        certificate.certificate_id = model.certificate_id
+        return certificate
@@ -0,0 +1,120 @@
+from enum import Enum
+
+from attrs import define, field
+from certtool_api.core import CertToolError
+from django.db import models  # noqa: F401
+
+# the keyword arguments of find() that aren't filters
+OPTIONS: tuple[str, ...] = ("order_by", "limit")
+
+# field name to the lookups find() allows on it, only ones an index on the field can serve
+FindFields = dict[str, tuple[str, ...]]
+
+
+@define
+class Filter:
+    """
+    A single condition of a :class:`FindQuery`, field__lookup=value
+
+    :param field: The model field
+    :param lookup: One of exact, in, gt, gte, lt or lte
+    :param value: The value, a list of values for in
+    """
+
+    field: str
+    lookup: str
+    value: object
+
+    # method returning the keyword argument the filter is for QuerySet.filter
+    def to_lookup(self) -> dict[str, object]:
+        return {f"{self.field}__{self.lookup}": self.value}
+
+
+@define
+class FindQuery:
+    """
+    The filters, ordering and limit of a find() call, checked against the fields the model allows them on.
+
+    Filters are keyword arguments, field=value or field__lookup=value where lookup is in, gt, gte, lt or
+    lte. Enum values are compared by their value. order_by is a field name or list of them, each prefixed
+    with - for descending, and limit caps the number of results. Results are in primary key order when
+    order_by isn't given, and after the order_by fields otherwise, so they are always deterministic.
+
+    :param filters: The filters, all of which must match
+    :param order_by: The ordering, as for QuerySet.order_by
+    :param limit: The most results to return, all of them if None
+
+    :Example:
+
+    >>> FindQuery.parse(
+    ...     {"status__in": [Status.ACTIVE], "not_after__lt": cutoff, "order_by": "not_after", "limit": 100},
+    ...     CertificateModel.FIND_FIELDS,
+    ...     CertificateModel.FIND_ORDERING,
+    ... ).apply(CertificateModel.objects.all())
+    """
+
+    filters: list[Filter] = field(factory=list)
+    order_by: list[str] = field(factory=list)
+    limit: int | None = None
+
+    @classmethod
+    def parse(
+        cls, kwargs: dict[str, object], fields: FindFields, ordering: tuple[str, ...]
+    ) -> "FindQuery":
+        """
+        :param kwargs: The keyword arguments find() was called with
+        :param fields: The fields that can be filtered on and the lookups allowed on each
+        :param ordering: The fields that can be ordered by
+
+        :return: The FindQuery
+
+        :raises InvalidQueryError: for a field, lookup, value or ordering that isn't allowed
+        """
+        filters: list[Filter] = [
+            _filter(key, value, fields)
+            for key, value in kwargs.items()
+            if key not in OPTIONS
+        ]
+        order_by: object = kwargs.get("order_by") or []
+        order_by = [order_by] if isinstance(order_by, str) else list(order_by)
+        for name in order_by:
+            if not isinstance(name, str) or name.removeprefix("-") not in ordering:
+                raise InvalidQueryError(f"Can't order by {name!r}.")
+        limit: object = kwargs.get("limit")
+        if limit is not None and (
+            isinstance(limit, bool) or not isinstance(limit, int) or limit < 1
+        ):
+            raise InvalidQueryError(f"Invalid limit: {limit!r}.")
+        return cls(filters=filters, order_by=order_by, limit=limit)
+
+    # method to narrow, order and slice queryset to the query
+    def apply(self, queryset: models.QuerySet) -> models.QuerySet:
+        for query_filter in self.filters:
+            queryset = queryset.filter(**query_filter.to_lookup())
+        queryset = queryset.order_by(*self.order_by, "pk")
+        return queryset[: self.limit] if self.limit is not None else queryset
+
+
+# function to turn a field__lookup=value keyword argument into a Filter
+def _filter(key: str, value: object, fields: FindFields) -> Filter:
+    name, _, lookup = key.partition("__")
+    lookup = lookup or "exact"
+    if name not in fields:
+        raise InvalidQueryError(f"Can't find by {name!r}.")
+    if lookup not in fields[name]:
+        raise InvalidQueryError(f"Can't find by {name!r} with {lookup!r}.")
+    if lookup == "in":
+        if isinstance(value, (str, bytes)) or not hasattr(value, "__iter__"):
+            raise InvalidQueryError(f"{key} needs a list of values.")
+        return Filter(name, lookup, [_value(item) for item in value])
+    return Filter(name, lookup, _value(value))
+
+
+def _value(value: object) -> object:
+    return value.value if isinstance(value, Enum) else value
+
+
+class InvalidQueryError(CertToolError):
+    """
+    This class is used to represent find() arguments the repository can't serve from an index
+    """
@@ -0,0 +1,17 @@
+from certtool_api.models import RenewalCheckpointModel, RenewalPosition
+
+
+class RenewalCheckpointRepository:
+    """
+    The checkpoints of renewal schedulers, each the (not_after, certificate_id) every certificate before which
+    has been renewed, see RenewalCheckpointModel
+    """
+
+    def load(self, name: str) -> RenewalPosition | None:
+        return RenewalCheckpointModel.load(name)
+
+    def store(self, name: str, position: RenewalPosition) -> None:
+        RenewalCheckpointModel.store(name, position)
+
+    def clear(self, name: str) -> None:
+        RenewalCheckpointModel.clear(name)
@@ -1,9 +1,24 @@
-from your_cookie_cutter_api.models import CookieModel
+from certtool_api.models import CertificateModel
 
-from .django_repository import DjangoRepository
+from .certificate_repository import CertificateRepository
+from .issuance_repository import IssuanceRepository
+from .renewal_checkpoint_repository import RenewalCheckpointRepository
 
 
 class RepoFactory:
     @staticmethod
-    def cookie() -> DjangoRepository:
-        return DjangoRepository(data_model=CookieModel)
+    def certificate() -> CertificateRepository:
+        return CertificateRepository(
+            data_model=CertificateModel,
+            prefetch=CertificateModel.ENTITY_RELATIONS,
+            find_fields=CertificateModel.FIND_FIELDS,
+            find_ordering=CertificateModel.FIND_ORDERING,
+        )
+
+    @staticmethod
+    def renewal_checkpoint() -> RenewalCheckpointRepository:
+        return RenewalCheckpointRepository()
+
+    @staticmethod
+    def issuance() -> IssuanceRepository:
+        return IssuanceRepository()
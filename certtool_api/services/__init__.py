@@ -1,6 +1,16 @@
 # from .service_factory import CookieMonsterServiceFactory
-from .kms_service import KMSService
+from .data_key_cache import DataKeyCache
+from .kms_service import (
+    EnvelopeCiphertext,
+    KMSBatchResult,
+    KMSService,
+    KMSServiceError,
+)
 
 __all__ = [
+    "DataKeyCache",
+    "EnvelopeCiphertext",
+    "KMSBatchResult",
     "KMSService",
+    "KMSServiceError",
 ]
@@ -0,0 +1,227 @@
+import json
+import tarfile
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+from enum import Enum
+from io import BytesIO
+
+from attrs import asdict, define
+from certtool_api.core import Certificate, Status, Tags
+
+from .protocols import CertificateStore
+
+DEFAULT_EXPORT_CHUNK_SIZE: int = 500
+# the size of the pieces an export is handed out in, so a response isn't written a certificate at a time
+EXPORT_BUFFER_SIZE: int = 64 * 1024
+TAR_DIRECTORY: str = "certificates"
+
+
+# the formats an inventory can be exported in
+class ExportFormat(Enum):
+    PEM = "pem"
+    JSONL = "jsonl"
+    TAR = "tar"
+
+    @property
+    def content_type(self) -> str:
+        return {
+            ExportFormat.PEM: "application/x-pem-file",
+            ExportFormat.JSONL: "application/x-ndjson",
+            ExportFormat.TAR: "application/x-tar",
+        }[self]
+
+
+# function to build the filters and tags of an export from the options of the command or the endpoint,
+# raising ValueError for any that are malformed
+def export_filters(
+    status: str | None = None,
+    common_name: str | None = None,
+    expires_before: str | None = None,
+    expires_after: str | None = None,
+    tags: Iterable[str] = (),
+) -> tuple[dict, Tags | None]:
+    filters: dict = {}
+    if status:
+        filters["status"] = Status(status)
+    if common_name:
+        filters["subject_common_name"] = common_name
+    if expires_before:
+        filters["not_after__lt"] = _datetime(expires_before)
+    if expires_after:
+        filters["not_after__gte"] = _datetime(expires_after)
+    export_tags: Tags = Tags()
+    for tag in tags:
+        key, separator, value = tag.partition("=")
+        if not separator:
+            raise ValueError(f"Tag {tag!r} isn't KEY=VALUE.")
+        export_tags.add_tag(key, value)
+    return filters, export_tags or None
+
+
+# function to read an ISO 8601 date or time, UTC when it doesn't say
+def _datetime(value: str) -> datetime:
+    parsed: datetime = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+@define
+class CertificateExporter:
+    """
+    This class streams the certificate inventory out as a PEM bundle, JSON lines of metadata or a tar of a
+    PEM file per certificate.
+
+    Certificates are read through CertificateStore.iter, or tagged when there are tags, a keyset query of
+    chunk_size rows at a time, and each is written out as it is read. Certificates and chains are written
+    as the PEM or DER they are stored as, converted between the two without being parsed, so an export runs
+    in the memory of one chunk however many certificates it holds.
+
+    :param repo: The store certificates are read from
+    :param chunk_size: The number of certificates read per query
+
+    :Example:
+
+    >>> exporter = CertificateExporterFactory.certificate_exporter()
+    >>> with open("inventory.pem", "wb") as file:
+    ...     file.writelines(exporter.export(ExportFormat.PEM, status=Status.ACTIVE))
+    """
+
+    _repo: CertificateStore
+    chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE
+
+    def export(
+        self,
+        export_format: ExportFormat,
+        tags: Tags | None = None,
+        chain: bool = True,
+        **filters,
+    ) -> Iterator[bytes]:
+        """
+        Stream the certificates with every one of tags and matching filters, in certificate_id order
+
+        The query is checked before this returns, and only read as the result is iterated.
+
+        :param export_format: The format to write
+        :param tags: The tags a certificate must have, any if None
+        :param chain: Whether to write each certificate's chain after it, in the PEM and tar formats
+        :param filters: Filters on the certificates' indexed fields, as for CertificateStore.find
+
+        :return: The export, a piece of up to EXPORT_BUFFER_SIZE bytes at a time
+
+        :raises InvalidQueryError: for a filter the store doesn't allow
+
+        :Example:
+
+        >>> exporter.export(ExportFormat.JSONL, tags=Tags(team="payments"), not_after__lt=cutoff)
+        """
+        certificates: Iterator[Certificate] = (
+            self._repo.tagged(tags, chunk_size=self.chunk_size, **filters)
+            if tags
+            else self._repo.iter(chunk_size=self.chunk_size, **filters)
+        )
+        writer = {
+            ExportFormat.PEM: _pem,
+            ExportFormat.JSONL: _jsonl,
+            ExportFormat.TAR: _tar,
+        }[export_format]
+        return _buffered(writer(certificates, chain))
+
+
+# function joining pieces into ones of at least size bytes
+def _buffered(
+    pieces: Iterable[bytes], size: int = EXPORT_BUFFER_SIZE
+) -> Iterator[bytes]:
+    buffer: list[bytes] = []
+    buffered: int = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield b"".join(buffer)
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+# the writers below take the certificates and whether to include chains, and yield the export a piece at a time.
+# Certificates that haven't been issued yet have no PEM, so only the metadata export has them.
+def _pem(certificates: Iterator[Certificate], chain: bool) -> Iterator[bytes]:
+    for certificate in certificates:
+        if certificate.get_der_safe("certificate") is None:
+            continue
+        yield certificate.certificate_pem
+        if chain and certificate.get_pem_safe("chain"):
+            yield certificate.chain_pem
+
+
+def _jsonl(certificates: Iterator[Certificate], chain: bool) -> Iterator[bytes]:
+    for certificate in certificates:
+        yield json.dumps(_metadata(certificate)).encode() + b"\n"
+
+
+def _tar(certificates: Iterator[Certificate], chain: bool) -> Iterator[bytes]:
+    spool: _Spool = _Spool()
+    with tarfile.open(fileobj=spool, mode="w|") as archive:
+        for certificate in certificates:
+            if certificate.get_der_safe("certificate") is None:
+                continue
+            name: str = f"{TAR_DIRECTORY}/{certificate.certificate_id}"
+            mtime: float = (
+                certificate.not_before.timestamp() if certificate.not_before else 0
+            )
+            _add(archive, f"{name}.pem", certificate.certificate_pem, mtime)
+            if chain and certificate.get_pem_safe("chain"):
+                _add(archive, f"{name}.chain.pem", certificate.chain_pem, mtime)
+            yield spool.take()
+    yield spool.take()
+
+
+def _add(archive: tarfile.TarFile, name: str, data: bytes, mtime: float) -> None:
+    info: tarfile.TarInfo = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    info.mode = 0o644
+    archive.addfile(info, BytesIO(data))
+
+
+def _metadata(certificate: Certificate) -> dict:
+    return {
+        "certificate_id": certificate.certificate_id,
+        "fingerprint": certificate.fingerprint.hex()
+        if certificate.get_der_safe("certificate")
+        else None,
+        "acm_arn": certificate.acm_arn,
+        "private_ca_arn": certificate.private_ca_arn,
+        "issuer_ca_arn": certificate.issuer_ca_arn,
+        "subject": asdict(certificate.subject),
+        "alternate_names": certificate.alternate_names,
+        "not_before": certificate.not_before.isoformat()
+        if certificate.not_before
+        else None,
+        "not_after": certificate.not_after.isoformat()
+        if certificate.not_after
+        else None,
+        "status": certificate.status.value if certificate.status else None,
+        "tags": {
+            tag["Key"]: tag["Value"] for tag in (certificate.tags or Tags()).list()
+        },
+    }
+
+
+class _Spool:
+    """
+    A write only file that hands back what has been written to it since it was last asked, for tarfile's
+    stream mode to write into
+    """
+
+    def __init__(self) -> None:
+        self._written: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._written.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data: bytes = b"".join(self._written)
+        self._written.clear()
+        return data
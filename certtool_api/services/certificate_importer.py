@@ -0,0 +1,261 @@
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timezone
+from itertools import islice
+from logging import Logger
+from typing import Callable
+
+from attrs import define, evolve, field
+from certtool_api.core import Certificate, Status, Tags
+from certtool_api.core.certificate_bundle import BundleItem, read_bundles
+from certtool_api.core.crypto_executor import (
+    CryptoExecutor,
+    ParsedCertificate,
+    try_parse_certificate,
+)
+from certtool_api.core.x509_encoding import CERTIFICATE_LABEL, LazyX509
+
+from .protocols import CertificateStore
+
+DEFAULT_IMPORT_CHUNK_SIZE: int = 500
+# the most issuers followed up from a certificate, so a loop of cross signed CAs can't hold an import
+MAX_CHAIN_LENGTH: int = 10
+
+# an item read from a bundle and the certificate parsed from it, None if it isn't one
+Parsed = tuple[BundleItem, ParsedCertificate | None]
+
+
+@define
+class ImportStats:
+    """
+    Counters for a :class:`CertificateImporter`
+
+    :param read: The number of items read from the bundles
+    :param imported: The number of certificates saved
+    :param duplicates: The number of certificates skipped because they were read before or are already stored
+    :param invalid: The number of items that couldn't be parsed
+    :param skipped: The number of PEM blocks that aren't certificates, like keys and CSRs
+    :param issuers: The number of CA certificates read, which are stored as the chains of others
+    :param unlinked: The number of certificates saved without their whole chain, because an issuer wasn't read
+    :param seconds: The time the import has taken
+    """
+
+    read: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    skipped: int = 0
+    issuers: int = 0
+    unlinked: int = 0
+    seconds: float = 0.0
+
+    # the number of items read per second
+    @property
+    def rate(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+@define
+class CertificateImporter:
+    """
+    This class imports certificates we didn't issue from PEM or DER bundles of any size, and directories of them.
+
+    Bundles are read through a memory map a chunk of chunk_size items at a time, and each chunk is parsed,
+    across the executor's processes when there is one, while the one before it is written. Certificates are
+    deduplicated by fingerprint, against those read before and those already stored, and saved a chunk at a
+    time through CertificateStore.save_many.
+
+    CA certificates aren't imported themselves. They are kept by subject and stored as the chains of the
+    certificates they issued, so a bundle of leaves and their issuers, in any order, imports the leaves with
+    their chains. A leaf whose issuer hasn't been read yet waits for the next chunk before it is saved with
+    what there is of its chain. Issuers and fingerprints are kept across imports, so bundles of issuers can be
+    imported first.
+
+    :param repo: The store certificates are saved to
+    :param log: The logger
+    :param executor: The worker processes certificates are parsed in, this thread if None
+    :param chunk_size: The number of items parsed and saved at a time
+    :param tags: The tags each imported certificate is saved with
+    :param status: The status each imported certificate is saved with
+    :param clock: Returns the time in seconds, to measure throughput with
+
+    :Example:
+
+    >>> from certtool_api.services.service_factory import CertificateImporterFactory
+    >>> with CryptoExecutor() as executor:
+    ...     importer = CertificateImporterFactory.certificate_importer(executor=executor)
+    ...     importer.import_paths(["/srv/certificates/"])
+    ImportStats(read=41233, imported=40870, duplicates=312, invalid=3, skipped=0, issuers=48, unlinked=0, ...)
+    """
+
+    _repo: CertificateStore
+    _log: Logger
+    executor: CryptoExecutor | None = None
+    chunk_size: int = DEFAULT_IMPORT_CHUNK_SIZE
+    tags: Tags | None = None
+    status: Status = Status.ACTIVE
+    clock: Callable[[], float] = time.monotonic
+    # the CA certificates read, by the hex sha256 of their subject name
+    _issuers: dict[str, ParsedCertificate] = field(init=False, factory=dict)
+    # the fingerprint of every certificate read
+    _seen: set[str] = field(init=False, factory=set)
+    _stats: ImportStats = field(init=False, factory=ImportStats)
+
+    def import_paths(
+        self,
+        paths: Iterable[str],
+        progress: Callable[[ImportStats], None] | None = None,
+    ) -> ImportStats:
+        """
+        Import the certificates in the bundles at paths, and in every file under the directories among them
+
+        :param paths: The paths of PEM or DER bundles and of directories of them
+        :param progress: Called with the stats after each chunk is saved
+
+        :return: The stats of the import
+        """
+        return self.import_items(read_bundles(paths), progress=progress)
+
+    def import_items(
+        self,
+        items: Iterable[BundleItem],
+        progress: Callable[[ImportStats], None] | None = None,
+    ) -> ImportStats:
+        """
+        Import the certificates among items, see import_paths
+
+        :param items: The items read from bundles
+        :param progress: Called with the stats after each chunk is saved
+
+        :return: The stats of the import
+        """
+        self._stats = ImportStats()
+        started: float = self.clock()
+        remaining: Iterator[BundleItem] = iter(items)
+        held: list[ParsedCertificate] = []
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="import") as reader:
+            next_chunk: Future = reader.submit(self._parse_chunk, remaining)
+            while (chunk := next_chunk.result()) is not None:
+                # the next chunk is read and parsed while this one is saved
+                next_chunk = reader.submit(self._parse_chunk, remaining)
+                held = self._save(held, self._sort(chunk))
+                self._stats.seconds = self.clock() - started
+                if progress:
+                    progress(self.stats())
+        self._save(held, [], final=True)
+        self._stats.seconds = self.clock() - started
+        self._log.info(
+            "Imported %d certificates from %d items in %.1fs",
+            self._stats.imported,
+            self._stats.read,
+            self._stats.seconds,
+        )
+        return self.stats()
+
+    def stats(self) -> ImportStats:
+        """
+        Return a copy of the counters of the import running or last run
+
+        :return: An :class:`ImportStats`
+        """
+        return evolve(self._stats)
+
+    # method run on the reader thread to read and parse the next chunk of items, None once there are none
+    def _parse_chunk(self, items: Iterator[BundleItem]) -> list[Parsed] | None:
+        chunk: list[BundleItem] = list(islice(items, self.chunk_size))
+        if not chunk:
+            return None
+        blobs: list[bytes] = [
+            item.data for item in chunk if item.label == CERTIFICATE_LABEL
+        ]
+        parsed: Iterator[ParsedCertificate | None] = iter(
+            self.executor.parse_certificates(blobs, skip_invalid=True)
+            if self.executor
+            else [try_parse_certificate(blob) for blob in blobs]
+        )
+        return [
+            (item, next(parsed) if item.label == CERTIFICATE_LABEL else None)
+            for item in chunk
+        ]
+
+    # method to count chunk and keep its issuers, returning the certificates in it to import
+    def _sort(self, chunk: list[Parsed]) -> list[ParsedCertificate]:
+        leaves: list[ParsedCertificate] = []
+        for item, parsed in chunk:
+            self._stats.read += 1
+            if item.label is not None and item.label != CERTIFICATE_LABEL:
+                self._stats.skipped += 1
+            elif parsed is None:
+                self._log.warning("Skipping %s, it isn't a certificate", item)
+                self._stats.invalid += 1
+            elif parsed.fingerprint in self._seen:
+                self._stats.duplicates += 1
+            else:
+                self._seen.add(parsed.fingerprint)
+                if parsed.ca:
+                    self._issuers[parsed.subject_id] = parsed
+                    self._stats.issuers += 1
+                else:
+                    leaves.append(parsed)
+        return leaves
+
+    # method saving held, the leaves of the chunk before, and the leaves whose chain is complete or that are
+    # final, returning the rest to hold for the next chunk
+    def _save(
+        self,
+        held: list[ParsedCertificate],
+        leaves: list[ParsedCertificate],
+        final: bool = False,
+    ) -> list[ParsedCertificate]:
+        ready: list[ParsedCertificate] = list(held)
+        holding: list[ParsedCertificate] = []
+        for leaf in leaves:
+            if final or self._chain(leaf)[1]:
+                ready.append(leaf)
+            else:
+                holding.append(leaf)
+        if not ready:
+            return holding
+        stored: set[str] = self._repo.stored_fingerprints(
+            leaf.fingerprint for leaf in ready
+        )
+        certificates: list[Certificate] = []
+        for leaf in ready:
+            if leaf.fingerprint in stored:
+                self._stats.duplicates += 1
+                continue
+            chain, complete = self._chain(leaf)
+            if not complete:
+                self._stats.unlinked += 1
+            certificates.append(self._entity(leaf, chain))
+        self._repo.save_many(certificates, chunk_size=self.chunk_size)
+        self._stats.imported += len(certificates)
+        return holding
+
+    # method returning the issuers of leaf read so far, from its own up, and whether they reach a self signed root
+    def _chain(self, leaf: ParsedCertificate) -> tuple[list[ParsedCertificate], bool]:
+        chain: list[ParsedCertificate] = []
+        current: ParsedCertificate = leaf
+        while current.issuer_id != current.subject_id:
+            issuer: ParsedCertificate | None = self._issuers.get(current.issuer_id)
+            if issuer is None or len(chain) == MAX_CHAIN_LENGTH:
+                return chain, False
+            chain.append(issuer)
+            current = issuer
+        return chain, True
+
+    def _entity(
+        self, parsed: ParsedCertificate, chain: list[ParsedCertificate]
+    ) -> Certificate:
+        # the DER is kept as it was read, so nothing is parsed again to be stored
+        return Certificate(
+            certificate=LazyX509.certificate(der=parsed.der),
+            chain=[LazyX509.certificate(der=issuer.der) for issuer in chain],
+            subject=parsed.subject,
+            alternate_names=list(parsed.alternate_names),
+            not_before=parsed.not_before.replace(tzinfo=timezone.utc),
+            not_after=parsed.not_after.replace(tzinfo=timezone.utc),
+            tags=self.tags,
+            status=self.status,
+        )
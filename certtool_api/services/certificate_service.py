@@ -1,14 +1,35 @@
+import time
+from datetime import timedelta
 from logging import Logger
 
-from attrs import define
+from attrs import define, field
 from certtool_api.core import Certificate, CertificateError
+from certtool_api.core.issuance import IssuanceInProgressError, issuance_key
+from certtool_api.core.single_flight import SingleFlight
 
-from .protocols import CertificateManager, CertificateSigner, CertificateStore
+from .protocols import (
+    CertificateManager,
+    CertificateSigner,
+    CertificateStore,
+    IssuanceStore,
+)
+
+# how long a certificate issued for a request is handed to identical requests, ACM's idempotency token window
+DEFAULT_COALESCE_WINDOW: timedelta = timedelta(hours=1)
+# how long a process has to issue a request before an identical one may, longer than ACM's validation waiter
+DEFAULT_CLAIM_LEASE: timedelta = timedelta(minutes=45)
+DEFAULT_CLAIM_POLL: float = 5.0
 
 
 @define
 class CertificateService:
-    """ """
+    """
+    Identical requests to sign a certificate, the same issuance_key, are collapsed into one issuance. Within
+    the process by flights, and across processes by issuances when it is set, which records the ARN of each
+    issued certificate and hands it to the identical requests made within coalesce_window. A process issuing
+    a request holds a claim_lease on it, and identical requests poll every claim_poll seconds until it is
+    recorded or the lease runs out. Nothing is saved here, storing the certificate is left to the caller.
+    """
 
     _acm: CertificateManager
 
@@ -18,16 +39,72 @@ class CertificateService:
 
     _log: Logger
 
+    _issuances: IssuanceStore | None = None
+
+    _flights: SingleFlight = field(factory=SingleFlight)
+
+    coalesce_window: timedelta = DEFAULT_COALESCE_WINDOW
+
+    claim_lease: timedelta = DEFAULT_CLAIM_LEASE
+
+    claim_poll: float = DEFAULT_CLAIM_POLL
+
     def sign_certificate(
         self, certificate: Certificate, acm_managed: bool = True
     ) -> Certificate:
         """
         This method is used to sign a certificate with our private CA. It supports creating both ACM managed and non-ACM managed certificates.
 
+        A request identical to one being signed waits for it and is given the same certificate rather than
+        a second one being issued. The certificate isn't saved, the caller stores it.
+
         :param certificate: The certificate to sign
 
         :return: The created certificate
         """
+        request_key: str = issuance_key(certificate, "acm" if acm_managed else "ca")
+        issued: Certificate = self._flights.do(
+            request_key, lambda: self._issue_once(request_key, certificate, acm_managed)
+        )
+        if issued is not certificate:
+            self._log.info("Certificate request coalesced")
+            _adopt(certificate, issued)
+        return certificate
+
+    # method issuing certificate, unless another process has already issued it for request_key
+    def _issue_once(
+        self, request_key: str, certificate: Certificate, acm_managed: bool
+    ) -> Certificate:
+        if self._issuances is None:
+            return self._issue(certificate, acm_managed)
+        while True:
+            try:
+                issued_arn: str | None = self._issuances.claim(
+                    request_key, self.coalesce_window, self.claim_lease
+                )
+                break
+            except IssuanceInProgressError:
+                time.sleep(self.claim_poll)
+        if issued_arn is not None:
+            return self._issued(issued_arn, acm_managed)
+        try:
+            certificate = self._issue(certificate, acm_managed)
+        except Exception:
+            self._issuances.release(request_key)
+            raise
+        self._issuances.record(
+            request_key,
+            certificate.acm_arn if acm_managed else certificate.private_ca_arn,
+        )
+        return certificate
+
+    # method fetching the certificate with issued_arn, with the key ACM generated for it when it is ACM's
+    def _issued(self, issued_arn: str, acm_managed: bool) -> Certificate:
+        if acm_managed:
+            return self._acm.export_certificate(issued_arn)
+        return self._ca.get_certificate(issued_arn)
+
+    def _issue(self, certificate: Certificate, acm_managed: bool) -> Certificate:
         self._log.info("Creating certificate")
         if acm_managed:
             try:
@@ -60,3 +137,18 @@ class CertificateService:
             raise e
         self._log.info("Certificate exported")
         return certificate
+
+
+# function to copy what issuing set on issued, a certificate for the same request, onto certificate
+def _adopt(certificate: Certificate, issued: Certificate) -> None:
+    certificate.certificate_id = issued.certificate_id
+    certificate.acm_arn = issued.acm_arn
+    certificate.private_ca_arn = issued.private_ca_arn
+    certificate.issuer_ca_arn = issued.issuer_ca_arn or certificate.issuer_ca_arn
+    certificate.certificate = issued.certificate
+    certificate.chain = issued.chain
+    certificate.not_before = issued.not_before
+    certificate.not_after = issued.not_after
+    # a CA signed certificate is for the key of our CSR, which is the same for the same request
+    if issued.key is not None:
+        certificate.key = issued.key
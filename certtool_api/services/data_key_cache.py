@@ -0,0 +1,163 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from attrs import define, field
+
+DEFAULT_DATA_KEY_MAX_AGE: float = 300.0  # 5 minutes
+DEFAULT_DATA_KEY_MAX_USES: int = 1000
+DEFAULT_DATA_KEY_MAX_BYTES: int = 64 * 1024 * 1024  # 64 MiB
+DEFAULT_DATA_KEY_MAX_ENTRIES: int = 1024
+
+
+@define
+class CachedDataKey:
+    """
+    A plaintext KMS data key held in memory along with its wrapped (KMS encrypted) form
+
+    :param plaintext: The plaintext data key
+    :param wrapped_key: The data key encrypted under the KMS key
+    :param created_at: The monotonic time the data key was obtained from KMS
+    :param uses: The number of messages encrypted with the data key
+    :param bytes_encrypted: The number of bytes encrypted with the data key
+    """
+
+    plaintext: bytes
+    wrapped_key: bytes
+    created_at: float = field(factory=time.monotonic)
+    uses: int = 0
+    bytes_encrypted: int = 0
+
+
+@define
+class DataKeyCache:
+    """
+    This class caches plaintext KMS data keys in process so envelope encryption doesn't call KMS for every
+    message.
+
+    Data keys used to encrypt are retired once they are max_age seconds old, have encrypted max_uses
+    messages or have encrypted max_bytes bytes, whichever comes first. Unwrapped data keys used to decrypt
+    are retired after max_age seconds. At most max_entries of each are held, least recently used first out.
+
+    :param max_age: The number of seconds a data key may be used for
+    :param max_uses: The number of messages a data key may encrypt
+    :param max_bytes: The number of bytes a data key may encrypt
+    :param max_entries: The number of data keys held for each of encryption and decryption
+    """
+
+    max_age: float = DEFAULT_DATA_KEY_MAX_AGE
+    max_uses: int = DEFAULT_DATA_KEY_MAX_USES
+    max_bytes: int = DEFAULT_DATA_KEY_MAX_BYTES
+    max_entries: int = DEFAULT_DATA_KEY_MAX_ENTRIES
+    _encryption_keys: OrderedDict = field(init=False, factory=OrderedDict)
+    _decryption_keys: OrderedDict = field(init=False, factory=OrderedDict)
+    _lock: Lock = field(init=False, factory=Lock)
+
+    def get_encryption_key(
+        self, key_id: str, context_key: tuple, size: int
+    ) -> CachedDataKey | None:
+        """
+        Return a cached data key that may still encrypt size more bytes, counting this use against it
+
+        :param key_id: The KMS key the data key was generated under
+        :param context_key: The encryption context the data key was generated for, as sorted items
+        :param size: The number of bytes about to be encrypted
+
+        :return: The cached data key, or None if the caller must get a new one from KMS
+        """
+        cache_key: tuple = (key_id, context_key)
+        with self._lock:
+            entry: CachedDataKey | None = self._encryption_keys.get(cache_key)
+            if entry is None:
+                return None
+            if (
+                self._expired(entry)
+                or entry.uses >= self.max_uses
+                or entry.bytes_encrypted + size > self.max_bytes
+            ):
+                del self._encryption_keys[cache_key]
+                return None
+            entry.uses += 1
+            entry.bytes_encrypted += size
+            self._encryption_keys.move_to_end(cache_key)
+            return entry
+
+    def put_encryption_key(
+        self,
+        key_id: str,
+        context_key: tuple,
+        plaintext: bytes,
+        wrapped_key: bytes,
+        size: int,
+    ) -> CachedDataKey:
+        """
+        Cache a data key fresh from KMS that has just been used to encrypt size bytes
+
+        :param key_id: The KMS key the data key was generated under
+        :param context_key: The encryption context the data key was generated for, as sorted items
+        :param plaintext: The plaintext data key
+        :param wrapped_key: The data key encrypted under the KMS key
+        :param size: The number of bytes encrypted with it
+
+        :return: The cached data key
+        """
+        entry: CachedDataKey = CachedDataKey(
+            plaintext=plaintext, wrapped_key=wrapped_key, uses=1, bytes_encrypted=size
+        )
+        with self._lock:
+            self._encryption_keys[(key_id, context_key)] = entry
+            self._trim(self._encryption_keys)
+        # reading back what we just wrote shouldn't need KMS to unwrap our own data key
+        self.put_decryption_key(wrapped_key, context_key, plaintext)
+        return entry
+
+    def get_decryption_key(
+        self, wrapped_key: bytes, context_key: tuple
+    ) -> bytes | None:
+        """
+        Return the plaintext of a wrapped data key if it has been unwrapped recently
+
+        :param wrapped_key: The data key encrypted under the KMS key
+        :param context_key: The encryption context the data key was wrapped under, as sorted items
+
+        :return: The plaintext data key, or None if the caller must ask KMS to decrypt it
+        """
+        cache_key: tuple = (wrapped_key, context_key)
+        with self._lock:
+            entry: CachedDataKey | None = self._decryption_keys.get(cache_key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                del self._decryption_keys[cache_key]
+                return None
+            entry.uses += 1
+            self._decryption_keys.move_to_end(cache_key)
+            return entry.plaintext
+
+    def put_decryption_key(
+        self, wrapped_key: bytes, context_key: tuple, plaintext: bytes
+    ) -> None:
+        """
+        Cache the plaintext of a data key KMS has just unwrapped
+
+        :param wrapped_key: The data key encrypted under the KMS key
+        :param context_key: The encryption context the data key was wrapped under, as sorted items
+        :param plaintext: The plaintext data key
+        """
+        with self._lock:
+            self._decryption_keys[(wrapped_key, context_key)] = CachedDataKey(
+                plaintext=plaintext, wrapped_key=wrapped_key
+            )
+            self._trim(self._decryption_keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._encryption_keys.clear()
+            self._decryption_keys.clear()
+
+    def _expired(self, entry: CachedDataKey) -> bool:
+        return time.monotonic() - entry.created_at >= self.max_age
+
+    def _trim(self, entries: OrderedDict) -> None:
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
@@ -1,14 +1,59 @@
-from typing import TYPE_CHECKING
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, TypeVar
 
-import boto3
 from attrs import define
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 if TYPE_CHECKING:
     from mypy_boto3_kms import KMSClient
 
-from certtool_api.core import CertToolError
+from certtool_api.aws import clients
+from certtool_api.aws.throttling import TokenBucket
+from certtool_api.core import CertToolError, PrivateKey
+
+from .data_key_cache import DataKeyCache
 
 DEFAULT_KMS_KEY_ALIAS: str = "alias/certtool-private-keys"
+DATA_KEY_SPEC: str = "AES_256"
+GCM_NONCE_SIZE: int = 12
+DEFAULT_BATCH_WORKERS: int = 8
+
+ItemType = TypeVar("ItemType")
+ResultType = TypeVar("ResultType")
+
+
+@define
+class EnvelopeCiphertext:
+    """
+    Data encrypted locally under a KMS data key
+
+    :param wrapped_key: The data key, encrypted under the KMS key
+    :param ciphertext: The AES-GCM nonce followed by the encrypted data and its tag
+    """
+
+    wrapped_key: bytes
+    ciphertext: bytes
+
+
+@define
+class KMSBatchResult:
+    """
+    The outcome of one item in a batch call. Exactly one of value and error is set.
+
+    :param value: The result for the item
+    :param error: The exception raised for the item
+    """
+
+    value: bytes | PrivateKey | None = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 
 @define
@@ -18,6 +63,11 @@ class KMSService:
 
     :param key_id: The id of the key to use
     :param profile_name: The name of the AWS profile to use
+    :param envelope: Encrypt private keys locally under a data key from GenerateDataKey rather than sending them to KMS
+    :param data_key_cache: Where to keep plaintext data keys between envelope calls, every call goes to KMS if None
+    :param batch_workers: The number of concurrent KMS calls the batch methods make
+    :param rate_limiter: Taken from before every request the batch methods make to KMS, to stay under the account
+        quota. Data keys from data_key_cache take nothing
 
     :Example:
 
@@ -29,17 +79,25 @@ class KMSService:
     key_id: str = DEFAULT_KMS_KEY_ALIAS
     profile_name: str | None = None
     encryption_context: dict[str, str] | None = None
+    envelope: bool = False
+    data_key_cache: DataKeyCache | None = None
+    batch_workers: int = DEFAULT_BATCH_WORKERS
+    rate_limiter: TokenBucket | None = None
     _endpoint_url: str | None = None
+    _region_name: str | None = None
 
     @property
     def _client(self) -> "KMSClient":
         """
-        This method is used to get a KMS client
+        This method is used to get a KMS client. Clients come from the shared registry, so this is cheap to call.
 
         :return: The KMS client
         """
-        return boto3.session.Session(profile_name=self.profile_name).client(
-            "kms", endpoint_url=self._endpoint_url
+        return clients.client(
+            "kms",
+            profile_name=self.profile_name,
+            region_name=self._region_name,
+            endpoint_url=self._endpoint_url,
         )
 
     def encrypt(
@@ -61,7 +119,7 @@ class KMSService:
         }
         if encryption_context:
             params["EncryptionContext"] = encryption_context
-        resp: dict = self._client.encrypt(**params)
+        resp: dict = self._request(self._client.encrypt, **params)
         return resp["CiphertextBlob"]
 
     def decrypt(
@@ -80,12 +138,265 @@ class KMSService:
         params: dict[str, str | bytes | dict] = {"CiphertextBlob": data}
         if encryption_context:
             params["EncryptionContext"] = encryption_context
+        client: "KMSClient" = self._client
         try:
-            resp: dict = self._client.decrypt(**params)
-        except self._client.exceptions.InvalidCiphertextException:
+            resp: dict = self._request(client.decrypt, **params)
+        except client.exceptions.InvalidCiphertextException:
             raise KMSServiceError("Invalid ciphertext")
         return resp["Plaintext"]
 
+    def generate_data_key(
+        self, encryption_context: dict[str, str] | None = None
+    ) -> tuple[bytes, bytes]:
+        """
+        This method is used to get a new AES-256 data key from KMS
+
+        :param encryption_context: The encryption context to use
+
+        :return: The plaintext data key and the data key encrypted under self.key_id
+        """
+        if not encryption_context:
+            encryption_context = self.encryption_context
+        params: dict[str, str | dict] = {
+            "KeyId": self.key_id,
+            "KeySpec": DATA_KEY_SPEC,
+        }
+        if encryption_context:
+            params["EncryptionContext"] = encryption_context
+        resp: dict = self._request(self._client.generate_data_key, **params)
+        return resp["Plaintext"], resp["CiphertextBlob"]
+
+    def encrypt_envelope(
+        self, data: bytes, encryption_context: dict[str, str] | None = None
+    ) -> EnvelopeCiphertext:
+        """
+        This method is used to encrypt data locally with AES-GCM under a KMS data key. The data key is reused
+        from self.data_key_cache while the cache's limits allow it.
+
+        :param data: The data to encrypt
+        :param encryption_context: The encryption context to use, also bound to the ciphertext as associated data
+
+        :return: The encrypted data and the wrapped data key needed to decrypt it
+        """
+        if not encryption_context:
+            encryption_context = self.encryption_context
+        context_key: tuple = _context_key(encryption_context)
+        plaintext_key: bytes
+        wrapped_key: bytes
+        cached = (
+            self.data_key_cache.get_encryption_key(self.key_id, context_key, len(data))
+            if self.data_key_cache
+            else None
+        )
+        if cached:
+            plaintext_key, wrapped_key = cached.plaintext, cached.wrapped_key
+        else:
+            plaintext_key, wrapped_key = self.generate_data_key(encryption_context)
+            if self.data_key_cache:
+                self.data_key_cache.put_encryption_key(
+                    self.key_id, context_key, plaintext_key, wrapped_key, len(data)
+                )
+        nonce: bytes = os.urandom(GCM_NONCE_SIZE)
+        ciphertext: bytes = AESGCM(plaintext_key).encrypt(
+            nonce, data, _associated_data(encryption_context)
+        )
+        return EnvelopeCiphertext(
+            wrapped_key=wrapped_key, ciphertext=nonce + ciphertext
+        )
+
+    def decrypt_envelope(
+        self,
+        envelope: EnvelopeCiphertext,
+        encryption_context: dict[str, str] | None = None,
+    ) -> bytes:
+        """
+        This method is used to decrypt data encrypted by :meth:`encrypt_envelope`. KMS is only asked to unwrap
+        the data key if it isn't in self.data_key_cache.
+
+        :param envelope: The encrypted data and wrapped data key
+        :param encryption_context: The encryption context to use
+
+        :return: The decrypted data
+        """
+        if not encryption_context:
+            encryption_context = self.encryption_context
+        context_key: tuple = _context_key(encryption_context)
+        plaintext_key: bytes | None = (
+            self.data_key_cache.get_decryption_key(envelope.wrapped_key, context_key)
+            if self.data_key_cache
+            else None
+        )
+        if plaintext_key is None:
+            plaintext_key = self.decrypt(envelope.wrapped_key, encryption_context)
+            if self.data_key_cache:
+                self.data_key_cache.put_decryption_key(
+                    envelope.wrapped_key, context_key, plaintext_key
+                )
+        nonce: bytes = envelope.ciphertext[:GCM_NONCE_SIZE]
+        try:
+            return AESGCM(plaintext_key).decrypt(
+                nonce,
+                envelope.ciphertext[GCM_NONCE_SIZE:],
+                _associated_data(encryption_context),
+            )
+        except InvalidTag:
+            raise KMSServiceError("Invalid ciphertext")
+
+    def encrypt_private_key(
+        self, key: PrivateKey, encryption_context: dict[str, str] | None = None
+    ) -> PrivateKey:
+        """
+        This method is used to encrypt a PrivateKey for storage, directly with KMS or in envelope mode
+        depending on self.envelope. The result is set on the key's kms fields.
+
+        :param key: The key to encrypt
+        :param encryption_context: The encryption context to use
+
+        :return: The key
+        """
+        if not encryption_context:
+            encryption_context = self.encryption_context
+        der: bytes = key.get_key_der()
+        if self.envelope:
+            envelope: EnvelopeCiphertext = self.encrypt_envelope(
+                der, encryption_context
+            )
+            key.set_kms_encrypted_key(
+                envelope.ciphertext, encryption_context, envelope.wrapped_key
+            )
+        else:
+            key.set_kms_encrypted_key(
+                self.encrypt(der, encryption_context), encryption_context
+            )
+        return key
+
+    def decrypt_private_key(self, key: PrivateKey) -> PrivateKey:
+        """
+        This method is used to load key.key from the key's kms fields, whichever mode they were written in
+
+        :param key: The key to decrypt
+
+        :return: The key
+        """
+        if not key.kms_encrypted_key:
+            raise KMSServiceError("Private key has no KMS encrypted key")
+        der: bytes
+        if key.kms_wrapped_data_key:
+            der = self.decrypt_envelope(
+                EnvelopeCiphertext(
+                    wrapped_key=key.kms_wrapped_data_key,
+                    ciphertext=key.kms_encrypted_key,
+                ),
+                key.kms_encryption_context,
+            )
+        else:
+            der = self.decrypt(key.kms_encrypted_key, key.kms_encryption_context)
+        key.set_der(der)
+        return key
+
+    def encrypt_many(
+        self, items: list[bytes], encryption_context: dict[str, str] | None = None
+    ) -> list[KMSBatchResult]:
+        """
+        This method is used to encrypt a batch of data concurrently. An item that fails doesn't stop the rest.
+
+        :param items: The data to encrypt
+        :param encryption_context: The encryption context to use for every item
+
+        :return: A result per item, in the same order as items
+        """
+        return self._map(lambda data: self.encrypt(data, encryption_context), items)
+
+    def decrypt_many(
+        self, items: list[bytes], encryption_context: dict[str, str] | None = None
+    ) -> list[KMSBatchResult]:
+        """
+        This method is used to decrypt a batch of data concurrently. An item that fails doesn't stop the rest.
+
+        :param items: The data to decrypt
+        :param encryption_context: The encryption context to use for every item
+
+        :return: A result per item, in the same order as items
+        """
+        return self._map(lambda data: self.decrypt(data, encryption_context), items)
+
+    def decrypt_private_keys(self, keys: list[PrivateKey]) -> list[KMSBatchResult]:
+        """
+        This method is used to decrypt a batch of stored PrivateKeys concurrently, each with its own encryption
+        context and in whichever mode it was written.
+
+        :param keys: The keys to decrypt
+
+        :return: A result per key holding the decrypted PrivateKey, in the same order as keys
+        """
+        return self._map(self.decrypt_private_key, keys)
+
+    # method sending a request to KMS, once rate_limiter allows it when it is made for a batch item
+    def _request(self, send: Callable[..., dict], **params) -> dict:
+        if self.rate_limiter and getattr(_batch_item, "active", False):
+            self.rate_limiter.acquire()
+        return send(**params)
+
+    # run fn over items on the shared batch threads, rate limited, catching each item's error
+    def _map(
+        self, fn: Callable[[ItemType], ResultType], items: list[ItemType]
+    ) -> list[KMSBatchResult]:
+        def _call(item: ItemType) -> KMSBatchResult:
+            _batch_item.active = True
+            try:
+                return KMSBatchResult(value=fn(item))
+            except Exception as e:
+                return KMSBatchResult(error=e)
+            finally:
+                _batch_item.active = False
+
+        if len(items) <= 1:
+            return [_call(item) for item in items]
+        return list(_batch_executor(self.batch_workers).map(_call, items))
+
+
+# set on a thread while it runs a batch item, so the requests it sends are rate limited
+_batch_item: threading.local = threading.local()
+
+_batch_executors: dict[int, ThreadPoolExecutor] = {}
+_batch_executors_lock: threading.Lock = threading.Lock()
+
+
+# function to return the long lived thread pool for a batch size. The threads keep their registry clients between batches.
+def _batch_executor(workers: int) -> ThreadPoolExecutor:
+    executor: ThreadPoolExecutor | None = _batch_executors.get(workers)
+    if executor is None:
+        # made under the lock, so concurrent first batches don't each start a pool
+        with _batch_executors_lock:
+            executor = _batch_executors.get(workers)
+            if executor is None:
+                executor = _batch_executors[workers] = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="kms-batch"
+                )
+    return executor
+
+
+# a forked child inherits the pools but not their threads, and the lock as it was at the fork
+def _reset_batch_executors() -> None:
+    global _batch_executors_lock
+    _batch_executors.clear()
+    _batch_executors_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_batch_executors)
+
+
+# function to turn an encryption context into something hashable for the data key cache
+def _context_key(encryption_context: dict[str, str] | None) -> tuple:
+    return tuple(sorted((encryption_context or {}).items()))
+
+
+# function to bind the encryption context to locally encrypted data the same way KMS does
+def _associated_data(encryption_context: dict[str, str] | None) -> bytes | None:
+    if not encryption_context:
+        return None
+    return json.dumps(encryption_context, sort_keys=True).encode()
+
 
 class KMSServiceError(CertToolError):
     """KMS Service Error"""
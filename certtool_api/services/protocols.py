@@ -1,6 +1,9 @@
-from typing import Protocol
+from __future__ import annotations
 
-from certtool_api.core import Certificate
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Protocol
+
+from certtool_api.core import Certificate, Tags
 
 
 class KeyStore(Protocol):
@@ -15,6 +18,9 @@ class CertificateSigner(Protocol):
     def issue_certificate(self, certificate: Certificate) -> Certificate:
         ...
 
+    def get_certificate(self, certificate_arn: str) -> Certificate:
+        ...
+
 
 class CertificateManager(Protocol):
     def request_certificate(self, certificate: Certificate) -> Certificate:
@@ -34,8 +40,81 @@ class CertificateStore(Protocol):
     def list(self) -> list[Certificate]:
         ...
 
+    # streams every certificate matching filters, cursor resumes after the one it was taken at
+    def iter(
+        self, chunk_size: int = ..., cursor: str | None = None, **filters
+    ) -> Iterator[Certificate]:
+        ...
+
     def delete(self, certificate_ref: str) -> None:
         ...
 
+    # saves certificates with bulk statements, a transaction per chunk
+    def save_many(
+        self, certificates: list[Certificate], chunk_size: int = ...
+    ) -> list[int]:
+        ...
+
+    # the ones of fingerprints, hex SHA-256 of certificate DER, that a stored certificate has
+    def stored_fingerprints(self, fingerprints: Iterable[str]) -> set[str]:
+        ...
+
+    # filters like field=value or field__lookup=value, with order_by and limit, see repositories.FindQuery
     def find(self, **kwargs) -> list[Certificate]:
         ...
+
+    # the active certificates whose alternate names, wildcards included, cover hostname, soonest expiring first
+    def covering(self, hostname: str) -> list[Certificate]:
+        ...
+
+    # streams the certificates with every one of tags matching filters, cursor resumes after the one it was taken at
+    def tagged(
+        self, tags: Tags, chunk_size: int = ..., cursor: str | None = None, **filters
+    ) -> Iterator[Certificate]:
+        ...
+
+    # the next limit active certificates we issued expiring before before, in (not_after, certificate_id) order after after
+    def expiring(
+        self,
+        before: datetime,
+        after: tuple[datetime, int] | None = None,
+        limit: int = ...,
+    ) -> list[Certificate]:
+        ...
+
+    # saves renewal and makes certificate, the one it replaces, inactive
+    def supersede(self, certificate: Certificate, renewal: Certificate) -> None:
+        ...
+
+
+class IssuanceStore(Protocol):
+    # the ARN issued for request_key within window, or None once the caller holds the lease to issue it for lease
+    def claim(
+        self, request_key: str, window: timedelta, lease: timedelta
+    ) -> str | None:
+        ...
+
+    def record(self, request_key: str, certificate_arn: str) -> None:
+        ...
+
+    def release(self, request_key: str) -> None:
+        ...
+
+
+class RenewalCheckpointStore(Protocol):
+    def load(self, name: str) -> tuple[datetime, int] | None:
+        ...
+
+    def store(self, name: str, position: tuple[datetime, int]) -> None:
+        ...
+
+    def clear(self, name: str) -> None:
+        ...
+
+
+class SubordinateStore(Protocol):
+    def current(self, issuer_ca_arn: str) -> Certificate | None:
+        ...
+
+    def save(self, certificate: Certificate) -> Certificate:
+        ...
@@ -0,0 +1,342 @@
+import math
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from logging import Logger
+from threading import Event, Lock
+from typing import Callable
+
+from attrs import define, evolve, field
+from certtool_api.aws.throttling import TokenBucket
+from certtool_api.core import Certificate, Status
+from cryptography.x509 import BasicConstraints, ExtensionNotFound
+
+from .certificate_service import CertificateService
+from .kms_service import KMSService
+from .protocols import CertificateStore, RenewalCheckpointStore
+
+DEFAULT_RENEWAL_WINDOW: timedelta = timedelta(days=30)
+DEFAULT_RENEWAL_WORKERS: int = 4
+DEFAULT_RENEWAL_RATE: float = 5.0
+DEFAULT_BUCKET_SECONDS: float = 3600.0  # 1 hour
+DEFAULT_LOAD_SIZE: int = 500
+DEFAULT_RENEWAL_INTERVAL: float = 300.0  # 5 minutes
+DEFAULT_SCHEDULER_NAME: str = "default"
+
+# (not_after, certificate_id), a position in the order certificates are renewed in
+Position = tuple[datetime, int]
+
+
+# function returning the position of certificate in the order certificates are renewed in
+def _position(certificate: Certificate) -> Position:
+    return certificate.not_after, certificate.certificate_id
+
+
+# function returning whether certificate is a CA's, like the subordinates LocalCertificateAuthority rotates
+# itself, which a renewal would replace with a leaf
+def _is_ca(certificate: Certificate) -> bool:
+    if certificate.certificate is None:
+        return False
+    try:
+        return certificate.certificate.extensions.get_extension_for_class(
+            BasicConstraints
+        ).value.ca
+    except ExtensionNotFound:
+        return False
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# function building the request for the certificate to replace certificate, for the same subject, names, tags and issuer
+def renewal_request(certificate: Certificate) -> Certificate:
+    renewal: Certificate = Certificate(
+        issuer_ca_arn=certificate.issuer_ca_arn,
+        alternate_names=list(certificate.alternate_names),
+        subject=evolve(certificate.subject),
+        tags=certificate.tags,
+        status=Status.ACTIVE,
+    )
+    # ACM generates the key of the certificates it manages, the private CA signs a CSR of ours
+    if certificate.acm_arn is None:
+        renewal.generate_key().generate_csr()
+    return renewal
+
+
+@define
+class RenewalStats:
+    """
+    Counters and gauges for a :class:`RenewalScheduler`
+
+    :param queued: The queue depth, the due certificates loaded that haven't been renewed yet
+    :param renewed: The number of certificates renewed
+    :param failed: The number of renewals that raised
+    :param lag: The number of seconds the oldest queued certificate has been due for, 0 if none are queued
+    :param max_lag: The most seconds any renewal was made after it was due
+    :param checkpoint: The last checkpoint stored, the position every certificate before which had been renewed
+        in its pass, None before the first
+    """
+
+    queued: int = 0
+    renewed: int = 0
+    failed: int = 0
+    lag: float = 0.0
+    max_lag: float = 0.0
+    checkpoint: Position | None = None
+
+
+@define
+class RenewalQueue:
+    """
+    This class queues certificates in buckets of bucket_seconds by the time they are due for renewal,
+    window before they expire. Buckets are taken whole, earliest first.
+
+    :param window: How long before they expire certificates are due
+    :param bucket_seconds: The span of due times each bucket holds
+    """
+
+    window: timedelta = DEFAULT_RENEWAL_WINDOW
+    bucket_seconds: float = DEFAULT_BUCKET_SECONDS
+    _buckets: dict[int, list[Certificate]] = field(init=False, factory=dict)
+
+    # method returning the time certificate is due for renewal
+    def due(self, certificate: Certificate) -> datetime:
+        return certificate.not_after - self.window
+
+    def push(self, certificates: list[Certificate]) -> None:
+        for certificate in certificates:
+            bucket: int = math.floor(
+                self.due(certificate).timestamp() / self.bucket_seconds
+            )
+            self._buckets.setdefault(bucket, []).append(certificate)
+
+    # method removing and returning the earliest bucket, in renewal order, an empty list if there are none
+    def pop(self) -> list[Certificate]:
+        if not self._buckets:
+            return []
+        return sorted(self._buckets.pop(min(self._buckets)), key=_position)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+
+@define
+class RenewalScheduler:
+    """
+    This class renews the active leaf certificates we issued as they come within window of expiring.
+    Certificates imported from elsewhere are left to whoever issued them, and CA certificates, like the
+    subordinates of LocalCertificateAuthority, to what rotates them.
+
+    Each pass reads the certificates that are due from the (status, not_after) index, load_size at a time
+    in (not_after, certificate_id) order, into a :class:`RenewalQueue`. Each bucket of the queue is renewed
+    across workers threads through CertificateService.sign_certificate, with the calls to each issuing CA
+    held to rate per second. A renewal is saved and the certificate it replaces made INACTIVE together, so
+    a renewed certificate is never due again. A renewal signed by the private CA is for a key generated here,
+    which is encrypted by kms and saved with it.
+
+    After each bucket the scheduler stores a checkpoint, the position every certificate before which has been
+    renewed, and a pass that was stopped or interrupted is carried on from there, in this process or after a
+    restart. A pass that gets to the end clears the checkpoint, so the next starts from the beginning and finds
+    the certificates saved since with an earlier position, like short lived, imported or reactivated ones.
+    Renewed certificates are INACTIVE, so the index skips them rather than them being read again. A renewal
+    that fails holds the checkpoint where it is, so the certificate is retried by the next pass.
+
+    :param service: The service renewals are signed by
+    :param repo: The store certificates are read from and renewals saved to
+    :param checkpoints: The store the checkpoint is kept in
+    :param log: The logger
+    :param kms: The service the keys of renewals signed by the private CA are encrypted with
+    :param name: The name the checkpoint is stored under, schedulers with different names keep their own
+    :param window: How long before they expire certificates are renewed
+    :param workers: The number of renewals made at once
+    :param rate: The most renewals per second from each issuing CA, unlimited if None
+    :param bucket_seconds: The span of due times renewed as one batch
+    :param load_size: The number of certificates read per query
+    :param clock: Returns the current time
+
+    :Example:
+
+    >>> from certtool_api.services.service_factory import RenewalSchedulerFactory
+    >>> scheduler = RenewalSchedulerFactory.renewal_scheduler()
+    >>> scheduler.run_once()
+    RenewalStats(queued=0, renewed=12, failed=0, lag=0.0, max_lag=41.2, checkpoint=(...))
+    """
+
+    _service: CertificateService
+    _repo: CertificateStore
+    _checkpoints: RenewalCheckpointStore
+    _log: Logger
+    _kms: KMSService
+    name: str = DEFAULT_SCHEDULER_NAME
+    window: timedelta = DEFAULT_RENEWAL_WINDOW
+    workers: int = DEFAULT_RENEWAL_WORKERS
+    rate: float | None = DEFAULT_RENEWAL_RATE
+    bucket_seconds: float = DEFAULT_BUCKET_SECONDS
+    load_size: int = DEFAULT_LOAD_SIZE
+    clock: Callable[[], datetime] = _now
+    _queue: RenewalQueue = field(init=False)
+    _limiters: dict[str | None, TokenBucket] = field(init=False, factory=dict)
+    # the due time of each certificate loaded and not yet renewed, by certificate_id
+    _pending: dict[int, datetime] = field(init=False, factory=dict)
+    _stats: RenewalStats = field(init=False, factory=RenewalStats)
+    _lock: Lock = field(init=False, factory=Lock)
+    _stopping: Event = field(init=False, factory=Event)
+
+    def __attrs_post_init__(self) -> None:
+        self._queue = RenewalQueue(
+            window=self.window, bucket_seconds=self.bucket_seconds
+        )
+
+    def run(self, interval: float = DEFAULT_RENEWAL_INTERVAL) -> None:
+        """
+        Make a pass every interval seconds until stop() is called
+
+        :param interval: The number of seconds between the end of one pass and the start of the next
+        """
+        self._stopping.clear()
+        while not self._stopping.is_set():
+            stats: RenewalStats = self.run_once()
+            self._log.info(
+                "Renewal pass done, %d renewed and %d failed so far, checkpoint %s",
+                stats.renewed,
+                stats.failed,
+                stats.checkpoint,
+            )
+            self._stopping.wait(interval)
+
+    def stop(self) -> None:
+        """
+        Stop after the bucket being renewed, from any thread
+        """
+        self._stopping.set()
+
+    def run_once(self) -> RenewalStats:
+        """
+        Renew every certificate that is due, from the checkpoint on, and clear the checkpoint unless stopped
+
+        :return: The stats as of the end of the pass
+        """
+        before: datetime = self.clock() + self.window
+        checkpoint: Position | None = self._checkpoints.load(self.name)
+        after: Position | None = checkpoint
+        held: bool = False
+        with self._lock:
+            self._stats.checkpoint = checkpoint
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="renewal"
+        ) as executor:
+            while not self._stopping.is_set():
+                page: list[Certificate] = self._repo.expiring(
+                    before, after=after, limit=self.load_size
+                )
+                if not page:
+                    break
+                after = _position(page[-1])
+                self._enqueue([c for c in page if not _is_ca(c)])
+                while not self._stopping.is_set() and (bucket := self._queue.pop()):
+                    for certificate, renewed in zip(
+                        bucket, self._renew_bucket(executor, bucket)
+                    ):
+                        held = held or not renewed
+                        if not held:
+                            checkpoint = _position(certificate)
+                    if checkpoint is not None and not held:
+                        self._checkpoints.store(self.name, checkpoint)
+                        with self._lock:
+                            self._stats.checkpoint = checkpoint
+                if len(page) < self.load_size:
+                    break
+        # certificates left queued by stop() are past the checkpoint, the next pass loads them again
+        self._queue.clear()
+        if not self._stopping.is_set():
+            self._checkpoints.clear(self.name)
+        with self._lock:
+            self._pending.clear()
+        return self.stats()
+
+    def stats(self) -> RenewalStats:
+        """
+        Return a copy of the scheduler's counters and gauges, from any thread
+
+        :return: A :class:`RenewalStats`
+        """
+        with self._lock:
+            oldest: datetime | None = min(self._pending.values(), default=None)
+            return evolve(
+                self._stats,
+                queued=len(self._pending),
+                lag=max(0.0, (self.clock() - oldest).total_seconds())
+                if oldest
+                else 0.0,
+            )
+
+    # method to queue certificates and count them as pending
+    def _enqueue(self, certificates: list[Certificate]) -> None:
+        self._queue.push(certificates)
+        with self._lock:
+            for certificate in certificates:
+                self._pending[certificate.certificate_id] = self._queue.due(certificate)
+
+    # method renewing bucket across the executor, returning whether each certificate was renewed
+    def _renew_bucket(
+        self, executor: ThreadPoolExecutor, bucket: list[Certificate]
+    ) -> list[bool]:
+        futures: list[Future] = [
+            executor.submit(self._sign, certificate) for certificate in bucket
+        ]
+        # saved on this thread, each in one transaction with the certificate it replaces. The workers only issue.
+        return [
+            self._save(certificate, future)
+            for certificate, future in zip(bucket, futures)
+        ]
+
+    # method run on the workers to sign the renewal of certificate, once its CA's rate limit allows
+    def _sign(self, certificate: Certificate) -> Certificate:
+        limiter: TokenBucket | None = self._limiter(certificate.issuer_ca_arn)
+        if limiter:
+            limiter.acquire()
+        renewal: Certificate = self._service.sign_certificate(
+            renewal_request(certificate),
+            acm_managed=certificate.acm_arn is not None,
+        )
+        if renewal.not_after is None:
+            renewal.attrs_from_x509_certificate()
+        # the key of a CA signed renewal is only ours, so it is useless unless it is stored with it
+        if certificate.acm_arn is None:
+            self._kms.encrypt_private_key(renewal.key)
+        return renewal
+
+    # method saving the renewal future made for certificate, returning whether it was renewed
+    def _save(self, certificate: Certificate, future: Future) -> bool:
+        try:
+            self._repo.supersede(certificate, future.result())
+        # one certificate that can't be renewed mustn't stop the others, it is retried on the next pass
+        except Exception as e:
+            self._log.error(
+                "Error renewing certificate %s: %s", certificate.certificate_id, e
+            )
+            with self._lock:
+                self._stats.failed += 1
+                self._pending.pop(certificate.certificate_id, None)
+            return False
+        with self._lock:
+            due: datetime | None = self._pending.pop(certificate.certificate_id, None)
+            self._stats.renewed += 1
+            if due is not None:
+                self._stats.max_lag = max(
+                    self._stats.max_lag, (self.clock() - due).total_seconds()
+                )
+        return True
+
+    # method returning the rate limiter of the CA with issuer_ca_arn, made the first time it is asked for
+    def _limiter(self, issuer_ca_arn: str | None) -> TokenBucket | None:
+        if self.rate is None:
+            return None
+        with self._lock:
+            limiter: TokenBucket | None = self._limiters.get(issuer_ca_arn)
+            if limiter is None:
+                limiter = self._limiters[issuer_ca_arn] = TokenBucket(rate=self.rate)
+            return limiter
@@ -1,3 +1,20 @@
+from datetime import timedelta
+from logging import getLogger
+
+from certtool_api.aws.throttling import TokenBucket
+from certtool_api.core.single_flight import SingleFlight
+from certtool_api.repositories import RepoFactory
+from certtool_api.repositories.aws.certificate_authority import AWSCertificateAuthority
+from certtool_api.repositories.aws.certificate_manager import AWSCertificateManager
+from django.conf import settings
+
+from .certificate_exporter import CertificateExporter
+from .certificate_importer import CertificateImporter
+from .certificate_service import CertificateService
+from .data_key_cache import DataKeyCache
+from .kms_service import KMSService
+from .renewal_scheduler import RenewalScheduler
+
 # from logging import getLogger
 
 # from certtool_api.core import Certificate
@@ -37,3 +54,111 @@ class CookieMonsterServiceFactory:
 #        return CookieMonsterService(
 #            monster=monster, repository=repository, log=DEFAULT_SERVICE_LOGGER
 #        )
+
+
+class KMSServiceFactory:
+    """Builds KMSServices from settings. Every service built here shares one DataKeyCache, so data keys
+    are reused across requests in the same process."""
+
+    _data_key_cache: DataKeyCache | None = None
+    _rate_limiter: TokenBucket | None = None
+
+    @classmethod
+    def data_key_cache(cls) -> DataKeyCache:
+        if cls._data_key_cache is None:
+            cls._data_key_cache = DataKeyCache(
+                max_age=settings.KMS_DATA_KEY_MAX_AGE_SECONDS,
+                max_uses=settings.KMS_DATA_KEY_MAX_USES,
+                max_bytes=settings.KMS_DATA_KEY_MAX_BYTES,
+            )
+        return cls._data_key_cache
+
+    @classmethod
+    def rate_limiter(cls) -> TokenBucket:
+        if cls._rate_limiter is None:
+            cls._rate_limiter = TokenBucket(rate=settings.KMS_BATCH_RATE_LIMIT)
+        return cls._rate_limiter
+
+    @classmethod
+    def kms_service(
+        cls, encryption_context: dict[str, str] | None = None
+    ) -> KMSService:
+        return KMSService(
+            key_id=settings.KMS_KEY_ID,
+            encryption_context=encryption_context,
+            envelope=settings.KMS_ENVELOPE_ENCRYPTION,
+            data_key_cache=cls.data_key_cache(),
+            batch_workers=settings.KMS_BATCH_WORKERS,
+            rate_limiter=cls.rate_limiter(),
+        )
+
+
+class CertificateServiceFactory:
+    """Builds CertificateServices from settings, signing with the private CA at settings.PRIVATE_CA_ARN either
+    directly or through ACM. Every service built here shares one SingleFlight, so identical requests in the
+    same process are issued once, and records what it issues so other processes do the same.
+    """
+
+    _flights: SingleFlight | None = None
+
+    @classmethod
+    def flights(cls) -> SingleFlight:
+        if cls._flights is None:
+            cls._flights = SingleFlight()
+        return cls._flights
+
+    @classmethod
+    def certificate_service(cls) -> CertificateService:
+        ca: AWSCertificateAuthority = AWSCertificateAuthority(
+            arn=settings.PRIVATE_CA_ARN
+        )
+        return CertificateService(
+            acm=AWSCertificateManager(private_ca=ca),
+            ca=ca,
+            repo=RepoFactory.certificate(),
+            log=getLogger("certtool_api.services.certificate_service"),
+            issuances=RepoFactory.issuance(),
+            flights=cls.flights(),
+        )
+
+
+class RenewalSchedulerFactory:
+    """Builds RenewalSchedulers from settings, see ./manage.py renew_certificates"""
+
+    @staticmethod
+    def renewal_scheduler(name: str = "default", **overrides) -> RenewalScheduler:
+        options: dict = {
+            "window": timedelta(days=settings.RENEWAL_WINDOW_DAYS),
+            "workers": settings.RENEWAL_WORKERS,
+            "rate": settings.RENEWAL_RATE_LIMIT or None,
+            "bucket_seconds": settings.RENEWAL_BUCKET_SECONDS,
+        }
+        return RenewalScheduler(
+            service=CertificateServiceFactory.certificate_service(),
+            repo=RepoFactory.certificate(),
+            checkpoints=RepoFactory.renewal_checkpoint(),
+            log=getLogger("certtool_api.services.renewal_scheduler"),
+            kms=KMSServiceFactory.kms_service(),
+            name=name,
+            **(options | overrides),
+        )
+
+
+class CertificateImporterFactory:
+    """Builds CertificateImporters, see ./manage.py import_certificates"""
+
+    @staticmethod
+    def certificate_importer(**options) -> CertificateImporter:
+        return CertificateImporter(
+            repo=RepoFactory.certificate(),
+            log=getLogger("certtool_api.services.certificate_importer"),
+            **options,
+        )
+
+
+class CertificateExporterFactory:
+    """Builds CertificateExporters, see ./manage.py export_certificates and the certificates/export/ endpoint"""
+
+    @staticmethod
+    def certificate_exporter(**options) -> CertificateExporter:
+        return CertificateExporter(repo=RepoFactory.certificate(), **options)
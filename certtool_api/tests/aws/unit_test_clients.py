@@ -0,0 +1,58 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+from certtool_api.aws import ClientRegistry
+
+REGION = "us-east-1"
+
+
+class ClientRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.registry = ClientRegistry(max_pool_connections=25)
+
+    def test_same_thread_reuses_client(self):
+        client = self.registry.client("kms", region_name=REGION)
+        self.assertIs(client, self.registry.client("kms", region_name=REGION))
+
+    def test_key_includes_service_region_and_endpoint(self):
+        client = self.registry.client("kms", region_name=REGION)
+        self.assertIsNot(client, self.registry.client("acm", region_name=REGION))
+        self.assertIsNot(client, self.registry.client("kms", region_name="us-west-2"))
+        self.assertIsNot(
+            client,
+            self.registry.client(
+                "kms", region_name=REGION, endpoint_url="http://localhost:4566"
+            ),
+        )
+
+    def test_threads_get_their_own_clients(self):
+        main_client = self.registry.client("kms", region_name=REGION)
+        thread_clients = []
+        thread = threading.Thread(
+            target=lambda: thread_clients.append(
+                self.registry.client("kms", region_name=REGION)
+            )
+        )
+        thread.start()
+        thread.join()
+        self.assertIsNot(main_client, thread_clients[0])
+
+    def test_max_pool_connections_is_applied(self):
+        client = self.registry.client("kms", region_name=REGION)
+        self.assertEqual(client.meta.config.max_pool_connections, 25)
+
+    def test_reset_drops_clients(self):
+        client = self.registry.client("kms", region_name=REGION)
+        self.registry.reset()
+        self.assertIsNot(client, self.registry.client("kms", region_name=REGION))
+
+    def test_clients_are_dropped_after_fork(self):
+        client = self.registry.client("kms", region_name=REGION)
+        with mock.patch("os.getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(client, self.registry.client("kms", region_name=REGION))
+
+
+if __name__ == "__main__":
+    unittest.main()
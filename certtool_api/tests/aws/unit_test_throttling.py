@@ -0,0 +1,202 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from certtool_api.aws import ClientRegistry
+from certtool_api.aws.throttling import (
+    CallPolicy,
+    CircuitBreaker,
+    CircuitOpenError,
+    SharedTokenBucket,
+    ThrottlingError,
+    TokenBucket,
+)
+from certtool_api.tests.fakes import FakeAWS
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("time.monotonic", return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_starts_full(self):
+        bucket = TokenBucket(rate=1, burst=3)
+        self.assertEqual([bucket.try_acquire() for _ in range(4)][:3], [0.0] * 3)
+
+    def test_reports_wait_when_empty(self):
+        bucket = TokenBucket(rate=2, burst=1)
+        bucket.try_acquire()
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+
+    def test_refills_over_time(self):
+        bucket = TokenBucket(rate=2, burst=1)
+        bucket.try_acquire()
+        self.clock.return_value += 0.5
+        self.assertEqual(bucket.try_acquire(), 0.0)
+
+    def test_acquire_times_out(self):
+        bucket = TokenBucket(rate=0.1, burst=1)
+        bucket.acquire()
+        with self.assertRaises(ThrottlingError):
+            bucket.acquire(timeout=1)
+
+    def test_fractional_rate_holds_a_whole_token(self):
+        bucket = TokenBucket(rate=0.5)
+        self.assertEqual(bucket.burst, 1.0)
+        self.assertEqual(bucket.try_acquire(), 0.0)
+
+    def test_acquire_more_than_burst_fails(self):
+        with self.assertRaises(ThrottlingError):
+            TokenBucket(rate=1, burst=2).acquire(3)
+
+
+class SharedTokenBucketTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "bucket")
+        patcher = mock.patch("time.monotonic", return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_buckets_on_one_path_share_tokens(self):
+        first = SharedTokenBucket(path=self.path, rate=1, burst=2)
+        second = SharedTokenBucket(path=self.path, rate=1, burst=2)
+        self.assertEqual(first.try_acquire(), 0.0)
+        self.assertEqual(second.try_acquire(), 0.0)
+        self.assertAlmostEqual(first.try_acquire(), 1.0)
+        self.clock.return_value += 1
+        self.assertEqual(second.try_acquire(), 0.0)
+
+    def test_forked_child_shares_the_budget(self):
+        bucket = SharedTokenBucket(path=self.path, rate=1, burst=2)
+        bucket.try_acquire()
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if bucket.try_acquire() == 0.0 else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertGreater(bucket.try_acquire(), 0.0)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("time.monotonic", return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_opens_after_failures_in_a_row(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+    def test_lets_one_trial_through_after_the_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+        self.clock.return_value += 10
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        # a failed trial opens it for another timeout
+        breaker.record_failure()
+        self.clock.return_value += 5
+        self.assertFalse(breaker.allow())
+        self.clock.return_value += 5
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+
+
+class CallPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.aws = FakeAWS(seed=1)
+        self.aws.kms.create_key(alias="alias/test")
+
+    def _kms(self, policy: CallPolicy):
+        registry = ClientRegistry(policy=policy)
+        patcher = self.aws.patch_clients(registry)
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+        return registry.client("kms")
+
+    def test_stays_under_the_quota(self):
+        self.aws = FakeAWS(quotas={"kms:Encrypt": 20})
+        self.aws.kms.create_key(alias="alias/test")
+        kms = self._kms(CallPolicy(quotas={"kms": 20}, max_attempts=1))
+        started = time.monotonic()
+        for _ in range(30):
+            kms.encrypt(KeyId="alias/test", Plaintext=b"secret")
+        # a burst of 20 and then 20 a second
+        self.assertGreaterEqual(time.monotonic() - started, 0.4)
+        self.assertEqual(self.aws.throttled["kms:Encrypt"], 0)
+
+    def test_retries_throttled_calls_with_jitter(self):
+        self.aws.throttle_rate = 0.5
+        policy = CallPolicy(quotas={"kms": 100}, base_delay=0.001)
+        kms = self._kms(policy)
+        for _ in range(10):
+            kms.encrypt(KeyId="alias/test", Plaintext=b"secret")
+        self.assertGreater(self.aws.throttled["kms:Encrypt"], 0)
+        # each throttle halved the rate and each success won a little back
+        self.assertLess(policy._limits["kms"].bucket.rate, 100)
+
+    def test_open_circuit_fails_fast(self):
+        self.aws.throttle_rate = 1.0
+        kms = self._kms(
+            CallPolicy(max_attempts=2, base_delay=0.001, failure_threshold=4)
+        )
+        for _ in range(2):
+            with self.assertRaises(ClientError):
+                kms.encrypt(KeyId="alias/test", Plaintext=b"secret")
+        calls = self.aws.calls["kms:Encrypt"]
+        with self.assertRaises(CircuitOpenError):
+            kms.encrypt(KeyId="alias/test", Plaintext=b"secret")
+        self.assertEqual(self.aws.calls["kms:Encrypt"], calls)
+
+    def test_open_circuit_half_opens_under_steady_calls(self):
+        self.aws.throttle_rate = 1.0
+        kms = self._kms(
+            CallPolicy(
+                max_attempts=2,
+                base_delay=0.001,
+                failure_threshold=2,
+                reset_timeout=0.3,
+            )
+        )
+        with self.assertRaises(ClientError):
+            kms.encrypt(KeyId="alias/test", Plaintext=b"secret")
+        self.aws.throttle_rate = 0.0
+        refused = 0
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            try:
+                kms.encrypt(KeyId="alias/test", Plaintext=b"secret")
+                break
+            except CircuitOpenError:
+                refused += 1
+                time.sleep(0.05)
+        else:
+            self.fail("the circuit never let a trial call through")
+        # refused calls neither kept the breaker open nor were retried
+        self.assertGreater(refused, 0)
+        self.assertLess(refused, 10)
+
+    def test_botocore_retries_are_turned_off(self):
+        self.assertEqual(
+            ClientRegistry(policy=CallPolicy())._client_config().retries,
+            {"mode": "standard", "total_max_attempts": 1},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
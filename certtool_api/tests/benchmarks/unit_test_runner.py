@@ -0,0 +1,133 @@
+import tempfile
+import time
+import unittest
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from certtool_api.benchmarks import (
+    Benchmark,
+    BenchmarkHistory,
+    BenchmarkResult,
+    run_benchmark,
+)
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+
+def _result(name: str, seconds: float) -> BenchmarkResult:
+    return BenchmarkResult.from_timings(name, 1, [seconds, seconds * 2])
+
+
+class RunBenchmarkTestCase(unittest.TestCase):
+    def test_run_benchmark(self):
+        calls: list[int] = []
+        setups: list[int] = []
+
+        def _setup():
+            setups.append(1)
+            return lambda: calls.append(1)
+
+        result = run_benchmark(Benchmark(name="noop", setup=_setup, number=5), 4)
+        self.assertEqual(len(setups), 1)
+        # one warm up call, then 4 rounds of 5
+        self.assertEqual(len(calls), 21)
+        self.assertEqual((result.name, result.rounds, result.number), ("noop", 4, 5))
+        self.assertLessEqual(result.min, result.median)
+
+
+class BenchmarkHistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "benchmarks" / "history.json"
+
+    def test_save_and_load(self):
+        history = BenchmarkHistory.load(self.path)
+        history.set_baseline([_result("a", 1.0)])
+        history.record([_result("a", 1.5)])
+        history.save()
+
+        loaded = BenchmarkHistory.load(self.path)
+        self.assertEqual(loaded.baseline, {"a": _result("a", 1.0)})
+        self.assertEqual(len(loaded.runs), 1)
+        self.assertEqual(loaded.runs[0]["results"]["a"]["min"], 1.5)
+
+    def test_record_keeps_max_runs(self):
+        history = BenchmarkHistory(path=self.path, max_runs=2)
+        for seconds in (1.0, 2.0, 3.0):
+            history.record([_result("a", seconds)])
+        self.assertEqual(
+            [run["results"]["a"]["min"] for run in history.runs], [2.0, 3.0]
+        )
+
+    def test_set_baseline_keeps_benchmarks_not_run(self):
+        history = BenchmarkHistory(path=self.path)
+        history.set_baseline([_result("a", 1.0), _result("b", 1.0)])
+        history.set_baseline([_result("a", 2.0)])
+        self.assertEqual(history.baseline["a"].min, 2.0)
+        self.assertEqual(history.baseline["b"].min, 1.0)
+
+    def test_compare(self):
+        history = BenchmarkHistory(path=self.path)
+        history.set_baseline([_result("a", 1.0), _result("b", 1.0), _result("c", 1.0)])
+        comparisons = {
+            comparison.name: comparison
+            for comparison in history.compare(
+                [
+                    _result("a", 1.2),
+                    _result("b", 1.3),
+                    _result("c", 1.9),
+                    _result("new", 5.0),
+                ],
+                threshold=0.25,
+                thresholds={"c": 1.0},
+            )
+        }
+        self.assertEqual(set(comparisons), {"a", "b", "c"})
+        self.assertFalse(comparisons["a"].regressed)
+        self.assertTrue(comparisons["b"].regressed)
+        self.assertAlmostEqual(comparisons["b"].ratio, 1.3)
+        self.assertFalse(comparisons["c"].regressed)
+
+
+class BenchmarkCommandTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.history = Path(directory.name) / "history.json"
+        self.seconds = 0.001
+        self.benchmark = Benchmark(
+            name="sleep", setup=lambda: lambda: self._sleep(), rounds=3
+        )
+        patcher = mock.patch(
+            "certtool_api.management.commands.benchmark.registry", [self.benchmark]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _sleep(self):
+        time.sleep(self.seconds)
+
+    def _call(self, *args):
+        call_command(
+            "benchmark", *args, history=self.history, stdout=StringIO(), threshold=0.5
+        )
+
+    def test_regression_fails(self):
+        self._call("--update-baseline")
+        self._call()
+        self.seconds = 0.005
+        with self.assertRaisesRegex(CommandError, "Regressed: sleep"):
+            self._call()
+        history = BenchmarkHistory.load(self.history)
+        self.assertEqual(len(history.runs), 3)
+        self.assertLess(history.baseline["sleep"].min, 0.005)
+
+    def test_no_match(self):
+        with self.assertRaisesRegex(CommandError, "No benchmarks match"):
+            self._call("nothing")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -304,12 +304,10 @@ class TestCertificate(unittest.TestCase):
         self.assertEqual(certificate.not_before, test_certificate_not_before)
         self.assertEqual(certificate.not_after, test_certificate_not_after)
 
-    # test that the _get_subject_details function works correctly
-    def test_get_subject_details(self):
-        certificate = Certificate()
-        certificate.certificate_pem = test_certificate_pem
+    # test that the Subject.from_x509_name function works correctly
+    def test_subject_from_x509_name(self):
         self.assertEqual(
-            certificate._get_subject_details(test_certificate.subject),
+            Subject.from_x509_name(test_certificate.subject),
             test_certificate_subject_details,
         )
 
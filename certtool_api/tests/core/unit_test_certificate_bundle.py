@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from certtool_api.core.certificate_bundle import read_bundle, read_bundles
+from certtool_api.core.x509_encoding import CERTIFICATE_LABEL
+from cryptography import x509
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.serialization import (
+    Encoding,
+    NoEncryption,
+    PrivateFormat,
+)
+
+
+def _certificate(common_name: str) -> x509.Certificate:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, common_name)])
+    now = datetime.utcnow()
+    return (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, SHA256())
+    )
+
+
+class CertificateBundleTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.certificates = [_certificate(f"host{i}.example.com") for i in range(3)]
+
+    def _write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def test_pem_bundle(self):
+        key = ec.generate_private_key(ec.SECP256R1()).private_bytes(
+            Encoding.PEM, PrivateFormat.PKCS8, NoEncryption()
+        )
+        pems = [c.public_bytes(Encoding.PEM) for c in self.certificates]
+        path = self._write("bundle.pem", pems[0] + key + b"\n" + b"".join(pems[1:]))
+        items = list(read_bundle(path))
+        self.assertEqual(
+            [item.label for item in items],
+            [CERTIFICATE_LABEL, b"PRIVATE KEY", CERTIFICATE_LABEL, CERTIFICATE_LABEL],
+        )
+        self.assertEqual([item.data for item in items if item.index != 1], pems)
+        self.assertEqual(str(items[2]), f"{path}#2")
+
+    def test_text_and_malformed_pem_are_bad_items(self):
+        pems = [c.public_bytes(Encoding.PEM) for c in self.certificates]
+        malformed = pems[1].replace(b"\n", b"\n!", 1)
+        path = self._write(
+            "bundle.pem", b"junk\n" + pems[0] + malformed + pems[2] + b"trailing\n"
+        )
+        items = list(read_bundle(path))
+        self.assertEqual(
+            [item.label for item in items],
+            [None, CERTIFICATE_LABEL, None, CERTIFICATE_LABEL, None],
+        )
+        self.assertEqual([item.index for item in items], [0, 1, 2, 3, 4])
+        self.assertEqual(
+            [item.data for item in items if item.label], [pems[0], pems[2]]
+        )
+
+    def test_concatenated_der(self):
+        ders = [c.public_bytes(Encoding.DER) for c in self.certificates]
+        items = list(read_bundle(self._write("bundle.der", b"".join(ders))))
+        self.assertEqual([item.data for item in items], ders)
+
+    def test_der_after_bytes_that_arent_der_is_one_bad_item(self):
+        der = self.certificates[0].public_bytes(Encoding.DER)
+        items = list(read_bundle(self._write("bundle.der", der + b"\x00junk" + der)))
+        self.assertEqual([item.label for item in items], [CERTIFICATE_LABEL, None])
+        # a truncated certificate can't be split either
+        items = list(read_bundle(self._write("truncated.der", der[:-1])))
+        self.assertEqual([item.label for item in items], [None])
+
+    def test_directories_are_read_in_name_order(self):
+        pems = [c.public_bytes(Encoding.PEM) for c in self.certificates]
+        self._write("b/2.pem", pems[2])
+        self._write("a/1.pem", pems[1])
+        self._write("a/0.crt", pems[0])
+        self._write("empty.pem", b"")
+        self.assertEqual([item.data for item in read_bundles([self.directory])], pems)
+
+
+if __name__ == "__main__":
+    unittest.main()
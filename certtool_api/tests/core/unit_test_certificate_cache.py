@@ -0,0 +1,110 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from certtool_api.core import Certificate
+from certtool_api.core.certificate_cache import (
+    CertificateCache,
+    get_certificate_cache,
+    install_certificate_cache,
+)
+from cryptography.hazmat.primitives.asymmetric.ec import SECP256R1, generate_private_key
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509 import (
+    CertificateBuilder,
+    Name,
+    NameAttribute,
+    NameOID,
+    random_serial_number,
+)
+
+
+def _self_signed(common_name: str):
+    key = generate_private_key(SECP256R1())
+    name = Name([NameAttribute(NameOID.COMMON_NAME, common_name)])
+    now = datetime.now(timezone.utc)
+    return (
+        CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, SHA256())
+    )
+
+
+class CertificateCacheTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.ders = [
+            _self_signed(f"ca{index}.example.com").public_bytes(Encoding.DER)
+            for index in range(3)
+        ]
+
+    def test_load_shares_parsed_certificates(self):
+        cache = CertificateCache(size=4)
+        first = cache.load(self.ders[0])
+        self.assertIs(cache.load(bytes(self.ders[0])), first)
+        self.assertEqual(first.public_bytes(Encoding.DER), self.ders[0])
+        stats = cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.evictions), (1, 1, 0))
+        self.assertEqual(stats.hit_rate, 0.5)
+
+    def test_evicts_least_recently_used(self):
+        cache = CertificateCache(size=2)
+        first = cache.load(self.ders[0])
+        cache.load(self.ders[1])
+        # touching the first makes the second the least recently used
+        cache.load(self.ders[0])
+        cache.load(self.ders[2])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats().evictions, 1)
+        self.assertIs(cache.load(self.ders[0]), first)
+        cache.load(self.ders[1])
+        self.assertEqual(cache.stats().misses, 4)
+
+    def test_clear(self):
+        cache = CertificateCache()
+        cache.load(self.ders[0])
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats().misses, 0)
+
+
+class CertificateChainCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        installed = get_certificate_cache()
+        self.addCleanup(install_certificate_cache, installed)
+        self.cache = CertificateCache()
+        install_certificate_cache(self.cache)
+
+    def test_chains_share_parsed_certificates(self):
+        chain_pem = b"".join(
+            _self_signed(f"ca{index}.example.com").public_bytes(Encoding.PEM)
+            for index in range(2)
+        )
+        certificates = [Certificate() for _ in range(3)]
+        for certificate in certificates:
+            certificate.chain_pem = chain_pem
+        chains = [certificate.chain for certificate in certificates]
+
+        for chain in chains[1:]:
+            for parsed, shared in zip(chain, chains[0]):
+                self.assertIs(parsed, shared)
+        stats = self.cache.stats()
+        self.assertEqual((stats.hits, stats.misses), (4, 2))
+
+    def test_no_cache_installed(self):
+        install_certificate_cache(None)
+        certificate = Certificate()
+        certificate.certificate_pem = _self_signed("leaf.example.com").public_bytes(
+            Encoding.PEM
+        )
+        self.assertIsNotNone(certificate.certificate)
+        self.assertEqual(self.cache.stats().misses, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
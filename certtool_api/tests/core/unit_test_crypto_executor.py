@@ -0,0 +1,129 @@
+import unittest
+
+from certtool_api.core import Certificate, PrivateKey, Subject
+from certtool_api.core.crypto_executor import (
+    CryptoExecutor,
+    CsrRequest,
+    install_crypto_executor,
+)
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from cryptography.x509 import DNSName, ExtensionOID
+
+TEST_KEY_SIZE = 1024
+TEST_SUBJECT = Subject(common_name="test.certtool.internal", organization="test")
+TEST_ALTERNATE_NAMES = ["test.certtool.internal", "alt.certtool.internal"]
+
+
+class CryptoExecutorTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = CryptoExecutor(workers=2, batch_size=2).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def tearDown(self):
+        install_crypto_executor(None)
+
+    def test_generate_keys(self):
+        keys = self.executor.generate_keys(count=3, key_size=TEST_KEY_SIZE)
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(
+            len({key.public_key().public_numbers().n for key in keys}), len(keys)
+        )
+
+    def test_sign_csrs_preserves_order(self):
+        keys = self.executor.generate_keys(count=2, key_size=TEST_KEY_SIZE)
+        subjects = [Subject(common_name=f"host{i}.certtool.internal") for i in (0, 1)]
+        csrs = self.executor.sign_csrs(
+            [CsrRequest(key, subject) for key, subject in zip(keys, subjects)]
+        )
+        for key, subject, csr in zip(keys, subjects, csrs):
+            self.assertTrue(csr.is_signature_valid)
+            self.assertEqual(csr.subject, subject.to_x509_name())
+            self.assertEqual(
+                csr.public_key().public_numbers(), key.public_key().public_numbers()
+            )
+
+    def test_encrypt_key(self):
+        key = self.executor.generate_key(TEST_KEY_SIZE, 65537)
+        pem = self.executor.encrypt_key(key, b"passphrase")
+        self.assertEqual(
+            load_pem_private_key(pem, password=b"passphrase").private_numbers(),
+            key.private_numbers(),
+        )
+
+    def test_parse_certificates_round_trips_der(self):
+        # a CSR isn't a certificate, so use the executor's own output via a self signed cert
+        from datetime import datetime, timedelta
+
+        from cryptography import x509
+        from cryptography.hazmat.primitives.hashes import SHA256
+        from cryptography.hazmat.primitives.serialization import Encoding
+
+        key = self.executor.generate_key(TEST_KEY_SIZE, 65537)
+        name = TEST_SUBJECT.to_x509_name()
+        now = datetime.utcnow().replace(microsecond=0)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now)
+            .not_valid_after(now + timedelta(days=1))
+            .add_extension(
+                x509.SubjectAlternativeName(
+                    [DNSName(name) for name in TEST_ALTERNATE_NAMES]
+                ),
+                critical=False,
+            )
+            .sign(key, SHA256())
+        )
+        pem_parsed, der_parsed = self.executor.parse_certificates(
+            [cert.public_bytes(Encoding.PEM), cert.public_bytes(Encoding.DER)]
+        )
+        self.assertEqual(pem_parsed, der_parsed)
+        self.assertEqual(pem_parsed.der, cert.public_bytes(Encoding.DER))
+        self.assertEqual(pem_parsed.subject, TEST_SUBJECT)
+        # read the same way as a certificate parsed in process, common name included
+        in_process = Certificate(certificate=cert)
+        in_process.attrs_from_x509_certificate()
+        self.assertEqual(in_process.subject, pem_parsed.subject)
+        self.assertEqual(pem_parsed.alternate_names, TEST_ALTERNATE_NAMES)
+        self.assertEqual(pem_parsed.not_after, now + timedelta(days=1))
+        self.assertFalse(pem_parsed.ca)
+        # self signed, so it is its own issuer
+        self.assertEqual(pem_parsed.subject_id, pem_parsed.issuer_id)
+
+        with self.assertRaises(ValueError):
+            self.executor.parse_certificates([b"not a certificate"])
+        self.assertEqual(
+            self.executor.parse_certificates(
+                [b"not a certificate", cert.public_bytes(Encoding.DER)],
+                skip_invalid=True,
+            ),
+            [None, der_parsed],
+        )
+
+    def test_installed_executor_backs_entities(self):
+        install_crypto_executor(self.executor)
+        key = PrivateKey.new(key_size=TEST_KEY_SIZE)
+        certificate = Certificate(key=key, subject=TEST_SUBJECT)
+        certificate.generate_csr(alternate_names=TEST_ALTERNATE_NAMES)
+        self.assertTrue(certificate.csr.is_signature_valid)
+        self.assertEqual(
+            certificate.csr.extensions.get_extension_for_oid(
+                ExtensionOID.SUBJECT_ALTERNATIVE_NAME
+            ).value.get_values_for_type(DNSName),
+            TEST_ALTERNATE_NAMES,
+        )
+        pem = key.get_pem(passphrase=b"passphrase")
+        self.assertEqual(
+            PrivateKey.from_pem(pem, b"passphrase").fingerprint, key.fingerprint
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
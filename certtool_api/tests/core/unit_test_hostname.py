@@ -0,0 +1,35 @@
+import unittest
+
+from certtool_api.core.hostname import (
+    covering_names,
+    normalize_hostname,
+    reversed_name,
+)
+
+
+class HostnameTestCase(unittest.TestCase):
+    def test_normalize_hostname(self):
+        self.assertEqual(normalize_hostname("API.Example.COM."), "api.example.com")
+        self.assertEqual(normalize_hostname("*.Bücher.de"), "*.xn--bcher-kva.de")
+        self.assertEqual(normalize_hostname("xn--bcher-kva.de"), "xn--bcher-kva.de")
+
+    def test_reversed_name(self):
+        self.assertEqual(
+            reversed_name("api.payments.internal"), "internal.payments.api"
+        )
+        self.assertEqual(reversed_name("*.payments.internal"), "internal.payments.*")
+        self.assertEqual(reversed_name("bücher.de"), reversed_name("xn--bcher-kva.de"))
+
+    def test_covering_names(self):
+        self.assertEqual(
+            covering_names("API.payments.internal"),
+            ["internal.payments.api", "internal.payments.*"],
+        )
+        # a wildcard only covers a single label
+        self.assertNotIn("internal.*", covering_names("api.payments.internal"))
+        self.assertEqual(covering_names("*.payments.internal"), ["internal.payments.*"])
+        self.assertEqual(covering_names("localhost"), ["localhost"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from certtool_api.core import Certificate, Subject
+from certtool_api.core.issuance import idempotency_token, issuance_key
+
+
+def _request(*alternate_names: str, common_name: str = "api.example.com"):
+    return Certificate(
+        subject=Subject(common_name=common_name), alternate_names=list(alternate_names)
+    )
+
+
+class IssuanceKeyTestCase(unittest.TestCase):
+    def test_same_request_same_key(self):
+        self.assertEqual(
+            issuance_key(_request("api.example.com", "www.example.com"), "acm"),
+            issuance_key(_request("WWW.example.com.", "api.example.com"), "acm"),
+        )
+
+    def test_different_requests_different_keys(self):
+        key = issuance_key(_request("api.example.com"), "acm")
+        self.assertNotEqual(key, issuance_key(_request("api.example.com"), "ca"))
+        self.assertNotEqual(key, issuance_key(_request("www.example.com"), "acm"))
+        self.assertNotEqual(
+            key,
+            issuance_key(
+                _request("api.example.com", common_name="www.example.com"), "acm"
+            ),
+        )
+
+    def test_csr_is_part_of_the_key(self):
+        first = _request("api.example.com").generate_key().generate_csr()
+        second = _request("api.example.com").generate_key().generate_csr()
+        self.assertNotEqual(issuance_key(first), issuance_key(second))
+        self.assertEqual(issuance_key(first), issuance_key(first))
+
+    def test_idempotency_token(self):
+        key = issuance_key(_request("api.example.com"))
+        self.assertEqual(len(idempotency_token(key)), 32)
+        self.assertEqual(len(idempotency_token(key, length=36)), 36)
+        self.assertEqual(idempotency_token(key), idempotency_token(key))
+
+
+if __name__ == "__main__":
+    unittest.main()
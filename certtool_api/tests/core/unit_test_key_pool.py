@@ -0,0 +1,74 @@
+import unittest
+
+from certtool_api.core import PrivateKey
+from certtool_api.core.key_pool import KeyPool, get_key_pool, install_key_pool
+
+# small keys keep the workers quick, the pool does not care about the size
+TEST_KEY_SIZE = 1024
+TEST_PUBLIC_EXPONENT = 65537
+TEST_SPEC = (TEST_KEY_SIZE, TEST_PUBLIC_EXPONENT)
+
+
+class KeyPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.pool = KeyPool(size=2, workers=1, specs=[TEST_SPEC])
+
+    def tearDown(self):
+        self.pool.stop()
+        install_key_pool(None)
+
+    def test_take_misses_when_not_started(self):
+        self.assertIsNone(self.pool.take(*TEST_SPEC))
+        stats = self.pool.stats()[TEST_SPEC]
+        self.assertEqual(stats.misses, 1)
+        self.assertEqual(stats.hits, 0)
+
+    def test_take_hits_once_filled(self):
+        self.pool.start()
+        self.assertTrue(self.pool.wait(timeout=60))
+        key = self.pool.take(*TEST_SPEC)
+        self.assertIsNotNone(key)
+        self.assertEqual(key.key_size, TEST_KEY_SIZE)
+        stats = self.pool.stats()[TEST_SPEC]
+        self.assertEqual(stats.hits, 1)
+        self.assertGreaterEqual(stats.generated, 2)
+        self.assertGreater(stats.refill_rate, 0)
+
+    def test_keys_are_single_use(self):
+        self.pool.start()
+        self.assertTrue(self.pool.wait(timeout=60))
+        first = self.pool.take(*TEST_SPEC)
+        second = self.pool.take(*TEST_SPEC)
+        self.assertNotEqual(
+            first.public_key().public_numbers(), second.public_key().public_numbers()
+        )
+
+    def test_buffer_is_bounded(self):
+        self.pool.start()
+        self.assertTrue(self.pool.wait(timeout=60))
+        self.assertEqual(self.pool.buffered(*TEST_SPEC), self.pool.size)
+
+    def test_stop_drops_buffered_keys(self):
+        self.pool.start()
+        self.assertTrue(self.pool.wait(timeout=60))
+        self.pool.stop()
+        self.assertEqual(self.pool.buffered(*TEST_SPEC), 0)
+        self.assertIsNone(self.pool.take(*TEST_SPEC))
+
+    def test_private_key_new_draws_from_installed_pool(self):
+        install_key_pool(self.pool.start())
+        self.assertIs(get_key_pool(), self.pool)
+        self.assertTrue(self.pool.wait(timeout=60))
+        key = PrivateKey.new(key_size=TEST_KEY_SIZE)
+        self.assertEqual(key.key.key_size, TEST_KEY_SIZE)
+        self.assertEqual(self.pool.stats()[TEST_SPEC].hits, 1)
+
+    def test_private_key_new_falls_back_when_empty(self):
+        install_key_pool(self.pool)
+        key = PrivateKey.new(key_size=TEST_KEY_SIZE)
+        self.assertEqual(key.key.key_size, TEST_KEY_SIZE)
+        self.assertEqual(self.pool.stats()[TEST_SPEC].misses, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import threading
+import time
+import unittest
+
+from certtool_api.core.single_flight import SingleFlight
+
+
+class SingleFlightTestCase(unittest.TestCase):
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.calls = 0
+        self.release = threading.Event()
+        self.arrived = threading.Semaphore(0)
+
+    def _call(self):
+        self.calls += 1
+        self.release.wait(5)
+        return object()
+
+    def _run(self, key, count):
+        results = [None] * count
+
+        def caller(index):
+            self.arrived.release()
+            results[index] = self.flights.do(key, self._call)
+
+        threads = [threading.Thread(target=caller, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_concurrent_calls_share_one_result(self):
+        threads, results = self._run("key", 8)
+        for _ in threads:
+            self.arrived.acquire()
+        # long enough for the callers that have arrived to join the running call
+        time.sleep(0.05)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertFalse(self.flights.running("key"))
+
+    def test_results_are_not_kept(self):
+        self.release.set()
+        first = self.flights.do("key", self._call)
+        self.assertIsNot(self.flights.do("key", self._call), first)
+        self.assertEqual(self.calls, 2)
+
+    def test_different_keys_run_separately(self):
+        self.release.set()
+        self.flights.do("one", self._call)
+        self.flights.do("two", self._call)
+        self.assertEqual(self.calls, 2)
+
+    def test_exception_is_raised_to_every_caller(self):
+        def fail():
+            raise ValueError("refused")
+
+        with self.assertRaises(ValueError):
+            self.flights.do("key", fail)
+        self.assertFalse(self.flights.running("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from certtool_api.core import Certificate, CertificateError
+from certtool_api.core.x509_encoding import (
+    CERTIFICATE_LABEL,
+    LazyX509,
+    X509EncodingError,
+    der_to_pem,
+    pem_to_der,
+    split_pem,
+)
+from cryptography.hazmat.primitives.asymmetric.ec import SECP256R1, generate_private_key
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509 import (
+    CertificateBuilder,
+    Name,
+    NameAttribute,
+    NameOID,
+    random_serial_number,
+)
+
+
+def _self_signed(common_name: str):
+    key = generate_private_key(SECP256R1())
+    name = Name([NameAttribute(NameOID.COMMON_NAME, common_name)])
+    now = datetime.now(timezone.utc)
+    return (
+        CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, SHA256())
+    )
+
+
+class X509EncodingTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.x509 = _self_signed("leaf.example.com")
+        cls.pem = cls.x509.public_bytes(Encoding.PEM)
+        cls.der = cls.x509.public_bytes(Encoding.DER)
+
+    def test_pem_der_round_trip(self):
+        self.assertEqual(pem_to_der(self.pem, CERTIFICATE_LABEL), self.der)
+        self.assertEqual(der_to_pem(self.der, CERTIFICATE_LABEL), self.pem)
+
+    def test_pem_to_der_wrong_label(self):
+        with self.assertRaises(X509EncodingError):
+            pem_to_der(self.pem, b"CERTIFICATE REQUEST")
+
+    def test_split_pem(self):
+        other = _self_signed("root.example.com").public_bytes(Encoding.PEM)
+        self.assertEqual(split_pem(self.pem + other), [self.pem, other])
+        self.assertEqual(split_pem(b""), [])
+
+    def test_split_pem_with_label_refuses_anything_else(self):
+        other = _self_signed("root.example.com").public_bytes(Encoding.PEM)
+        self.assertEqual(
+            split_pem(b"\n" + self.pem + b"\n\n" + other, CERTIFICATE_LABEL),
+            [self.pem, other],
+        )
+        self.assertEqual(split_pem(b" \n", CERTIFICATE_LABEL), [])
+        for garbage in (
+            b"garbage",
+            self.pem + b"garbage",
+            b"garbage" + self.pem,
+            self.pem.replace(b"CERTIFICATE", b"CERTIFICATE REQUEST"),
+            # a block whose base64 is damaged no longer matches
+            self.pem[:100] + b"!" + self.pem[101:],
+        ):
+            with self.subTest(garbage=garbage), self.assertRaises(X509EncodingError):
+                split_pem(garbage, CERTIFICATE_LABEL)
+
+    def test_lazy_parses_on_first_access(self):
+        lazy = LazyX509.certificate(pem=self.pem)
+        self.assertEqual(lazy.der, self.der)
+        self.assertFalse(lazy.is_parsed)
+        self.assertEqual(lazy.parsed, self.x509)
+        self.assertTrue(lazy.is_parsed)
+        self.assertIs(lazy.parsed, lazy.parsed)
+
+    def test_lazy_equality(self):
+        self.assertEqual(
+            LazyX509.certificate(pem=self.pem), LazyX509.certificate(der=self.der)
+        )
+        self.assertEqual(
+            LazyX509.certificate(parsed=self.x509), LazyX509.certificate(der=self.der)
+        )
+        self.assertNotEqual(
+            LazyX509.certificate(der=self.der), LazyX509.csr(der=self.der)
+        )
+
+
+class CertificateLazyParsingTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.x509 = _self_signed("leaf.example.com")
+        cls.chain = [
+            _self_signed("issuing.example.com"),
+            _self_signed("root.example.com"),
+        ]
+        cls.pem = cls.x509.public_bytes(Encoding.PEM)
+        cls.chain_pem = b"".join(
+            certificate.public_bytes(Encoding.PEM) for certificate in cls.chain
+        )
+
+    def test_pem_round_trip_does_not_parse(self):
+        certificate = Certificate()
+        with mock.patch.object(
+            LazyX509, "parsed", new_callable=mock.PropertyMock
+        ) as parsed:
+            certificate.certificate_pem = self.pem
+            certificate.chain_pem = self.chain_pem
+            self.assertEqual(certificate.certificate_pem, self.pem)
+            self.assertEqual(certificate.chain_pem, self.chain_pem)
+            self.assertEqual(certificate.get_pem_safe("certificate"), self.pem.decode())
+            self.assertEqual(certificate.fingerprint, self.x509.fingerprint(SHA256()))
+        parsed.assert_not_called()
+
+    def test_parsed_on_access(self):
+        certificate = Certificate()
+        certificate.certificate_pem = self.pem
+        certificate.chain_pem = self.chain_pem
+        self.assertEqual(certificate.certificate, self.x509)
+        self.assertEqual(certificate.chain, self.chain)
+        self.assertEqual(
+            certificate.certificate_der, self.x509.public_bytes(Encoding.DER)
+        )
+
+    def test_parsed_arguments(self):
+        certificate = Certificate(certificate=self.x509, chain=self.chain)
+        self.assertIs(certificate.certificate, self.x509)
+        self.assertEqual(certificate.chain_pem, self.chain_pem)
+        self.assertEqual(certificate.get_pem_safe("csr"), "")
+        self.assertEqual(
+            certificate, Certificate(certificate=self.x509, chain=self.chain)
+        )
+
+    def test_garbage_chain_is_refused(self):
+        certificate = Certificate()
+        with self.assertRaises(X509EncodingError):
+            certificate.chain_pem = b"not a chain"
+        with self.assertRaises(X509EncodingError):
+            certificate.chain_pem = self.chain_pem + b"trailing garbage"
+        self.assertEqual(certificate.chain, [])
+
+    def test_not_set(self):
+        certificate = Certificate()
+        self.assertIsNone(certificate.certificate)
+        self.assertEqual(certificate.chain, [])
+        for attribute in ("certificate_pem", "certificate_der", "chain_pem", "csr_pem"):
+            with self.assertRaises(CertificateError):
+                getattr(certificate, attribute)
+
+
+if __name__ == "__main__":
+    unittest.main()
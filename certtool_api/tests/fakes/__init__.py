@@ -0,0 +1,9 @@
+from .aws import FakeAWS, FakeAWSError, Latency
+from .server import FakeAWSServer
+
+__all__ = [
+    "FakeAWS",
+    "FakeAWSError",
+    "FakeAWSServer",
+    "Latency",
+]
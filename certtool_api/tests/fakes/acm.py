@@ -0,0 +1,178 @@
+import time
+import uuid
+from datetime import timedelta
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from attrs import define, field
+from certtool_api.core import Certificate, PrivateKey, Subject
+from certtool_api.core.private_key import KeyTypes
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from .aws import FakeAWSError, decode_blob
+
+if TYPE_CHECKING:
+    from .aws import FakeAWS
+
+IDEMPOTENCY_WINDOW: float = 3600.0  # 1 hour, as ACM documents
+PRIVATE_CERTIFICATE_VALIDITY: timedelta = timedelta(days=395)
+# (key_type, key_size) of each ACM KeyAlgorithm
+KEY_ALGORITHMS: dict[str, tuple[KeyTypes, int]] = {
+    "RSA_1024": (KeyTypes.RSA, 1024),
+    "RSA_2048": (KeyTypes.RSA, 2048),
+    "RSA_3072": (KeyTypes.RSA, 3072),
+    "RSA_4096": (KeyTypes.RSA, 4096),
+    "EC_prime256v1": (KeyTypes.EC, 256),
+    "EC_secp384r1": (KeyTypes.EC, 384),
+    "EC_secp521r1": (KeyTypes.EC, 521),
+}
+
+
+@define
+class _Requested:
+    arn: str
+    domain_name: str
+    alternate_names: list[str]
+    key_algorithm: str
+    key: PrivateKey
+    private_ca_arn: str
+    created_at: float
+    ready_at: float
+    tags: dict[str, str] = field(factory=dict)
+
+
+@define
+class FakeACM:
+    """
+    The ACM half of :class:`FakeAWS`. Only private certificates are supported, ACM generates their key and
+    has the fake ACM-PCA sign them.
+    """
+
+    aws: "FakeAWS"
+    certificates: dict[str, _Requested] = field(factory=dict)
+    _tokens: dict[str, tuple[str, float]] = field(factory=dict)
+    _lock: Lock = field(factory=Lock)
+
+    def handle(self, operation: str, params: dict) -> dict:
+        handler = getattr(self, f"_{operation}", None)
+        if handler is None:
+            raise FakeAWSError("UnsupportedOperationException", operation)
+        return handler(params)
+
+    def _RequestCertificate(self, params: dict) -> dict:
+        if "CertificateAuthorityArn" not in params:
+            raise FakeAWSError(
+                "ValidationException", "Only private certificates are supported."
+            )
+        now: float = time.time()
+        token: str | None = params.get("IdempotencyToken")
+        if token:
+            with self._lock:
+                arn, expires_at = self._tokens.get(token, (None, 0.0))
+                if arn and expires_at > now:
+                    return {"CertificateArn": arn}
+        key_algorithm: str = params.get("KeyAlgorithm", "RSA_2048")
+        if key_algorithm not in KEY_ALGORITHMS:
+            raise FakeAWSError("ValidationException", key_algorithm)
+        key_type, key_size = KEY_ALGORITHMS[key_algorithm]
+        key: PrivateKey = PrivateKey.new(key_size=key_size, key_type=key_type)
+        alternate_names: list[str] = params.get("SubjectAlternativeNames") or [
+            params["DomainName"]
+        ]
+        certificate: Certificate = Certificate(
+            key=key, subject=Subject(common_name=params["DomainName"])
+        ).generate_csr(alternate_names=alternate_names)
+        private_ca_arn: str = self.aws.acm_pca.issue(
+            params["CertificateAuthorityArn"],
+            certificate.csr,
+            PRIVATE_CERTIFICATE_VALIDITY,
+        )
+        arn: str = self.aws.arn("acm", f"certificate/{uuid.uuid4()}")
+        self.certificates[arn] = _Requested(
+            arn=arn,
+            domain_name=params["DomainName"],
+            alternate_names=alternate_names,
+            key_algorithm=key_algorithm,
+            key=key,
+            private_ca_arn=private_ca_arn,
+            created_at=now,
+            ready_at=now + self.aws.sample(self.aws.acm_issuance_delay),
+            tags={tag["Key"]: tag.get("Value", "") for tag in params.get("Tags", [])},
+        )
+        if token:
+            with self._lock:
+                self._tokens[token] = (arn, now + IDEMPOTENCY_WINDOW)
+        return {"CertificateArn": arn}
+
+    def _DescribeCertificate(self, params: dict) -> dict:
+        requested: _Requested = self._requested(params["CertificateArn"])
+        detail: dict = {
+            "CertificateArn": requested.arn,
+            "DomainName": requested.domain_name,
+            "SubjectAlternativeNames": requested.alternate_names,
+            "CertificateAuthorityArn": requested.private_ca_arn.split("/certificate/")[
+                0
+            ],
+            "CreatedAt": requested.created_at,
+            "KeyAlgorithm": requested.key_algorithm,
+            "Type": "PRIVATE",
+        }
+        if time.time() < requested.ready_at:
+            status: str = "PENDING_VALIDATION"
+        else:
+            status = "ISSUED"
+            issued = self.aws.acm_pca.certificates[requested.private_ca_arn]
+            detail.update(
+                Serial=format(issued.certificate.serial_number, "x"),
+                IssuedAt=requested.ready_at,
+                NotBefore=issued.certificate.not_valid_before.timestamp(),
+                NotAfter=issued.certificate.not_valid_after.timestamp(),
+            )
+        detail["Status"] = status
+        detail["DomainValidationOptions"] = [
+            {
+                "DomainName": name,
+                "ValidationStatus": status.replace("ISSUED", "SUCCESS"),
+            }
+            for name in requested.alternate_names
+        ]
+        return {"Certificate": detail}
+
+    def _ExportCertificate(self, params: dict) -> dict:
+        requested: _Requested = self._requested(params["CertificateArn"])
+        if time.time() < requested.ready_at:
+            raise FakeAWSError(
+                "RequestInProgressException", "The certificate is not yet issued."
+            )
+        issued = self.aws.acm_pca.certificates[requested.private_ca_arn]
+        return {
+            "Certificate": issued.certificate.public_bytes(Encoding.PEM).decode(),
+            "CertificateChain": self.aws.acm_pca.chain_pem(issued.authority_arn),
+            "PrivateKey": requested.key.get_pem(
+                passphrase=decode_blob(params["Passphrase"])
+            ).decode(),
+        }
+
+    def _AddTagsToCertificate(self, params: dict) -> dict:
+        self._requested(params["CertificateArn"]).tags.update(
+            {tag["Key"]: tag.get("Value", "") for tag in params["Tags"]}
+        )
+        return {}
+
+    def _ListTagsForCertificate(self, params: dict) -> dict:
+        return {
+            "Tags": [
+                {"Key": key, "Value": value}
+                for key, value in self._requested(params["CertificateArn"]).tags.items()
+            ]
+        }
+
+    def _DeleteCertificate(self, params: dict) -> dict:
+        self._requested(params["CertificateArn"])
+        del self.certificates[params["CertificateArn"]]
+        return {}
+
+    def _requested(self, arn: str) -> _Requested:
+        if arn not in self.certificates:
+            raise FakeAWSError("ResourceNotFoundException", arn)
+        return self.certificates[arn]
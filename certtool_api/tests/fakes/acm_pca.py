@@ -0,0 +1,227 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from attrs import define, field
+from certtool_api.core import PrivateKey, Subject
+from certtool_api.core.private_key import KeyTypes
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509 import (
+    AuthorityKeyIdentifier,
+    BasicConstraints,
+)
+from cryptography.x509 import Certificate as X509Certificate
+from cryptography.x509 import (
+    CertificateBuilder,
+    CertificateSigningRequest,
+    ExtensionNotFound,
+    SubjectAlternativeName,
+    SubjectKeyIdentifier,
+    load_pem_x509_csr,
+    random_serial_number,
+)
+
+from .aws import FakeAWSError, decode_blob
+
+if TYPE_CHECKING:
+    from .aws import FakeAWS
+
+IDEMPOTENCY_WINDOW: float = 300.0  # 5 minutes, as ACM-PCA documents
+VALIDITY_UNITS: dict[str, timedelta] = {
+    "DAYS": timedelta(days=1),
+    "MONTHS": timedelta(days=30),
+    "YEARS": timedelta(days=365),
+}
+
+
+@define
+class _Authority:
+    arn: str
+    key: PrivateKey
+    certificate: X509Certificate
+
+
+@define
+class _Issued:
+    arn: str
+    authority_arn: str
+    certificate: X509Certificate
+    ready_at: float
+
+
+@define
+class FakeACMPCA:
+    """
+    The ACM-PCA half of :class:`FakeAWS`. Each authority is a self signed root that really signs what it is
+    sent, end entity certificates by default and path length 0 CAs for a subordinate CA TemplateArn.
+    """
+
+    aws: "FakeAWS"
+    authorities: dict[str, _Authority] = field(factory=dict)
+    certificates: dict[str, _Issued] = field(factory=dict)
+    _tokens: dict[tuple[str, str], tuple[str, float]] = field(factory=dict)
+    _lock: Lock = field(factory=Lock)
+
+    def create_certificate_authority(self, common_name: str = "Fake Root CA") -> str:
+        """
+        Create a root CA without going through the API
+
+        :return: The authority's ARN
+        """
+        arn: str = self.aws.arn("acm-pca", f"certificate-authority/{uuid.uuid4()}")
+        key: PrivateKey = PrivateKey.new(key_size=256, key_type=KeyTypes.EC)
+        name = Subject(common_name=common_name).to_x509_name()
+        now: datetime = datetime.now(timezone.utc)
+        certificate: X509Certificate = (
+            CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.key.public_key())
+            .serial_number(random_serial_number())
+            .not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=3650))
+            .add_extension(BasicConstraints(ca=True, path_length=None), critical=True)
+            .add_extension(
+                SubjectKeyIdentifier.from_public_key(key.key.public_key()),
+                critical=False,
+            )
+            .sign(key.key, SHA256())
+        )
+        self.authorities[arn] = _Authority(arn=arn, key=key, certificate=certificate)
+        return arn
+
+    def issue(
+        self,
+        authority_arn: str,
+        csr: CertificateSigningRequest,
+        validity: timedelta,
+        template_arn: str | None = None,
+        idempotency_token: str | None = None,
+    ) -> str:
+        """
+        Sign a CSR, shared by IssueCertificate and ACM
+
+        :return: The certificate's ARN
+        """
+        authority: _Authority = self._authority(authority_arn)
+        now: float = time.time()
+        if idempotency_token:
+            with self._lock:
+                arn, expires_at = self._tokens.get(
+                    (authority_arn, idempotency_token), (None, 0.0)
+                )
+                if arn and expires_at > now:
+                    return arn
+        signed_at: datetime = datetime.now(timezone.utc)
+        is_ca: bool = bool(template_arn and "CACertificate" in template_arn)
+        builder: CertificateBuilder = (
+            CertificateBuilder()
+            .subject_name(csr.subject)
+            .issuer_name(authority.certificate.subject)
+            .public_key(csr.public_key())
+            .serial_number(random_serial_number())
+            .not_valid_before(signed_at)
+            .not_valid_after(signed_at + validity)
+            .add_extension(
+                BasicConstraints(ca=is_ca, path_length=0 if is_ca else None),
+                critical=True,
+            )
+            .add_extension(
+                SubjectKeyIdentifier.from_public_key(csr.public_key()), critical=False
+            )
+            .add_extension(
+                AuthorityKeyIdentifier.from_issuer_public_key(
+                    authority.key.key.public_key()
+                ),
+                critical=False,
+            )
+        )
+        try:
+            builder = builder.add_extension(
+                csr.extensions.get_extension_for_class(SubjectAlternativeName).value,
+                critical=False,
+            )
+        except ExtensionNotFound:
+            pass
+        arn: str = f"{authority_arn}/certificate/{uuid.uuid4().hex}"
+        self.certificates[arn] = _Issued(
+            arn=arn,
+            authority_arn=authority_arn,
+            certificate=builder.sign(authority.key.key, SHA256()),
+            ready_at=now + self.aws.sample(self.aws.issuance_delay),
+        )
+        if idempotency_token:
+            with self._lock:
+                self._tokens[(authority_arn, idempotency_token)] = (
+                    arn,
+                    now + IDEMPOTENCY_WINDOW,
+                )
+        return arn
+
+    def get(self, certificate_arn: str) -> _Issued:
+        """
+        Return an issued certificate, shared by GetCertificate and ACM
+
+        :raises FakeAWSError: RequestInProgressException until the certificate is ready
+        """
+        issued: _Issued | None = self.certificates.get(certificate_arn)
+        if issued is None:
+            raise FakeAWSError("ResourceNotFoundException", certificate_arn)
+        if time.time() < issued.ready_at:
+            raise FakeAWSError(
+                "RequestInProgressException", "The request is still in progress."
+            )
+        return issued
+
+    def chain_pem(self, authority_arn: str) -> str:
+        return (
+            self._authority(authority_arn)
+            .certificate.public_bytes(Encoding.PEM)
+            .decode()
+        )
+
+    def handle(self, operation: str, params: dict) -> dict:
+        handler = getattr(self, f"_{operation}", None)
+        if handler is None:
+            raise FakeAWSError("UnsupportedOperationException", operation)
+        return handler(params)
+
+    def _IssueCertificate(self, params: dict) -> dict:
+        try:
+            csr: CertificateSigningRequest = load_pem_x509_csr(
+                decode_blob(params["Csr"])
+            )
+        except ValueError:
+            raise FakeAWSError("MalformedCSRException")
+        validity: dict = params["Validity"]
+        if validity["Type"] not in VALIDITY_UNITS:
+            raise FakeAWSError("ValidationException", validity["Type"])
+        return {
+            "CertificateArn": self.issue(
+                params["CertificateAuthorityArn"],
+                csr,
+                VALIDITY_UNITS[validity["Type"]] * validity["Value"],
+                params.get("TemplateArn"),
+                params.get("IdempotencyToken"),
+            )
+        }
+
+    def _GetCertificate(self, params: dict) -> dict:
+        issued: _Issued = self.get(params["CertificateArn"])
+        if issued.authority_arn != params["CertificateAuthorityArn"]:
+            raise FakeAWSError("ResourceNotFoundException", params["CertificateArn"])
+        return {
+            "Certificate": issued.certificate.public_bytes(Encoding.PEM).decode(),
+            "CertificateChain": self.chain_pem(issued.authority_arn),
+        }
+
+    def _GetCertificateAuthorityCertificate(self, params: dict) -> dict:
+        return {"Certificate": self.chain_pem(params["CertificateAuthorityArn"])}
+
+    def _authority(self, authority_arn: str) -> _Authority:
+        if authority_arn not in self.authorities:
+            raise FakeAWSError("ResourceNotFoundException", authority_arn)
+        return self.authorities[authority_arn]
@@ -0,0 +1,279 @@
+# This module is an in-process stand-in for the KMS, ACM and ACM-PCA APIs certtool uses. Real boto3 clients talk to it,
+# either through a botocore hook or over HTTP (see server.py), so waiters, retries and our own throttling run unchanged.
+
+import json
+import random
+import time
+from base64 import b64decode, b64encode
+from collections import Counter
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Iterator
+from unittest import mock
+
+import boto3
+from attrs import define, field
+from botocore.awsrequest import AWSPreparedRequest, AWSResponse
+from botocore.config import Config
+from certtool_api.aws.clients import ClientRegistry, clients
+from certtool_api.aws.throttling import TokenBucket
+
+REGION: str = "us-east-1"
+ACCOUNT_ID: str = "123456789012"
+CREDENTIALS: dict[str, str] = {
+    "aws_access_key_id": "testing",
+    "aws_secret_access_key": "testing",
+}
+
+# the JSON 1.1 target prefix of each service, and back again
+TARGET_PREFIXES: dict[str, str] = {
+    "kms": "TrentService",
+    "acm": "CertificateManager",
+    "acm-pca": "ACMPrivateCA",
+}
+SERVICES: dict[str, str] = {prefix: name for name, prefix in TARGET_PREFIXES.items()}
+
+
+class FakeAWSError(Exception):
+    """
+    An AWS error response. code becomes the __type botocore raises as client.exceptions.<code>.
+    """
+
+    def __init__(self, code: str, message: str = "", status: int = 400) -> None:
+        super().__init__(message or code)
+        self.code = code
+        self.message = message or code
+        self.status = status
+
+
+@define
+class Latency:
+    """
+    A distribution of delays in seconds
+
+    :param sampler: Draws a delay from rng
+
+    :Example:
+
+    >>> Latency.lognormal(median=0.02, sigma=0.5, cap=1.0).sample(random.Random(1))
+    """
+
+    sampler: Callable[[random.Random], float]
+
+    @classmethod
+    def constant(cls, seconds: float) -> "Latency":
+        return cls(lambda rng: seconds)
+
+    @classmethod
+    def uniform(cls, low: float, high: float) -> "Latency":
+        return cls(lambda rng: rng.uniform(low, high))
+
+    @classmethod
+    def exponential(cls, mean: float) -> "Latency":
+        return cls(lambda rng: rng.expovariate(1 / mean) if mean else 0.0)
+
+    # the long tailed shape real API latencies tend to have
+    @classmethod
+    def lognormal(
+        cls, median: float, sigma: float, cap: float | None = None
+    ) -> "Latency":
+        def _sample(rng: random.Random) -> float:
+            delay: float = rng.lognormvariate(0, sigma) * median
+            return min(delay, cap) if cap is not None else delay
+
+        return cls(_sample)
+
+    def sample(self, rng: random.Random) -> float:
+        return max(self.sampler(rng), 0.0)
+
+
+NO_LATENCY: Latency = Latency.constant(0.0)
+
+
+# helpers for the wire format, blobs travel base64 encoded and timestamps as epoch seconds
+def decode_blob(value: str) -> bytes:
+    return b64decode(value)
+
+
+def encode_blob(value: bytes) -> str:
+    return b64encode(value).decode()
+
+
+@define
+class FakeAWS:
+    """
+    This class is an in-process KMS, ACM and ACM-PCA, backed by a real local CA.
+
+    Every call first waits out a delay drawn from latency, then may be refused with a ThrottlingException,
+    at random with probability throttle_rate or when it is over its quota of requests per second. Latency
+    and quotas are keyed by "service:Operation", "service" or "*", most specific first. ACM-PCA certificates
+    and ACM certificates only become ready issuance_delay after they are requested, until then GetCertificate
+    and ExportCertificate raise RequestInProgressException and DescribeCertificate reports
+    PENDING_VALIDATION.
+
+    :param latency: The latency of each call
+    :param throttle_rate: The probability of any call being throttled
+    :param quotas: The requests per second each call is allowed before it is throttled
+    :param issuance_delay: The time ACM-PCA takes to issue a certificate
+    :param acm_issuance_delay: The time ACM takes to issue a certificate
+    :param seed: The seed for the random delays and throttling, for repeatable runs
+
+    :Example:
+
+    >>> aws = FakeAWS(latency={"kms": Latency.constant(0.005)}, quotas={"kms:Decrypt": 100})
+    >>> ca_arn = aws.acm_pca.create_certificate_authority()
+    >>> with aws.patch_clients():
+    ...     KMSService().encrypt(b"secret")
+    """
+
+    latency: dict[str, Latency] = field(factory=dict)
+    throttle_rate: float = 0.0
+    quotas: dict[str, float] = field(factory=dict)
+    issuance_delay: Latency = NO_LATENCY
+    acm_issuance_delay: Latency = NO_LATENCY
+    seed: int | None = None
+    calls: Counter = field(init=False, factory=Counter)
+    throttled: Counter = field(init=False, factory=Counter)
+    _rng: random.Random = field(init=False)
+    _buckets: dict[str, TokenBucket] = field(init=False, factory=dict)
+    _lock: Lock = field(init=False, factory=Lock)
+    kms: "FakeKMS" = field(init=False)
+    acm_pca: "FakeACMPCA" = field(init=False)
+    acm: "FakeACM" = field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        from .acm import FakeACM
+        from .acm_pca import FakeACMPCA
+        from .kms import FakeKMS
+
+        self._rng = random.Random(self.seed)
+        self._buckets = {
+            key: TokenBucket(rate=rate) for key, rate in self.quotas.items()
+        }
+        self.kms = FakeKMS(self)
+        self.acm_pca = FakeACMPCA(self)
+        self.acm = FakeACM(self)
+
+    def sample(self, latency: Latency) -> float:
+        with self._lock:
+            return latency.sample(self._rng)
+
+    def dispatch(self, target: str, body: bytes) -> tuple[int, bytes]:
+        """
+        Handle one JSON 1.1 request
+
+        :param target: The X-Amz-Target header, e.g. "TrentService.Encrypt"
+        :param body: The JSON request body
+
+        :return: The HTTP status and JSON response body
+        """
+        prefix, _, operation = target.partition(".")
+        service: str | None = SERVICES.get(prefix)
+        try:
+            if service is None:
+                raise FakeAWSError("UnknownOperationException", target)
+            self._call(service, operation)
+            response: dict = getattr(self, service.replace("-", "_")).handle(
+                operation, json.loads(body or b"{}")
+            )
+            return 200, json.dumps(response).encode()
+        except FakeAWSError as exc:
+            return (
+                exc.status,
+                json.dumps({"__type": exc.code, "message": exc.message}).encode(),
+            )
+
+    def client(
+        self,
+        service_name: str,
+        region_name: str | None = None,
+        endpoint_url: str | None = None,
+        config: Config | None = None,
+    ) -> Any:
+        """
+        Return a boto3 client that talks to this fake, in process unless endpoint_url is set
+
+        :param service_name: "kms", "acm" or "acm-pca"
+        :param region_name: The region, REGION if None
+        :param endpoint_url: The url of a :class:`FakeAWSServer` to talk to over HTTP
+        :param config: The botocore config for the client
+
+        :return: The boto3 client
+        """
+        client: Any = boto3.session.Session(**CREDENTIALS).client(
+            service_name,
+            region_name=region_name or REGION,
+            endpoint_url=endpoint_url,
+            config=config,
+        )
+        if not endpoint_url:
+            client.meta.events.register("before-send", self._before_send)
+        return client
+
+    @contextmanager
+    def patch_clients(self, registry: ClientRegistry = clients) -> Iterator["FakeAWS"]:
+        """
+        Make every client the registry hands out talk to this fake, in process
+        """
+
+        def _create_client(
+            _registry: ClientRegistry,
+            service_name: str,
+            profile_name: str | None,
+            region_name: str | None,
+            endpoint_url: str | None,
+        ) -> Any:
+            return self.client(
+                service_name, region_name, config=_registry._client_config()
+            )
+
+        registry.reset()
+        try:
+            with mock.patch.object(ClientRegistry, "_create_client", _create_client):
+                yield self
+        finally:
+            registry.reset()
+
+    def arn(self, service: str, resource: str) -> str:
+        return f"arn:aws:{service}:{REGION}:{ACCOUNT_ID}:{resource}"
+
+    # method to apply the latency, throttling and accounting shared by every call
+    def _call(self, service: str, operation: str) -> None:
+        keys: list[str] = [f"{service}:{operation}", service, "*"]
+        latency: Latency | None = next(
+            (self.latency[key] for key in keys if key in self.latency), None
+        )
+        if latency:
+            time.sleep(self.sample(latency))
+        with self._lock:
+            self.calls[f"{service}:{operation}"] += 1
+            throttled: bool = self._rng.random() < self.throttle_rate
+        bucket: TokenBucket | None = next(
+            (self._buckets[key] for key in keys if key in self._buckets), None
+        )
+        if throttled or (bucket and bucket.try_acquire()):
+            with self._lock:
+                self.throttled[f"{service}:{operation}"] += 1
+            raise FakeAWSError("ThrottlingException", "Rate exceeded")
+
+    # botocore hook answering a request in place of sending it
+    def _before_send(self, request: AWSPreparedRequest, **_) -> AWSResponse:
+        target: str | bytes = request.headers["X-Amz-Target"]
+        if isinstance(target, bytes):
+            target = target.decode()
+        status, body = self.dispatch(target, request.body or b"")
+        return AWSResponse(
+            request.url,
+            status,
+            {"Content-Type": "application/x-amz-json-1.1"},
+            _RawResponse(body),
+        )
+
+
+# the minimum of a urllib3 response botocore reads a body from
+class _RawResponse:
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    def stream(self, **_) -> Iterator[bytes]:
+        yield self._body
@@ -0,0 +1,199 @@
+import json
+import os
+import time
+import uuid
+from typing import TYPE_CHECKING
+
+from attrs import define, field
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from .aws import FakeAWSError, decode_blob, encode_blob
+
+if TYPE_CHECKING:
+    from .aws import FakeAWS
+
+# ciphertext blobs are MAGIC, the 36 character key id, a nonce, then AES-GCM ciphertext
+MAGIC: bytes = b"FKMS"
+KEY_ID_SIZE: int = 36
+NONCE_SIZE: int = 12
+DATA_KEY_SIZES: dict[str, int] = {"AES_256": 32, "AES_128": 16}
+
+
+@define
+class _Key:
+    key_id: str
+    arn: str
+    material: bytes
+    state: str = "Enabled"
+    created_at: float = field(factory=time.time)
+    deletion_date: float | None = None
+
+    def metadata(self) -> dict:
+        return {
+            "AWSAccountId": self.arn.split(":")[4],
+            "KeyId": self.key_id,
+            "Arn": self.arn,
+            "CreationDate": self.created_at,
+            "Enabled": self.state == "Enabled",
+            "KeyState": self.state,
+            "KeyUsage": "ENCRYPT_DECRYPT",
+            "KeySpec": "SYMMETRIC_DEFAULT",
+            "Origin": "AWS_KMS",
+            "KeyManager": "CUSTOMER",
+            **({"DeletionDate": self.deletion_date} if self.deletion_date else {}),
+        }
+
+
+@define
+class FakeKMS:
+    """
+    The KMS half of :class:`FakeAWS`. Symmetric keys really encrypt, with the encryption context bound in as
+    associated data, so a ciphertext only decrypts under the context it was encrypted with.
+    """
+
+    aws: "FakeAWS"
+    keys: dict[str, _Key] = field(factory=dict)
+    aliases: dict[str, str] = field(factory=dict)
+
+    def create_key(self, alias: str | None = None) -> str:
+        """
+        Create a key, and optionally an alias to it, without going through the API
+
+        :return: The key's ARN
+        """
+        key_id: str = str(uuid.uuid4())
+        key: _Key = _Key(
+            key_id=key_id,
+            arn=self.aws.arn("kms", f"key/{key_id}"),
+            material=AESGCM.generate_key(bit_length=256),
+        )
+        self.keys[key_id] = key
+        if alias:
+            self.aliases[alias] = key_id
+        return key.arn
+
+    def handle(self, operation: str, params: dict) -> dict:
+        handler = getattr(self, f"_{operation}", None)
+        if handler is None:
+            raise FakeAWSError("UnsupportedOperationException", operation)
+        return handler(params)
+
+    def _CreateKey(self, params: dict) -> dict:
+        return {"KeyMetadata": self._key(self.create_key()).metadata()}
+
+    def _DescribeKey(self, params: dict) -> dict:
+        return {"KeyMetadata": self._key(params["KeyId"]).metadata()}
+
+    def _CreateAlias(self, params: dict) -> dict:
+        if params["AliasName"] in self.aliases:
+            raise FakeAWSError("AlreadyExistsException", params["AliasName"])
+        self.aliases[params["AliasName"]] = self._key(params["TargetKeyId"]).key_id
+        return {}
+
+    def _DeleteAlias(self, params: dict) -> dict:
+        if self.aliases.pop(params["AliasName"], None) is None:
+            raise FakeAWSError("NotFoundException", params["AliasName"])
+        return {}
+
+    def _ScheduleKeyDeletion(self, params: dict) -> dict:
+        key: _Key = self._key(params["KeyId"])
+        days: int = params.get("PendingWindowInDays", 30)
+        key.state = "PendingDeletion"
+        key.deletion_date = time.time() + days * 86400
+        return {
+            "KeyId": key.arn,
+            "DeletionDate": key.deletion_date,
+            "KeyState": key.state,
+            "PendingWindowInDays": days,
+        }
+
+    def _Encrypt(self, params: dict) -> dict:
+        key: _Key = self._usable_key(params["KeyId"])
+        return {
+            "CiphertextBlob": encode_blob(
+                self._seal(
+                    key,
+                    decode_blob(params["Plaintext"]),
+                    params.get("EncryptionContext"),
+                )
+            ),
+            "KeyId": key.arn,
+            "EncryptionAlgorithm": "SYMMETRIC_DEFAULT",
+        }
+
+    def _Decrypt(self, params: dict) -> dict:
+        blob: bytes = decode_blob(params["CiphertextBlob"])
+        if not blob.startswith(MAGIC) or len(blob) < len(MAGIC) + KEY_ID_SIZE:
+            raise FakeAWSError("InvalidCiphertextException")
+        key: _Key = self._usable_key(
+            blob[len(MAGIC) : len(MAGIC) + KEY_ID_SIZE].decode()
+        )
+        if "KeyId" in params and self._key(params["KeyId"]) is not key:
+            raise FakeAWSError("IncorrectKeyException")
+        nonce_at: int = len(MAGIC) + KEY_ID_SIZE
+        try:
+            plaintext: bytes = AESGCM(key.material).decrypt(
+                blob[nonce_at : nonce_at + NONCE_SIZE],
+                blob[nonce_at + NONCE_SIZE :],
+                _associated_data(params.get("EncryptionContext")),
+            )
+        except InvalidTag:
+            raise FakeAWSError("InvalidCiphertextException")
+        return {
+            "KeyId": key.arn,
+            "Plaintext": encode_blob(plaintext),
+            "EncryptionAlgorithm": "SYMMETRIC_DEFAULT",
+        }
+
+    def _GenerateDataKey(self, params: dict) -> dict:
+        key: _Key = self._usable_key(params["KeyId"])
+        size: int = params.get("NumberOfBytes") or DATA_KEY_SIZES.get(
+            params.get("KeySpec", ""), 0
+        )
+        if not size:
+            raise FakeAWSError("ValidationException", "KeySpec or NumberOfBytes")
+        plaintext: bytes = os.urandom(size)
+        return {
+            "CiphertextBlob": encode_blob(
+                self._seal(key, plaintext, params.get("EncryptionContext"))
+            ),
+            "Plaintext": encode_blob(plaintext),
+            "KeyId": key.arn,
+        }
+
+    # method to find a key by id, ARN, alias or alias ARN
+    def _key(self, key_id: str) -> _Key:
+        if ":alias/" in key_id:
+            key_id = key_id.split(":", 5)[5]
+        if key_id.startswith("alias/"):
+            if key_id not in self.aliases:
+                raise FakeAWSError("NotFoundException", f"Alias {key_id} is not found.")
+            key_id = self.aliases[key_id]
+        key_id = key_id.rsplit("/", 1)[-1]
+        if key_id not in self.keys:
+            raise FakeAWSError("NotFoundException", f"Key {key_id} is not found.")
+        return self.keys[key_id]
+
+    def _usable_key(self, key_id: str) -> _Key:
+        key: _Key = self._key(key_id)
+        if key.state != "Enabled":
+            raise FakeAWSError("KMSInvalidStateException", f"{key.arn} is {key.state}")
+        return key
+
+    def _seal(
+        self, key: _Key, plaintext: bytes, encryption_context: dict | None
+    ) -> bytes:
+        nonce: bytes = os.urandom(NONCE_SIZE)
+        return (
+            MAGIC
+            + key.key_id.encode()
+            + nonce
+            + AESGCM(key.material).encrypt(
+                nonce, plaintext, _associated_data(encryption_context)
+            )
+        )
+
+
+def _associated_data(encryption_context: dict | None) -> bytes:
+    return json.dumps(encryption_context or {}, sort_keys=True).encode()
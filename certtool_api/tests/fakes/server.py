@@ -0,0 +1,85 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+from attrs import define, field
+
+from .aws import FakeAWS
+
+
+# request handler speaking the AWS JSON 1.1 protocol for a FakeAWS
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        body: bytes = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, response = self.server.aws.dispatch(
+            self.headers.get("X-Amz-Target", ""), body
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-amz-json-1.1")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *_) -> None:
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, aws: FakeAWS, address: tuple[str, int]) -> None:
+        super().__init__(address, _Handler)
+        self.aws = aws
+
+
+@define
+class FakeAWSServer:
+    """
+    This class serves a :class:`FakeAWS` over HTTP, for clients in other processes or that need a real
+    endpoint_url. Each request is handled on its own thread.
+
+    :param aws: The fake to serve
+    :param host: The address to listen on
+    :param port: The port to listen on, any free port if 0
+
+    :Example:
+
+    >>> with FakeAWSServer(FakeAWS()) as server:
+    ...     KMSService(endpoint_url=server.url).encrypt(b"secret")
+    """
+
+    aws: FakeAWS
+    host: str = "127.0.0.1"
+    port: int = 0
+    _server: _Server | None = field(init=False, default=None)
+    _thread: Thread | None = field(init=False, default=None)
+
+    def __enter__(self) -> "FakeAWSServer":
+        return self.start()
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        if not self._server:
+            raise RuntimeError("Fake AWS server not started.")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAWSServer":
+        self._server = _Server(self.aws, (self.host, self.port))
+        self._thread = Thread(
+            target=self._server.serve_forever, name="fake-aws", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        server, self._server = self._server, None
+        if server:
+            server.shutdown()
+            server.server_close()
+            self._thread.join()
@@ -0,0 +1,160 @@
+import time
+import unittest
+
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from certtool_api.core import Certificate, PrivateKey, Subject
+from certtool_api.repositories.aws.certificate_authority import AWSCertificateAuthority
+from certtool_api.services.kms_service import KMSService
+from certtool_api.tests.fakes import FakeAWS, FakeAWSServer, Latency
+from cryptography.hazmat.primitives.asymmetric.ec import ECDSA
+from cryptography.hazmat.primitives.hashes import SHA256
+
+NO_RETRIES = Config(retries={"total_max_attempts": 1, "mode": "standard"})
+
+
+def _csr(common_name: str = "service.example.com") -> Certificate:
+    certificate = Certificate(
+        key=PrivateKey.new(key_size=1024), subject=Subject(common_name=common_name)
+    )
+    return certificate.generate_csr(alternate_names=[common_name])
+
+
+class FakeAWSTestCase(unittest.TestCase):
+    def setUp(self):
+        self.aws = FakeAWS(seed=1)
+        self.ca_arn = self.aws.acm_pca.create_certificate_authority()
+        self.aws.kms.create_key(alias="alias/test")
+
+    def test_issues_real_certificates(self):
+        with self.aws.patch_clients():
+            certificate = AWSCertificateAuthority(arn=self.ca_arn).issue_certificate(
+                _csr()
+            )
+        root = certificate.chain[0]
+        root.public_key().verify(
+            certificate.certificate.signature,
+            certificate.certificate.tbs_certificate_bytes,
+            ECDSA(SHA256()),
+        )
+        self.assertEqual(
+            (
+                certificate.certificate.not_valid_after
+                - certificate.certificate.not_valid_before
+            ).days,
+            365 * 5,
+        )
+
+    def test_issuance_delay_keeps_certificates_in_progress(self):
+        self.aws.issuance_delay = Latency.constant(0.2)
+        with self.aws.patch_clients():
+            (result,) = AWSCertificateAuthority(arn=self.ca_arn).issue_certificates(
+                [_csr()], poll_delay=0.05, max_poll_delay=0.05
+            )
+        self.assertTrue(result.ok)
+        self.assertGreater(result.polls, 1)
+        self.assertGreaterEqual(result.latency, 0.2)
+        self.assertGreater(self.aws.calls["acm-pca:GetCertificate"], 1)
+
+    def test_latency_is_applied(self):
+        self.aws.latency["kms:Encrypt"] = Latency.constant(0.05)
+        with self.aws.patch_clients():
+            started = time.monotonic()
+            KMSService(key_id="alias/test").encrypt(b"secret")
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_quota_throttles(self):
+        aws = FakeAWS(quotas={"kms:Encrypt": 2})
+        aws.kms.create_key(alias="alias/test")
+        client = aws.client("kms", config=NO_RETRIES)
+        errors = []
+        for _ in range(10):
+            try:
+                client.encrypt(KeyId="alias/test", Plaintext=b"secret")
+            except ClientError as exc:
+                errors.append(exc.response["Error"]["Code"])
+        self.assertGreater(len(errors), 0)
+        self.assertEqual(set(errors), {"ThrottlingException"})
+        self.assertEqual(aws.throttled["kms:Encrypt"], len(errors))
+
+    def test_throttled_calls_are_retried_by_botocore(self):
+        self.aws.throttle_rate = 0.5
+        client = self.aws.client(
+            "kms", config=Config(retries={"max_attempts": 20, "mode": "standard"})
+        )
+        # with seed 1 the first attempt is throttled and the retry isn't
+        client.encrypt(KeyId="alias/test", Plaintext=b"secret")
+        self.assertEqual(self.aws.throttled["kms:Encrypt"], 1)
+        self.assertEqual(self.aws.calls["kms:Encrypt"], 2)
+
+    def test_wrong_encryption_context_fails(self):
+        client = self.aws.client("kms")
+        blob = client.encrypt(
+            KeyId="alias/test", Plaintext=b"secret", EncryptionContext={"a": "b"}
+        )["CiphertextBlob"]
+        with self.assertRaises(client.exceptions.InvalidCiphertextException):
+            client.decrypt(CiphertextBlob=blob, EncryptionContext={"a": "c"})
+
+    def test_issue_certificate_is_idempotent(self):
+        client = self.aws.client("acm-pca")
+        params = dict(
+            CertificateAuthorityArn=self.ca_arn,
+            Csr=_csr().csr_pem,
+            SigningAlgorithm="SHA256WITHECDSA",
+            Validity={"Value": 1, "Type": "DAYS"},
+            IdempotencyToken="token",
+        )
+        self.assertEqual(
+            client.issue_certificate(**params)["CertificateArn"],
+            client.issue_certificate(**params)["CertificateArn"],
+        )
+
+    def test_acm_private_certificate(self):
+        self.aws.acm_issuance_delay = Latency.constant(60)
+        client = self.aws.client("acm")
+        arn = client.request_certificate(
+            DomainName="service.example.com",
+            CertificateAuthorityArn=self.ca_arn,
+            KeyAlgorithm="EC_prime256v1",
+        )["CertificateArn"]
+        detail = client.describe_certificate(CertificateArn=arn)["Certificate"]
+        self.assertEqual(detail["Status"], "PENDING_VALIDATION")
+        with self.assertRaises(client.exceptions.RequestInProgressException):
+            client.export_certificate(CertificateArn=arn, Passphrase=b"passphrase")
+        self.aws.acm.certificates[arn].ready_at = 0
+        exported = client.export_certificate(
+            CertificateArn=arn, Passphrase=b"passphrase"
+        )
+        key = PrivateKey.from_pem(
+            exported["PrivateKey"].encode(), passphrase=b"passphrase"
+        )
+        certificate = Certificate.from_pem(exported["Certificate"].encode())
+        self.assertEqual(
+            certificate.certificate.public_key().public_numbers(),
+            key.key.public_key().public_numbers(),
+        )
+
+    def test_http_server(self):
+        with FakeAWSServer(self.aws) as server:
+            client = self.aws.client("kms", endpoint_url=server.url)
+            blob = client.encrypt(KeyId="alias/test", Plaintext=b"secret")[
+                "CiphertextBlob"
+            ]
+            self.assertEqual(
+                client.decrypt(CiphertextBlob=blob)["Plaintext"], b"secret"
+            )
+            pca = self.aws.client("acm-pca", endpoint_url=server.url)
+            arn = pca.issue_certificate(
+                CertificateAuthorityArn=self.ca_arn,
+                Csr=_csr().csr_pem,
+                SigningAlgorithm="SHA256WITHECDSA",
+                Validity={"Value": 1, "Type": "DAYS"},
+            )["CertificateArn"]
+            pca.get_waiter("certificate_issued").wait(
+                CertificateAuthorityArn=self.ca_arn, CertificateArn=arn
+            )
+        self.assertEqual(self.aws.calls["acm-pca:GetCertificate"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,424 @@
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
+
+from certtool_api.core import Certificate, Subject, Tags
+from certtool_api.models import (
+    SAVE_QUERY_BUDGET,
+    CertificateChainModel,
+    CertificateModel,
+    CertificateStorage,
+    IssuerCertificateModel,
+    SubjectAlternateNameModel,
+    TagsModel,
+)
+from cryptography.hazmat.primitives.asymmetric.ec import SECP256R1, generate_private_key
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509 import (
+    CertificateBuilder,
+    Name,
+    NameAttribute,
+    NameOID,
+    random_serial_number,
+)
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django_db_test_utils import DBTestCase
+
+PCA_ARN = "arn:aws:acm-pca:us-east-1:123456789012:certificate-authority/ca"
+
+
+def _issuer_pem(common_name: str) -> bytes:
+    key = generate_private_key(SECP256R1())
+    name = Name([NameAttribute(NameOID.COMMON_NAME, common_name)])
+    now = datetime.now(timezone.utc)
+    return (
+        CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, SHA256())
+        .public_bytes(Encoding.PEM)
+    )
+
+
+INTERMEDIATE_PEM, ROOT_PEM, OTHER_ROOT_PEM = (
+    _issuer_pem(f"{name}.example.com") for name in ("intermediate", "root", "other")
+)
+
+
+def _certificate(index: int, **kwargs) -> Certificate:
+    kwargs.setdefault("private_ca_arn", f"{PCA_ARN}/certificate/{index}")
+    return Certificate(
+        subject=Subject(common_name=f"host{index}.example.com"),
+        alternate_names=[f"host{index}.example.com", f"www{index}.example.com"],
+        tags=Tags(team="platform", index=str(index)),
+        **kwargs,
+    )
+
+
+# the statements a block runs, less the savepoints of the test's own transaction
+class CaptureStatements(CaptureQueriesContext):
+    def __init__(self) -> None:
+        super().__init__(connection)
+
+    @property
+    def statements(self) -> list[str]:
+        return [
+            query["sql"]
+            for query in self.captured_queries
+            if not query["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT"))
+        ]
+
+
+class CertificateRelationsMixin:
+    def _tags(self, certificate_id: int) -> dict[str, str]:
+        return dict(
+            TagsModel.objects.filter(certificate_id=certificate_id).values_list(
+                "tag_key", "tag_value"
+            )
+        )
+
+    def _alternate_names(self, certificate_id: int) -> set[str]:
+        return set(
+            SubjectAlternateNameModel.objects.filter(
+                certificate_id=certificate_id
+            ).values_list("alternate_name", flat=True)
+        )
+
+
+class CertificateModelSaveManyIntegrationTestCase(
+    CertificateRelationsMixin, DBTestCase
+):
+    def test_save_many_creates(self):
+        certificates = [_certificate(index) for index in range(5)]
+        ids = CertificateModel.save_many(certificates, chunk_size=2)
+
+        self.assertEqual(
+            ids, [certificate.certificate_id for certificate in certificates]
+        )
+        self.assertEqual(len(set(ids)), 5)
+        self.assertEqual(CertificateModel.objects.count(), 5)
+        self.assertEqual(
+            CertificateModel.objects.get(certificate_id=ids[3]).subject_common_name,
+            "host3.example.com",
+        )
+        self.assertEqual(self._tags(ids[3]), {"team": "platform", "index": "3"})
+        self.assertEqual(
+            self._alternate_names(ids[3]), {"host3.example.com", "www3.example.com"}
+        )
+
+    def test_save_many_updates(self):
+        ids = CertificateModel.save_many([_certificate(0), _certificate(1)])
+
+        # the first by its certificate_id, the second by its private_ca_arn
+        first = _certificate(0, certificate_id=ids[0])
+        first.tags = Tags(team="security")
+        first.alternate_names = ["host0.example.com", "api0.example.com"]
+        second = _certificate(1)
+        second.tags = None
+        second.subject = Subject(common_name="renamed.example.com")
+        self.assertEqual(CertificateModel.save_many([first, second]), ids)
+
+        self.assertEqual(CertificateModel.objects.count(), 2)
+        self.assertEqual(self._tags(ids[0]), {"team": "security"})
+        self.assertEqual(
+            self._alternate_names(ids[0]), {"host0.example.com", "api0.example.com"}
+        )
+        self.assertEqual(self._tags(ids[1]), {})
+        self.assertEqual(
+            CertificateModel.objects.get(certificate_id=ids[1]).subject_common_name,
+            "renamed.example.com",
+        )
+
+    def test_save_many_matches_each_arn_on_its_own(self):
+        acm_arn = "arn:aws:acm:us-east-1:123456789012:certificate"
+        stored = [_certificate(0), _certificate(1)] + [
+            _certificate(index, private_ca_arn=None, acm_arn=f"{acm_arn}/{index}")
+            for index in (2, 3)
+        ]
+        ids = CertificateModel.save_many(stored)
+
+        # certificates with only an acm_arn, only a private_ca_arn, a new one of each and one with neither
+        certificates = [
+            _certificate(3, private_ca_arn=None, acm_arn=f"{acm_arn}/3"),
+            _certificate(2, private_ca_arn=None, acm_arn=f"{acm_arn}/2"),
+            _certificate(1),
+            _certificate(0),
+            _certificate(4),
+            _certificate(5, private_ca_arn=None, acm_arn=f"{acm_arn}/5"),
+            _certificate(6, private_ca_arn=None),
+        ]
+        saved = CertificateModel.save_many(certificates)
+
+        self.assertEqual(saved[:4], [ids[3], ids[2], ids[1], ids[0]])
+        self.assertEqual(len(set(saved)), 7)
+        self.assertEqual(CertificateModel.objects.count(), 7)
+
+    def test_save_many_creates_unstored_ids(self):
+        (stored,) = CertificateModel.save_many([_certificate(0)])
+        certificates = [
+            _certificate(0, certificate_id=stored),
+            _certificate(1, certificate_id=stored + 100),
+        ]
+        self.assertEqual(
+            CertificateModel.save_many(certificates), [stored, stored + 100]
+        )
+        self.assertEqual(
+            CertificateModel.objects.get(
+                certificate_id=stored + 100
+            ).subject_common_name,
+            "host1.example.com",
+        )
+        self.assertEqual(self._tags(stored + 100), {"team": "platform", "index": "1"})
+
+    def test_save_many_saves_the_last_of_duplicates(self):
+        renamed = _certificate(0)
+        renamed.subject = Subject(common_name="renamed.example.com")
+        certificates = [_certificate(0), _certificate(1), renamed]
+        ids = CertificateModel.save_many(certificates)
+
+        self.assertEqual(ids[0], ids[2])
+        self.assertEqual(CertificateModel.objects.count(), 2)
+        self.assertEqual(
+            CertificateModel.objects.get(certificate_id=ids[0]).subject_common_name,
+            "renamed.example.com",
+        )
+
+    def test_save_many_updates_a_certificate_stored_concurrently(self):
+        (stored,) = CertificateModel.save_many([_certificate(0)])
+        certificate = _certificate(0)
+        certificate.tags = Tags(team="security")
+        # as if another save stored it after this one looked for it
+        with mock.patch.object(CertificateModel, "_match_natural_keys"):
+            self.assertEqual(CertificateModel.save_many([certificate]), [stored])
+
+        self.assertEqual(CertificateModel.objects.count(), 1)
+        self.assertEqual(self._tags(stored), {"team": "security"})
+
+    def test_save_many_query_count_is_per_chunk(self):
+        def _queries(count: int, offset: int) -> int:
+            certificates = [_certificate(offset + index) for index in range(count)]
+            with CaptureQueriesContext(connection) as context:
+                CertificateModel.save_many(certificates)
+            return len(context.captured_queries)
+
+        self.assertEqual(_queries(10, 0), _queries(40, 100))
+        # and the same again for updates
+        self.assertEqual(_queries(10, 0), _queries(40, 100))
+
+
+class CertificateModelSaveFromEntityIntegrationTestCase(
+    CertificateRelationsMixin, DBTestCase
+):
+    def test_create(self):
+        certificate = _certificate(0)
+        with CaptureStatements() as context:
+            model = CertificateModel.save_from_entity(certificate)
+        # the certificate, its tags and its alternate names, with nothing to read back
+        self.assertEqual(len(context.statements), 3)
+        self.assertEqual(certificate.certificate_id, model.certificate_id)
+        self.assertEqual(
+            self._tags(model.certificate_id), {"team": "platform", "index": "0"}
+        )
+        self.assertEqual(
+            self._alternate_names(model.certificate_id),
+            {"host0.example.com", "www0.example.com"},
+        )
+
+    def test_update_writes_only_the_difference(self):
+        certificate = _certificate(0)
+        CertificateModel.save_from_entity(certificate)
+        certificate.tags = Tags(team="security", index="0", owner="pki")
+        certificate.alternate_names = ["host0.example.com", "api0.example.com"]
+
+        with CaptureStatements() as context:
+            model = CertificateModel.save_from_entity(certificate)
+        self.assertLessEqual(len(context.statements), SAVE_QUERY_BUDGET)
+        self.assertEqual(
+            self._tags(certificate.certificate_id),
+            {"team": "security", "index": "0", "owner": "pki"},
+        )
+        self.assertEqual(
+            self._alternate_names(certificate.certificate_id),
+            {"host0.example.com", "api0.example.com"},
+        )
+        self.assertIsNotNone(model.created_at)
+        self.assertEqual(CertificateModel.objects.count(), 1)
+
+    def test_budget_does_not_grow_with_relations(self):
+        certificate = _certificate(0)
+        CertificateModel.save_from_entity(certificate)
+        certificate.tags = Tags(**{f"key{index}": "value" for index in range(50)})
+        certificate.alternate_names = [
+            f"host{index}.example.com" for index in range(50)
+        ]
+
+        certificate.chain_pem = INTERMEDIATE_PEM + ROOT_PEM
+        CertificateModel.save_from_entity(certificate)
+        # every relation both loses and changes a row, and the chain gains an issuer
+        certificate.tags = Tags(
+            key0="changed", **{f"key{index}": "value" for index in range(1, 49)}
+        )
+        certificate.alternate_names = [
+            *certificate.alternate_names[:-1],
+            "new.example.com",
+        ]
+        certificate.chain_pem = OTHER_ROOT_PEM
+
+        with CaptureStatements() as context:
+            CertificateModel.save_from_entity(certificate)
+        self.assertEqual(len(context.statements), SAVE_QUERY_BUDGET)
+
+        certificate.tags.add_tag("key1", "changed")
+        with CaptureStatements() as context:
+            CertificateModel.save_from_entity(certificate)
+        # the update, the three reads and the one changed tag
+        self.assertEqual(len(context.statements), 5)
+
+        with CaptureStatements() as context:
+            CertificateModel.save_from_entity(certificate)
+        self.assertEqual(len(context.statements), 4)
+
+    def test_save_writes_assigned_relations(self):
+        model = CertificateModel.from_entity(_certificate(0))
+        model.save()
+        self.assertEqual(
+            self._tags(model.certificate_id), {"team": "platform", "index": "0"}
+        )
+        model.tags = Tags(team="security")
+        model.save()
+        self.assertEqual(self._tags(model.certificate_id), {"team": "security"})
+        self.assertEqual(model.tags, Tags(team="security"))
+
+
+class CertificateModelChainIntegrationTestCase(DBTestCase):
+    def setUp(self):
+        IssuerCertificateModel.clear_cache()
+
+    def test_issuers_are_stored_once(self):
+        certificates = [_certificate(index) for index in range(3)]
+        for certificate in certificates:
+            certificate.chain_pem = INTERMEDIATE_PEM + ROOT_PEM
+        CertificateModel.save_many(certificates[:2])
+        CertificateModel.save_from_entity(certificates[2])
+
+        self.assertEqual(IssuerCertificateModel.objects.count(), 2)
+        self.assertEqual(CertificateChainModel.objects.count(), 6)
+        for certificate in certificates:
+            self.assertEqual(
+                CertificateModel.objects.get(
+                    certificate_id=certificate.certificate_id
+                ).chain_pem,
+                (INTERMEDIATE_PEM + ROOT_PEM).decode(),
+            )
+
+    def test_chain_is_replaced(self):
+        certificate = _certificate(0)
+        certificate.chain_pem = INTERMEDIATE_PEM + ROOT_PEM
+        CertificateModel.save_from_entity(certificate)
+        certificate.chain_pem = OTHER_ROOT_PEM
+        CertificateModel.save_from_entity(certificate)
+
+        model = CertificateModel.objects.get(certificate_id=certificate.certificate_id)
+        self.assertEqual(model.chain_pem, OTHER_ROOT_PEM.decode())
+        self.assertEqual(model.to_entity().chain_pem, OTHER_ROOT_PEM)
+        # the issuers that are no longer linked are left for other chains
+        self.assertEqual(IssuerCertificateModel.objects.count(), 3)
+
+        certificate.chain = []
+        CertificateModel.save_many([certificate])
+        self.assertFalse(CertificateChainModel.objects.exists())
+        model = CertificateModel.objects.get(certificate_id=certificate.certificate_id)
+        self.assertEqual(model.to_entity().chain, [])
+        self.assertIsNone(model.legacy_chain_pem)
+
+    def test_legacy_chain_pem(self):
+        certificate = _certificate(0)
+        certificate.chain_pem = INTERMEDIATE_PEM + ROOT_PEM
+        CertificateModel.save_many([certificate])
+        model = CertificateModel.objects.get(certificate_id=certificate.certificate_id)
+        # written alongside the links, for the code before them
+        self.assertEqual(model.legacy_chain_pem, (INTERMEDIATE_PEM + ROOT_PEM).decode())
+
+        # and read when the code before them saved the chain
+        CertificateModel.objects.filter(
+            certificate_id=certificate.certificate_id
+        ).update(legacy_chain_pem=OTHER_ROOT_PEM.decode())
+        CertificateChainModel.objects.all().delete()
+        model = CertificateModel.objects.get(certificate_id=certificate.certificate_id)
+        self.assertEqual(model.to_entity().chain_pem, OTHER_ROOT_PEM)
+
+    def test_issuer_pems_are_cached(self):
+        certificate = _certificate(0)
+        certificate.chain_pem = INTERMEDIATE_PEM + ROOT_PEM
+        CertificateModel.save_from_entity(certificate)
+        model = CertificateModel.objects.get(certificate_id=certificate.certificate_id)
+        # the links, then the issuers
+        with self.assertNumQueries(2):
+            model.chain_pem
+        with self.assertNumQueries(1):
+            model.chain_pem
+        # the tags, alternate names and the links once, the issuers from the cache
+        with self.assertNumQueries(3):
+            model.to_entity()
+
+
+class CertificateModelStorageIntegrationTestCase(DBTestCase):
+    def _stored(self, certificate: Certificate) -> CertificateModel:
+        return CertificateModel.objects.get(certificate_id=certificate.certificate_id)
+
+    def test_storages_round_trip(self):
+        for index, storage in enumerate(CertificateStorage):
+            with self.subTest(storage=storage), override_settings(
+                CERTIFICATE_STORAGE=storage.value
+            ):
+                # arns are unique, so each storage saves a certificate of its own
+                certificate = _certificate(index)
+                certificate.certificate_pem = INTERMEDIATE_PEM
+                CertificateModel.save_from_entity(certificate)
+                model = self._stored(certificate)
+                self.assertEqual(model.fingerprint, certificate.fingerprint.hex())
+                if storage is CertificateStorage.PEM:
+                    self.assertEqual(model.certificate_pem, INTERMEDIATE_PEM.decode())
+                    self.assertIsNone(model.certificate_der)
+                else:
+                    self.assertEqual(model.certificate_pem, "")
+                    self.assertIsNone(model.csr_der)
+                entity = model.to_entity()
+                self.assertEqual(entity.certificate_der, certificate.certificate_der)
+                self.assertEqual(entity.certificate_pem, INTERMEDIATE_PEM)
+
+    def test_convert_storage(self):
+        certificates = [_certificate(index) for index in range(3)]
+        for certificate in certificates:
+            certificate.certificate_pem = ROOT_PEM
+        CertificateModel.save_many(certificates)
+
+        out = StringIO()
+        call_command(
+            "convert_certificate_storage",
+            storage="der_compressed",
+            batch_size=2,
+            stdout=out,
+        )
+        self.assertIn("Converted 3 certificates to der_compressed", out.getvalue())
+        model = self._stored(certificates[1])
+        self.assertEqual(model.certificate_pem, "")
+        self.assertNotEqual(bytes(model.certificate_der)[:1], b"\x30")
+        self.assertEqual(model.to_entity().certificate_pem, ROOT_PEM)
+        # rows already in the storage aren't rewritten
+        self.assertEqual(
+            CertificateModel.convert_storage(CertificateStorage.DER_COMPRESSED), 0
+        )
+
+        self.assertEqual(CertificateModel.convert_storage(CertificateStorage.PEM), 3)
+        model = self._stored(certificates[1])
+        self.assertEqual(model.certificate_pem, ROOT_PEM.decode())
+        self.assertIsNone(model.certificate_der)
@@ -0,0 +1,532 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
+
+from certtool_api.core import Certificate, PrivateKey, Status, Subject, Tags
+from certtool_api.core.x509_encoding import LazyX509
+from certtool_api.models import (
+    CertificateModel,
+    RenewalCheckpointModel,
+    SubjectAlternateNameModel,
+    TagsModel,
+)
+from certtool_api.repositories import (
+    FindQuery,
+    InvalidCursorError,
+    InvalidQueryError,
+    RepoFactory,
+)
+from certtool_api.views.export import export_certificates
+from cryptography import x509
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.serialization import Encoding
+from django.core.exceptions import PermissionDenied
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, models, transaction
+from django.test import RequestFactory
+from django_db_test_utils import DBTestCase
+
+PCA_ARN = "arn:aws:acm-pca:us-east-1:123456789012:certificate-authority/ca"
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _certificates(count: int) -> list[Certificate]:
+    return [
+        Certificate(
+            subject=Subject(common_name=f"host{index}.example.com"),
+            alternate_names=[f"host{index}.example.com", f"www{index}.example.com"],
+            tags=Tags(team="platform", index=str(index)),
+        )
+        for index in range(count)
+    ]
+
+
+def _self_signed(common_name: str) -> bytes:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, common_name)])
+    return (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(NOW)
+        .not_valid_after(NOW + timedelta(days=1))
+        .sign(key, SHA256())
+        .public_bytes(Encoding.PEM)
+    )
+
+
+# the plan of queryset, with sequential scans priced out on postgres so it picks any index that can serve it
+def _plan(queryset: models.QuerySet) -> str:
+    if connection.vendor != "postgresql":
+        return queryset.explain()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+
+# whether plan looks column up in an index, rather than filtering rows read some other way
+def _uses_index(plan: str, column: str) -> bool:
+    if connection.vendor == "postgresql":
+        return any(
+            column in line
+            for line in plan.splitlines()
+            if "Index Cond" in line or "Recheck Cond" in line
+        )
+    return any(
+        line.lstrip(" |`-0123456789").startswith("SEARCH") and column in line
+        for line in plan.splitlines()
+    )
+
+
+class CertificateRepositoryIntegrationTestCase(DBTestCase):
+    def test_all_reads_in_constant_queries(self):
+        repo = RepoFactory.certificate()
+        CertificateModel.save_many(_certificates(20))
+        # the certificates, then their tags, alternate names and chain links
+        with self.assertNumQueries(4):
+            self.assertEqual(len(repo.all()), 20)
+
+        CertificateModel.save_many(_certificates(200))
+        with self.assertNumQueries(4):
+            certificates: list[Certificate] = repo.all()
+        self.assertEqual(len(certificates), 220)
+        last: Certificate = certificates[-1]
+        self.assertEqual(last.tags, Tags(team="platform", index="199"))
+        self.assertEqual(
+            last.alternate_names, ["host199.example.com", "www199.example.com"]
+        )
+
+    def test_get(self):
+        repo = RepoFactory.certificate()
+        certificate = _certificates(1)[0]
+        repo.save(certificate)
+        with self.assertNumQueries(4):
+            fetched: Certificate = repo.get(id=certificate.certificate_id)
+        self.assertEqual(fetched.common_name, "host0.example.com")
+        self.assertEqual(fetched.tags, certificate.tags)
+
+    def test_iter_streams_in_chunks(self):
+        repo = RepoFactory.certificate()
+        ids = CertificateModel.save_many(_certificates(25))
+        # per chunk of 10, the certificates, their tags, alternate names and chain links, then a last short chunk
+        with self.assertNumQueries(12):
+            certificates: list[Certificate] = list(repo.iter(chunk_size=10))
+        self.assertEqual([c.certificate_id for c in certificates], ids)
+        self.assertEqual(certificates[12].tags, Tags(team="platform", index="12"))
+
+    def test_iter_resumes_from_cursor(self):
+        repo = RepoFactory.certificate()
+        ids = CertificateModel.save_many(_certificates(12))
+        entities = repo.iter(chunk_size=5)
+        self.assertIsNone(entities.cursor)
+        for _ in range(7):
+            next(entities)
+        cursor = entities.cursor
+
+        # rows added while the job was stopped are picked up too
+        ids += CertificateModel.save_many(_certificates(2))
+        resumed = [c.certificate_id for c in repo.iter(chunk_size=5, cursor=cursor)]
+        self.assertEqual(resumed, ids[7:])
+
+    def test_iter_rejects_bad_cursor(self):
+        for cursor in ("not a cursor", "eyJ2IjogMn0"):
+            with self.assertRaises(InvalidCursorError):
+                RepoFactory.certificate().iter(cursor=cursor)
+
+
+class CertificateRepositoryFindIntegrationTestCase(DBTestCase):
+    def setUp(self):
+        self.repo = RepoFactory.certificate()
+        self.certificates = _certificates(6)
+        for index, certificate in enumerate(self.certificates):
+            certificate.private_ca_arn = f"{PCA_ARN}/certificate/{index}"
+            certificate.status = Status.ACTIVE if index % 2 else Status.REVOKED
+            certificate.not_after = NOW + timedelta(days=index)
+        CertificateModel.save_many(self.certificates)
+
+    def _ids(self, certificates: list[Certificate]) -> list[int]:
+        return [certificate.certificate_id for certificate in certificates]
+
+    def test_find(self):
+        ids = self._ids(self.certificates)
+        self.assertEqual(
+            self._ids(self.repo.find(private_ca_arn=f"{PCA_ARN}/certificate/2")),
+            [ids[2]],
+        )
+        self.assertEqual(
+            self._ids(self.repo.find(status=Status.ACTIVE)), [ids[1], ids[3], ids[5]]
+        )
+        self.assertEqual(
+            self._ids(
+                self.repo.find(
+                    status__in=[Status.ACTIVE, "REVOKED"],
+                    not_after__gte=NOW + timedelta(days=2),
+                    not_after__lt=NOW + timedelta(days=5),
+                )
+            ),
+            ids[2:5],
+        )
+        self.assertEqual(
+            self._ids(self.repo.find(order_by="-not_after", limit=2)),
+            [ids[5], ids[4]],
+        )
+        found = self.repo.find(subject_common_name="host3.example.com")
+        self.assertEqual(found[0].tags, Tags(team="platform", index="3"))
+        self.assertEqual(self.repo.find(acm_arn__in=[]), [])
+
+    def test_find_rejects_unindexed_queries(self):
+        for kwargs in (
+            {"key_reference": "ref"},
+            {"private_ca_arn__startswith": PCA_ARN},
+            {"status__in": "ACTIVE"},
+            {"order_by": "status"},
+            {"limit": 0},
+        ):
+            with self.subTest(kwargs=kwargs), self.assertRaises(InvalidQueryError):
+                self.repo.find(**kwargs)
+
+    def test_every_find_filter_uses_an_index(self):
+        values: dict[str, object] = {
+            "acm_arn": "arn:aws:acm:us-east-1:123456789012:certificate/1",
+            "private_ca_arn": f"{PCA_ARN}/certificate/1",
+            "fingerprint": "0" * 64,
+            "subject_common_name": "host1.example.com",
+            "status": Status.ACTIVE,
+            "not_after": NOW,
+        }
+        for field, lookups in CertificateModel.FIND_FIELDS.items():
+            for lookup in lookups:
+                value = values[field]
+                with self.subTest(field=field, lookup=lookup):
+                    query = FindQuery.parse(
+                        {f"{field}__{lookup}": [value] if lookup == "in" else value},
+                        CertificateModel.FIND_FIELDS,
+                        CertificateModel.FIND_ORDERING,
+                    )
+                    # without the ordering, which the planner may prefer to serve from the primary key
+                    plan = _plan(query.apply(CertificateModel.objects.all()).order_by())
+                    self.assertTrue(_uses_index(plan, field), plan)
+
+
+class CertificateRepositoryCoveringIntegrationTestCase(DBTestCase):
+    def setUp(self):
+        self.repo = RepoFactory.certificate()
+
+    def _save(self, *alternate_names: str, days: int = 30, **kwargs) -> int:
+        certificate = Certificate(
+            subject=Subject(common_name=alternate_names[0]),
+            alternate_names=list(alternate_names),
+            status=kwargs.pop("status", Status.ACTIVE),
+            not_after=NOW + timedelta(days=days),
+        )
+        self.repo.save(certificate)
+        return certificate.certificate_id
+
+    def _covering(self, hostname: str) -> list[int]:
+        return [c.certificate_id for c in self.repo.covering(hostname, at=NOW)]
+
+    def test_covering(self):
+        exact = self._save("api.payments.internal", days=60)
+        wildcard = self._save("*.Payments.Internal", days=10)
+        self._save("*.internal")
+        self._save("payments.internal")
+        self._save("api.payments.internal", status=Status.REVOKED)
+        self._save("api.payments.internal", days=-1)
+
+        # soonest expiring first, and only the active certificates that haven't expired
+        self.assertEqual(self._covering("API.payments.internal."), [wildcard, exact])
+        self.assertEqual(self._covering("web.payments.internal"), [wildcard])
+        self.assertEqual(self._covering("a.b.payments.internal"), [])
+
+    def test_covering_idna(self):
+        certificate_id = self._save("*.bücher.example")
+        self.assertEqual(self._covering("shop.xn--bcher-kva.example"), [certificate_id])
+        self.assertEqual(self._covering("shop.BÜCHER.example"), [certificate_id])
+
+    def test_under(self):
+        ids = [
+            self._save("payments.internal", days=3),
+            self._save("*.payments.internal", days=2),
+            self._save("a.b.payments.internal", days=1),
+        ]
+        self._save("paymentsXinternal")
+        self._save("otherpayments.internal")
+        self.assertEqual(
+            [c.certificate_id for c in self.repo.under("payments.internal", at=NOW)],
+            ids[::-1],
+        )
+
+    def test_lookups_use_the_reversed_name_index(self):
+        lookups: list[models.QuerySet] = [
+            SubjectAlternateNameModel.objects.filter(
+                reversed_name__in=["internal.payments.api", "internal.payments.*"]
+            )
+        ]
+        # sqlite's LIKE is case insensitive, so only postgres, with pattern ops, can serve a prefix from it
+        if connection.vendor == "postgresql":
+            lookups.append(
+                SubjectAlternateNameModel.objects.filter(
+                    reversed_name__startswith="internal.payments."
+                )
+            )
+        for alternate_names in lookups:
+            plan = _plan(alternate_names)
+            self.assertTrue(_uses_index(plan, "reversed_name"), plan)
+
+
+class CertificateRepositoryTaggedIntegrationTestCase(DBTestCase):
+    def setUp(self):
+        self.repo = RepoFactory.certificate()
+        # every certificate is team=platform, and parity=even is every other one
+        certificates = _certificates(10)
+        for index, certificate in enumerate(certificates):
+            certificate.tags.add_tag("parity", "odd" if index % 2 else "even")
+        CertificateModel.save_many(certificates)
+        self.ids = [certificate.certificate_id for certificate in certificates]
+
+    def test_tagged_intersects_tags(self):
+        tagged = self.repo.tagged(Tags(team="platform", parity="even"))
+        self.assertEqual([c.certificate_id for c in tagged], self.ids[::2])
+        tagged = self.repo.tagged(Tags(parity="odd", index="3"))
+        self.assertEqual([c.certificate_id for c in tagged], [self.ids[3]])
+        self.assertEqual(list(self.repo.tagged(Tags(team="platform", index="x"))), [])
+
+    def test_tagged_resumes_from_cursor(self):
+        tagged = self.repo.tagged(Tags(parity="even"), chunk_size=2)
+        first = [next(tagged).certificate_id for _ in range(3)]
+        rest = self.repo.tagged(Tags(parity="even"), chunk_size=2, cursor=tagged.cursor)
+        self.assertEqual(first + [c.certificate_id for c in rest], self.ids[::2])
+
+    def test_tagged_rejects_no_tags(self):
+        with self.assertRaises(InvalidQueryError):
+            self.repo.tagged(Tags())
+
+    def test_tag_lookup_uses_the_tag_index(self):
+        plan = _plan(
+            TagsModel.objects.filter(tag_key="team", tag_value="platform").values(
+                "certificate_id"
+            )
+        )
+        self.assertTrue(_uses_index(plan, "tag_key"), plan)
+
+
+class CertificateRepositoryExpiringIntegrationTestCase(DBTestCase):
+    def setUp(self):
+        self.repo = RepoFactory.certificate()
+
+    def _save(self, days: float, status: Status = Status.ACTIVE) -> Certificate:
+        certificate = Certificate(
+            issuer_ca_arn=PCA_ARN,
+            subject=Subject(common_name="host.example.com"),
+            not_after=NOW + timedelta(days=days),
+            status=status,
+        )
+        self.repo.save(certificate)
+        return certificate
+
+    def test_expiring_pages_in_not_after_order(self):
+        ties = [self._save(days=2) for _ in range(3)]
+        first = self._save(days=1)
+        self._save(days=1, status=Status.REVOKED)
+        self._save(days=40)
+        expected = [first.certificate_id] + [c.certificate_id for c in ties]
+
+        before = NOW + timedelta(days=30)
+        page = self.repo.expiring(before, limit=2)
+        self.assertEqual([c.certificate_id for c in page], expected[:2])
+        # resuming between certificates with the same not_after
+        rest = self.repo.expiring(
+            before, after=(page[-1].not_after, page[-1].certificate_id)
+        )
+        self.assertEqual([c.certificate_id for c in rest], expected[2:])
+
+    def test_expiring_skips_certificates_we_did_not_issue(self):
+        issued = self._save(days=1)
+        acm = Certificate(
+            acm_arn="arn:aws:acm:us-east-1:123456789012:certificate/1",
+            not_after=NOW + timedelta(days=1),
+            status=Status.ACTIVE,
+        )
+        imported = Certificate(not_after=NOW + timedelta(days=1), status=Status.ACTIVE)
+        self.repo.save_many([acm, imported])
+        self.assertEqual(
+            [c.certificate_id for c in self.repo.expiring(NOW + timedelta(days=30))],
+            [issued.certificate_id, acm.certificate_id],
+        )
+
+    def test_supersede(self):
+        certificate = self._save(days=1)
+        renewal = Certificate(
+            subject=Subject(common_name="host.example.com"),
+            not_after=NOW + timedelta(days=365),
+            status=Status.ACTIVE,
+        )
+        self.repo.supersede(certificate, renewal)
+        self.assertEqual(
+            self.repo.get(certificate.certificate_id).status, Status.INACTIVE
+        )
+        self.assertEqual(self.repo.get(renewal.certificate_id).status, Status.ACTIVE)
+        self.assertEqual(self.repo.expiring(NOW + timedelta(days=30)), [])
+
+    def test_supersede_stores_the_renewal_key(self):
+        certificate = self._save(days=1)
+        renewal = Certificate(
+            key=PrivateKey(kms_encrypted_key=b"encrypted", kms_encryption_context={}),
+            subject=Subject(common_name="host.example.com"),
+            status=Status.ACTIVE,
+        )
+        self.repo.supersede(certificate, renewal)
+        stored = CertificateModel.objects.select_related("private_key_id").get(
+            certificate_id=renewal.certificate_id
+        )
+        self.assertEqual(stored.private_key_id.pk, renewal.key.private_key_id)
+        self.assertEqual(bytes(stored.private_key_id.kms_encrypted_key), b"encrypted")
+
+    def test_expiring_uses_the_status_index(self):
+        plan = _plan(
+            CertificateModel.objects.filter(
+                status=Status.ACTIVE.value, not_after__lt=NOW
+            ).order_by("not_after", "pk")
+        )
+        self.assertTrue(_uses_index(plan, "not_after"), plan)
+
+    def test_checkpoint(self):
+        checkpoints = RepoFactory.renewal_checkpoint()
+        self.assertIsNone(checkpoints.load("default"))
+        checkpoints.store("default", (NOW, 1))
+        checkpoints.store("default", (NOW + timedelta(days=1), 2))
+        checkpoints.store("other", (NOW, 3))
+        self.assertEqual(checkpoints.load("default"), (NOW + timedelta(days=1), 2))
+        self.assertEqual(RenewalCheckpointModel.objects.count(), 2)
+        checkpoints.clear("default")
+        self.assertIsNone(checkpoints.load("default"))
+        self.assertEqual(checkpoints.load("other"), (NOW, 3))
+
+
+class CertificateRepositoryImportIntegrationTestCase(DBTestCase):
+    def setUp(self):
+        self.repo = RepoFactory.certificate()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_stored_fingerprints(self):
+        root, intermediate = _self_signed("root.example.com"), _self_signed(
+            "intermediate.example.com"
+        )
+        certificate = Certificate(subject=Subject(common_name="root.example.com"))
+        certificate.certificate_pem = root
+        self.repo.save_many([certificate, Certificate()])
+        stored = certificate.fingerprint.hex()
+        other = Certificate(certificate=LazyX509.certificate(pem=intermediate))
+        self.assertEqual(
+            self.repo.stored_fingerprints([stored, other.fingerprint.hex()]), {stored}
+        )
+        self.assertEqual(self.repo.stored_fingerprints([]), set())
+
+    def test_import_certificates_command(self):
+        path = os.path.join(self.directory, "bundle.pem")
+        with open(path, "wb") as file:
+            file.write(
+                _self_signed("a.example.com")
+                + b"not a certificate\n"
+                + _self_signed("b.example.com")
+            )
+        out = StringIO()
+        call_command(
+            "import_certificates", path, workers=0, tag=["source=import"], stdout=out
+        )
+        self.assertIn("Imported 2 certificates from 3 items", out.getvalue())
+        self.assertIn("1 invalid", out.getvalue())
+        self.assertEqual(
+            sorted(c.subject.common_name for c in self.repo.find(status=Status.ACTIVE)),
+            ["a.example.com", "b.example.com"],
+        )
+        self.assertEqual(TagsModel.objects.filter(tag_value="import").count(), 2)
+
+        call_command("import_certificates", path, workers=0, stdout=out)
+        self.assertIn("Imported 0 certificates from 3 items", out.getvalue())
+        self.assertEqual(CertificateModel.objects.count(), 2)
+
+
+class CertificateRepositoryExportIntegrationTestCase(DBTestCase):
+    def setUp(self):
+        self.repo = RepoFactory.certificate()
+        certificates = _certificates(6)
+        for index, certificate in enumerate(certificates):
+            certificate.certificate_pem = _self_signed(f"host{index}.example.com")
+            certificate.not_after = NOW + timedelta(days=index)
+            certificate.status = Status.REVOKED if index % 3 == 0 else Status.ACTIVE
+        CertificateModel.save_many(certificates)
+        self.ids = [certificate.certificate_id for certificate in certificates]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_iter_filters(self):
+        streamed = self.repo.iter(
+            chunk_size=2, status=Status.ACTIVE, not_after__gte=NOW + timedelta(days=2)
+        )
+        self.assertEqual(
+            [c.certificate_id for c in streamed],
+            [self.ids[2], self.ids[4], self.ids[5]],
+        )
+
+    def test_tagged_filters(self):
+        tagged = self.repo.tagged(Tags(team="platform"), status=Status.REVOKED)
+        self.assertEqual([c.certificate_id for c in tagged], [self.ids[0], self.ids[3]])
+
+    def test_streams_reject_order_and_limit(self):
+        for filters in ({"order_by": "not_after"}, {"limit": 2}, {"serial": "1"}):
+            with self.subTest(filters=filters), self.assertRaises(InvalidQueryError):
+                self.repo.iter(**filters)
+
+    def test_export_certificates_command(self):
+        path = os.path.join(self.directory, "inventory.jsonl")
+        out = StringIO()
+        call_command(
+            "export_certificates",
+            format="jsonl",
+            output=path,
+            status="ACTIVE",
+            tag=["team=platform"],
+            stdout=out,
+        )
+        self.assertIn(f"to {path}.", out.getvalue())
+        with open(path, "rb") as file:
+            exported = [json.loads(line) for line in file]
+        self.assertEqual(
+            [line["certificate_id"] for line in exported],
+            [self.ids[index] for index in (1, 2, 4, 5)],
+        )
+
+        with self.assertRaises(CommandError):
+            call_command("export_certificates", expires_before="tomorrow", stdout=out)
+
+    def test_export_endpoint(self):
+        request = RequestFactory().get(
+            "/certificates/export/",
+            {"format": "pem", "expires_before": "2026-01-02T12:00"},
+        )
+        request.user = mock.Mock(has_perms=mock.Mock(return_value=True))
+        response = export_certificates(request)
+        self.assertEqual(response["Content-Type"], "application/x-pem-file")
+        self.assertEqual(
+            b"".join(response.streaming_content).count(b"-----BEGIN CERTIFICATE-----"),
+            2,
+        )
+
+        request = RequestFactory().get("/certificates/export/", {"format": "zip"})
+        request.user = mock.Mock(has_perms=mock.Mock(return_value=True))
+        self.assertEqual(export_certificates(request).status_code, 400)
+
+        request.user = mock.Mock(has_perms=mock.Mock(return_value=False))
+        with self.assertRaises(PermissionDenied):
+            export_certificates(request)
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from certtool_api.core.issuance import IssuanceInProgressError
+from certtool_api.models import IssuanceModel
+from certtool_api.repositories import RepoFactory
+from django.utils import timezone
+from django_db_test_utils import DBTestCase
+
+KEY = "0" * 64
+ARN = "arn:aws:acm:us-east-1:123456789012:certificate/issued"
+WINDOW = timedelta(hours=1)
+LEASE = timedelta(minutes=45)
+
+
+class IssuanceRepositoryIntegrationTestCase(DBTestCase):
+    def setUp(self):
+        self.issuances = RepoFactory.issuance()
+
+    def test_first_claim_issues(self):
+        self.assertIsNone(self.issuances.claim(KEY, WINDOW, LEASE))
+        self.issuances.record(KEY, ARN)
+        self.assertEqual(self.issuances.claim(KEY, WINDOW, LEASE), ARN)
+        self.assertEqual(IssuanceModel.objects.count(), 1)
+
+    def test_leased_request_is_in_progress(self):
+        self.assertIsNone(self.issuances.claim(KEY, WINDOW, LEASE))
+        with self.assertRaises(IssuanceInProgressError):
+            self.issuances.claim(KEY, WINDOW, LEASE)
+
+    def test_expired_lease_can_be_taken(self):
+        self.issuances.claim(KEY, WINDOW, LEASE)
+        IssuanceModel.objects.update(
+            claimed_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertIsNone(self.issuances.claim(KEY, WINDOW, LEASE))
+
+    def test_claim_outside_window_issues_again(self):
+        self.issuances.claim(KEY, WINDOW, LEASE)
+        self.issuances.record(KEY, ARN)
+        IssuanceModel.objects.update(issued_at=timezone.now() - 2 * WINDOW)
+        self.assertIsNone(self.issuances.claim(KEY, WINDOW, LEASE))
+
+    def test_released_request_issues_at_once(self):
+        self.issuances.claim(KEY, WINDOW, LEASE)
+        self.issuances.release(KEY)
+        self.assertIsNone(self.issuances.claim(KEY, WINDOW, LEASE))
@@ -0,0 +1,164 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from attrs import define, field
+from certtool_api.core import Certificate
+from certtool_api.repositories.aws.certificate_authority import AWSCertificateAuthority
+
+CA_ARN = "arn:aws:acm-pca:us-east-1:123456789012:certificate-authority/test"
+
+
+class RequestInProgressException(Exception):
+    pass
+
+
+class LimitExceededException(Exception):
+    pass
+
+
+@define
+class ACMPCAClientFake:
+    """
+    An ACM-PCA client that reports each certificate as in progress for its first pending_polls
+    GetCertificate calls, and refuses to issue any CSR containing b"bad". A repeated IdempotencyToken is
+    given the certificate first issued for it.
+    """
+
+    pending_polls: int = 2
+    delay: float = 0.01
+    issued: dict = field(factory=dict)
+    polls: dict = field(factory=dict)
+    tokens: dict = field(factory=dict)
+    in_flight: int = 0
+    max_in_flight: int = 0
+    exceptions: object = field(
+        factory=lambda: mock.Mock(
+            RequestInProgressException=RequestInProgressException,
+            LimitExceededException=LimitExceededException,
+        )
+    )
+    _lock: threading.Lock = field(factory=threading.Lock)
+
+    def issue_certificate(
+        self, CertificateAuthorityArn, Csr, SigningAlgorithm, Validity, IdempotencyToken
+    ):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+            if "bad" in Csr:
+                raise LimitExceededException()
+            if IdempotencyToken in self.tokens:
+                return {"CertificateArn": self.tokens[IdempotencyToken]}
+            arn = f"{CertificateAuthorityArn}/certificate/{len(self.issued)}"
+            self.issued[arn] = Csr
+            self.polls[arn] = 0
+            self.tokens[IdempotencyToken] = arn
+        return {"CertificateArn": arn}
+
+    def get_certificate(self, CertificateAuthorityArn, CertificateArn):
+        with self._lock:
+            self.polls[CertificateArn] += 1
+            if self.polls[CertificateArn] <= self.pending_polls:
+                raise RequestInProgressException()
+        return {
+            "Certificate": f"cert for {self.issued[CertificateArn]}",
+            "CertificateChain": "chain",
+        }
+
+
+def _certificate(csr: bytes) -> Certificate:
+    certificate = mock.Mock(spec=Certificate)
+    certificate.csr_pem = csr
+    return certificate
+
+
+class IssueCertificatesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = ACMPCAClientFake()
+        patcher = mock.patch.object(
+            AWSCertificateAuthority, "_client", new_callable=mock.PropertyMock
+        )
+        patcher.start().return_value = self.client
+        self.addCleanup(patcher.stop)
+        self.ca = AWSCertificateAuthority(arn=CA_ARN)
+
+    def _issue(self, certificates, **kwargs):
+        kwargs.setdefault("poll_delay", 0.01)
+        kwargs.setdefault("max_poll_delay", 0.05)
+        return list(self.ca.issue_certificates(certificates, **kwargs))
+
+    def test_every_certificate_is_issued(self):
+        certificates = [_certificate(f"csr {i}".encode()) for i in range(10)]
+        results = self._issue(certificates, max_workers=4)
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(result.ok for result in results))
+        for result in results:
+            self.assertEqual(
+                result.certificate.certificate_pem,
+                f"cert for {result.certificate.csr_pem.decode()}".encode(),
+            )
+            self.assertEqual(result.certificate.issuer_ca_arn, CA_ARN)
+            self.assertEqual(result.polls, self.client.pending_polls + 1)
+            self.assertGreater(result.latency, 0)
+
+    def test_submissions_are_concurrent(self):
+        self._issue(
+            [_certificate(f"csr {i}".encode()) for i in range(8)], max_workers=4
+        )
+        self.assertGreater(self.client.max_in_flight, 1)
+        self.assertLessEqual(self.client.max_in_flight, 4)
+
+    def test_failures_are_reported_per_certificate(self):
+        certificates = [_certificate(b"csr"), _certificate(b"bad csr")]
+        results = {
+            result.certificate.csr_pem: result for result in self._issue(certificates)
+        }
+        self.assertTrue(results[b"csr"].ok)
+        self.assertIsInstance(results[b"bad csr"].error, LimitExceededException)
+        self.assertEqual(results[b"bad csr"].polls, 0)
+
+    def test_resubmitting_a_csr_issues_one_certificate(self):
+        first, retried, other = self._issue(
+            [_certificate(b"csr"), _certificate(b"csr"), _certificate(b"other csr")],
+            max_workers=1,
+        )
+        self.assertEqual(first.certificate.certificate_pem, b"cert for csr")
+        self.assertEqual(retried.certificate.certificate_pem, b"cert for csr")
+        self.assertEqual(other.certificate.certificate_pem, b"cert for other csr")
+        self.assertEqual(len(self.client.issued), 2)
+        self.assertTrue(all(len(token) == 36 for token in self.client.tokens))
+
+    def test_gives_up_after_timeout(self):
+        self.client.pending_polls = 1000
+        (result,) = self._issue([_certificate(b"csr")], timeout=0.1)
+        self.assertFalse(result.ok)
+        self.assertGreaterEqual(result.latency, 0.1)
+
+    def test_waiting_for_polls_does_not_spin(self):
+        self.client.pending_polls = 3
+        started, cpu_started = time.monotonic(), time.process_time()
+        (result,) = self._issue(
+            [_certificate(b"csr")], poll_delay=0.2, max_poll_delay=0.2
+        )
+        elapsed = time.monotonic() - started
+        self.assertTrue(result.ok)
+        self.assertGreater(elapsed, 0.3)
+        self.assertLess(time.process_time() - cpu_started, elapsed / 4)
+
+    def test_latency_starts_when_the_submission_is_sent(self):
+        self.client.delay = 0.1
+        results = self._issue(
+            [_certificate(f"bad csr {i}".encode()) for i in range(4)], max_workers=1
+        )
+        self.assertEqual(len(results), 4)
+        # the later submissions queue behind the others but are only timed from their own call
+        self.assertTrue(all(result.latency < 0.2 for result in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from certtool_api.core import Certificate, Subject, Tags
+from certtool_api.repositories.aws.certificate_authority import AWSCertificateAuthority
+from certtool_api.repositories.aws.certificate_manager import (
+    AWSCertificateManager,
+    AWSCertificateManagerError,
+)
+from certtool_api.tests.fakes import FakeAWS
+
+
+class AWSCertificateManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.aws = FakeAWS()
+        self.ca_arn = self.aws.acm_pca.create_certificate_authority()
+        patcher = self.aws.patch_clients()
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+
+    def test_request_certificate(self):
+        manager = AWSCertificateManager(
+            private_ca=AWSCertificateAuthority(arn=self.ca_arn)
+        )
+        certificate = Certificate(
+            subject=Subject(common_name="service.example.com"),
+            alternate_names=["service.example.com", "api.example.com"],
+            tags=Tags(team="platform"),
+        )
+        certificate = manager.request_certificate(certificate)
+        self.assertIsNotNone(certificate.acm_arn)
+        self.assertEqual(certificate.issuer_ca_arn, self.ca_arn)
+        self.assertEqual(
+            certificate.alternate_names, ["service.example.com", "api.example.com"]
+        )
+        self.assertEqual(
+            certificate.certificate.public_key().public_numbers(),
+            certificate.key.key.public_key().public_numbers(),
+        )
+        self.assertEqual(
+            self.aws.acm.certificates[certificate.acm_arn].tags, {"team": "platform"}
+        )
+
+    def test_request_certificate_needs_private_ca(self):
+        with self.assertRaises(AWSCertificateManagerError):
+            AWSCertificateManager().request_certificate(Certificate())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from attrs import define, field
+from certtool_api.core import Certificate, PrivateKey, Subject
+from certtool_api.core.certificate_types import CertificateType
+from certtool_api.core.private_key import KeyTypes
+from certtool_api.repositories.local import (
+    LocalCertificateAuthority,
+    LocalCertificateAuthorityError,
+)
+from cryptography.hazmat.primitives.asymmetric.ec import ECDSA
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.x509 import (
+    BasicConstraints,
+    CertificateBuilder,
+    DNSName,
+    ExtendedKeyUsage,
+    ExtendedKeyUsageOID,
+    SubjectAlternativeName,
+    random_serial_number,
+)
+
+ROOT_ARN = "arn:aws:acm-pca:us-east-1:123456789012:certificate-authority/root"
+
+
+@define
+class IssuerFake:
+    """An ACM Private CA that signs subordinate CSRs with an in memory root valid for valid_days."""
+
+    valid_days: int = 30
+    arn: str = ROOT_ARN
+    issued: int = 0
+    failing: bool = False
+    _root: PrivateKey = field(
+        factory=lambda: PrivateKey.new(key_size=256, key_type=KeyTypes.EC)
+    )
+
+    def issue_certificate(self, certificate: Certificate) -> Certificate:
+        if self.failing:
+            raise RuntimeError("issuer unavailable")
+        now = datetime.now(timezone.utc)
+        certificate.certificate = (
+            CertificateBuilder()
+            .subject_name(certificate.csr.subject)
+            .issuer_name(Subject(common_name="root").to_x509_name())
+            .public_key(certificate.csr.public_key())
+            .serial_number(random_serial_number())
+            .not_valid_before(now)
+            .not_valid_after(now + timedelta(days=self.valid_days))
+            .add_extension(BasicConstraints(ca=True, path_length=0), critical=True)
+            .sign(self._root.key, SHA256())
+        )
+        self.issued += 1
+        certificate.issuer_ca_arn = self.arn
+        certificate.private_ca_arn = f"{self.arn}/certificate/{self.issued}"
+        return certificate
+
+
+@define
+class SubordinateStoreFake:
+    saved: list[Certificate] = field(factory=list)
+
+    def current(self, issuer_ca_arn: str) -> Certificate | None:
+        if not self.saved:
+            return None
+        newest = max(self.saved, key=lambda certificate: certificate.not_after)
+        # hand back what a database would, a key that is still encrypted
+        return Certificate(
+            private_ca_arn=newest.private_ca_arn,
+            certificate=newest.certificate,
+            key=PrivateKey(kms_encrypted_key=newest.key.kms_encrypted_key),
+            not_after=newest.not_after,
+        )
+
+    def save(self, certificate: Certificate) -> Certificate:
+        self.saved.append(certificate)
+        return certificate
+
+
+@define
+class KMSServiceFake:
+    decrypted: int = 0
+
+    def encrypt_private_key(
+        self, key: PrivateKey, encryption_context: dict[str, str] | None = None
+    ) -> PrivateKey:
+        key.set_kms_encrypted_key(b"enc:" + key.get_key_der(), encryption_context)
+        return key
+
+    def decrypt_private_key(self, key: PrivateKey) -> PrivateKey:
+        self.decrypted += 1
+        key.set_der(key.kms_encrypted_key.removeprefix(b"enc:"))
+        return key
+
+
+def _leaf(*alternate_names: str) -> Certificate:
+    certificate = Certificate(
+        key=PrivateKey.new(key_size=256, key_type=KeyTypes.EC),
+        subject=Subject(common_name="service.example.com"),
+    )
+    return certificate.generate_csr(alternate_names=list(alternate_names))
+
+
+class LocalCertificateAuthorityTestCase(unittest.TestCase):
+    def setUp(self):
+        self.issuer = IssuerFake()
+        self.store = SubordinateStoreFake()
+        self.kms = KMSServiceFake()
+
+    def _ca(self, **kwargs) -> LocalCertificateAuthority:
+        return LocalCertificateAuthority(
+            issuer=self.issuer,
+            store=self.store,
+            kms=self.kms,
+            subject=Subject(common_name="issuing ca"),
+            **kwargs,
+        )
+
+    def test_signs_leaf_with_subordinate(self):
+        ca = self._ca()
+        certificate = ca.issue_certificate(_leaf("a.example.com", "b.example.com"))
+        subordinate = certificate.chain[0]
+        subordinate.public_key().verify(
+            certificate.certificate.signature,
+            certificate.certificate.tbs_certificate_bytes,
+            ECDSA(SHA256()),
+        )
+        self.assertEqual(certificate.certificate.issuer, subordinate.subject)
+        self.assertEqual(
+            certificate.certificate.extensions.get_extension_for_class(
+                SubjectAlternativeName
+            ).value.get_values_for_type(DNSName),
+            ["a.example.com", "b.example.com"],
+        )
+        self.assertEqual(
+            list(
+                certificate.certificate.extensions.get_extension_for_class(
+                    ExtendedKeyUsage
+                ).value
+            ),
+            [ExtendedKeyUsageOID.SERVER_AUTH],
+        )
+        self.assertEqual(certificate.issuer_ca_arn, self.store.saved[0].private_ca_arn)
+
+    def test_subordinate_is_issued_once_and_stored_encrypted(self):
+        ca = self._ca()
+        for _ in range(20):
+            ca.issue_certificate(_leaf())
+        self.assertEqual(self.issuer.issued, 1)
+        self.assertTrue(self.store.saved[0].key.kms_encrypted_key.startswith(b"enc:"))
+
+    def test_loads_stored_subordinate(self):
+        self._ca().issue_certificate(_leaf())
+        ca = self._ca()
+        certificate = ca.issue_certificate(_leaf())
+        self.assertEqual(self.issuer.issued, 1)
+        self.assertEqual(self.kms.decrypted, 1)
+        self.assertEqual(certificate.chain[0], self.store.saved[0].certificate)
+
+    def test_refuses_templates_outside_policy(self):
+        ca = self._ca()
+        with self.assertRaises(LocalCertificateAuthorityError):
+            ca.issue_certificate(_leaf(), certificate_type=CertificateType.Client)
+        ca = self._ca(allowed_types=frozenset(CertificateType))
+        certificate = ca.issue_certificate(
+            _leaf(), certificate_type=CertificateType.Client
+        )
+        self.assertEqual(
+            list(
+                certificate.certificate.extensions.get_extension_for_class(
+                    ExtendedKeyUsage
+                ).value
+            ),
+            [ExtendedKeyUsageOID.CLIENT_AUTH],
+        )
+
+    def test_refuses_certificate_without_csr(self):
+        with self.assertRaises(LocalCertificateAuthorityError):
+            self._ca().issue_certificate(Certificate())
+
+    def test_leaf_never_outlives_subordinate(self):
+        ca = self._ca()
+        certificate = ca.issue_certificate(_leaf(), valid_days=365)
+        self.assertLessEqual(
+            certificate.certificate.not_valid_after,
+            certificate.chain[0].not_valid_after,
+        )
+
+    def test_rotates_before_expiry_without_blocking(self):
+        ca = self._ca(rotate_before=timedelta(days=self.issuer.valid_days))
+        first = ca.issue_certificate(_leaf()).chain[0]
+        # the first subordinate is already inside the rotation window
+        self.assertEqual(ca.issue_certificate(_leaf()).chain[0], first)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            if ca.issue_certificate(_leaf()).chain[0] != first:
+                break
+            time.sleep(0.01)
+        else:
+            self.fail("subordinate was not rotated")
+        self.assertGreaterEqual(self.issuer.issued, 2)
+
+    def test_failed_rotation_is_retried_later(self):
+        ca = self._ca(rotate_before=timedelta(days=self.issuer.valid_days))
+        first = ca.issue_certificate(_leaf()).chain[0]
+        self.issuer.failing = True
+        self.assertEqual(ca.issue_certificate(_leaf()).chain[0], first)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            if ca._state.rotate_at > datetime.now(timezone.utc):
+                break
+            time.sleep(0.01)
+        else:
+            self.fail("rotation was not pushed back")
+        # the old subordinate keeps signing until the retry
+        self.issuer.failing = False
+        self.assertEqual(ca.issue_certificate(_leaf()).chain[0], first)
+        self.assertEqual(self.issuer.issued, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+import io
+import json
+import tarfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from attrs import define, field
+from certtool_api.core import Certificate, Status, Subject, Tags
+from certtool_api.core.x509_encoding import LazyX509
+from certtool_api.services.certificate_exporter import (
+    CertificateExporter,
+    ExportFormat,
+    export_filters,
+)
+from cryptography import x509
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.serialization import Encoding
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _der(common_name: str) -> bytes:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, common_name)])
+    return (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(NOW)
+        .not_valid_after(NOW + timedelta(days=1))
+        .sign(key, SHA256())
+        .public_bytes(Encoding.DER)
+    )
+
+
+ROOT_DER = _der("root.example.com")
+
+
+@define
+class CertificateStoreFake:
+    """
+    A certificate store streaming its certificates from a list, recording the arguments of each stream
+    """
+
+    certificates: list[Certificate] = field(factory=list)
+    streams: list[tuple] = field(factory=list)
+
+    def iter(self, chunk_size=500, cursor=None, **filters):
+        self.streams.append((None, filters))
+        return iter(self.certificates)
+
+    def tagged(self, tags, chunk_size=500, cursor=None, **filters):
+        self.streams.append((tags, filters))
+        return iter(self.certificates)
+
+
+class CertificateExporterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.ders = [_der(f"host{i}.example.com") for i in range(3)]
+        self.repo = CertificateStoreFake(
+            [
+                Certificate(
+                    certificate_id=index + 1,
+                    certificate=LazyX509.certificate(der=der),
+                    chain=[LazyX509.certificate(der=ROOT_DER)],
+                    subject=Subject(common_name=f"host{index}.example.com"),
+                    alternate_names=[f"host{index}.example.com"],
+                    not_before=NOW,
+                    not_after=NOW + timedelta(days=1),
+                    tags=Tags(team="platform"),
+                    status=Status.ACTIVE,
+                )
+                for index, der in enumerate(self.ders)
+            ]
+            # requested but not issued yet
+            + [Certificate(certificate_id=4, status=Status.ACTIVE)]
+        )
+        self.exporter = CertificateExporter(repo=self.repo)
+
+    def _export(self, export_format: ExportFormat, **kwargs) -> bytes:
+        return b"".join(self.exporter.export(export_format, **kwargs))
+
+    def _pems(self, *ders: bytes) -> list[bytes]:
+        return [
+            x509.load_der_x509_certificate(der).public_bytes(Encoding.PEM)
+            for der in ders
+        ]
+
+    def test_pem_bundle(self):
+        expected = []
+        for der in self.ders:
+            expected += self._pems(der, ROOT_DER)
+        self.assertEqual(self._export(ExportFormat.PEM), b"".join(expected))
+        self.assertEqual(
+            self._export(ExportFormat.PEM, chain=False),
+            b"".join(self._pems(*self.ders)),
+        )
+
+    def test_stored_bytes_are_written_without_parsing(self):
+        self._export(ExportFormat.TAR)
+        self._export(ExportFormat.JSONL)
+        self.assertFalse(
+            any(c._certificate.is_parsed for c in self.repo.certificates[:3])
+        )
+
+    def test_jsonl(self):
+        lines = self._export(ExportFormat.JSONL).splitlines()
+        self.assertEqual(len(lines), 4)
+        first = json.loads(lines[0])
+        self.assertEqual(first["certificate_id"], 1)
+        self.assertEqual(
+            first["fingerprint"], self.repo.certificates[0].fingerprint.hex()
+        )
+        self.assertEqual(first["subject"]["common_name"], "host0.example.com")
+        self.assertEqual(first["not_after"], "2026-01-02T00:00:00+00:00")
+        self.assertEqual(first["tags"], {"team": "platform"})
+        self.assertEqual(first["status"], "ACTIVE")
+        self.assertIsNone(json.loads(lines[3])["fingerprint"])
+
+    def test_tar(self):
+        with tarfile.open(
+            fileobj=io.BytesIO(self._export(ExportFormat.TAR))
+        ) as archive:
+            self.assertEqual(
+                archive.getnames(),
+                [
+                    f"certificates/{i}{suffix}"
+                    for i in (1, 2, 3)
+                    for suffix in (".pem", ".chain.pem")
+                ],
+            )
+            self.assertEqual(
+                archive.extractfile("certificates/2.pem").read(),
+                self._pems(self.ders[1])[0],
+            )
+            self.assertEqual(
+                archive.getmember("certificates/2.pem").mtime, NOW.timestamp()
+            )
+
+    def test_exports_are_streamed_in_pieces(self):
+        self.repo.certificates *= 200
+        pieces = list(self.exporter.export(ExportFormat.PEM))
+        self.assertGreater(len(pieces), 1)
+        self.assertTrue(all(len(piece) >= 64 * 1024 for piece in pieces[:-1]))
+
+    def test_tags_and_filters_are_passed_to_the_store(self):
+        self._export(ExportFormat.PEM, status=Status.ACTIVE)
+        self._export(ExportFormat.PEM, tags=Tags(team="platform"), status=Status.ACTIVE)
+        self.assertEqual(
+            [(str(tags), filters) for tags, filters in self.repo.streams],
+            [
+                ("None", {"status": Status.ACTIVE}),
+                ("{'team': 'platform'}", {"status": Status.ACTIVE}),
+            ],
+        )
+
+
+class ExportFiltersTestCase(unittest.TestCase):
+    def test_export_filters(self):
+        filters, tags = export_filters(
+            status="ACTIVE",
+            common_name="api.example.com",
+            expires_before="2026-02-01",
+            expires_after="2026-01-01T00:00:00+02:00",
+            tags=["team=payments", "env=prod"],
+        )
+        self.assertEqual(
+            filters,
+            {
+                "status": Status.ACTIVE,
+                "subject_common_name": "api.example.com",
+                "not_after__lt": datetime(2026, 2, 1, tzinfo=timezone.utc),
+                "not_after__gte": datetime(
+                    2026, 1, 1, tzinfo=timezone(timedelta(hours=2))
+                ),
+            },
+        )
+        self.assertEqual(
+            tags.list(),
+            [{"Key": "team", "Value": "payments"}, {"Key": "env", "Value": "prod"}],
+        )
+        self.assertEqual(export_filters(), ({}, None))
+
+    def test_malformed_filters(self):
+        for options in (
+            {"status": "ACTIVATED"},
+            {"expires_before": "soon"},
+            {"tags": ["team"]},
+        ):
+            with self.subTest(options=options), self.assertRaises(ValueError):
+                export_filters(**options)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from logging import getLogger
+
+from attrs import define, field
+from certtool_api.core import Certificate, Status, Tags
+from certtool_api.core.certificate_bundle import BundleItem
+from certtool_api.core.crypto_executor import CryptoExecutor
+from certtool_api.core.x509_encoding import CERTIFICATE_LABEL
+from certtool_api.services.certificate_importer import CertificateImporter
+from cryptography import x509
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.serialization import Encoding
+
+
+@define
+class Issuer:
+    certificate: x509.Certificate
+    key: ec.EllipticCurvePrivateKey
+
+
+# function to make a certificate for common_name, issued by issuer or self signed, a CA if ca
+def _issue(common_name: str, issuer: Issuer | None = None, ca: bool = False) -> Issuer:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, common_name)])
+    now = datetime.utcnow().replace(microsecond=0)
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(issuer.certificate.subject if issuer else name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + timedelta(days=30))
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+    )
+    if not ca:
+        builder = builder.add_extension(
+            x509.SubjectAlternativeName([x509.DNSName(common_name)]), critical=False
+        )
+    return Issuer(builder.sign(issuer.key if issuer else key, SHA256()), key)
+
+
+def _pem(*issued: Issuer) -> bytes:
+    return b"".join(i.certificate.public_bytes(Encoding.PEM) for i in issued)
+
+
+@define
+class CertificateStoreFake:
+    saved: list[Certificate] = field(factory=list)
+    save_calls: int = 0
+
+    def save_many(self, certificates, chunk_size=500):
+        self.save_calls += 1
+        self.saved.extend(certificates)
+        return [None] * len(certificates)
+
+    def stored_fingerprints(self, fingerprints):
+        stored = {c.fingerprint.hex() for c in self.saved}
+        return stored & set(fingerprints)
+
+
+class CertificateImporterTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.root = _issue("Root CA", ca=True)
+        cls.intermediate = _issue("Intermediate CA", cls.root, ca=True)
+        cls.leaves = [
+            _issue(f"host{i}.example.com", cls.intermediate) for i in range(5)
+        ]
+
+    def setUp(self):
+        self.repo = CertificateStoreFake()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def _importer(self, **kwargs) -> CertificateImporter:
+        return CertificateImporter(repo=self.repo, log=getLogger(__name__), **kwargs)
+
+    def _write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def _chains(self) -> dict[str, list[str]]:
+        return {
+            c.subject.common_name: [i.subject.rfc4514_string() for i in c.chain]
+            for c in self.repo.saved
+        }
+
+    def test_imports_leaves_with_their_chains(self):
+        path = self._write(
+            "bundle.pem", _pem(*self.leaves[:2], self.intermediate, self.root)
+        )
+        stats = self._importer().import_paths([path])
+        self.assertEqual(
+            (stats.read, stats.imported, stats.issuers, stats.unlinked), (4, 2, 2, 0)
+        )
+        self.assertEqual(
+            self._chains(),
+            {
+                f"host{i}.example.com": ["CN=Intermediate CA", "CN=Root CA"]
+                for i in range(2)
+            },
+        )
+        certificate = self.repo.saved[0]
+        self.assertEqual(
+            certificate.certificate_der,
+            self.leaves[0].certificate.public_bytes(Encoding.DER),
+        )
+        self.assertEqual(certificate.alternate_names, ["host0.example.com"])
+        self.assertEqual(certificate.status, Status.ACTIVE)
+        self.assertIsNotNone(certificate.not_after.tzinfo)
+
+    def test_issuers_read_a_chunk_later_are_linked(self):
+        path = self._write(
+            "bundle.pem", _pem(*self.leaves[:2], self.intermediate, self.root)
+        )
+        self._importer(chunk_size=2).import_paths([path])
+        self.assertEqual(len(self._chains()["host0.example.com"]), 2)
+
+    def test_missing_issuers_leave_the_chain_short(self):
+        path = self._write("bundle.pem", _pem(self.leaves[0], self.intermediate))
+        stats = self._importer(chunk_size=1).import_paths([path])
+        self.assertEqual((stats.imported, stats.unlinked), (1, 1))
+        self.assertEqual(self._chains(), {"host0.example.com": ["CN=Intermediate CA"]})
+
+    def test_duplicates_are_skipped(self):
+        bundle = _pem(self.leaves[0], self.leaves[0], self.leaves[1], self.root)
+        path = self._write("bundle.pem", bundle)
+        stats = self._importer().import_paths([path])
+        self.assertEqual((stats.imported, stats.duplicates), (2, 1))
+        # a second import finds them stored
+        stats = self._importer().import_paths([path])
+        self.assertEqual((stats.imported, stats.duplicates), (0, 3))
+
+    def test_invalid_and_skipped_items_are_counted(self):
+        items = [
+            BundleItem("bundle", 0, CERTIFICATE_LABEL, b"not a certificate"),
+            BundleItem("bundle", 1, b"PRIVATE KEY", b"a key"),
+            BundleItem("bundle", 2, None, b""),
+            BundleItem("bundle", 3, CERTIFICATE_LABEL, _pem(self.leaves[0])),
+        ]
+        stats = self._importer().import_items(items)
+        self.assertEqual(
+            (stats.read, stats.imported, stats.invalid, stats.skipped), (4, 1, 2, 1)
+        )
+
+    def test_chunks_are_saved_in_bulk_with_progress(self):
+        path = self._write(
+            "bundle.pem", _pem(self.root, self.intermediate, *self.leaves)
+        )
+        reported = []
+        stats = self._importer(chunk_size=3, tags=Tags(source="import")).import_paths(
+            [path], progress=reported.append
+        )
+        self.assertEqual(stats.imported, 5)
+        self.assertEqual(self.repo.save_calls, 3)
+        self.assertEqual([s.read for s in reported], [3, 6, 7])
+        self.assertTrue(
+            all(
+                c.tags.list() == [{"Key": "source", "Value": "import"}]
+                for c in self.repo.saved
+            )
+        )
+
+    def test_parses_in_the_executor(self):
+        path = self._write(
+            "bundle.pem", _pem(*self.leaves, self.intermediate, self.root)
+        )
+        with CryptoExecutor(workers=2, batch_size=2) as executor:
+            stats = self._importer(executor=executor).import_paths([path])
+        self.assertEqual((stats.imported, stats.unlinked), (5, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
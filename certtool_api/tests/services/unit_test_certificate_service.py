@@ -0,0 +1,166 @@
+import threading
+import unittest
+from datetime import timedelta
+from logging import getLogger
+
+from attrs import define, evolve, field
+from certtool_api.core import Certificate, Subject
+from certtool_api.core.issuance import IssuanceInProgressError
+from certtool_api.repositories.aws.certificate_authority import AWSCertificateAuthority
+from certtool_api.repositories.aws.certificate_manager import AWSCertificateManager
+from certtool_api.services.certificate_service import CertificateService
+from certtool_api.tests.fakes import FakeAWS, Latency
+
+
+@define
+class CertificateStoreFake:
+    certificates: dict[int, Certificate] = field(factory=dict)
+
+    def save(self, certificate: Certificate) -> None:
+        if certificate.certificate_id is None:
+            certificate.certificate_id = len(self.certificates) + 1
+        self.certificates[certificate.certificate_id] = evolve(certificate, key=None)
+
+    def get(self, certificate_id: int) -> Certificate:
+        return evolve(self.certificates[certificate_id])
+
+
+@define
+class IssuanceStoreFake:
+    """
+    An issuance store shared by services standing in for separate processes, whose leases never expire
+    """
+
+    issued: dict[str, str] = field(factory=dict)
+    leased: set[str] = field(factory=set)
+    claims: int = 0
+    _lock: threading.Lock = field(factory=threading.Lock)
+
+    def claim(self, request_key: str, window: timedelta, lease: timedelta):
+        with self._lock:
+            self.claims += 1
+            if request_key in self.issued:
+                return self.issued[request_key]
+            if request_key in self.leased:
+                raise IssuanceInProgressError(request_key)
+            self.leased.add(request_key)
+            return None
+
+    def record(self, request_key: str, certificate_arn: str) -> None:
+        with self._lock:
+            self.issued[request_key] = certificate_arn
+            self.leased.discard(request_key)
+
+    def release(self, request_key: str) -> None:
+        with self._lock:
+            self.leased.discard(request_key)
+
+
+def _request() -> Certificate:
+    return Certificate(
+        subject=Subject(common_name="api.example.com"),
+        alternate_names=["api.example.com", "www.example.com"],
+    )
+
+
+class CertificateServiceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.aws = FakeAWS(latency={"acm": Latency.constant(0.05)})
+        self.ca_arn = self.aws.acm_pca.create_certificate_authority()
+        patcher = self.aws.patch_clients()
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+        self.repo = CertificateStoreFake()
+
+    def _service(self, **kwargs) -> CertificateService:
+        ca = AWSCertificateAuthority(arn=self.ca_arn)
+        return CertificateService(
+            acm=AWSCertificateManager(private_ca=ca),
+            ca=ca,
+            repo=self.repo,
+            log=getLogger(__name__),
+            **kwargs,
+        )
+
+    def test_concurrent_identical_requests_are_issued_once(self):
+        service = self._service()
+        requests = [_request() for _ in range(6)]
+        ready = threading.Barrier(len(requests))
+
+        def sign(certificate):
+            ready.wait()
+            service.sign_certificate(certificate)
+
+        threads = [threading.Thread(target=sign, args=(c,)) for c in requests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.aws.calls["acm:RequestCertificate"], 1)
+        self.assertEqual(len({c.acm_arn for c in requests}), 1)
+        self.assertEqual(len({c.certificate_pem for c in requests}), 1)
+        self.assertEqual(len({c.key.get_pem() for c in requests}), 1)
+
+    def test_retried_request_gets_the_same_certificate_from_acm(self):
+        service = self._service()
+        first = service.sign_certificate(_request())
+        retried = service.sign_certificate(_request())
+        self.assertEqual(self.aws.calls["acm:RequestCertificate"], 2)
+        self.assertEqual(len(self.aws.acm.certificates), 1)
+        self.assertEqual(retried.acm_arn, first.acm_arn)
+
+    def test_processes_share_issued_certificates(self):
+        issuances = IssuanceStoreFake()
+        first = self._service(issuances=issuances).sign_certificate(_request())
+        second = self._service(issuances=issuances).sign_certificate(_request())
+        self.assertEqual(self.aws.calls["acm:RequestCertificate"], 1)
+        self.assertEqual(second.acm_arn, first.acm_arn)
+        self.assertEqual(second.certificate_pem, first.certificate_pem)
+        self.assertEqual(second.key.get_pem(), first.key.get_pem())
+        # storing them is left to the callers
+        self.assertEqual(self.repo.certificates, {})
+
+    def test_waits_for_a_request_another_process_is_issuing(self):
+        issuances = IssuanceStoreFake()
+        service = self._service(issuances=issuances, claim_poll=0.01)
+        first = self._service(issuances=issuances).sign_certificate(_request())
+        # as if another process had taken the lease again and was still issuing
+        (request_key,) = issuances.issued
+        arn = issuances.issued.pop(request_key)
+        issuances.leased.add(request_key)
+        threading.Timer(0.1, issuances.record, (request_key, arn)).start()
+
+        second = service.sign_certificate(_request())
+        self.assertGreater(issuances.claims, 3)
+        self.assertEqual(second.acm_arn, first.acm_arn)
+        self.assertEqual(self.aws.calls["acm:RequestCertificate"], 1)
+
+    def test_failed_issuance_releases_its_lease(self):
+        issuances = IssuanceStoreFake()
+        request = _request()
+        request.subject.common_name = None
+        with self.assertRaises(Exception):
+            self._service(issuances=issuances).sign_certificate(request)
+        self.assertEqual(issuances.claims, 1)
+        self.assertEqual((issuances.issued, issuances.leased), ({}, set()))
+
+    def test_ca_signs_each_csr_once(self):
+        issuances = IssuanceStoreFake()
+        request = _request().generate_key().generate_csr()
+        first = self._service(issuances=issuances).sign_certificate(
+            request, acm_managed=False
+        )
+        retried = self._service(issuances=issuances).sign_certificate(
+            evolve(request), acm_managed=False
+        )
+        other = self._service(issuances=issuances).sign_certificate(
+            _request().generate_key().generate_csr(), acm_managed=False
+        )
+        self.assertEqual(self.aws.calls["acm-pca:IssueCertificate"], 2)
+        self.assertEqual(retried.certificate_pem, first.certificate_pem)
+        self.assertNotEqual(other.certificate_pem, first.certificate_pem)
+
+
+if __name__ == "__main__":
+    unittest.main()
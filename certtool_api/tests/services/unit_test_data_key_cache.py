@@ -0,0 +1,106 @@
+import unittest
+from unittest import mock
+
+from attrs import define, field
+from certtool_api.core import PrivateKey
+from certtool_api.services.data_key_cache import DataKeyCache
+from certtool_api.services.kms_service import KMSService, KMSServiceError
+
+TEST_CONTEXT = {"purpose": "test"}
+
+
+@define
+class KMSClientFake:
+    """
+    A KMS client that wraps data keys by reversing them, and counts how often it is asked to.
+    """
+
+    generated: int = 0
+    decrypted: int = 0
+    exceptions: object = field(
+        factory=lambda: mock.Mock(InvalidCiphertextException=KeyError)
+    )
+
+    def generate_data_key(self, KeyId, KeySpec, EncryptionContext=None):
+        self.generated += 1
+        plaintext = bytes(range(self.generated, self.generated + 32))
+        return {"Plaintext": plaintext, "CiphertextBlob": plaintext[::-1]}
+
+    def decrypt(self, CiphertextBlob, EncryptionContext=None):
+        self.decrypted += 1
+        return {"Plaintext": CiphertextBlob[::-1]}
+
+
+class DataKeyCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = KMSClientFake()
+        patcher = mock.patch.object(
+            KMSService, "_client", new_callable=mock.PropertyMock
+        )
+        patcher.start().return_value = self.client
+        self.addCleanup(patcher.stop)
+
+    def _kms(self, **cache_limits) -> KMSService:
+        return KMSService(
+            encryption_context=TEST_CONTEXT,
+            envelope=True,
+            data_key_cache=DataKeyCache(**cache_limits),
+        )
+
+    def test_envelope_round_trip(self):
+        kms = KMSService(encryption_context=TEST_CONTEXT)
+        envelope = kms.encrypt_envelope(b"secret")
+        self.assertNotIn(b"secret", envelope.ciphertext)
+        self.assertEqual(kms.decrypt_envelope(envelope), b"secret")
+
+    def test_envelope_is_bound_to_encryption_context(self):
+        kms = self._kms()
+        envelope = kms.encrypt_envelope(b"secret")
+        with self.assertRaises(KMSServiceError):
+            kms.decrypt_envelope(envelope, {"purpose": "other"})
+
+    def test_data_key_reused_until_max_uses(self):
+        kms = self._kms(max_uses=2)
+        first, second, third = (kms.encrypt_envelope(b"secret") for _ in range(3))
+        self.assertEqual(first.wrapped_key, second.wrapped_key)
+        self.assertNotEqual(first.wrapped_key, third.wrapped_key)
+        self.assertEqual(self.client.generated, 2)
+
+    def test_data_key_retired_at_max_bytes(self):
+        kms = self._kms(max_bytes=10)
+        kms.encrypt_envelope(b"123456")
+        kms.encrypt_envelope(b"123456")
+        self.assertEqual(self.client.generated, 2)
+
+    def test_data_key_retired_at_max_age(self):
+        kms = self._kms(max_age=60)
+        kms.encrypt_envelope(b"secret")
+        with mock.patch("time.monotonic", return_value=10**9):
+            kms.encrypt_envelope(b"secret")
+        self.assertEqual(self.client.generated, 2)
+
+    def test_decrypt_caches_unwrapped_data_keys(self):
+        writer = KMSService(encryption_context=TEST_CONTEXT)
+        envelopes = [writer.encrypt_envelope(b"secret") for _ in range(3)]
+        reader = self._kms()
+        for _ in range(2):
+            for envelope in envelopes:
+                self.assertEqual(reader.decrypt_envelope(envelope), b"secret")
+        self.assertEqual(self.client.decrypted, len(envelopes))
+
+    def test_private_key_envelope_round_trip(self):
+        kms = self._kms()
+        key = PrivateKey.new(key_size=1024)
+        kms.encrypt_private_key(key)
+        self.assertIsNotNone(key.kms_wrapped_data_key)
+        stored = PrivateKey(
+            kms_encrypted_key=key.kms_encrypted_key,
+            kms_encryption_context=key.kms_encryption_context,
+            kms_wrapped_data_key=key.kms_wrapped_data_key,
+        )
+        self.assertEqual(kms.decrypt_private_key(stored).fingerprint, key.fingerprint)
+        self.assertEqual(self.client.decrypted, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from attrs import define, field
+from certtool_api.aws.throttling import TokenBucket
+from certtool_api.core import PrivateKey
+from certtool_api.core.private_key import KeyTypes
+from certtool_api.services import DataKeyCache, kms_service
+from certtool_api.services.kms_service import KMSService, KMSServiceError
+
+
+class InvalidCiphertextException(Exception):
+    pass
+
+
+@define
+class KMSClientFake:
+    """
+    A KMS client that "encrypts" by prefixing, refuses anything containing b"bad", and records how many
+    calls were in flight at once.
+    """
+
+    delay: float = 0.01
+    in_flight: int = 0
+    max_in_flight: int = 0
+    exceptions: object = field(
+        factory=lambda: mock.Mock(InvalidCiphertextException=InvalidCiphertextException)
+    )
+    _lock: threading.Lock = field(factory=threading.Lock)
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+
+    def encrypt(self, KeyId, Plaintext, EncryptionContext=None):
+        self._enter()
+        return {"CiphertextBlob": b"enc:" + Plaintext}
+
+    def decrypt(self, CiphertextBlob, EncryptionContext=None):
+        self._enter()
+        if b"bad" in CiphertextBlob:
+            raise InvalidCiphertextException()
+        return {"Plaintext": CiphertextBlob.removeprefix(b"enc:")}
+
+    def generate_data_key(self, KeyId, KeySpec, EncryptionContext=None):
+        self._enter()
+        key = os.urandom(32)
+        return {"Plaintext": key, "CiphertextBlob": b"enc:" + key}
+
+
+class KMSBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = KMSClientFake()
+        patcher = mock.patch.object(
+            KMSService, "_client", new_callable=mock.PropertyMock
+        )
+        patcher.start().return_value = self.client
+        self.addCleanup(patcher.stop)
+
+    def test_encrypt_many_preserves_order(self):
+        items = [str(i).encode() for i in range(20)]
+        results = KMSService(batch_workers=4).encrypt_many(items)
+        self.assertEqual([r.value for r in results], [b"enc:" + i for i in items])
+
+    def test_batch_is_bounded_by_workers(self):
+        KMSService(batch_workers=3).encrypt_many([b"x"] * 12)
+        self.assertGreater(self.client.max_in_flight, 1)
+        self.assertLessEqual(self.client.max_in_flight, 3)
+
+    def test_decrypt_many_reports_errors_per_item(self):
+        results = KMSService().decrypt_many([b"enc:1", b"bad", b"enc:3"])
+        self.assertEqual([r.ok for r in results], [True, False, True])
+        self.assertEqual(results[0].value, b"1")
+        self.assertIsInstance(results[1].error, KMSServiceError)
+        self.assertEqual(results[2].value, b"3")
+
+    def test_rate_limiter_is_honoured(self):
+        self.client.delay = 0
+        kms = KMSService(batch_workers=8, rate_limiter=TokenBucket(rate=50, burst=1))
+        started = time.monotonic()
+        kms.encrypt_many([b"x"] * 11)
+        # one token up front, then ten more at 50 per second
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+    def test_rate_limiter_is_only_taken_for_kms_requests(self):
+        self.client.delay = 0
+        limiter = mock.Mock(spec=TokenBucket)
+        writer = KMSService(
+            envelope=True, data_key_cache=DataKeyCache(), rate_limiter=limiter
+        )
+        keys = [PrivateKey.new(key_size=256, key_type=KeyTypes.EC) for _ in range(4)]
+        for key in keys:
+            writer.encrypt_private_key(key)
+        # outside a batch nothing is taken
+        self.assertEqual(limiter.acquire.call_count, 0)
+
+        reader = KMSService(
+            envelope=True, data_key_cache=DataKeyCache(), rate_limiter=limiter
+        )
+        self.assertTrue(reader.decrypt_private_keys(keys[:1])[0].ok)
+        self.assertEqual(limiter.acquire.call_count, 1)
+        # the keys share the data key unwrapped above, so they make no request
+        results = reader.decrypt_private_keys(keys)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(limiter.acquire.call_count, 1)
+
+    def test_concurrent_first_batches_share_a_pool(self):
+        kms_service._batch_executors.pop(5, None)
+        barrier = threading.Barrier(4)
+
+        def _first_batch():
+            barrier.wait()
+            return kms_service._batch_executor(5)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            pools = list(executor.map(lambda _: _first_batch(), range(4)))
+        self.assertEqual(len({id(pool) for pool in pools}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,8 @@
 import unittest
 
-# will be using localstack for these functional tests
-import boto3
+from certtool_api.core import PrivateKey
 from certtool_api.services.kms_service import DEFAULT_KMS_KEY_ALIAS, KMSService
-
-ENDPOINT_URL = "http://localstack:4566"
-AWS_CREDS = {
-    "aws_access_key_id": "test",
-    "aws_secret_access_key": "test",
-}
+from certtool_api.tests.fakes import FakeAWS
 
 
 class KMSServiceFunctionalTestCase(unittest.TestCase):
@@ -25,7 +19,11 @@ class KMSServiceFunctionalTestCase(unittest.TestCase):
         self.client.delete_alias(AliasName=key_alias)
 
     def setUp(self):
-        self.client = boto3.client("kms", endpoint_url=ENDPOINT_URL, **AWS_CREDS)
+        self.aws = FakeAWS()
+        patcher = self.aws.patch_clients()
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+        self.client = self.aws.client("kms")
         self.key_id = self._create_kms_key()
         self._create_kms_alias(self.key_id)
         self.test_token = b"test"
@@ -35,17 +33,31 @@ class KMSServiceFunctionalTestCase(unittest.TestCase):
         self._delete_kms_key(self.key_id)
 
     def test_encrypt_decrypt(self):
-        kms = KMSService(endpoint_url=ENDPOINT_URL)
+        kms = KMSService()
         blob = kms.encrypt(self.test_token)
         self.assertEqual(kms.decrypt(blob), self.test_token)
 
-    # TODO: Move this test to a integration test, can't rely on localstack to use the context at all
     def test_encrypt_with_encryption_context(self):
         encryption_context = {"test": "test"}
-        kms = KMSService(
-            endpoint_url=ENDPOINT_URL, encryption_context=encryption_context
-        )
+        kms = KMSService(encryption_context=encryption_context)
         blob = kms.encrypt(self.test_token)
         self.assertEqual(kms.decrypt(blob), self.test_token)
         with self.assertRaises(Exception):
             kms.decrypt(blob, {"test": "test1"})
+
+    def test_envelope_private_key_round_trip(self):
+        kms = KMSService(envelope=True, encryption_context={"test": "test"})
+        key = PrivateKey.new(key_size=1024)
+        stored = kms.encrypt_private_key(key)
+        loaded = kms.decrypt_private_key(
+            PrivateKey(
+                kms_encrypted_key=stored.kms_encrypted_key,
+                kms_encryption_context=stored.kms_encryption_context,
+                kms_wrapped_data_key=stored.kms_wrapped_data_key,
+            )
+        )
+        self.assertEqual(loaded.fingerprint, key.fingerprint)
+
+
+if __name__ == "__main__":
+    unittest.main()
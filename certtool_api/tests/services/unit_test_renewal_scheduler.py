@@ -0,0 +1,351 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from logging import getLogger
+from typing import Callable
+
+from attrs import define, field
+from certtool_api.core import (
+    Certificate,
+    CertificateError,
+    PrivateKey,
+    Status,
+    Subject,
+)
+from certtool_api.core.private_key import KeyTypes
+from certtool_api.services.certificate_service import CertificateService
+from certtool_api.services.renewal_scheduler import RenewalQueue, RenewalScheduler
+from cryptography import x509
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.hashes import SHA256
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+CA_ARN = "arn:aws:acm-pca:us-east-1:123456789012:certificate-authority/ca"
+
+
+@define
+class CertificateManagerFake:
+    """
+    An ACM that "issues" a year long certificate, refuses common names starting with bad, and records how
+    many requests were in flight at once.
+    """
+
+    delay: float = 0.01
+    in_flight: int = 0
+    max_in_flight: int = 0
+    requested: list[str] = field(factory=list)
+    _lock: threading.Lock = field(factory=threading.Lock)
+
+    def request_certificate(self, certificate: Certificate) -> Certificate:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.requested.append(certificate.common_name)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if certificate.common_name.startswith("bad"):
+            raise CertificateError("Refused.")
+        certificate.acm_arn = f"arn:aws:acm:renewed/{certificate.common_name}"
+        certificate.not_after = NOW + timedelta(days=365)
+        return certificate
+
+    def export_certificate(self, certificate_ref: str) -> Certificate:
+        return Certificate(
+            acm_arn=certificate_ref,
+            key=PrivateKey.new(key_size=256, key_type=KeyTypes.EC),
+            not_after=NOW + timedelta(days=365),
+        )
+
+
+@define
+class CertificateSignerFake:
+    """
+    A private CA that "issues" a year long certificate for the CSR it is given
+    """
+
+    issued: list[str] = field(factory=list)
+
+    def issue_certificate(self, certificate: Certificate) -> Certificate:
+        self.issued.append(certificate.common_name)
+        certificate.private_ca_arn = f"{CA_ARN}/certificate/{len(self.issued)}"
+        certificate.not_after = NOW + timedelta(days=365)
+        return certificate
+
+
+@define
+class KMSServiceFake:
+    def encrypt_private_key(
+        self, key: PrivateKey, encryption_context: dict[str, str] | None = None
+    ) -> PrivateKey:
+        key.set_kms_encrypted_key(b"enc:" + key.get_key_der(), encryption_context)
+        return key
+
+
+@define
+class CertificateStoreFake:
+    """
+    A certificate store holding its certificates in a list, recording where each expiring() read started
+    """
+
+    certificates: list[Certificate] = field(factory=list)
+    reads: list[tuple | None] = field(factory=list)
+    failing: bool = False
+
+    def expiring(self, before, after=None, limit=500) -> list[Certificate]:
+        self.reads.append(after)
+        found = sorted(
+            (
+                c
+                for c in self.certificates
+                if c.status == Status.ACTIVE
+                and c.not_after < before
+                and (after is None or (c.not_after, c.certificate_id) > after)
+            ),
+            key=lambda c: (c.not_after, c.certificate_id),
+        )
+        return found[:limit]
+
+    def supersede(self, certificate: Certificate, renewal: Certificate) -> None:
+        if self.failing:
+            raise RuntimeError("database unavailable")
+        renewal.certificate_id = len(self.certificates) + 1
+        self.certificates.append(renewal)
+        certificate.status = Status.INACTIVE
+
+
+@define
+class IssuanceStoreFake:
+    issued: dict[str, str] = field(factory=dict)
+
+    def claim(self, request_key, window, lease):
+        return self.issued.get(request_key)
+
+    def record(self, request_key, certificate_arn):
+        self.issued[request_key] = certificate_arn
+
+    def release(self, request_key):
+        pass
+
+
+@define
+class CheckpointStoreFake:
+    positions: dict = field(factory=dict)
+    stored: list = field(factory=list)
+    # called after each store
+    on_store: Callable[[], None] | None = None
+
+    def load(self, name):
+        return self.positions.get(name)
+
+    def store(self, name, position):
+        self.positions[name] = position
+        self.stored.append(position)
+        if self.on_store:
+            self.on_store()
+
+    def clear(self, name):
+        self.positions.pop(name, None)
+
+
+class RenewalSchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.acm = CertificateManagerFake()
+        self.ca = CertificateSignerFake()
+        self.repo = CertificateStoreFake()
+        self.checkpoints = CheckpointStoreFake()
+
+    def _scheduler(self, issuances=None, **kwargs) -> RenewalScheduler:
+        service = CertificateService(
+            acm=self.acm,
+            ca=self.ca,
+            repo=self.repo,
+            log=getLogger(__name__),
+            issuances=issuances,
+        )
+        options = {"rate": None, "clock": lambda: NOW} | kwargs
+        return RenewalScheduler(
+            service=service,
+            repo=self.repo,
+            checkpoints=self.checkpoints,
+            log=getLogger(__name__),
+            kms=KMSServiceFake(),
+            **options,
+        )
+
+    def _add(self, common_name: str, days: float, acm: bool = True) -> Certificate:
+        certificate = Certificate(
+            certificate_id=len(self.repo.certificates) + 1,
+            acm_arn=f"arn:aws:acm:{common_name}" if acm else None,
+            issuer_ca_arn=CA_ARN,
+            subject=Subject(common_name=common_name),
+            alternate_names=[common_name],
+            not_after=NOW + timedelta(days=days),
+            status=Status.ACTIVE,
+        )
+        self.repo.certificates.append(certificate)
+        return certificate
+
+    def test_renews_due_certificates_in_expiry_order(self):
+        later = self._add("later.example.com", days=20)
+        sooner = self._add("sooner.example.com", days=2)
+        expired = self._add("expired.example.com", days=-1)
+        not_due = self._add("not-due.example.com", days=45)
+
+        stats = self._scheduler(workers=1).run_once()
+
+        self.assertEqual(
+            self.acm.requested,
+            ["expired.example.com", "sooner.example.com", "later.example.com"],
+        )
+        self.assertEqual(
+            [c.status for c in (expired, sooner, later, not_due)],
+            [Status.INACTIVE, Status.INACTIVE, Status.INACTIVE, Status.ACTIVE],
+        )
+        self.assertEqual((stats.renewed, stats.failed, stats.queued), (3, 0, 0))
+        # the expired certificate was due 31 days ago
+        self.assertEqual(stats.max_lag, timedelta(days=31).total_seconds())
+        self.assertEqual(
+            self.checkpoints.stored[-1], (later.not_after, later.certificate_id)
+        )
+        # the pass got to the end, so the next starts from the beginning
+        self.assertIsNone(self.checkpoints.load("default"))
+
+    def test_renews_a_bucket_across_the_workers(self):
+        for index in range(8):
+            self._add(f"host{index}.example.com", days=1)
+        self._scheduler(workers=4).run_once()
+        self.assertEqual(self.acm.max_in_flight, 4)
+
+    def test_restart_reads_on_from_the_checkpoint(self):
+        certificates = [
+            self._add(f"host{index}.example.com", days=index + 1) for index in range(5)
+        ]
+        # as left by a pass interrupted after renewing the first two
+        checkpoint = (certificates[1].not_after, certificates[1].certificate_id)
+        self.checkpoints.store("default", checkpoint)
+
+        self.assertEqual(self._scheduler(load_size=2).run_once().renewed, 3)
+        self.assertEqual(self.repo.reads[0], checkpoint)
+        self.assertEqual(
+            self.acm.requested, [f"host{i}.example.com" for i in (2, 3, 4)]
+        )
+        self.assertIsNone(self.checkpoints.load("default"))
+
+    def test_passes_start_from_the_beginning(self):
+        self._add("later.example.com", days=10)
+        self._scheduler().run_once()
+        # saved after the first pass, expiring before what it renewed
+        sooner = self._add("sooner.example.com", days=1)
+
+        self.repo.reads.clear()
+        self.assertEqual(self._scheduler().run_once().renewed, 1)
+        self.assertEqual(self.repo.reads, [None])
+        self.assertEqual(sooner.status, Status.INACTIVE)
+
+    def test_stopped_pass_keeps_its_checkpoint(self):
+        for index in range(4):
+            self._add(f"host{index}.example.com", days=index + 1)
+        scheduler = self._scheduler(workers=1, bucket_seconds=60)
+        # stopped after the first bucket
+        self.checkpoints.on_store = scheduler.stop
+
+        self.assertEqual(scheduler.run_once().renewed, 1)
+        self.assertEqual(self.checkpoints.load("default"), self.checkpoints.stored[0])
+
+    def test_failure_holds_the_checkpoint_and_is_retried(self):
+        first = self._add("first.example.com", days=1)
+        bad = self._add("bad.example.com", days=2)
+        self._add("last.example.com", days=3)
+
+        stats = self._scheduler(workers=1, bucket_seconds=60).run_once()
+        self.assertEqual((stats.renewed, stats.failed), (2, 1))
+        self.assertEqual(
+            self.checkpoints.stored, [(first.not_after, first.certificate_id)]
+        )
+
+        self.acm.requested.clear()
+        self._scheduler().run_once()
+        self.assertEqual(self.acm.requested, ["bad.example.com"])
+        self.assertEqual(bad.status, Status.ACTIVE)
+
+    def test_renewal_is_only_saved_with_the_certificate_it_replaces(self):
+        certificate = self._add("api.example.com", days=1)
+        issuances = IssuanceStoreFake()
+        self.repo.failing = True
+
+        stats = self._scheduler(issuances=issuances).run_once()
+        self.assertEqual((stats.renewed, stats.failed), (0, 1))
+        # issued, but nothing was stored alongside the certificate it was to replace
+        self.assertEqual(len(issuances.issued), 1)
+        self.assertEqual(self.repo.certificates, [certificate])
+        self.assertEqual(certificate.status, Status.ACTIVE)
+
+        self.repo.failing = False
+        self.assertEqual(self._scheduler(issuances=issuances).run_once().renewed, 1)
+        # the next pass stored the certificate already issued rather than issuing another
+        self.assertEqual(self.acm.requested, ["api.example.com"])
+        self.assertEqual(
+            self.repo.certificates[-1].acm_arn, "arn:aws:acm:renewed/api.example.com"
+        )
+        self.assertEqual(certificate.status, Status.INACTIVE)
+
+    def test_ca_renewals_are_saved_with_their_encrypted_key(self):
+        certificate = self._add("internal.example.com", days=1, acm=False)
+
+        self.assertEqual(self._scheduler().run_once().renewed, 1)
+
+        renewal = self.repo.certificates[-1]
+        self.assertEqual(self.ca.issued, ["internal.example.com"])
+        self.assertEqual(self.acm.requested, [])
+        self.assertEqual(
+            renewal.key.kms_encrypted_key, b"enc:" + renewal.key.get_key_der()
+        )
+        self.assertEqual(renewal.csr.public_key(), renewal.key.key.public_key())
+        self.assertEqual(certificate.status, Status.INACTIVE)
+
+    def test_ca_certificates_are_not_renewed(self):
+        key = ec.generate_private_key(ec.SECP256R1())
+        name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, "Issuing CA")])
+        subordinate = self._add("Issuing CA", days=1, acm=False)
+        subordinate.certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(NOW)
+            .not_valid_after(subordinate.not_after)
+            .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+            .sign(key, SHA256())
+        )
+        self._add("leaf.example.com", days=1)
+
+        self.assertEqual(self._scheduler().run_once().renewed, 1)
+        self.assertEqual(self.acm.requested, ["leaf.example.com"])
+        self.assertEqual(self.ca.issued, [])
+        self.assertEqual(subordinate.status, Status.ACTIVE)
+
+    def test_rate_limit_is_per_ca(self):
+        scheduler = self._scheduler(rate=2.0)
+        self.assertIs(scheduler._limiter(CA_ARN), scheduler._limiter(CA_ARN))
+        self.assertIsNot(scheduler._limiter(CA_ARN), scheduler._limiter("other"))
+        self.assertIsNone(self._scheduler(rate=None)._limiter(CA_ARN))
+
+
+class RenewalQueueTestCase(unittest.TestCase):
+    def test_pops_buckets_earliest_first(self):
+        queue = RenewalQueue(window=timedelta(days=1), bucket_seconds=3600)
+        certificates = [
+            Certificate(
+                certificate_id=index, not_after=NOW + timedelta(minutes=minutes)
+            )
+            for index, minutes in enumerate([150, 10, 70, 20])
+        ]
+        queue.push(certificates)
+        self.assertEqual(len(queue), 4)
+        self.assertEqual([c.certificate_id for c in queue.pop()], [1, 3])
+        self.assertEqual([c.certificate_id for c in queue.pop()], [2])
+        self.assertEqual([c.certificate_id for c in queue.pop()], [0])
+        self.assertEqual(queue.pop(), [])
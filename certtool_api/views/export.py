@@ -0,0 +1,38 @@
+from certtool_api.repositories import InvalidQueryError
+from certtool_api.services.certificate_exporter import ExportFormat, export_filters
+from certtool_api.services.service_factory import CertificateExporterFactory
+from django.contrib.auth.decorators import permission_required
+from django.http import HttpRequest, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+
+# streams the certificates matching the query string, see ./manage.py export_certificates for the options
+@require_GET
+@permission_required("certtool_api.view_certificatemodel", raise_exception=True)
+def export_certificates(request: HttpRequest):
+    try:
+        export_format: ExportFormat = ExportFormat(
+            request.GET.get("format", ExportFormat.PEM.value)
+        )
+        filters, tags = export_filters(
+            status=request.GET.get("status"),
+            common_name=request.GET.get("common_name"),
+            expires_before=request.GET.get("expires_before"),
+            expires_after=request.GET.get("expires_after"),
+            tags=request.GET.getlist("tag"),
+        )
+        export = CertificateExporterFactory.certificate_exporter().export(
+            export_format,
+            tags=tags,
+            chain=request.GET.get("chain", "true") != "false",
+            **filters,
+        )
+    except (ValueError, InvalidQueryError) as e:
+        return JsonResponse(status=400, data={"success": False, "error": str(e)})
+    response: StreamingHttpResponse = StreamingHttpResponse(
+        export, content_type=export_format.content_type
+    )
+    response[
+        "Content-Disposition"
+    ] = f'attachment; filename="certificates.{export_format.value}"'
+    return response